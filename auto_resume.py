@@ -42,15 +42,15 @@ class TaskResumer:
         """获取项目生成进度"""
         try:
             resp = self.session.get(
-                f"{BASE_URL}/api/chapters/project/{project_id}?limit=200", 
+                f"{BASE_URL}/api/chapters/project/{project_id}?fields=content_length", 
                 timeout=30
             )
             if resp.status_code == 200:
                 data = resp.json()
                 items = data.get('items', [])
                 total = data.get('total', 0)
-                generated = len([c for c in items if c.get('content') and len(c['content']) > 100])
-                last_chapter = max([c['chapter_number'] for c in items if c.get('content') and len(c['content']) > 100], default=0)
+                generated = len([c for c in items if c.get('content_length', 0) > 100])
+                last_chapter = max([c['chapter_number'] for c in items if c.get('content_length', 0) > 100], default=0)
                 return {
                     'total': total,
                     'generated': generated,
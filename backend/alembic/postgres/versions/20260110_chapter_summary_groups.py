@@ -0,0 +1,40 @@
+"""添加章节分组摘要缓存表
+
+Revision ID: 20260110_summary_groups
+Revises: 20260105_refinement
+Create Date: 2026-01-10
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20260110_summary_groups'
+down_revision = '20260105_refinement'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'chapter_summary_groups',
+        sa.Column('id', sa.String(36), primary_key=True),
+        sa.Column('project_id', sa.String(36), sa.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('tier', sa.String(20), nullable=False),
+        sa.Column('start_chapter', sa.Integer, nullable=False),
+        sa.Column('end_chapter', sa.Integer, nullable=False),
+        sa.Column('chars_per_group', sa.Integer, nullable=False),
+        sa.Column('fingerprint', sa.String(64), nullable=False),
+        sa.Column('content', sa.Text, nullable=False),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_index('ix_chapter_summary_groups_project_id', 'chapter_summary_groups', ['project_id'])
+    op.create_index(
+        'ix_chapter_summary_groups_range', 'chapter_summary_groups',
+        ['project_id', 'tier', 'start_chapter', 'end_chapter']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_chapter_summary_groups_range', 'chapter_summary_groups')
+    op.drop_index('ix_chapter_summary_groups_project_id', 'chapter_summary_groups')
+    op.drop_table('chapter_summary_groups')
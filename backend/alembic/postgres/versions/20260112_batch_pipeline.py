@@ -0,0 +1,23 @@
+"""批量生成任务添加流水线模式与阶段统计字段
+
+Revision ID: 20260112_batch_pipeline
+Revises: 20260110_summary_groups
+Create Date: 2026-01-12
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20260112_batch_pipeline'
+down_revision = '20260110_summary_groups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('batch_generation_tasks', sa.Column('pipelined', sa.Boolean(), nullable=True, server_default=sa.false()))
+    op.add_column('batch_generation_tasks', sa.Column('stage_metrics', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('batch_generation_tasks', 'stage_metrics')
+    op.drop_column('batch_generation_tasks', 'pipelined')
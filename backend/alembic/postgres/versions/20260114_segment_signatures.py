@@ -0,0 +1,33 @@
+"""添加章节片段MinHash签名表（重复检测索引）
+
+Revision ID: 20260114_segment_signatures
+Revises: 20260112_batch_pipeline
+Create Date: 2026-01-14
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20260114_segment_signatures'
+down_revision = '20260112_batch_pipeline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'chapter_segment_signatures',
+        sa.Column('chapter_id', sa.String(36), sa.ForeignKey('chapters.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('project_id', sa.String(36), sa.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('content_hash', sa.String(64), nullable=False),
+        sa.Column('segment_count', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('num_perm', sa.Integer, nullable=False),
+        sa.Column('signatures', sa.LargeBinary, nullable=False),
+        sa.Column('created_at', sa.DateTime, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_index('ix_chapter_segment_signatures_project_id', 'chapter_segment_signatures', ['project_id'])
+
+
+def downgrade():
+    op.drop_index('ix_chapter_segment_signatures_project_id', 'chapter_segment_signatures')
+    op.drop_table('chapter_segment_signatures')
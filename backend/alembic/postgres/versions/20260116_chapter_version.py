@@ -0,0 +1,24 @@
+"""章节表添加版本号列（乐观并发控制）
+
+Revision ID: 20260116_chapter_version
+Revises: 20260114_segment_signatures
+Create Date: 2026-01-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20260116_chapter_version'
+down_revision = '20260114_segment_signatures'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'chapters',
+        sa.Column('version', sa.Integer, nullable=False, server_default='1', comment='行版本号（乐观锁）')
+    )
+
+
+def downgrade():
+    op.drop_column('chapters', 'version')
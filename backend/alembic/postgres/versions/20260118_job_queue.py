@@ -0,0 +1,35 @@
+"""批量生成/分析任务添加租约与心跳列（持久化任务队列）
+
+Revision ID: 20260118_job_queue
+Revises: 20260116_chapter_version
+Create Date: 2026-01-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20260118_job_queue'
+down_revision = '20260116_chapter_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('batch_generation_tasks', 'analysis_tasks'):
+        op.add_column(table, sa.Column('lease_owner', sa.String(100), nullable=True, comment='持有租约的worker标识'))
+        op.add_column(table, sa.Column('lease_expires_at', sa.DateTime(), nullable=True, comment='租约过期时间'))
+        op.add_column(table, sa.Column('heartbeat_at', sa.DateTime(), nullable=True, comment='最近一次心跳时间'))
+        op.add_column(table, sa.Column('attempts', sa.Integer(), nullable=True, server_default='0', comment='被worker领取的次数'))
+    op.add_column('batch_generation_tasks', sa.Column('model', sa.String(100), nullable=True, comment='自定义模型（为空使用用户默认模型）'))
+    op.create_index('ix_batch_generation_tasks_lease_expires_at', 'batch_generation_tasks', ['lease_expires_at'])
+    op.create_index('idx_analysis_tasks_lease', 'analysis_tasks', ['status', 'lease_expires_at'])
+
+
+def downgrade():
+    op.drop_index('idx_analysis_tasks_lease', table_name='analysis_tasks')
+    op.drop_index('ix_batch_generation_tasks_lease_expires_at', table_name='batch_generation_tasks')
+    op.drop_column('batch_generation_tasks', 'model')
+    for table in ('batch_generation_tasks', 'analysis_tasks'):
+        op.drop_column(table, 'attempts')
+        op.drop_column(table, 'heartbeat_at')
+        op.drop_column(table, 'lease_expires_at')
+        op.drop_column(table, 'lease_owner')
@@ -0,0 +1,47 @@
+"""添加记忆重建索引任务表
+
+Revision ID: 20260120_memory_reindex
+Revises: 20260118_job_queue
+Create Date: 2026-01-20
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20260120_memory_reindex'
+down_revision = '20260118_job_queue'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'memory_reindex_tasks',
+        sa.Column('id', sa.String(36), primary_key=True, comment='任务ID'),
+        sa.Column('user_id', sa.String(100), nullable=False, comment='用户ID'),
+        sa.Column('project_id', sa.String(36), nullable=False, comment='项目ID'),
+        sa.Column('target_collection', sa.String(100), nullable=True, comment='写入的版本化集合名称（首次执行时生成）'),
+        sa.Column('embedding_model', sa.String(100), nullable=True, comment='使用的embedding模型'),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending', comment='任务状态: pending/running/completed/failed'),
+        sa.Column('progress', sa.Integer(), nullable=True, server_default='0', comment='进度 0-100'),
+        sa.Column('cursor', sa.String(100), nullable=True, comment='已处理的最后一条记忆ID（续传位置）'),
+        sa.Column('processed_count', sa.Integer(), nullable=True, server_default='0', comment='已写入的记忆数'),
+        sa.Column('total_count', sa.Integer(), nullable=True, server_default='0', comment='记忆总数'),
+        sa.Column('throughput', sa.Float(), nullable=True, comment='写入速度（条/秒）'),
+        sa.Column('eta_seconds', sa.Integer(), nullable=True, comment='预计剩余时间（秒）'),
+        sa.Column('error_message', sa.Text(), nullable=True, comment='错误信息'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), comment='创建时间'),
+        sa.Column('started_at', sa.DateTime(), nullable=True, comment='开始执行时间'),
+        sa.Column('completed_at', sa.DateTime(), nullable=True, comment='完成时间'),
+        sa.Column('lease_owner', sa.String(100), nullable=True, comment='持有租约的worker标识'),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True, comment='租约过期时间'),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True, comment='最近一次心跳时间'),
+        sa.Column('attempts', sa.Integer(), nullable=True, server_default='0', comment='被worker领取的次数'),
+    )
+    op.create_index('ix_memory_reindex_tasks_project_id', 'memory_reindex_tasks', ['project_id'])
+    op.create_index('idx_memory_reindex_tasks_lease', 'memory_reindex_tasks', ['status', 'lease_expires_at'])
+
+
+def downgrade():
+    op.drop_index('idx_memory_reindex_tasks_lease', table_name='memory_reindex_tasks')
+    op.drop_index('ix_memory_reindex_tasks_project_id', table_name='memory_reindex_tasks')
+    op.drop_table('memory_reindex_tasks')
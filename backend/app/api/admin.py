@@ -12,6 +12,7 @@ from app.database import get_db
 from app.models.user import User
 from app.user_manager import user_manager
 from app.user_password import password_manager
+from app.services.llm_response_cache import llm_response_cache
 from app.logger import get_logger
 
 logger = get_logger(__name__)
@@ -152,6 +153,7 @@ async def create_user(
                     db_user.is_admin = True
                     await session.commit()
                     new_user.is_admin = True
+            user_manager.invalidate_user(user_id)
         
         # 设置密码
         actual_password = await password_manager.set_password(
@@ -221,6 +223,7 @@ async def update_user(
             await session.commit()
             await session.refresh(db_user)
         
+        user_manager.invalidate_user(user_id)
         logger.info(f"管理员 {admin.user_id} 更新了用户 {user_id} 的信息")
         
         updated_user = await user_manager.get_user(user_id)
@@ -277,6 +280,9 @@ async def toggle_user_status(
             
             await session.commit()
         
+        # 立即失效认证缓存，禁用在下一个请求生效
+        user_manager.invalidate_user(user_id)
+        
         status_text = "启用" if data.is_active else "禁用"
         logger.info(f"管理员 {admin.user_id} {status_text}了用户 {user_id}")
         
@@ -314,6 +320,7 @@ async def reset_password(
             password=data.new_password
         )
         
+        user_manager.invalidate_user(user_id)
         logger.info(f"管理员 {admin.user_id} 重置了用户 {user_id} 的密码")
         
         return {
@@ -374,6 +381,7 @@ async def delete_user(
             
             await session.commit()
         
+        user_manager.invalidate_user(user_id)
         logger.warning(f"管理员 {admin.user_id} 删除了用户 {user_id}")
         
         return {
@@ -385,4 +393,25 @@ async def delete_user(
         raise
     except Exception as e:
         logger.error(f"删除用户失败: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"删除用户失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"删除用户失败: {str(e)}")
+
+@router.get("/llm-cache/stats")
+async def get_llm_cache_stats(
+    admin: User = Depends(check_admin)
+):
+    """获取LLM响应缓存统计（命中/未命中/淘汰次数等，仅管理员）"""
+    if not llm_response_cache:
+        return {"enabled": False}
+    return llm_response_cache.get_stats()
+
+
+@router.delete("/llm-cache")
+async def clear_llm_cache(
+    admin: User = Depends(check_admin)
+):
+    """清空LLM响应缓存（仅管理员）"""
+    if not llm_response_cache:
+        return {"success": True, "deleted": 0, "message": "LLM响应缓存未启用"}
+    deleted = llm_response_cache.clear()
+    logger.warning(f"管理员 {admin.user_id} 清空了LLM响应缓存，共 {deleted} 条")
+    return {"success": True, "deleted": deleted, "message": "LLM响应缓存已清空"}
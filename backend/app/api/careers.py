@@ -8,6 +8,7 @@ from typing import AsyncGenerator
 
 from app.database import get_db
 from app.utils.sse_response import SSEResponse, create_sse_response
+from app.utils.stream_buffer import StreamTextBuffer
 from app.models.career import Career, CharacterCareer
 from app.models.character import Character
 from app.models.project import Project
@@ -314,13 +315,13 @@ async def generate_career_system(
             
             try:
                 # 使用流式生成替代非流式
-                ai_response = ""
+                response_buffer = StreamTextBuffer()
                 chunk_count = 0
                 last_progress = 10
                 
                 async for chunk in user_ai_service.generate_text_stream(prompt=prompt):
                     chunk_count += 1
-                    ai_response += chunk
+                    response_buffer.append(chunk)
                     
                     # 发送内容块
                     yield await SSEResponse.send_chunk(chunk)
@@ -333,7 +334,7 @@ async def generate_career_system(
                         if current_progress > last_progress:
                             last_progress = current_progress
                             yield await SSEResponse.send_progress(
-                                f"AI生成职业体系中... (已生成 {len(ai_response)} 字符)",
+                                f"AI生成职业体系中... (已生成 {len(response_buffer)} 字符)",
                                 current_progress
                             )
                     
@@ -346,6 +347,7 @@ async def generate_career_system(
                 yield await SSEResponse.send_error(f"AI服务调用失败：{str(ai_error)}")
                 return
             
+            ai_response = response_buffer.getvalue()
             if not ai_response or not ai_response.strip():
                 yield await SSEResponse.send_error("AI服务返回空响应")
                 return
@@ -1,21 +1,26 @@
 """章节管理API"""
 from fastapi import APIRouter, Depends, HTTPException, Request, Query, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, tuple_
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
 import json
 import asyncio
-from typing import Optional
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Set, Union
 from datetime import datetime
-from asyncio import Queue, Lock
+from asyncio import Queue
 
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.utils.stream_buffer import StreamTextBuffer
 from app.services.chapter_context_service import ChapterContextBuilder, FocusedMemoryRetriever
 from app.models.chapter import Chapter
 from app.models.project import Project
 from app.models.outline import Outline
-from app.models.character import Character
-from app.models.career import Career, CharacterCareer
 from app.models.generation_history import GenerationHistory
 from app.models.writing_style import WritingStyle
 from app.models.analysis_task import AnalysisTask
@@ -27,6 +32,7 @@ from app.schemas.chapter import (
     ChapterUpdate,
     ChapterResponse,
     ChapterListResponse,
+    ChapterBriefListResponse,
     ChapterGenerateRequest,
     BatchGenerateRequest,
     BatchGenerateResponse,
@@ -39,19 +45,67 @@ from app.schemas.regeneration import (
     RegenerationTaskStatus
 )
 from app.services.ai_service import AIService
+from app.services.ai_clients.llm_scheduler import LLMPriority, with_llm_priority
 from app.services.prompt_service import prompt_service, PromptService, WritingStyleManager
 from app.services.plot_analyzer import PlotAnalyzer
 from app.services.memory_service import memory_service
 from app.services.chapter_regenerator import ChapterRegenerator
+from app.services.duplicate_detector import refresh_duplicate_index
+from app.services.task_progress_writer import progress_writer
+from app.services.job_queue import job_queue
+from app.services.world_snapshot import world_snapshot_cache
 from app.logger import get_logger
 from app.api.settings import get_user_ai_service
-from app.utils.sse_response import create_sse_response
+from app.utils.sse_response import SSEResponse, create_sse_response
 
 router = APIRouter(prefix="/chapters", tags=["章节管理"])
 logger = get_logger(__name__)
 
-# 全局数据库写入锁（每个用户一个锁，用于保护SQLite写入操作）
-db_write_locks: dict[str, Lock] = {}
+# 流水线批量生成：同时进行的后处理（分析/记忆/职业更新）上限
+BATCH_POST_PROCESS_CONCURRENCY = 2
+
+
+@dataclass
+class BatchChapterPrefetch:
+    """流水线批量生成中为下一章预取的输入（均不依赖上一章正文）"""
+    chapter_id: str
+    characters_info: str
+    style_content: str
+    context_sections: Dict[str, Optional[str]]
+
+
+class BatchStageMetrics:
+    """批量生成各阶段吞吐统计，写入 BatchGenerationTask.stage_metrics"""
+    
+    STAGES = ("prefetch", "generate", "post_process")
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.prefetch_hits = 0
+        self._stages = {name: {"count": 0, "total_seconds": 0.0} for name in self.STAGES}
+    
+    def record(self, stage: str, seconds: float):
+        """记录一次阶段执行耗时"""
+        self._stages[stage]["count"] += 1
+        self._stages[stage]["total_seconds"] += seconds
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """生成可序列化的统计快照"""
+        wall_seconds = time.monotonic() - self.started
+        stages = {}
+        for name, data in self._stages.items():
+            count = data["count"]
+            stages[name] = {
+                "count": count,
+                "total_seconds": round(data["total_seconds"], 2),
+                "avg_seconds": round(data["total_seconds"] / count, 2) if count else 0.0,
+                "chapters_per_minute": round(count / wall_seconds * 60, 2) if wall_seconds > 0 else 0.0,
+            }
+        return {
+            "stages": stages,
+            "prefetch_hits": self.prefetch_hits,
+            "wall_seconds": round(wall_seconds, 2),
+        }
 
 
 async def verify_project_access(project_id: str, user_id: str, db: AsyncSession) -> Project:
@@ -87,14 +141,6 @@ async def verify_project_access(project_id: str, user_id: str, db: AsyncSession)
     return project
 
 
-async def get_db_write_lock(user_id: str) -> Lock:
-    """获取或创建用户的数据库写入锁"""
-    if user_id not in db_write_locks:
-        db_write_locks[user_id] = Lock()
-        logger.debug(f"🔒 为用户 {user_id} 创建数据库写入锁")
-    return db_write_locks[user_id]
-
-
 @router.post("", response_model=ChapterResponse, summary="创建章节")
 async def create_chapter(
     chapter: ChapterCreate,
@@ -123,71 +169,196 @@ async def create_chapter(
     return db_chapter
 
 
-@router.get("/project/{project_id}", response_model=ChapterListResponse, summary="获取项目的所有章节")
+# 章节列表投影模式可选字段：列名 -> SQL表达式（has_content/content_length 在SQL中计算，不加载正文）
+CHAPTER_LIST_FIELDS = {
+    "id": Chapter.id,
+    "project_id": Chapter.project_id,
+    "chapter_number": Chapter.chapter_number,
+    "title": Chapter.title,
+    "content": Chapter.content,
+    "summary": Chapter.summary,
+    "word_count": Chapter.word_count,
+    "status": Chapter.status,
+    "outline_id": Chapter.outline_id,
+    "sub_index": Chapter.sub_index,
+    "expansion_plan": Chapter.expansion_plan,
+    "version": Chapter.version,
+    "created_at": Chapter.created_at,
+    "updated_at": Chapter.updated_at,
+    "content_length": func.coalesce(func.length(Chapter.content), 0),
+    "has_content": func.coalesce(func.length(Chapter.content), 0) > 0,
+}
+CHAPTER_LIST_OUTLINE_FIELDS = ("outline_title", "outline_order")
+
+
+async def _chapter_list_etag(db: AsyncSession, project_id: str, variant: str) -> str:
+    """
+    计算章节列表的ETag（仅聚合查询，不加载任何行）
+    
+    章节增删改会改变数量/最大更新时间/总字数/版本号之和，大纲改名会改变大纲最大更新时间。
+    """
+    chapter_stats = (await db.execute(
+        select(
+            func.count(Chapter.id),
+            func.max(Chapter.updated_at),
+            func.coalesce(func.sum(Chapter.word_count), 0),
+            func.coalesce(func.sum(Chapter.version), 0)
+        ).where(Chapter.project_id == project_id)
+    )).one()
+    outline_updated = (await db.execute(
+        select(func.max(Outline.updated_at)).where(Outline.project_id == project_id)
+    )).scalar()
+    raw = f"{project_id}|{variant}|{'|'.join(str(v) for v in chapter_stats)}|{outline_updated}"
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """判断 If-None-Match 是否命中（支持逗号分隔的多个值和弱校验前缀）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _encode_chapter_cursor(chapter_number: int, chapter_id: str) -> str:
+    """章节列表分页游标：与排序键 (chapter_number, id) 一致，章节号重复时也不会跳过或重复"""
+    return f"{chapter_number}:{chapter_id}"
+
+
+def _decode_chapter_cursor(cursor: str) -> tuple:
+    """解析分页游标，格式错误时返回400"""
+    number, sep, chapter_id = cursor.partition(":")
+    try:
+        if not sep or not chapter_id:
+            raise ValueError(cursor)
+        return int(number), chapter_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"无效的分页游标: {cursor}")
+
+
+@router.get(
+    "/project/{project_id}",
+    response_model=Union[ChapterListResponse, ChapterBriefListResponse],
+    summary="获取项目的所有章节"
+)
 async def get_project_chapters(
     project_id: str,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[str] = Query(
+        None,
+        description="投影字段（逗号分隔），如 id,chapter_number,title,word_count,has_content；"
+                    "不提供则返回完整章节（含正文）"
+    ),
+    after: Optional[str] = Query(None, description="分页游标：上一页响应中的 next_cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="每页数量，不提供则返回全部"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """获取指定项目的所有章节（带大纲信息）"""
+    """
+    获取指定项目的章节（带大纲信息）
+    
+    - 默认返回完整章节；指定 fields 时只查询所需列，has_content/content_length 在SQL中计算
+    - 按 (chapter_number, id) 键集分页：响应中的 next_cursor 作为下一页的 after 参数
+    - 支持 ETag / If-None-Match，数据未变化时返回 304
+    """
     # 验证用户权限
     user_id = getattr(request.state, 'user_id', None)
     await verify_project_access(project_id, user_id, db)
     
+    # 解析投影字段
+    selected_fields = None
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        allowed = set(CHAPTER_LIST_FIELDS) | set(CHAPTER_LIST_OUTLINE_FIELDS)
+        unknown = [f for f in requested if f not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不支持的字段: {', '.join(unknown)}")
+        # id 和 chapter_number 始终返回（分页游标依赖这两列）
+        selected_fields = list(dict.fromkeys(["id", "chapter_number"] + requested))
+    
+    cursor = _decode_chapter_cursor(after) if after is not None else None
+    variant = f"{','.join(selected_fields) if selected_fields else '*'}|{after}|{limit}"
+    etag = await _chapter_list_etag(db, project_id, variant)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
     # 获取总数
     count_result = await db.execute(
         select(func.count(Chapter.id)).where(Chapter.project_id == project_id)
     )
     total = count_result.scalar_one()
     
-    # 获取章节列表，同时加载关联的大纲信息
-    result = await db.execute(
-        select(Chapter)
-        .where(Chapter.project_id == project_id)
-        .order_by(Chapter.chapter_number)
-    )
-    chapters = result.scalars().all()
+    # 构建查询：投影模式只选择所需列，完整模式加载整个章节
+    if selected_fields:
+        column_fields = [f for f in selected_fields if f in CHAPTER_LIST_FIELDS]
+        need_outline = any(f in CHAPTER_LIST_OUTLINE_FIELDS for f in selected_fields)
+        if need_outline and "outline_id" not in column_fields:
+            column_fields.append("outline_id")
+        query = select(*[CHAPTER_LIST_FIELDS[f].label(f) for f in column_fields])
+    else:
+        need_outline = True
+        query = select(Chapter)
+    
+    query = query.where(Chapter.project_id == project_id)
+    if cursor is not None:
+        query = query.where(tuple_(Chapter.chapter_number, Chapter.id) > tuple_(*cursor))
+    query = query.order_by(Chapter.chapter_number, Chapter.id)
+    if limit:
+        query = query.limit(limit)
+    
+    result = await db.execute(query)
+    if selected_fields:
+        rows = [dict(row._mapping) for row in result.all()]
+        for row in rows:
+            if "has_content" in row:
+                row["has_content"] = bool(row["has_content"])
+    else:
+        rows = [
+            {
+                "id": chapter.id,
+                "project_id": chapter.project_id,
+                "chapter_number": chapter.chapter_number,
+                "title": chapter.title,
+                "content": chapter.content,
+                "summary": chapter.summary,
+                "word_count": chapter.word_count,
+                "status": chapter.status,
+                "outline_id": chapter.outline_id,
+                "sub_index": chapter.sub_index,
+                "expansion_plan": chapter.expansion_plan,
+                "version": chapter.version,
+                "created_at": chapter.created_at,
+                "updated_at": chapter.updated_at,
+            }
+            for chapter in result.scalars().all()
+        ]
     
-    # 获取所有大纲信息（用于填充outline_title）
-    outline_ids = [ch.outline_id for ch in chapters if ch.outline_id]
-    outlines_map = {}
-    if outline_ids:
-        outlines_result = await db.execute(
-            select(Outline).where(Outline.id.in_(outline_ids))
-        )
-        outlines_map = {o.id: o for o in outlines_result.scalars().all()}
-    
-    # 为所有章节添加大纲信息（统一处理）
-    chapters_with_outline = []
-    for chapter in chapters:
-        chapter_dict = {
-            "id": chapter.id,
-            "project_id": chapter.project_id,
-            "chapter_number": chapter.chapter_number,
-            "title": chapter.title,
-            "content": chapter.content,
-            "summary": chapter.summary,
-            "word_count": chapter.word_count,
-            "status": chapter.status,
-            "outline_id": chapter.outline_id,
-            "sub_index": chapter.sub_index,
-            "expansion_plan": chapter.expansion_plan,
-            "created_at": chapter.created_at,
-            "updated_at": chapter.updated_at,
-        }
-        
-        # 添加大纲信息
-        if chapter.outline_id and chapter.outline_id in outlines_map:
-            outline = outlines_map[chapter.outline_id]
-            chapter_dict["outline_title"] = outline.title
-            chapter_dict["outline_order"] = outline.order_index
-        else:
-            chapter_dict["outline_title"] = None
-            chapter_dict["outline_order"] = None
+    # 获取大纲信息（用于填充outline_title），只查询需要的列
+    if need_outline:
+        outline_ids = list({row["outline_id"] for row in rows if row.get("outline_id")})
+        outlines_map = {}
+        if outline_ids:
+            outlines_result = await db.execute(
+                select(Outline.id, Outline.title, Outline.order_index).where(Outline.id.in_(outline_ids))
+            )
+            outlines_map = {o.id: o for o in outlines_result.all()}
         
-        chapters_with_outline.append(chapter_dict)
+        for row in rows:
+            outline = outlines_map.get(row.get("outline_id"))
+            row["outline_title"] = outline.title if outline else None
+            row["outline_order"] = outline.order_index if outline else None
+    
+    next_cursor = None
+    if limit and len(rows) == limit:
+        next_cursor = _encode_chapter_cursor(rows[-1]["chapter_number"], rows[-1]["id"])
+    
+    if selected_fields:
+        items = [{f: row.get(f) for f in selected_fields} for row in rows]
+        payload = ChapterBriefListResponse(total=total, items=items, next_cursor=next_cursor)
+    else:
+        payload = ChapterListResponse(total=total, items=rows, next_cursor=next_cursor)
     
-    return ChapterListResponse(total=total, items=chapters_with_outline)
+    return JSONResponse(content=jsonable_encoder(payload), headers={"ETag": etag})
 
 
 @router.get("/{chapter_id}", response_model=ChapterResponse, summary="获取章节详情")
@@ -216,7 +387,7 @@ async def get_chapter(
 async def get_chapter_navigation(
     chapter_id: str,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     获取章节的导航信息（上一章/下一章）
@@ -299,6 +470,12 @@ async def update_chapter(
     
     # 更新字段
     update_data = chapter_update.model_dump(exclude_unset=True)
+    expected_version = update_data.pop("version", None)
+    if expected_version is not None and expected_version != chapter.version:
+        raise HTTPException(
+            status_code=409,
+            detail=f"章节已被其他操作修改（当前版本{chapter.version}），请刷新后重试"
+        )
     for field, value in update_data.items():
         setattr(chapter, field, value)
     
@@ -307,13 +484,13 @@ async def update_chapter(
         new_word_count = len(chapter.content) if chapter.content else 0
         chapter.word_count = new_word_count
         
-        # 更新项目字数
-        result = await db.execute(
-            select(Project).where(Project.id == chapter.project_id)
-        )
-        project = result.scalar_one_or_none()
-        if project:
-            project.current_words = project.current_words - old_word_count + new_word_count
+        # 更新项目字数（数据库端增量更新，避免并发写入互相覆盖）
+        if new_word_count != old_word_count:
+            await db.execute(
+                update(Project)
+                .where(Project.id == chapter.project_id)
+                .values(current_words=Project.current_words + (new_word_count - old_word_count))
+            )
         
         # 如果内容被清空，清理相关数据
         if not chapter.content or chapter.content.strip() == "":
@@ -355,6 +532,9 @@ async def update_chapter(
                 logger.warning(f"⚠️ 清理向量记忆数据失败: {str(e)}")
             
             logger.info(f"🗑️ 章节 {chapter_id[:8]} 内容已清空，已清理分析和记忆数据")
+        
+        # 增量更新重复检测索引（失败不影响保存）
+        await refresh_duplicate_index(chapter, db)
     
     await db.commit()
     await db.refresh(chapter)
@@ -371,6 +551,7 @@ async def update_chapter(
         "outline_id": chapter.outline_id,
         "sub_index": chapter.sub_index,
         "expansion_plan": chapter.expansion_plan,
+        "version": chapter.version,
         "created_at": chapter.created_at,
         "updated_at": chapter.updated_at,
         "outline_title": None,
@@ -670,27 +851,29 @@ async def build_smart_chapter_context(
 async def build_characters_info_with_careers(
     db: AsyncSession,
     project_id: str,
-    characters: list[Character],
     filter_character_names: Optional[list[str]] = None
 ) -> str:
     """
     构建包含职业信息的角色上下文
     
+    角色、职业和角色职业关联来自项目世界状态快照，批量生成时不再逐章重复查询
+    
     Args:
-        db: 数据库会话
+        db: 数据库会话（仅在快照失效时用于重新读取）
         project_id: 项目ID
-        characters: 角色列表
         filter_character_names: 可选，筛选特定角色名称列表（用于1-1模式的structure.characters或1-n模式的expansion_plan.character_focus）
         
     Returns:
         格式化的角色信息字符串，包含职业信息
     """
+    snapshot = await world_snapshot_cache.get(db, project_id)
+    characters = list(snapshot.characters)
     if not characters:
         return '暂无角色信息'
     
     # 如果提供了筛选名单，只保留匹配的角色
     if filter_character_names:
-        filtered_characters = [c for c in characters if c.name in filter_character_names]
+        filtered_characters = snapshot.filter_characters(filter_character_names)
         if not filtered_characters:
             logger.warning(f"筛选后无匹配角色，使用全部角色。筛选名单: {filter_character_names}")
             filtered_characters = characters
@@ -698,81 +881,7 @@ async def build_characters_info_with_careers(
             logger.info(f"根据筛选名单保留 {len(filtered_characters)}/{len(characters)} 个角色: {[c.name for c in filtered_characters]}")
         characters = filtered_characters
     
-    # 获取所有职业信息（一次性查询，提高效率）
-    careers_result = await db.execute(
-        select(Career).where(Career.project_id == project_id)
-    )
-    careers_map = {c.id: c for c in careers_result.scalars().all()}
-    
-    # 获取所有角色的职业关联（一次性查询）
-    character_ids = [c.id for c in characters]
-    if not character_ids:
-        return '暂无角色信息'
-        
-    character_careers_result = await db.execute(
-        select(CharacterCareer).where(CharacterCareer.character_id.in_(character_ids))
-    )
-    character_careers = character_careers_result.scalars().all()
-    
-    # 构建角色ID到职业信息的映射
-    char_career_map = {}
-    for cc in character_careers:
-        if cc.character_id not in char_career_map:
-            char_career_map[cc.character_id] = {'main': None, 'sub': []}
-        
-        career = careers_map.get(cc.career_id)
-        if not career:
-            continue
-            
-        career_info = {
-            'name': career.name,
-            'stage': cc.current_stage,
-            'max_stage': career.max_stage,
-            'stage_progress': cc.stage_progress
-        }
-        
-        if cc.career_type == 'main':
-            char_career_map[cc.character_id]['main'] = career_info
-        else:
-            char_career_map[cc.character_id]['sub'].append(career_info)
-    
-    # 构建角色信息字符串
-    characters_info_parts = []
-    for c in characters:
-        # 基本信息
-        entity_type = '组织' if c.is_organization else '角色'
-        base_info = f"- {c.name}({entity_type}, {c.role_type})"
-        
-        # 职业信息
-        career_info_str = ""
-        if c.id in char_career_map:
-            career_data = char_career_map[c.id]
-            
-            # 主职业
-            if career_data['main']:
-                main = career_data['main']
-                stage_desc = f"{main['stage']}/{main['max_stage']}阶"
-                career_info_str += f" | 主职业: {main['name']}({stage_desc})"
-            
-            # 副职业
-            if career_data['sub']:
-                sub_list = []
-                for sub in career_data['sub']:
-                    stage_desc = f"{sub['stage']}/{sub['max_stage']}阶"
-                    sub_list.append(f"{sub['name']}({stage_desc})")
-                career_info_str += f" | 副职业: {', '.join(sub_list)}"
-        
-        # 性格描述
-        personality_str = ""
-        if c.personality:
-            personality_preview = c.personality[:100] if len(c.personality) > 100 else c.personality
-            personality_str = f": {personality_preview}"
-        
-        # 组合完整信息
-        full_info = base_info + career_info_str + personality_str
-        characters_info_parts.append(full_info)
-    
-    return "\n".join(characters_info_parts)
+    return snapshot.characters_with_careers(characters)
 
 
 @router.get("/{chapter_id}/can-generate", summary="检查章节是否可以生成")
@@ -820,6 +929,7 @@ async def check_can_generate(
     }
 
 
+@with_llm_priority(LLMPriority.BACKGROUND)
 async def analyze_chapter_background(
     chapter_id: str,
     user_id: str,
@@ -828,7 +938,7 @@ async def analyze_chapter_background(
     ai_service: AIService
 ) -> bool:
     """
-    后台异步分析章节（支持并发，使用锁保护数据库写入）
+    后台异步分析章节（支持并发；任务进度经合并写入器落库，不再使用进程内写锁）
     
     Args:
         chapter_id: 章节ID
@@ -841,21 +951,14 @@ async def analyze_chapter_background(
         bool: True表示分析成功，False表示分析失败
     """
     db_session = None
-    write_lock = await get_db_write_lock(user_id)
     
     try:
         logger.info(f"🔍 开始分析章节: {chapter_id}, 任务ID: {task_id}")
         
-        # 创建独立数据库会话
-        from app.database import get_engine
-        from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+        # 创建独立数据库会话（复用共享会话工厂）
+        from app.database import get_session_factory
         
-        engine = await get_engine(user_id)
-        AsyncSessionLocal = async_sessionmaker(
-            engine,
-            class_=AsyncSession,
-            expire_on_commit=False
-        )
+        AsyncSessionLocal = await get_session_factory(user_id)
         db_session = AsyncSessionLocal()
         
         # 1. 获取任务（读操作）
@@ -868,12 +971,11 @@ async def analyze_chapter_background(
             logger.error(f"❌ 任务不存在: {task_id}")
             return False
         
-        # 更新任务状态（写操作，需要锁）
-        async with write_lock:
-            task.status = 'running'
-            task.started_at = datetime.now()
-            task.progress = 10
-            await db_session.commit()
+        # 更新任务状态（合并写入）
+        progress_writer.update(
+            AnalysisTask, task_id, user_id,
+            status='running', started_at=datetime.now(), progress=10
+        )
         
         # 2. 获取章节信息（读操作）
         chapter_result = await db_session.execute(
@@ -881,17 +983,14 @@ async def analyze_chapter_background(
         )
         chapter = chapter_result.scalar_one_or_none()
         if not chapter or not chapter.content:
-            async with write_lock:
-                task.status = 'failed'
-                task.error_message = '章节不存在或内容为空'
-                task.completed_at = datetime.now()
-                await db_session.commit()
+            await progress_writer.write_now(
+                AnalysisTask, task_id, user_id,
+                status='failed', error_message='章节不存在或内容为空', completed_at=datetime.now()
+            )
             logger.error(f"❌ 章节不存在或内容为空: {chapter_id}")
             return False
         
-        async with write_lock:
-            task.progress = 20
-            await db_session.commit()
+        progress_writer.update(AnalysisTask, task_id, user_id, progress=20)
         
         # 3. 使用PlotAnalyzer分析章节
         analyzer = PlotAnalyzer(ai_service)
@@ -903,87 +1002,81 @@ async def analyze_chapter_background(
         )
         
         if not analysis_result:
-            async with write_lock:
-                task.status = 'failed'
-                task.error_message = 'AI分析失败，请检查日志'
-                task.completed_at = datetime.now()
-                await db_session.commit()
+            await progress_writer.write_now(
+                AnalysisTask, task_id, user_id,
+                status='failed', error_message='AI分析失败，请检查日志', completed_at=datetime.now()
+            )
             logger.error(f"❌ AI分析失败: {chapter_id}")
             return False
         
-        async with write_lock:
-            task.progress = 60
-            await db_session.commit()
+        progress_writer.update(AnalysisTask, task_id, user_id, progress=60)
         
-        # 4. 保存分析结果到数据库（写操作，需要锁）
-        async with write_lock:
-            existing_analysis_result = await db_session.execute(
-                select(PlotAnalysis).where(PlotAnalysis.chapter_id == chapter_id)
+        # 4. 保存分析结果到数据库
+        existing_analysis_result = await db_session.execute(
+            select(PlotAnalysis).where(PlotAnalysis.chapter_id == chapter_id)
+        )
+        existing_analysis = existing_analysis_result.scalar_one_or_none()
+        
+        if existing_analysis:
+            # 更新现有记录
+            logger.info(f"  更新现有分析记录: {existing_analysis.id}")
+            existing_analysis.plot_stage = analysis_result.get('plot_stage', '发展')
+            existing_analysis.conflict_level = analysis_result.get('conflict', {}).get('level', 0)
+            existing_analysis.conflict_types = analysis_result.get('conflict', {}).get('types', [])
+            existing_analysis.emotional_tone = analysis_result.get('emotional_arc', {}).get('primary_emotion', '')
+            existing_analysis.emotional_intensity = analysis_result.get('emotional_arc', {}).get('intensity', 0) / 10.0
+            existing_analysis.hooks = analysis_result.get('hooks', [])
+            existing_analysis.hooks_count = len(analysis_result.get('hooks', []))
+            existing_analysis.foreshadows = analysis_result.get('foreshadows', [])
+            existing_analysis.foreshadows_planted = sum(1 for f in analysis_result.get('foreshadows', []) if f.get('type') == 'planted')
+            existing_analysis.foreshadows_resolved = sum(1 for f in analysis_result.get('foreshadows', []) if f.get('type') == 'resolved')
+            existing_analysis.plot_points = analysis_result.get('plot_points', [])
+            existing_analysis.plot_points_count = len(analysis_result.get('plot_points', []))
+            existing_analysis.character_states = analysis_result.get('character_states', [])
+            existing_analysis.scenes = analysis_result.get('scenes', [])
+            existing_analysis.pacing = analysis_result.get('pacing', 'moderate')
+            existing_analysis.overall_quality_score = analysis_result.get('scores', {}).get('overall', 0)
+            existing_analysis.pacing_score = analysis_result.get('scores', {}).get('pacing', 0)
+            existing_analysis.engagement_score = analysis_result.get('scores', {}).get('engagement', 0)
+            existing_analysis.coherence_score = analysis_result.get('scores', {}).get('coherence', 0)
+            existing_analysis.analysis_report = analyzer.generate_analysis_summary(analysis_result)
+            existing_analysis.suggestions = analysis_result.get('suggestions', [])
+            existing_analysis.dialogue_ratio = analysis_result.get('dialogue_ratio', 0)
+            existing_analysis.description_ratio = analysis_result.get('description_ratio', 0)
+        else:
+            # 创建新记录
+            logger.info(f"  创建新的分析记录")
+            plot_analysis = PlotAnalysis(
+                chapter_id=chapter_id,
+                project_id=project_id,
+                plot_stage=analysis_result.get('plot_stage', '发展'),
+                conflict_level=analysis_result.get('conflict', {}).get('level', 0),
+                conflict_types=analysis_result.get('conflict', {}).get('types', []),
+                emotional_tone=analysis_result.get('emotional_arc', {}).get('primary_emotion', ''),
+                emotional_intensity=analysis_result.get('emotional_arc', {}).get('intensity', 0) / 10.0,
+                hooks=analysis_result.get('hooks', []),
+                hooks_count=len(analysis_result.get('hooks', [])),
+                foreshadows=analysis_result.get('foreshadows', []),
+                foreshadows_planted=sum(1 for f in analysis_result.get('foreshadows', []) if f.get('type') == 'planted'),
+                foreshadows_resolved=sum(1 for f in analysis_result.get('foreshadows', []) if f.get('type') == 'resolved'),
+                plot_points=analysis_result.get('plot_points', []),
+                plot_points_count=len(analysis_result.get('plot_points', [])),
+                character_states=analysis_result.get('character_states', []),
+                scenes=analysis_result.get('scenes', []),
+                pacing=analysis_result.get('pacing', 'moderate'),
+                overall_quality_score=analysis_result.get('scores', {}).get('overall', 0),
+                pacing_score=analysis_result.get('scores', {}).get('pacing', 0),
+                engagement_score=analysis_result.get('scores', {}).get('engagement', 0),
+                coherence_score=analysis_result.get('scores', {}).get('coherence', 0),
+                analysis_report=analyzer.generate_analysis_summary(analysis_result),
+                suggestions=analysis_result.get('suggestions', []),
+                dialogue_ratio=analysis_result.get('dialogue_ratio', 0),
+                description_ratio=analysis_result.get('description_ratio', 0)
             )
-            existing_analysis = existing_analysis_result.scalar_one_or_none()
-            
-            if existing_analysis:
-                # 更新现有记录
-                logger.info(f"  更新现有分析记录: {existing_analysis.id}")
-                existing_analysis.plot_stage = analysis_result.get('plot_stage', '发展')
-                existing_analysis.conflict_level = analysis_result.get('conflict', {}).get('level', 0)
-                existing_analysis.conflict_types = analysis_result.get('conflict', {}).get('types', [])
-                existing_analysis.emotional_tone = analysis_result.get('emotional_arc', {}).get('primary_emotion', '')
-                existing_analysis.emotional_intensity = analysis_result.get('emotional_arc', {}).get('intensity', 0) / 10.0
-                existing_analysis.hooks = analysis_result.get('hooks', [])
-                existing_analysis.hooks_count = len(analysis_result.get('hooks', []))
-                existing_analysis.foreshadows = analysis_result.get('foreshadows', [])
-                existing_analysis.foreshadows_planted = sum(1 for f in analysis_result.get('foreshadows', []) if f.get('type') == 'planted')
-                existing_analysis.foreshadows_resolved = sum(1 for f in analysis_result.get('foreshadows', []) if f.get('type') == 'resolved')
-                existing_analysis.plot_points = analysis_result.get('plot_points', [])
-                existing_analysis.plot_points_count = len(analysis_result.get('plot_points', []))
-                existing_analysis.character_states = analysis_result.get('character_states', [])
-                existing_analysis.scenes = analysis_result.get('scenes', [])
-                existing_analysis.pacing = analysis_result.get('pacing', 'moderate')
-                existing_analysis.overall_quality_score = analysis_result.get('scores', {}).get('overall', 0)
-                existing_analysis.pacing_score = analysis_result.get('scores', {}).get('pacing', 0)
-                existing_analysis.engagement_score = analysis_result.get('scores', {}).get('engagement', 0)
-                existing_analysis.coherence_score = analysis_result.get('scores', {}).get('coherence', 0)
-                existing_analysis.analysis_report = analyzer.generate_analysis_summary(analysis_result)
-                existing_analysis.suggestions = analysis_result.get('suggestions', [])
-                existing_analysis.dialogue_ratio = analysis_result.get('dialogue_ratio', 0)
-                existing_analysis.description_ratio = analysis_result.get('description_ratio', 0)
-            else:
-                # 创建新记录
-                logger.info(f"  创建新的分析记录")
-                plot_analysis = PlotAnalysis(
-                    chapter_id=chapter_id,
-                    project_id=project_id,
-                    plot_stage=analysis_result.get('plot_stage', '发展'),
-                    conflict_level=analysis_result.get('conflict', {}).get('level', 0),
-                    conflict_types=analysis_result.get('conflict', {}).get('types', []),
-                    emotional_tone=analysis_result.get('emotional_arc', {}).get('primary_emotion', ''),
-                    emotional_intensity=analysis_result.get('emotional_arc', {}).get('intensity', 0) / 10.0,
-                    hooks=analysis_result.get('hooks', []),
-                    hooks_count=len(analysis_result.get('hooks', [])),
-                    foreshadows=analysis_result.get('foreshadows', []),
-                    foreshadows_planted=sum(1 for f in analysis_result.get('foreshadows', []) if f.get('type') == 'planted'),
-                    foreshadows_resolved=sum(1 for f in analysis_result.get('foreshadows', []) if f.get('type') == 'resolved'),
-                    plot_points=analysis_result.get('plot_points', []),
-                    plot_points_count=len(analysis_result.get('plot_points', [])),
-                    character_states=analysis_result.get('character_states', []),
-                    scenes=analysis_result.get('scenes', []),
-                    pacing=analysis_result.get('pacing', 'moderate'),
-                    overall_quality_score=analysis_result.get('scores', {}).get('overall', 0),
-                    pacing_score=analysis_result.get('scores', {}).get('pacing', 0),
-                    engagement_score=analysis_result.get('scores', {}).get('engagement', 0),
-                    coherence_score=analysis_result.get('scores', {}).get('coherence', 0),
-                    analysis_report=analyzer.generate_analysis_summary(analysis_result),
-                    suggestions=analysis_result.get('suggestions', []),
-                    dialogue_ratio=analysis_result.get('dialogue_ratio', 0),
-                    description_ratio=analysis_result.get('description_ratio', 0)
-                )
-                db_session.add(plot_analysis)
-            
-            await db_session.commit()
-            
-            task.progress = 80
-            await db_session.commit()
+            db_session.add(plot_analysis)
+        
+        await db_session.commit()
+        progress_writer.update(AnalysisTask, task_id, user_id, progress=80)
         
         # 5. 提取记忆并保存到向量数据库（传入章节内容用于计算位置）
         memories = analyzer.extract_memories_from_analysis(
@@ -994,18 +1087,17 @@ async def analyze_chapter_background(
             chapter_title=chapter.title or ""
         )
         
-        # 先删除该章节的旧记忆（写操作，需要锁）
-        async with write_lock:
-            old_memories_result = await db_session.execute(
-                select(StoryMemory).where(StoryMemory.chapter_id == chapter_id)
-            )
-            old_memories = old_memories_result.scalars().all()
-            for old_mem in old_memories:
-                await db_session.delete(old_mem)
-            await db_session.commit()
-            logger.info(f"  删除旧记忆: {len(old_memories)}条")
+        # 先删除该章节的旧记忆（与写入新记忆在同一事务中）
+        old_memories_result = await db_session.execute(
+            select(StoryMemory).where(StoryMemory.chapter_id == chapter_id)
+        )
+        old_memories = old_memories_result.scalars().all()
+        for old_mem in old_memories:
+            await db_session.delete(old_mem)
+        await db_session.flush()
+        logger.info(f"  删除旧记忆: {len(old_memories)}条")
         
-        # 准备批量添加的记忆数据（不需要锁）
+        # 准备批量添加的记忆数据
         memory_records = []
         for mem in memories:
             memory_id = f"{chapter_id}_{mem['type']}_{len(memory_records)}"
@@ -1016,35 +1108,34 @@ async def analyze_chapter_background(
                 'metadata': mem['metadata']
             })
             
-        # 保存到关系数据库（写操作，需要锁）
-        async with write_lock:
-            for mem in memories:
-                memory_id = memory_records[memories.index(mem)]['id']
-                text_position = mem['metadata'].get('text_position', -1)
-                text_length = mem['metadata'].get('text_length', 0)
-                
-                story_memory = StoryMemory(
-                    id=memory_id,
-                    project_id=project_id,
-                    chapter_id=chapter_id,
-                    memory_type=mem['type'],
-                    content=mem['content'],
-                    title=mem['title'],
-                    importance_score=mem['metadata'].get('importance_score', 0.5),
-                    tags=mem['metadata'].get('tags', []),
-                    is_foreshadow=mem['metadata'].get('is_foreshadow', 0),
-                    story_timeline=chapter.chapter_number,
-                    chapter_position=text_position,
-                    text_length=text_length,
-                    related_characters=mem['metadata'].get('related_characters', []),
-                    related_locations=mem['metadata'].get('related_locations', [])
-                )
-                db_session.add(story_memory)
-                
-                if text_position >= 0:
-                    logger.debug(f"  保存记忆 {memory_id}: position={text_position}, length={text_length}")
+        # 保存到关系数据库
+        for mem in memories:
+            memory_id = memory_records[memories.index(mem)]['id']
+            text_position = mem['metadata'].get('text_position', -1)
+            text_length = mem['metadata'].get('text_length', 0)
             
-            await db_session.commit()
+            story_memory = StoryMemory(
+                id=memory_id,
+                project_id=project_id,
+                chapter_id=chapter_id,
+                memory_type=mem['type'],
+                content=mem['content'],
+                title=mem['title'],
+                importance_score=mem['metadata'].get('importance_score', 0.5),
+                tags=mem['metadata'].get('tags', []),
+                is_foreshadow=mem['metadata'].get('is_foreshadow', 0),
+                story_timeline=chapter.chapter_number,
+                chapter_position=text_position,
+                text_length=text_length,
+                related_characters=mem['metadata'].get('related_characters', []),
+                related_locations=mem['metadata'].get('related_locations', [])
+            )
+            db_session.add(story_memory)
+            
+            if text_position >= 0:
+                logger.debug(f"  保存记忆 {memory_id}: position={text_position}, length={text_length}")
+        
+        await db_session.commit()
         
         # 批量添加到向量数据库
         if memory_records:
@@ -1085,18 +1176,17 @@ async def analyze_chapter_background(
         else:
             logger.debug("📋 分析结果中无角色状态信息，跳过职业更新")
         
-        # 最终更新任务状态（写操作，需要锁）- 增加重试机制
+        # 最终更新任务状态（立即写入，合并未落库的进度）- 增加重试机制
         update_success = False
         for retry in range(3):
             try:
-                async with write_lock:
-                    task.progress = 100
-                    task.status = 'completed'
-                    task.completed_at = datetime.now()
-                    await db_session.commit()
-                    update_success = True
-                    logger.info(f"✅ 章节分析完成: {chapter_id}, 提取{len(memories)}条记忆")
-                    break
+                await progress_writer.write_now(
+                    AnalysisTask, task_id, user_id,
+                    progress=100, status='completed', completed_at=datetime.now()
+                )
+                update_success = True
+                logger.info(f"✅ 章节分析完成: {chapter_id}, 提取{len(memories)}条记忆")
+                break
             except Exception as commit_error:
                 logger.error(f"❌ 提交任务完成状态失败(重试{retry+1}/3): {str(commit_error)}")
                 if retry < 2:
@@ -1113,34 +1203,22 @@ async def analyze_chapter_background(
         
     except Exception as e:
         logger.error(f"❌ 后台分析异常: {str(e)}", exc_info=True)
-        # 确保任务状态被更新为failed（写操作，需要锁）
-        if db_session:
-            # 多次重试更新任务状态
-            for retry in range(3):
-                try:
-                    async with write_lock:
-                        # 重新获取任务（可能是旧会话导致的问题）
-                        task_result = await db_session.execute(
-                            select(AnalysisTask).where(AnalysisTask.id == task_id)
-                        )
-                        task = task_result.scalar_one_or_none()
-                        if task:
-                            task.status = 'failed'
-                            task.error_message = str(e)[:500]
-                            task.completed_at = datetime.now()
-                            task.progress = 0
-                            await db_session.commit()
-                            logger.info(f"✅ 任务状态已更新为failed: {task_id} (重试{retry+1}次)")
-                            break
-                        else:
-                            logger.error(f"❌ 无法找到任务进行状态更新: {task_id}")
-                            break
-                except Exception as update_error:
-                    logger.error(f"❌ 更新任务状态失败(重试{retry+1}/3): {str(update_error)}")
-                    if retry < 2:
-                        await asyncio.sleep(0.1)  # 短暂等待后重试
-                    else:
-                        logger.error(f"❌ 任务状态更新失败，已达到最大重试次数: {task_id}")
+        # 确保任务状态被更新为failed（写入器使用独立会话，不受当前会话状态影响）
+        # 多次重试更新任务状态
+        for retry in range(3):
+            try:
+                await progress_writer.write_now(
+                    AnalysisTask, task_id, user_id,
+                    status='failed', error_message=str(e)[:500], completed_at=datetime.now(), progress=0
+                )
+                logger.info(f"✅ 任务状态已更新为failed: {task_id} (重试{retry+1}次)")
+                break
+            except Exception as update_error:
+                logger.error(f"❌ 更新任务状态失败(重试{retry+1}/3): {str(update_error)}")
+                if retry < 2:
+                    await asyncio.sleep(0.1)  # 短暂等待后重试
+                else:
+                    logger.error(f"❌ 任务状态更新失败，已达到最大重试次数: {task_id}")
         
         # 返回失败状态
         return False
@@ -1154,7 +1232,6 @@ async def analyze_chapter_background(
 async def generate_chapter_content_stream(
     chapter_id: str,
     request: Request,
-    background_tasks: BackgroundTasks,
     generate_request: ChapterGenerateRequest = ChapterGenerateRequest(),
     user_ai_service: AIService = Depends(get_user_ai_service)
 ):
@@ -1245,25 +1322,6 @@ async def generate_chapter_content_stream(
                 )
                 outline = outline_result.scalar_one_or_none()
                 
-                # 获取所有大纲用于上下文
-                all_outlines_result = await db_session.execute(
-                    select(Outline)
-                    .where(Outline.project_id == current_chapter.project_id)
-                    .order_by(Outline.order_index)
-                    .execution_options(populate_existing=True)
-                )
-                all_outlines = all_outlines_result.scalars().all()
-                outlines_context = "\n".join([
-                    f"第{o.order_index}章 {o.title}: {o.content[:100]}..."
-                    for o in all_outlines
-                ])
-                
-                # 获取角色信息（包含职业信息）
-                characters_result = await db_session.execute(
-                    select(Character).where(Character.project_id == current_chapter.project_id)
-                )
-                characters = characters_result.scalars().all()
-                
                 # 📝 根据大纲模式智能筛选相关角色
                 filter_character_names = None
                 if outline_mode == 'one-to-one':
@@ -1290,7 +1348,6 @@ async def generate_chapter_content_stream(
                 characters_info = await build_characters_info_with_careers(
                     db=db_session,
                     project_id=current_chapter.project_id,
-                    characters=characters,
                     filter_character_names=filter_character_names
                 )
                 
@@ -1550,20 +1607,19 @@ async def generate_chapter_content_stream(
                     # 如果需要切换provider，需要在前端传递provider参数
                 
                 # 流式生成内容
-                full_content = ""
-                chunk_count = 0
+                content_buffer = StreamTextBuffer()
                 last_progress = 0
                 
                 async for chunk in user_ai_service.generate_text_stream(**generate_kwargs):
-                    full_content += chunk
-                    chunk_count += 1
+                    content_buffer.append(chunk)
+                    chunk_count = content_buffer.chunk_count
                     
                     # 发送内容块
-                    yield f"data: {json.dumps({'type': 'content', 'content': chunk}, ensure_ascii=False)}\n\n"
+                    yield await SSEResponse.send_chunk(chunk, chunk_type='content')
                     
                     # 每5个chunk发送一次进度更新（10-95%，更平滑）
                     if chunk_count % 5 == 0:
-                        current_word_count = len(full_content)
+                        current_word_count = content_buffer.word_count
                         # 优化进度计算：使用更平滑的递增方式
                         # 基于chunk数量和字数的混合计算，避免大幅跳跃
                         chunk_progress = min(40, chunk_count // 5)  # chunk贡献最多40%
@@ -1572,29 +1628,23 @@ async def generate_chapter_content_stream(
                         
                         # 只在进度变化时发送
                         if estimated_progress > last_progress:
-                            progress_data = {
-                                'type': 'progress',
-                                'progress': estimated_progress,
-                                'message': f'正在创作中... 已生成 {current_word_count} 字',
-                                'word_count': current_word_count,
-                                'status': 'processing'
-                            }
-                            yield f"data: {json.dumps(progress_data, ensure_ascii=False)}\n\n"
+                            yield await SSEResponse.send_progress(
+                                f'正在创作中... 已生成 {current_word_count} 字',
+                                estimated_progress,
+                                word_count=current_word_count
+                            )
                             last_progress = estimated_progress
                     
-                    # 每20个chunk发送心跳
-                    if chunk_count % 20 == 0:
-                        yield f"data: {json.dumps({'type': 'heartbeat'}, ensure_ascii=False)}\n\n"
-                    
                     await asyncio.sleep(0)  # 让出控制权
                 
                 # 发送保存进度
                 yield f"data: {json.dumps({'type': 'progress', 'progress': 97, 'message': '正在保存章节...', 'status': 'processing'}, ensure_ascii=False)}\n\n"
                 
                 # 更新章节内容到数据库
+                full_content = content_buffer.getvalue()
                 old_word_count = current_chapter.word_count or 0
                 current_chapter.content = full_content
-                new_word_count = len(full_content)
+                new_word_count = content_buffer.word_count
                 current_chapter.word_count = new_word_count
                 current_chapter.status = "completed"
                 
@@ -1611,6 +1661,9 @@ async def generate_chapter_content_stream(
                 )
                 db_session.add(history)
                 
+                # 增量更新重复检测索引（失败不影响保存）
+                await refresh_duplicate_index(current_chapter, db_session)
+                
                 await db_session.commit()
                 db_committed = True
                 await db_session.refresh(current_chapter)
@@ -1632,18 +1685,8 @@ async def generate_chapter_content_stream(
                 task_id = analysis_task.id
                 logger.info(f"📋 已创建分析任务: {task_id}")
                 
-                # 短暂延迟确保SQLite WAL完成写入
-                await asyncio.sleep(0.05)
-                
-                # 直接启动后台分析（并发执行）
-                background_tasks.add_task(
-                    analyze_chapter_background,
-                    chapter_id=chapter_id,
-                    user_id=current_user_id,
-                    project_id=project.id,
-                    task_id=task_id,
-                    ai_service=user_ai_service
-                )
+                # 分析任务由任务队列worker领取执行
+                job_queue.notify()
                 
                 # 发送最终进度100%
                 yield f"data: {json.dumps({'type': 'progress', 'progress': 99, 'message': '创作完成！', 'word_count': new_word_count, 'status': 'success'}, ensure_ascii=False)}\n\n"
@@ -2031,9 +2074,7 @@ async def get_chapter_annotations(
 async def trigger_chapter_analysis(
     chapter_id: str,
     request: Request,
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db),
-    user_ai_service: AIService = Depends(get_user_ai_service)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     手动触发章节分析(用于重新分析或分析旧章节)
@@ -2078,21 +2119,8 @@ async def trigger_chapter_analysis(
     task_id = analysis_task.id
     logger.info(f"📋 创建分析任务: {task_id}, 章节: {chapter_id}")
     
-    # 刷新数据库会话，确保其他会话可以看到新任务
-    await db.refresh(analysis_task)
-    
-    # 短暂延迟确保SQLite WAL完成写入（让其他会话可见）
-    await asyncio.sleep(3)
-    
-    # 直接启动后台分析（并发执行）
-    background_tasks.add_task(
-        analyze_chapter_background,
-        chapter_id=chapter_id,
-        user_id=user_id,
-        project_id=project.id,
-        task_id=task_id,
-        ai_service=user_ai_service
-    )
+    # 分析任务由任务队列worker领取执行
+    job_queue.notify()
     
     return {
         "task_id": task_id,
@@ -2128,9 +2156,7 @@ async def batch_generate_chapters_in_order(
     project_id: str,
     batch_request: BatchGenerateRequest,
     request: Request,
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db),
-    user_ai_service: AIService = Depends(get_user_ai_service)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     从指定章节开始，按顺序批量生成指定数量的章节
@@ -2188,6 +2214,8 @@ async def batch_generate_chapters_in_order(
         style_id=batch_request.style_id,
         target_word_count=batch_request.target_word_count,
         enable_analysis=batch_request.enable_analysis,
+        pipelined=batch_request.pipelined,
+        model=batch_request.model,
         max_retries=batch_request.max_retries,
         status='pending',
         total_chapters=len(chapters_to_generate),
@@ -2210,14 +2238,8 @@ async def batch_generate_chapters_in_order(
     
     logger.info(f"📦 创建批量生成任务: {batch_id}, 章节: 第{start_number}-{end_number}章, 预估耗时: {estimated_time}分钟")
     
-    # 启动后台批量生成任务，传递model参数
-    background_tasks.add_task(
-        execute_batch_generation_in_order,
-        batch_id=batch_id,
-        user_id=user_id,
-        ai_service=user_ai_service,
-        custom_model=batch_request.model
-    )
+    # 批量生成任务由任务队列worker领取执行（model参数保存在任务行中）
+    job_queue.notify()
     
     return BatchGenerateResponse(
         batch_id=batch_id,
@@ -2261,7 +2283,9 @@ async def get_batch_generation_status(
         created_at=task.created_at.isoformat() if task.created_at else None,
         started_at=task.started_at.isoformat() if task.started_at else None,
         completed_at=task.completed_at.isoformat() if task.completed_at else None,
-        error_message=task.error_message
+        error_message=task.error_message,
+        pipelined=bool(task.pipelined),
+        stage_metrics=task.stage_metrics
     )
 
 
@@ -2340,6 +2364,72 @@ async def cancel_batch_generation(
     }
 
 
+async def analyze_chapter_with_retries(
+    db_session: AsyncSession,
+    chapter: Chapter,
+    project_id: str,
+    user_id: str,
+    ai_service: AIService,
+    max_attempts: int = 3
+) -> Optional[str]:
+    """
+    分析章节（失败自动重试），供批量生成使用
+    
+    Returns:
+        None表示分析成功，否则为最后一次失败的错误信息
+    """
+    last_analysis_error = None
+    for attempt in range(max_attempts):
+        try:
+            if attempt > 0:
+                logger.info(f"🔄 重试分析章节 (第{attempt}次): 第{chapter.chapter_number}章")
+            
+            # 以本进程的内联租约创建（running状态），避免被任务队列重复领取；进程崩溃后租约过期由worker接管
+            analysis_task = AnalysisTask(
+                chapter_id=chapter.id,
+                user_id=user_id,
+                project_id=project_id,
+                progress=0,
+                **job_queue.inline_lease()
+            )
+            db_session.add(analysis_task)
+            await db_session.commit()
+            await db_session.refresh(analysis_task)
+            
+            # 同步执行分析（执行期间续期租约），直接使用返回值判断成功/失败
+            analysis_result = await job_queue.run_inline(
+                AnalysisTask,
+                analysis_task.id,
+                analyze_chapter_background(
+                    chapter_id=chapter.id,
+                    user_id=user_id,
+                    project_id=project_id,
+                    task_id=analysis_task.id,
+                    ai_service=ai_service
+                )
+            )
+            
+            if not analysis_result:
+                last_analysis_error = "分析函数返回失败"
+                logger.error(f"❌ 章节分析失败: 第{chapter.chapter_number}章")
+                raise Exception(f"章节分析失败")
+            
+            logger.info(f"✅ 章节分析成功: 第{chapter.chapter_number}章")
+            return None
+            
+        except Exception as analysis_error:
+            last_analysis_error = str(analysis_error)
+            if attempt + 1 < max_attempts:
+                # 还有重试机会，等待后重试
+                wait_time = min(2 ** (attempt + 1), 10)
+                logger.warning(f"⏳ 分析失败，等待 {wait_time} 秒后重试...")
+                await asyncio.sleep(wait_time)
+    
+    logger.error(f"❌ 章节分析失败，已达最大重试次数({max_attempts}次): 第{chapter.chapter_number}章")
+    return last_analysis_error
+
+
+@with_llm_priority(LLMPriority.BATCH)
 async def execute_batch_generation_in_order(
     batch_id: str,
     user_id: str,
@@ -2351,23 +2441,23 @@ async def execute_batch_generation_in_order(
     - 严格按章节序号顺序
     - 任一章节失败则终止后续生成
     - 可选同步分析
+    - 流水线模式：第N章生成期间预取第N+1章上下文，分析在有界的后台阶段进行
     """
     db_session = None
-    write_lock = await get_db_write_lock(user_id)
+    task = None
+    metrics = BatchStageMetrics()
+    prefetch_tasks: Dict[str, asyncio.Task] = {}
+    post_tasks: List[asyncio.Task] = []
+    post_failures: List[Dict[str, Any]] = []
+    post_slots = asyncio.Semaphore(BATCH_POST_PROCESS_CONCURRENCY)
     
     try:
         logger.info(f"📦 开始执行顺序批量生成任务: {batch_id}")
         
-        # 创建独立数据库会话
-        from app.database import get_engine
-        from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+        # 创建独立数据库会话（复用共享会话工厂）
+        from app.database import get_session_factory
         
-        engine = await get_engine(user_id)
-        AsyncSessionLocal = async_sessionmaker(
-            engine,
-            class_=AsyncSession,
-            expire_on_commit=False
-        )
+        AsyncSessionLocal = await get_session_factory(user_id)
         db_session = AsyncSessionLocal()
         
         # 获取任务
@@ -2380,25 +2470,136 @@ async def execute_batch_generation_in_order(
             logger.error(f"❌ 批量生成任务不存在: {batch_id}")
             return
         
-        # 更新任务状态为运行中
-        async with write_lock:
-            task.status = 'running'
-            task.started_at = datetime.now()
-            await db_session.commit()
+        pipelined = bool(task.pipelined)
+        if pipelined:
+            logger.info(f"⚡ 流水线模式: 预取下一章上下文，后处理并发上限 {BATCH_POST_PROCESS_CONCURRENCY}")
+        
+        # 断点续传：任务被重新领取（worker重启或租约过期）时跳过已完成的章节
+        completed_chapters = task.completed_chapters or 0
+        failed_chapters = list(task.failed_chapters or [])
+        resume_from = completed_chapters if task.started_at is not None else 0
+        if resume_from:
+            logger.info(f"⏩ 批量任务 {batch_id} 从第{resume_from + 1}/{task.total_chapters}个章节继续")
+        
+        # 流水线模式下分析在后台完成：持久化的完成数（断点续传位置）只推进到连续完成后处理的章节，
+        # 崩溃或后台分析失败后从第一个未完成分析的章节重新生成，不会跳过缺少分析/记忆/职业更新的章节
+        background_analysis = bool(task.enable_analysis and pipelined)
+        post_processed: Set[int] = set()
+        post_watermark = resume_from
+        watermark_lock = asyncio.Lock()
+        
+        async def advance_watermark(idx: int):
+            """第idx个章节后处理成功，推进并写入连续完成的位置"""
+            nonlocal post_watermark
+            async with watermark_lock:
+                post_processed.add(idx)
+                advanced = False
+                while post_watermark + 1 in post_processed:
+                    post_watermark += 1
+                    advanced = True
+                if advanced:
+                    await progress_writer.write_now(
+                        BatchGenerationTask, batch_id, user_id,
+                        completed_chapters=post_watermark,
+                        stage_metrics=metrics.snapshot()
+                    )
+        
+        # 更新任务状态为运行中（立即写入；循环内的进度字段由合并写入器定期落库）
+        await progress_writer.write_now(
+            BatchGenerationTask, batch_id, user_id,
+            status='running', started_at=task.started_at or datetime.now()
+        )
+        
+        async def mark_failed(error_message: str):
+            """立即写入失败终态（与未落库的进度合并）"""
+            await progress_writer.write_now(
+                BatchGenerationTask, batch_id, user_id,
+                failed_chapters=failed_chapters,
+                status='failed',
+                error_message=error_message[:500],
+                completed_at=datetime.now(),
+                current_retry_count=0,
+                stage_metrics=metrics.snapshot()
+            )
+        
+        async def timed_prefetch(next_chapter_id: str) -> Optional[BatchChapterPrefetch]:
+            start = time.monotonic()
+            try:
+                return await prefetch_batch_chapter(next_chapter_id, user_id, task.style_id)
+            finally:
+                metrics.record("prefetch", time.monotonic() - start)
+        
+        async def post_process(idx: int, chapter_snapshot: Chapter):
+            """后台分析（流水线模式），使用独立会话，失败信息汇总到 post_failures"""
+            start = time.monotonic()
+            try:
+                async with AsyncSessionLocal() as post_db:
+                    analysis_error = await analyze_chapter_with_retries(
+                        post_db, chapter_snapshot, task.project_id, user_id, ai_service
+                    )
+                if not analysis_error:
+                    await advance_watermark(idx)
+                else:
+                    post_failures.append({
+                        'chapter_id': chapter_snapshot.id,
+                        'chapter_number': chapter_snapshot.chapter_number,
+                        'title': chapter_snapshot.title,
+                        'error': f"分析失败(重试3次): {analysis_error}",
+                        'retry_count': 3
+                    })
+            except Exception as e:
+                post_failures.append({
+                    'chapter_id': chapter_snapshot.id,
+                    'chapter_number': chapter_snapshot.chapter_number,
+                    'title': chapter_snapshot.title,
+                    'error': f"分析异常: {str(e)}",
+                    'retry_count': 0
+                })
+            finally:
+                metrics.record("post_process", time.monotonic() - start)
+                post_slots.release()
+        
+        async def fail_on_post_failure() -> bool:
+            """流水线模式下，后台分析失败则终止批量任务"""
+            if not post_failures:
+                return False
+            failed_info = post_failures[0]
+            failed_chapters.extend(post_failures)
+            await mark_failed(f"第{failed_info['chapter_number']}章{failed_info['error']}")
+            logger.error(f"🛑 批量生成中断: 第{failed_info['chapter_number']}章后台分析失败")
+            return True
         
         # 按顺序生成每个章节
         for idx, chapter_id in enumerate(task.chapter_ids, 1):
+            if idx <= resume_from:
+                continue
+            
             # 检查任务是否被取消
             await db_session.refresh(task)
             if task.status == 'cancelled':
                 logger.info(f"🛑 批量生成任务已被取消: {batch_id}")
                 return
             
-            # 更新当前章节
-            async with write_lock:
-                task.current_chapter_id = chapter_id
-                task.current_retry_count = 0  # 重置重试计数
-                await db_session.commit()
+            if await fail_on_post_failure():
+                return
+            
+            # 更新当前章节（重置重试计数）
+            progress_writer.update(
+                BatchGenerationTask, batch_id, user_id,
+                current_chapter_id=chapter_id, current_retry_count=0
+            )
+            
+            # 流水线模式：取回上一轮为本章预取的输入
+            prefetched = None
+            if chapter_id in prefetch_tasks:
+                prefetched = await prefetch_tasks.pop(chapter_id)
+                if prefetched:
+                    metrics.prefetch_hits += 1
+            
+            # 流水线模式：本章生成期间预取下一章
+            if pipelined and idx < len(task.chapter_ids):
+                next_chapter_id = task.chapter_ids[idx]
+                prefetch_tasks[next_chapter_id] = asyncio.create_task(timed_prefetch(next_chapter_id))
             
             # 重试循环
             retry_count = 0
@@ -2418,10 +2619,10 @@ async def execute_batch_generation_in_order(
                         raise Exception(f"章节 {chapter_id} 不存在")
                     
                     # 更新当前章节序号和重试次数
-                    async with write_lock:
-                        task.current_chapter_number = chapter.chapter_number
-                        task.current_retry_count = retry_count
-                        await db_session.commit()
+                    progress_writer.update(
+                        BatchGenerationTask, batch_id, user_id,
+                        current_chapter_number=chapter.chapter_number, current_retry_count=retry_count
+                    )
                     
                     if retry_count > 0:
                         logger.info(f"🔄 [{idx}/{task.total_chapters}] 重试生成章节 (第{retry_count}次): 第{chapter.chapter_number}章 《{chapter.title}》")
@@ -2434,6 +2635,7 @@ async def execute_batch_generation_in_order(
                         raise Exception(f"前置条件不满足: {error_msg}")
                     
                     # 生成章节内容（复用现有流式生成逻辑的核心部分），传递model参数
+                    generate_start = time.monotonic()
                     await generate_single_chapter_for_batch(
                         db_session=db_session,
                         chapter=chapter,
@@ -2441,104 +2643,64 @@ async def execute_batch_generation_in_order(
                         style_id=task.style_id,
                         target_word_count=task.target_word_count,
                         ai_service=ai_service,
-                        write_lock=write_lock,
-                        custom_model=custom_model
+                        custom_model=custom_model,
+                        prefetched=prefetched
                     )
+                    metrics.record("generate", time.monotonic() - generate_start)
                     
                     logger.info(f"✅ 章节生成完成: 第{chapter.chapter_number}章")
                     
                     # 如果启用同步分析
-                    if task.enable_analysis:
+                    if task.enable_analysis and pipelined:
+                        # 流水线模式：分析进入有界的后台阶段，后处理积压时在此等待（背压）
+                        await post_slots.acquire()
+                        post_tasks.append(asyncio.create_task(post_process(idx, chapter)))
+                        logger.info(f"🔍 第{chapter.chapter_number}章分析已进入后台阶段")
+                    elif task.enable_analysis:
                         logger.info(f"🔍 开始同步分析章节: 第{chapter.chapter_number}章")
                         
-                        # 分析重试机制（最多3次）
-                        analysis_retry_count = 0
-                        analysis_success = False
-                        last_analysis_error = None
+                        analyze_start = time.monotonic()
+                        last_analysis_error = await analyze_chapter_with_retries(
+                            db_session, chapter, task.project_id, user_id, ai_service
+                        )
+                        metrics.record("post_process", time.monotonic() - analyze_start)
                         
-                        while analysis_retry_count < 3 and not analysis_success:
-                            try:
-                                if analysis_retry_count > 0:
-                                    logger.info(f"🔄 重试分析章节 (第{analysis_retry_count}次): 第{chapter.chapter_number}章")
-                                
-                                async with write_lock:
-                                    analysis_task = AnalysisTask(
-                                        chapter_id=chapter_id,
-                                        user_id=user_id,
-                                        project_id=task.project_id,
-                                        status='pending',
-                                        progress=0
-                                    )
-                                    db_session.add(analysis_task)
-                                    await db_session.commit()
-                                    await db_session.refresh(analysis_task)
-                                
-                                # 同步执行分析，直接使用返回值判断成功/失败
-                                analysis_result = await analyze_chapter_background(
-                                    chapter_id=chapter_id,
-                                    user_id=user_id,
-                                    project_id=task.project_id,
-                                    task_id=analysis_task.id,
-                                    ai_service=ai_service
-                                )
-                                
-                                # 直接根据返回值判断
-                                if not analysis_result:
-                                    last_analysis_error = "分析函数返回失败"
-                                    logger.error(f"❌ 章节分析失败: 第{chapter.chapter_number}章")
-                                    raise Exception(f"章节分析失败")
-                                
-                                # 分析成功
-                                analysis_success = True
-                                logger.info(f"✅ 章节分析成功: 第{chapter.chapter_number}章")
-                                
-                            except Exception as analysis_error:
-                                last_analysis_error = str(analysis_error)
-                                analysis_retry_count += 1
-                                
-                                if analysis_retry_count < 3:
-                                    # 还有重试机会，等待后重试
-                                    wait_time = min(2 ** analysis_retry_count, 10)
-                                    logger.warning(f"⏳ 分析失败，等待 {wait_time} 秒后重试...")
-                                    await asyncio.sleep(wait_time)
-                                else:
-                                    # 达到最大重试次数，必须终止整个批量任务
-                                    logger.error(f"❌ 章节分析失败，已达最大重试次数(3次): 第{chapter.chapter_number}章")
-                                    
-                                    # 记录失败信息
-                                    failed_info = {
-                                        'chapter_id': chapter_id,
-                                        'chapter_number': chapter.chapter_number,
-                                        'title': chapter.title,
-                                        'error': f"分析失败(重试3次): {last_analysis_error}",
-                                        'retry_count': 3
-                                    }
-                                    
-                                    async with write_lock:
-                                        if task.failed_chapters is None:
-                                            task.failed_chapters = []
-                                        task.failed_chapters.append(failed_info)
-                                        
-                                        # 标记任务失败并终止
-                                        task.status = 'failed'
-                                        task.error_message = f"第{chapter.chapter_number}章分析失败(重试3次): {last_analysis_error}"[:500]
-                                        task.completed_at = datetime.now()
-                                        task.current_retry_count = 0
-                                        await db_session.commit()
-                                    
-                                    logger.error(f"🛑 批量生成中断: 第{chapter.chapter_number}章分析失败")
-                                    return  # 立即终止整个批量生成任务
+                        if last_analysis_error:
+                            # 达到最大重试次数，必须终止整个批量任务
+                            failed_chapters.append({
+                                'chapter_id': chapter_id,
+                                'chapter_number': chapter.chapter_number,
+                                'title': chapter.title,
+                                'error': f"分析失败(重试3次): {last_analysis_error}",
+                                'retry_count': 3
+                            })
+                            
+                            # 标记任务失败并终止
+                            await mark_failed(f"第{chapter.chapter_number}章分析失败(重试3次): {last_analysis_error}")
+                            
+                            logger.error(f"🛑 批量生成中断: 第{chapter.chapter_number}章分析失败")
+                            return  # 立即终止整个批量生成任务
                     
                     # 标记成功
                     chapter_success = True
                     
-                    # 更新完成数
-                    async with write_lock:
-                        task.completed_chapters += 1
-                        task.current_retry_count = 0  # 重置重试计数
-                        await db_session.commit()
+                    # 更新完成数（重置重试计数）；完成数是断点续传位置，立即写入
+                    # （后台分析模式下由后处理完成时推进）
+                    completed_chapters += 1
+                    if background_analysis:
+                        progress_writer.update(
+                            BatchGenerationTask, batch_id, user_id,
+                            current_retry_count=0
+                        )
+                    else:
+                        await progress_writer.write_now(
+                            BatchGenerationTask, batch_id, user_id,
+                            completed_chapters=completed_chapters,
+                            current_retry_count=0,
+                            stage_metrics=metrics.snapshot()
+                        )
                     
-                    logger.info(f"✅ 进度: {task.completed_chapters}/{task.total_chapters}")
+                    logger.info(f"✅ 进度: {completed_chapters}/{task.total_chapters}")
                     
                 except Exception as e:
                     last_error = str(e)
@@ -2562,25 +2724,16 @@ async def execute_batch_generation_in_order(
                         # 达到最大重试次数，记录失败信息
                         logger.error(f"❌ 章节生成失败，已达最大重试次数({task.max_retries}): 第{chapter.chapter_number if chapter else '?'}章")
                         
-                        failed_info = {
+                        failed_chapters.append({
                             'chapter_id': chapter_id,
                             'chapter_number': chapter.chapter_number if chapter else -1,
                             'title': chapter.title if chapter else '未知',
                             'error': last_error,
                             'retry_count': retry_count - 1
-                        }
+                        })
                         
-                        async with write_lock:
-                            if task.failed_chapters is None:
-                                task.failed_chapters = []
-                            task.failed_chapters.append(failed_info)
-                            
-                            # 标记任务失败并终止
-                            task.status = 'failed'
-                            task.error_message = f"第{chapter.chapter_number}章生成失败(重试{retry_count-1}次): {last_error}"[:500]
-                            task.completed_at = datetime.now()
-                            task.current_retry_count = 0
-                            await db_session.commit()
+                        # 标记任务失败并终止
+                        await mark_failed(f"第{chapter.chapter_number if chapter else '?'}章生成失败(重试{retry_count-1}次): {last_error}")
                         
                         # ⚠️ 如果启用了同步分析，任何错误都应该中断任务
                         # 因为章节生成或分析失败会影响后续章节的职业更新和剧情连贯性
@@ -2591,83 +2744,58 @@ async def execute_batch_generation_in_order(
                         
                         return
         
+        # 流水线模式：等待后台分析全部完成
+        if post_tasks:
+            logger.info(f"⏳ 等待 {len(post_tasks)} 个后台分析完成...")
+            await asyncio.gather(*post_tasks, return_exceptions=True)
+            if await fail_on_post_failure():
+                return
+        
         # 全部完成
-        async with write_lock:
-            task.status = 'completed'
-            task.completed_at = datetime.now()
-            task.current_chapter_id = None
-            task.current_chapter_number = None
-            await db_session.commit()
+        await progress_writer.write_now(
+            BatchGenerationTask, batch_id, user_id,
+            status='completed',
+            completed_at=datetime.now(),
+            current_chapter_id=None,
+            current_chapter_number=None,
+            stage_metrics=metrics.snapshot()
+        )
         
-        logger.info(f"✅ 批量生成任务全部完成: {batch_id}, 成功生成 {task.completed_chapters} 章")
+        logger.info(f"✅ 批量生成任务全部完成: {batch_id}, 成功生成 {completed_chapters} 章")
         
     except Exception as e:
         logger.error(f"❌ 批量生成任务异常: {str(e)}", exc_info=True)
-        if db_session and task:
+        if task:
             try:
-                async with write_lock:
-                    task.status = 'failed'
-                    task.error_message = str(e)[:500]
-                    task.completed_at = datetime.now()
-                    await db_session.commit()
+                await progress_writer.write_now(
+                    BatchGenerationTask, batch_id, user_id,
+                    status='failed', error_message=str(e)[:500], completed_at=datetime.now()
+                )
             except Exception as commit_error:
                 logger.error(f"❌ 更新任务失败状态失败: {str(commit_error)}")
     finally:
+        # 未使用的预取直接取消；后台分析各自持有独立会话，允许继续完成
+        for pending in prefetch_tasks.values():
+            pending.cancel()
         if db_session:
             await db_session.close()
 
 
-async def generate_single_chapter_for_batch(
+async def _load_batch_chapter_inputs(
     db_session: AsyncSession,
     chapter: Chapter,
+    project: Project,
+    outline: Optional[Outline],
     user_id: str,
-    style_id: Optional[int],
-    target_word_count: int,
-    ai_service: AIService,
-    write_lock: Lock,
-    custom_model: Optional[str] = None
-):
+    style_id: Optional[int]
+) -> tuple[str, str]:
     """
-    为批量生成执行单个章节的生成（非流式）
-    复用现有生成逻辑的核心部分
-    """
-    # 获取项目信息
-    project_result = await db_session.execute(
-        select(Project).where(Project.id == chapter.project_id)
-    )
-    project = project_result.scalar_one_or_none()
-    if not project:
-        raise Exception("项目不存在")
+    加载批量生成单章所需的角色信息和写作风格
     
-    # 获取项目的大纲模式
+    Returns:
+        (角色信息, 写作风格内容)
+    """
     outline_mode = project.outline_mode if project else 'one-to-many'
-    logger.info(f"📋 批量生成 - 项目大纲模式: {outline_mode}")
-    
-    # 获取对应的大纲
-    outline_result = await db_session.execute(
-        select(Outline)
-        .where(Outline.project_id == chapter.project_id)
-        .where(Outline.order_index == chapter.chapter_number)
-    )
-    outline = outline_result.scalar_one_or_none()
-    
-    # 获取所有大纲用于上下文
-    all_outlines_result = await db_session.execute(
-        select(Outline)
-        .where(Outline.project_id == chapter.project_id)
-        .order_by(Outline.order_index)
-    )
-    all_outlines = all_outlines_result.scalars().all()
-    outlines_context = "\n".join([
-        f"第{o.order_index}章 {o.title}: {o.content[:100]}..."
-        for o in all_outlines
-    ])
-    
-    # 获取角色信息（包含职业信息）
-    characters_result = await db_session.execute(
-        select(Character).where(Character.project_id == chapter.project_id)
-    )
-    characters = characters_result.scalars().all()
     
     # 📝 根据大纲模式智能筛选相关角色（批量生成）
     filter_character_names = None
@@ -2695,7 +2823,6 @@ async def generate_single_chapter_for_batch(
     characters_info = await build_characters_info_with_careers(
         db=db_session,
         project_id=chapter.project_id,
-        characters=characters,
         filter_character_names=filter_character_names
     )
     
@@ -2710,6 +2837,109 @@ async def generate_single_chapter_for_batch(
             if style.user_id is None or style.user_id == user_id:
                 style_content = style.prompt_content or ""
     
+    return characters_info, style_content
+
+
+async def prefetch_batch_chapter(
+    chapter_id: str,
+    user_id: str,
+    style_id: Optional[int]
+) -> Optional[BatchChapterPrefetch]:
+    """
+    预取下一章的生成输入（流水线批量生成，在上一章生成期间执行）
+    
+    使用独立数据库会话；只预取不依赖上一章正文的部分：角色、写作风格、
+    大纲上下文、伏笔上下文和风格指南。失败时返回None，由生成阶段正常加载。
+    """
+    from app.database import session_scope
+    
+    try:
+        async with session_scope(user_id, read_only=True, name="batch_prefetch") as prefetch_db:
+            chapter = (await prefetch_db.execute(
+                select(Chapter).where(Chapter.id == chapter_id)
+            )).scalar_one_or_none()
+            if not chapter:
+                return None
+            project = (await prefetch_db.execute(
+                select(Project).where(Project.id == chapter.project_id)
+            )).scalar_one_or_none()
+            if not project:
+                return None
+            outline = (await prefetch_db.execute(
+                select(Outline)
+                .where(Outline.project_id == chapter.project_id)
+                .where(Outline.order_index == chapter.chapter_number)
+            )).scalar_one_or_none()
+            
+            characters_info, style_content = await _load_batch_chapter_inputs(
+                prefetch_db, chapter, project, outline, user_id, style_id
+            )
+            context_sections = await ChapterContextBuilder().prefetch(
+                chapter=chapter,
+                project=project,
+                outline=outline,
+                user_id=user_id,
+                db=prefetch_db
+            )
+        
+        logger.info(f"⚡ 已预取第{chapter.chapter_number}章上下文: {', '.join(context_sections)}")
+        return BatchChapterPrefetch(
+            chapter_id=chapter_id,
+            characters_info=characters_info,
+            style_content=style_content,
+            context_sections=context_sections
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ 预取章节上下文失败，将在生成时重新加载: {str(e)}")
+        return None
+
+
+async def generate_single_chapter_for_batch(
+    db_session: AsyncSession,
+    chapter: Chapter,
+    user_id: str,
+    style_id: Optional[int],
+    target_word_count: int,
+    ai_service: AIService,
+    custom_model: Optional[str] = None,
+    prefetched: Optional[BatchChapterPrefetch] = None
+):
+    """
+    为批量生成执行单个章节的生成（非流式）
+    复用现有生成逻辑的核心部分
+    
+    prefetched: 流水线模式下预取的输入，命中时跳过角色/风格/独立上下文片段的加载
+    """
+    # 获取项目信息
+    project_result = await db_session.execute(
+        select(Project).where(Project.id == chapter.project_id)
+    )
+    project = project_result.scalar_one_or_none()
+    if not project:
+        raise Exception("项目不存在")
+    
+    # 获取项目的大纲模式
+    outline_mode = project.outline_mode if project else 'one-to-many'
+    logger.info(f"📋 批量生成 - 项目大纲模式: {outline_mode}")
+    
+    # 获取对应的大纲
+    outline_result = await db_session.execute(
+        select(Outline)
+        .where(Outline.project_id == chapter.project_id)
+        .where(Outline.order_index == chapter.chapter_number)
+    )
+    outline = outline_result.scalar_one_or_none()
+    
+    if prefetched and prefetched.chapter_id == chapter.id:
+        characters_info = prefetched.characters_info
+        style_content = prefetched.style_content
+        prefetched_sections = prefetched.context_sections
+    else:
+        characters_info, style_content = await _load_batch_chapter_inputs(
+            db_session, chapter, project, outline, user_id, style_id
+        )
+        prefetched_sections = None
+    
     # 🚀 使用新的优化上下文构建器
     logger.info(f"🔧 批量生成 - 使用优化的章节上下文构建器（V2）")
     context_builder = ChapterContextBuilder()
@@ -2718,7 +2948,8 @@ async def generate_single_chapter_for_batch(
         project=project,
         outline=outline,
         user_id=user_id,
-        db=db_session
+        db=db_session,
+        prefetched_sections=prefetched_sections
     )
     
     # 日志输出统计信息
@@ -2957,11 +3188,11 @@ async def generate_single_chapter_for_batch(
             seg_kwargs["model"] = custom_model
         
         # 生成本段内容
-        seg_content = ""
+        seg_buffer = StreamTextBuffer()
         async for chunk in ai_service.generate_text_stream(**seg_kwargs):
-            seg_content += chunk
+            seg_buffer.append(chunk)
         
-        seg_content = seg_content.strip()
+        seg_content = seg_buffer.getvalue().strip()
         
         if seg_content:
             if full_content:
@@ -2999,9 +3230,10 @@ async def generate_single_chapter_for_batch(
         if custom_model:
             ending_kwargs["model"] = custom_model
         
-        ending_content = ""
+        ending_buffer = StreamTextBuffer()
         async for chunk in ai_service.generate_text_stream(**ending_kwargs):
-            ending_content += chunk
+            ending_buffer.append(chunk)
+        ending_content = ending_buffer.getvalue()
         
         if ending_content.strip():
             full_content += "\n\n" + ending_content.strip()
@@ -3010,29 +3242,38 @@ async def generate_single_chapter_for_batch(
     total_words = len(full_content)
     logger.info(f"  📊 分段生成完成: 总计{total_words}字 (目标{target_word_count}字)")
     
-    # 更新章节内容到数据库（使用锁保护）
-    async with write_lock:
-        old_word_count = chapter.word_count or 0
-        chapter.content = full_content
-        new_word_count = len(full_content)
-        chapter.word_count = new_word_count
-        chapter.status = "completed"
-        
-        # 更新项目字数
-        project.current_words = project.current_words - old_word_count + new_word_count
-        
-        # 记录生成历史
-        history = GenerationHistory(
-            project_id=chapter.project_id,
-            chapter_id=chapter.id,
-            prompt=f"批量生成: 第{chapter.chapter_number}章 {chapter.title}",
-            generated_content=full_content[:500] if len(full_content) > 500 else full_content,
-            model="default"
-        )
-        db_session.add(history)
-        
+    # 更新章节内容到数据库（章节按版本号乐观并发控制，项目字数在数据库端增量更新）
+    old_word_count = chapter.word_count or 0
+    chapter.content = full_content
+    new_word_count = len(full_content)
+    chapter.word_count = new_word_count
+    chapter.status = "completed"
+    
+    await db_session.execute(
+        update(Project)
+        .where(Project.id == chapter.project_id)
+        .values(current_words=Project.current_words + (new_word_count - old_word_count))
+    )
+    
+    # 记录生成历史
+    history = GenerationHistory(
+        project_id=chapter.project_id,
+        chapter_id=chapter.id,
+        prompt=f"批量生成: 第{chapter.chapter_number}章 {chapter.title}",
+        generated_content=full_content[:500] if len(full_content) > 500 else full_content,
+        model="default"
+    )
+    db_session.add(history)
+    
+    # 增量更新重复检测索引（失败不影响保存）
+    await refresh_duplicate_index(chapter, db_session)
+    
+    try:
         await db_session.commit()
-        await db_session.refresh(chapter)
+    except StaleDataError:
+        await db_session.rollback()
+        raise Exception(f"第{chapter.chapter_number}章在生成期间被其他操作修改，放弃本次写入")
+    await db_session.refresh(chapter)
     
     logger.info(f"✅ 单章节生成完成: 第{chapter.chapter_number}章，共 {new_word_count} 字")
     
@@ -3064,22 +3305,23 @@ async def generate_single_chapter_for_batch(
         if custom_model:
             summary_kwargs["model"] = custom_model
         
-        chapter_summary = ""
+        summary_buffer = StreamTextBuffer()
         async for chunk in ai_service.generate_text_stream(**summary_kwargs):
-            chapter_summary += chunk
+            summary_buffer.append(chunk)
         
-        chapter_summary = chapter_summary.strip()
+        chapter_summary = summary_buffer.getvalue().strip()
         
         if chapter_summary and len(chapter_summary) >= 100:
             # 保存摘要到数据库
-            async with write_lock:
-                chapter.summary = chapter_summary
-                await db_session.commit()
+            chapter.summary = chapter_summary
+            await db_session.commit()
             logger.info(f"  ✅ 章节摘要生成完成: {len(chapter_summary)}字")
         else:
             logger.warning(f"  ⚠️ 章节摘要生成失败或过短")
     except Exception as e:
         logger.error(f"  ❌ 生成章节摘要时出错: {str(e)}")
+        # 摘要写入冲突等情况需要回滚，保证会话可继续使用
+        await db_session.rollback()
 
 
 
@@ -3135,14 +3377,14 @@ async def generate_chapter_summary(
 请直接输出摘要，不要添加任何前缀或说明："""
 
     try:
-        summary = ""
+        summary_buffer = StreamTextBuffer()
         async for chunk in user_ai_service.generate_text_stream(
             prompt=summary_prompt,
             max_tokens=2000
         ):
-            summary += chunk
+            summary_buffer.append(chunk)
         
-        summary = summary.strip()
+        summary = summary_buffer.getvalue().strip()
         
         if summary and len(summary) >= 100:
             chapter.summary = summary
@@ -3207,22 +3449,14 @@ async def batch_generate_summaries(
     }
 
 
+@with_llm_priority(LLMPriority.BACKGROUND)
 async def _batch_generate_summaries_task(project_id: str, chapter_ids: list, user_id: str):
     """后台任务：批量生成摘要"""
-    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
-    from app.database import get_engine
+    from app.database import session_scope
     from app.models.settings import Settings
     from app.api.settings import create_user_ai_service, read_env_defaults
     
-    # 获取数据库引擎并创建会话
-    engine = await get_engine(user_id)
-    AsyncSessionLocal = async_sessionmaker(
-        engine,
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
-    
-    async with AsyncSessionLocal() as db:
+    async with session_scope(user_id, name="batch_summaries") as db:
         # 获取用户的AI设置
         result = await db.execute(
             select(Settings).where(Settings.user_id == user_id)
@@ -3269,14 +3503,14 @@ async def _batch_generate_summaries_task(project_id: str, chapter_ids: list, use
 
 直接输出摘要："""
 
-                summary = ""
+                summary_buffer = StreamTextBuffer()
                 async for chunk in ai_service.generate_text_stream(
                     prompt=summary_prompt,
                     max_tokens=2000
                 ):
-                    summary += chunk
+                    summary_buffer.append(chunk)
                 
-                summary = summary.strip()
+                summary = summary_buffer.getvalue().strip()
                 
                 if summary and len(summary) >= 100:
                     chapter.summary = summary
@@ -3355,12 +3589,6 @@ async def regenerate_chapter_stream(
             )
             project = project_result.scalar_one_or_none()
             
-            # 获取角色信息（包含职业信息）
-            characters_result = await temp_db.execute(
-                select(Character).where(Character.project_id == chapter.project_id)
-            )
-            characters = characters_result.scalars().all()
-            
             # 📝 根据大纲模式智能筛选相关角色（重新生成）
             outline_mode_result = await temp_db.execute(
                 select(Project.outline_mode).where(Project.id == chapter.project_id)
@@ -3398,7 +3626,6 @@ async def regenerate_chapter_stream(
             characters_info_with_careers = await build_characters_info_with_careers(
                 db=temp_db,
                 project_id=chapter.project_id,
-                characters=characters,
                 filter_character_names=filter_character_names
             )
             
@@ -3506,7 +3733,7 @@ async def regenerate_chapter_stream(
                 regenerator = ChapterRegenerator(user_ai_service)
                 
                 # 流式生成新内容
-                full_content = ""
+                content_buffer = StreamTextBuffer()
                 async for event in regenerator.regenerate_with_feedback(
                     chapter=chapter,
                     analysis=analysis,
@@ -3520,24 +3747,23 @@ async def regenerate_chapter_stream(
                     if event['type'] == 'chunk':
                         # 内容块
                         chunk = event['content']
-                        full_content += chunk
-                        yield f"data: {json.dumps({'type': 'chunk', 'content': chunk}, ensure_ascii=False)}\n\n"
+                        content_buffer.append(chunk)
+                        yield await SSEResponse.send_chunk(chunk)
                     elif event['type'] == 'progress':
-                        # 进度更新
-                        progress_data = {
-                            'type': 'progress',
-                            'progress': event.get('progress', 0),
-                            'message': event.get('message', ''),
-                            'word_count': event.get('word_count', 0)
-                        }
-                        yield f"data: {json.dumps(progress_data, ensure_ascii=False)}\n\n"
+                        # 进度更新（传输层在合并窗口内只发送最新一条）
+                        yield await SSEResponse.send_progress(
+                            event.get('message', ''),
+                            event.get('progress', 0),
+                            word_count=event.get('word_count', 0)
+                        )
                     
                     await asyncio.sleep(0)
                 
                 # 更新任务状态
+                full_content = content_buffer.getvalue()
                 regen_task.status = 'completed'
                 regen_task.regenerated_content = full_content
-                regen_task.regenerated_word_count = len(full_content)
+                regen_task.regenerated_word_count = content_buffer.word_count
                 regen_task.completed_at = datetime.now()
                 
                 # 计算差异统计
@@ -3551,7 +3777,7 @@ async def regenerate_chapter_stream(
                     'type': 'result',
                     'data': {
                         'task_id': task_id,
-                        'word_count': len(full_content),
+                        'word_count': content_buffer.word_count,
                         'version_number': regen_task.version_number,
                         'auto_applied': regenerate_request.auto_apply,
                         'diff_stats': diff_stats
@@ -8,6 +8,7 @@ from typing import AsyncGenerator
 
 from app.database import get_db
 from app.utils.sse_response import SSEResponse, create_sse_response
+from app.utils.stream_buffer import StreamTextBuffer
 from app.models.character import Character
 from app.models.project import Project
 from app.models.generation_history import GenerationHistory
@@ -839,10 +840,10 @@ async def generate_character_stream(
                             # 如果MCP调用失败或返回空，继续走流式生成
                             if not ai_response or not ai_response.strip():
                                 logger.info(f"🔄 开始流式生成...")
-                                ai_response = ""
+                                text_buffer = StreamTextBuffer()
                                 async for chunk in user_ai_service.generate_text_stream(prompt=prompt):
                                     chunk_count += 1
-                                    ai_response += chunk
+                                    text_buffer.append(chunk)
                                     
                                     # 发送内容块
                                     yield await SSEResponse.send_chunk(chunk)
@@ -850,18 +851,20 @@ async def generate_character_stream(
                                     # 定期更新进度
                                     if chunk_count % 5 == 0:
                                         yield await SSEResponse.send_progress(
-                                            f"AI生成角色中... ({len(ai_response)}字符)",
+                                            f"AI生成角色中... ({len(text_buffer)}字符)",
                                             10 + min(chunk_count // 2, 85)
                                         )
                                     
                                     # 心跳
                                     if chunk_count % 20 == 0:
                                         yield await SSEResponse.send_heartbeat()
+                                ai_response = text_buffer.getvalue()
                         else:
                             logger.debug(f"用户 {user_id} 未启用MCP工具，使用流式基础模式")
+                            text_buffer = StreamTextBuffer(ai_response)
                             async for chunk in user_ai_service.generate_text_stream(prompt=prompt):
                                 chunk_count += 1
-                                ai_response += chunk
+                                text_buffer.append(chunk)
                                 
                                 # 发送内容块
                                 yield await SSEResponse.send_chunk(chunk)
@@ -869,20 +872,21 @@ async def generate_character_stream(
                                 # 定期更新进度
                                 if chunk_count % 5 == 0:
                                     yield await SSEResponse.send_progress(
-                                        f"AI生成角色中... ({len(ai_response)}字符)",
+                                        f"AI生成角色中... ({len(text_buffer)}字符)",
                                         10 + min(chunk_count // 2, 85)
                                     )
                                 
                                 # 心跳
                                 if chunk_count % 20 == 0:
                                     yield await SSEResponse.send_heartbeat()
+                            ai_response = text_buffer.getvalue()
                             
                     except Exception as mcp_error:
                         logger.warning(f"⚠️ MCP工具调用异常，降级为流式基础模式: {str(mcp_error)}")
-                        ai_response = ""
+                        text_buffer = StreamTextBuffer()
                         async for chunk in user_ai_service.generate_text_stream(prompt=prompt):
                             chunk_count += 1
-                            ai_response += chunk
+                            text_buffer.append(chunk)
                             
                             # 发送内容块
                             yield await SSEResponse.send_chunk(chunk)
@@ -890,18 +894,20 @@ async def generate_character_stream(
                             # 定期更新进度
                             if chunk_count % 5 == 0:
                                 yield await SSEResponse.send_progress(
-                                    f"AI生成角色中... ({len(ai_response)}字符)",
+                                    f"AI生成角色中... ({len(text_buffer)}字符)",
                                     10 + min(chunk_count // 2, 85)
                                 )
                             
                             # 心跳
                             if chunk_count % 20 == 0:
                                 yield await SSEResponse.send_heartbeat()
+                        ai_response = text_buffer.getvalue()
                 else:
                     logger.debug(f"未登录用户，使用流式基础模式")
+                    text_buffer = StreamTextBuffer(ai_response)
                     async for chunk in user_ai_service.generate_text_stream(prompt=prompt):
                         chunk_count += 1
-                        ai_response += chunk
+                        text_buffer.append(chunk)
                         
                         # 发送内容块
                         yield await SSEResponse.send_chunk(chunk)
@@ -909,13 +915,14 @@ async def generate_character_stream(
                         # 定期更新进度
                         if chunk_count % 5 == 0:
                             yield await SSEResponse.send_progress(
-                                f"AI生成角色中... ({len(ai_response)}字符)",
+                                f"AI生成角色中... ({len(text_buffer)}字符)",
                                 10 + min(chunk_count // 2, 85)
                             )
                         
                         # 心跳
                         if chunk_count % 20 == 0:
                             yield await SSEResponse.send_heartbeat()
+                    ai_response = text_buffer.getvalue()
                     
             except Exception as ai_error:
                 logger.error(f"❌ AI服务调用异常：{str(ai_error)}")
@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 import json
 import asyncio
 
@@ -41,7 +41,7 @@ async def check_chapter_duplicates(
 async def check_project_duplicates(
     project_id: str,
     threshold: float = Query(0.7, ge=0.5, le=1.0, description="相似度阈值"),
-    max_chapters: int = Query(20, ge=2, le=100, description="最大检查章节数"),
+    max_chapters: Optional[int] = Query(None, ge=2, description="最大检查章节数，不提供则检测全书"),
     db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
@@ -50,12 +50,12 @@ async def check_project_duplicates(
     
     - **project_id**: 项目ID
     - **threshold**: 相似度阈值 (0.5-1.0)
-    - **max_chapters**: 最大检查章节数 (2-100)
+    - **max_chapters**: 最大检查章节数，不提供则检测全书
     
-    注意：章节数较多时可能耗时较长，建议使用流式接口
+    候选片段对由持久化的MinHash/LSH索引产生，仅对候选对做精确比对
     """
     detector = DuplicateDetector(similarity_threshold=threshold)
-    result = await detector.check_project(project_id, db, max_chapters)
+    result = await detector.check_project(project_id, db, user["user_id"], max_chapters)
     
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -67,17 +67,17 @@ async def check_project_duplicates(
 async def check_project_duplicates_stream(
     project_id: str,
     threshold: float = Query(0.7, ge=0.5, le=1.0, description="相似度阈值"),
-    max_chapters: int = Query(50, ge=2, le=100, description="最大检查章节数"),
+    max_chapters: Optional[int] = Query(None, ge=2, description="最大检查章节数，不提供则检测全书"),
     db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
     """
     流式检测项目章节间重复内容（SSE）
     
-    实时返回检测进度，适合大量章节的检测任务
+    实时返回检测进度，默认检测全书。片段签名按章节持久化，仅重建正文变化的章节
     
     事件类型：
-    - `progress`: 检测进度 {"current": 1, "total": 10, "phase": "internal/cross"}
+    - `progress`: 检测进度 {"current": 1, "total": 10, "phase": "index/internal/cross"}
     - `internal`: 章节内部重复结果
     - `cross`: 章节间重复结果
     - `complete`: 检测完成，包含汇总统计
@@ -87,7 +87,7 @@ async def check_project_duplicates_stream(
         detector = DuplicateDetector(similarity_threshold=threshold)
         
         try:
-            async for event in detector.check_project_stream(project_id, db, max_chapters):
+            async for event in detector.check_project_stream(project_id, db, user["user_id"], max_chapters):
                 yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
                 await asyncio.sleep(0.01)  # 防止阻塞
         except Exception as e:
@@ -5,7 +5,7 @@ from sqlalchemy import select, func, and_, or_
 from typing import Optional, List
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.foreshadow import Foreshadow, ForeshadowStatus, ForeshadowType
 from app.models.project import Project
 from app.models.chapter import Chapter
@@ -131,7 +131,7 @@ async def get_foreshadow_reminders(
     request: Request,
     project_id: str = Query(..., description="项目ID"),
     current_chapter: int = Query(..., description="当前章节号"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取需要提醒的伏笔（即将到期或已过期未回收）"""
     user_id = getattr(request.state, 'user_id', None)
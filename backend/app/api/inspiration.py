@@ -9,6 +9,7 @@ from app.services.ai_service import AIService
 from app.api.settings import get_user_ai_service
 from app.services.prompt_service import PromptService
 from app.logger import get_logger
+from app.utils.stream_buffer import StreamTextBuffer
 
 router = APIRouter(prefix="/inspiration", tags=["灵感模式"])
 logger = get_logger(__name__)
@@ -149,16 +150,13 @@ async def generate_options(
             logger.info(f"调用AI生成{step}选项... (temperature={temperature})")
             
             # 流式生成并累积文本
-            accumulated_text = ""
-            async for chunk in ai_service.generate_text_stream(
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                temperature=temperature
-            ):
-                accumulated_text += chunk
-            
-            response = {"content": accumulated_text}
-            content = accumulated_text
+            text_buffer = StreamTextBuffer()
+            options_request = dict(prompt=user_prompt, system_prompt=system_prompt, temperature=temperature)
+            async for chunk in ai_service.generate_text_stream(**options_request, use_cache=True):
+                text_buffer.append(chunk)
+            
+            response = {"content": text_buffer.getvalue()}
+            content = text_buffer.getvalue()
             logger.info(f"AI返回内容长度: {len(content)}")
             
             # 解析JSON（使用统一的JSON清洗方法）
@@ -172,6 +170,7 @@ async def generate_options(
                 is_valid, error_msg = validate_options_response(result, step)
                 
                 if not is_valid:
+                    await ai_service.discard_cached_response(**options_request)
                     logger.warning(f"⚠️ 第{attempt + 1}次生成格式校验失败: {error_msg}")
                     if attempt < max_retries - 1:
                         logger.info("准备重试...")
@@ -188,6 +187,7 @@ async def generate_options(
                 return result
                 
             except json.JSONDecodeError as e:
+                await ai_service.discard_cached_response(**options_request)
                 logger.error(f"第{attempt + 1}次JSON解析失败: {e}")
                 
                 if attempt < max_retries - 1:
@@ -329,15 +329,12 @@ async def refine_options(
             logger.info(f"调用AI根据反馈生成{step}选项... (temperature={temperature})")
             
             # 流式生成并累积文本
-            accumulated_text = ""
-            async for chunk in ai_service.generate_text_stream(
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                temperature=temperature
-            ):
-                accumulated_text += chunk
-            
-            content = accumulated_text
+            text_buffer = StreamTextBuffer()
+            options_request = dict(prompt=user_prompt, system_prompt=system_prompt, temperature=temperature)
+            async for chunk in ai_service.generate_text_stream(**options_request, use_cache=True):
+                text_buffer.append(chunk)
+            
+            content = text_buffer.getvalue()
             logger.info(f"AI返回内容长度: {len(content)}")
             
             # 解析JSON
@@ -349,6 +346,7 @@ async def refine_options(
                 is_valid, error_msg = validate_options_response(result, step)
                 
                 if not is_valid:
+                    await ai_service.discard_cached_response(**options_request)
                     logger.warning(f"⚠️ 第{attempt + 1}次生成格式校验失败: {error_msg}")
                     if attempt < max_retries - 1:
                         logger.info("准备重试...")
@@ -364,6 +362,7 @@ async def refine_options(
                 return result
                 
             except json.JSONDecodeError as e:
+                await ai_service.discard_cached_response(**options_request)
                 logger.error(f"第{attempt + 1}次JSON解析失败: {e}")
                 
                 if attempt < max_retries - 1:
@@ -449,17 +448,14 @@ async def quick_generate(
             "user": "请补全小说信息"
         }
         
-        # 调用AI - 流式生成并累积文本
-        accumulated_text = ""
-        async for chunk in ai_service.generate_text_stream(
-            prompt=prompts["user"],
-            system_prompt=prompts["system"],
-            temperature=0.7
-        ):
-            accumulated_text += chunk
+        # 调用AI - 流式生成并累积文本（相同信息的重试直接使用缓存结果）
+        text_buffer = StreamTextBuffer()
+        complete_request = dict(prompt=prompts["user"], system_prompt=prompts["system"], temperature=0.7)
+        async for chunk in ai_service.generate_text_stream(**complete_request, use_cache=True):
+            text_buffer.append(chunk)
         
-        response = {"content": accumulated_text}
-        content = accumulated_text
+        response = {"content": text_buffer.getvalue()}
+        content = text_buffer.getvalue()
         
         # 解析JSON（使用统一的JSON清洗方法）
         try:
@@ -480,6 +476,7 @@ async def quick_generate(
             return final_result
             
         except json.JSONDecodeError as e:
+            await ai_service.discard_cached_response(**complete_request)
             logger.error(f"JSON解析失败: {e}")
             raise Exception("AI返回格式错误，请重试")
     
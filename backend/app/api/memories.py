@@ -3,11 +3,13 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, desc
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.memory import StoryMemory, PlotAnalysis
+from app.models.memory_reindex_task import MemoryReindexTask
 from app.models.chapter import Chapter
 from app.models.project import Project
 from app.services.memory_service import memory_service
+from app.services.memory_reindex_service import MemoryReindexService
 from app.services.plot_analyzer import get_plot_analyzer
 from app.services.ai_service import create_user_ai_service
 from app.models.settings import Settings
@@ -358,7 +360,7 @@ async def get_unresolved_foreshadows(
 async def get_memory_stats(
     project_id: str,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取记忆统计信息"""
     try:
@@ -427,4 +429,66 @@ async def delete_chapter_memories(
     except Exception as e:
         logger.error(f"❌ 删除记忆失败: {str(e)}")
         await db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/projects/{project_id}/reindex")
+async def reindex_project_memories(
+    project_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    重建项目的向量索引（更换Embedding模型或向量库丢失后使用）
+    
+    从数据库中的记忆重新编码并写入新的版本化集合，完成后原子切换，期间检索仍使用旧集合。
+    项目已有进行中的重建任务时返回该任务；上次失败的任务从中断位置继续。
+    """
+    try:
+        user_id = getattr(request.state, 'user_id', None)
+        
+        # 验证用户权限
+        await verify_project_access(project_id, user_id, db)
+        
+        task = await MemoryReindexService.enqueue(db, user_id, project_id)
+        logger.info(f"📋 记忆重建索引任务: {task.id} (状态: {task.status})")
+        
+        return {
+            "success": True,
+            "task": task.to_dict()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ 创建重建索引任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/projects/{project_id}/reindex/{task_id}")
+async def get_reindex_status(
+    project_id: str,
+    task_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """查询重建索引任务进度（已写入条数、速度、预计剩余时间）"""
+    try:
+        user_id = getattr(request.state, 'user_id', None)
+        
+        # 验证用户权限
+        await verify_project_access(project_id, user_id, db)
+        
+        task = await db.get(MemoryReindexTask, task_id)
+        if not task or task.project_id != project_id:
+            raise HTTPException(status_code=404, detail="重建任务不存在")
+        
+        return {
+            "success": True,
+            "task": task.to_dict()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ 查询重建索引任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -8,6 +8,7 @@ import json
 
 from app.database import get_db
 from app.utils.sse_response import SSEResponse, create_sse_response
+from app.utils.stream_buffer import StreamTextBuffer
 from app.models.relationship import Organization, OrganizationMember
 from app.models.character import Character
 from app.models.project import Project
@@ -513,12 +514,12 @@ async def generate_organization_stream(
             
             try:
                 # 使用流式生成替代非流式
-                ai_content = ""
+                content_buffer = StreamTextBuffer()
                 chunk_count = 0
                 
                 async for chunk in user_ai_service.generate_text_stream(prompt=prompt):
                     chunk_count += 1
-                    ai_content += chunk
+                    content_buffer.append(chunk)
                     
                     # 发送内容块
                     yield await SSEResponse.send_chunk(chunk)
@@ -527,7 +528,7 @@ async def generate_organization_stream(
                     if chunk_count % 5 == 0:
                         progress = min(10 + (chunk_count // 5), 95)
                         yield await SSEResponse.send_progress(
-                            f"AI生成组织中... ({len(ai_content)}字符)",
+                            f"AI生成组织中... ({len(content_buffer)}字符)",
                             progress
                         )
                     
@@ -540,6 +541,7 @@ async def generate_organization_stream(
                 yield await SSEResponse.send_error(f"AI服务调用失败：{str(ai_error)}")
                 return
             
+            ai_content = content_buffer.getvalue()
             if not ai_content or not ai_content.strip():
                 yield await SSEResponse.send_error("AI服务返回空响应")
                 return
@@ -2,9 +2,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, delete
+from contextlib import aclosing
 from typing import List, AsyncGenerator, Dict, Any
 import json
 
+from app.config import settings
 from app.database import get_db
 from app.models.outline import Outline
 from app.models.project import Project
@@ -31,9 +33,11 @@ from app.services.ai_service import AIService
 from app.services.prompt_service import prompt_service, PromptService
 from app.services.memory_service import memory_service
 from app.services.plot_expansion_service import PlotExpansionService
+from app.services.chapter_numbering import renumber_outline_chapters, shift_chapter_numbers, shift_outline_order
 from app.logger import get_logger
 from app.api.settings import get_user_ai_service
 from app.utils.sse_response import SSEResponse, create_sse_response
+from app.utils.stream_buffer import StreamTextBuffer
 
 router = APIRouter(prefix="/outlines", tags=["大纲管理"])
 logger = get_logger(__name__)
@@ -326,33 +330,19 @@ async def delete_outline(
     
     # 删除大纲
     await db.delete(outline)
+    await db.flush()
     
-    # 重新排序后续的大纲（序号-1）
-    result = await db.execute(
-        select(Outline).where(
-            Outline.project_id == project_id,
-            Outline.order_index > deleted_order
-        )
-    )
-    subsequent_outlines = result.scalars().all()
+    # 重新排序后续的大纲（序号-1，单条UPDATE）
+    await shift_outline_order(db, project_id, deleted_order, -1)
     
-    for o in subsequent_outlines:
-        o.order_index -= 1
-    
-    # 如果是one-to-one模式，还需要重新排序后续章节的chapter_number
     if project.outline_mode == 'one-to-one':
-        chapters_result = await db.execute(
-            select(Chapter).where(
-                Chapter.project_id == project_id,
-                Chapter.chapter_number > deleted_order
-            ).order_by(Chapter.chapter_number)
-        )
-        subsequent_chapters = chapters_result.scalars().all()
-        
-        for ch in subsequent_chapters:
-            ch.chapter_number -= 1
-        
-        logger.info(f"一对一模式：重新排序了 {len(subsequent_chapters)} 个后续章节")
+        # one-to-one模式：后续章节的chapter_number整体-1
+        shifted_count = await shift_chapter_numbers(db, project_id, deleted_order, -1)
+        logger.info(f"一对一模式：重新排序了 {shifted_count} 个后续章节")
+    else:
+        # one-to-many模式：按大纲顺序重排后续大纲的章节序号，消除被删章节留下的空号
+        renumbered_count = await renumber_outline_chapters(db, project_id, from_order_index=deleted_order)
+        logger.info(f"一对多模式：重新排序了 {renumbered_count} 个后续章节")
     
     await db.commit()
     
@@ -574,7 +564,7 @@ async def _generate_new_outline(
     )
     
     # 调用AI流式生成大纲（带字数统计）
-    accumulated_text = ""
+    text_buffer = StreamTextBuffer()
     chunk_count = 0
     
     async for chunk in user_ai_service.generate_text_stream(
@@ -583,12 +573,12 @@ async def _generate_new_outline(
         model=request.model
     ):
         chunk_count += 1
-        accumulated_text += chunk
+        text_buffer.append(chunk)
         
         # 这里是非SSE接口，不需要发送chunk
         # 如果未来需要转SSE，可以在这里yield
     
-    ai_content = accumulated_text
+    ai_content = text_buffer.getvalue()
     ai_response = {"content": ai_content}
     
     # 解析响应
@@ -1060,7 +1050,7 @@ async def _continue_outline(
         outline_data = None
         
         while retry_count <= max_retries:
-            accumulated_text = ""
+            text_buffer = StreamTextBuffer()
             chunk_count = 0
             
             # 第一次使用原始prompt，重试时添加格式强调
@@ -1074,11 +1064,11 @@ async def _continue_outline(
                 model=request.model
             ):
                 chunk_count += 1
-                accumulated_text += chunk
+                text_buffer.append(chunk)
                 
                 # 这里是非SSE接口，不需要发送chunk
             
-            ai_content = accumulated_text
+            ai_content = text_buffer.getvalue()
             ai_response = {"content": ai_content}
             
             # 解析响应
@@ -1430,7 +1420,7 @@ async def new_outline_generator(
         logger.info(f"  model参数: {model_param}")
         
         # ✅ 流式生成（带字数统计和进度）
-        accumulated_text = ""
+        text_buffer = StreamTextBuffer()
         chunk_count = 0
         
         async for chunk in user_ai_service.generate_text_stream(
@@ -1439,7 +1429,7 @@ async def new_outline_generator(
             model=model_param
         ):
             chunk_count += 1
-            accumulated_text += chunk
+            text_buffer.append(chunk)
             
             # 发送内容块
             yield await SSEResponse.send_chunk(chunk)
@@ -1448,7 +1438,7 @@ async def new_outline_generator(
             if chunk_count % 5 == 0:
                 progress = min(30 + (chunk_count // 2), 95)
                 yield await SSEResponse.send_progress(
-                    f"AI生成大纲中... ({len(accumulated_text)}字符)",
+                    f"AI生成大纲中... ({len(text_buffer)}字符)",
                     progress
                 )
             
@@ -1458,7 +1448,7 @@ async def new_outline_generator(
         
         yield await SSEResponse.send_progress("✅ AI生成完成，正在解析...", 96)
         
-        ai_content = accumulated_text
+        ai_content = text_buffer.getvalue()
         ai_response = {"content": ai_content}
         
         # 解析响应（带重试机制）
@@ -1491,7 +1481,7 @@ async def new_outline_generator(
                 )
                 
                 # 重新调用AI生成
-                accumulated_text = ""
+                text_buffer = StreamTextBuffer()
                 chunk_count = 0
                 
                 # 在prompt中添加格式强调
@@ -1503,7 +1493,7 @@ async def new_outline_generator(
                     model=model_param
                 ):
                     chunk_count += 1
-                    accumulated_text += chunk
+                    text_buffer.append(chunk)
                     
                     # 发送内容块
                     yield await SSEResponse.send_chunk(chunk)
@@ -1512,7 +1502,7 @@ async def new_outline_generator(
                     if chunk_count % 20 == 0:
                         yield await SSEResponse.send_heartbeat()
                 
-                ai_content = accumulated_text
+                ai_content = text_buffer.getvalue()
                 ai_response = {"content": ai_content}
                 logger.info(f"🔄 重试生成完成，累计{len(ai_content)}字符")
         
@@ -2006,7 +1996,7 @@ async def continue_outline_generator(
             logger.info(f"  model参数: {model_param}")
             
             # 流式生成并累积文本
-            accumulated_text = ""
+            text_buffer = StreamTextBuffer()
             chunk_count = 0
             
             async for chunk in user_ai_service.generate_text_stream(
@@ -2015,7 +2005,7 @@ async def continue_outline_generator(
                 model=model_param
             ):
                 chunk_count += 1
-                accumulated_text += chunk
+                text_buffer.append(chunk)
                 
                 # 发送内容块
                 yield await SSEResponse.send_chunk(chunk)
@@ -2026,7 +2016,7 @@ async def continue_outline_generator(
                     batch_range = 60 // total_batches  # 总进度60%分配给所有批次
                     progress_in_batch = batch_progress + 5 + min((chunk_count // 2), batch_range - 5)
                     yield await SSEResponse.send_progress(
-                        f"📝 第{str(batch_num + 1)}/{str(total_batches)}批生成中... ({len(accumulated_text)}字符)",
+                        f"📝 第{str(batch_num + 1)}/{str(total_batches)}批生成中... ({len(text_buffer)}字符)",
                         progress_in_batch
                     )
                 
@@ -2040,7 +2030,7 @@ async def continue_outline_generator(
             )
             
             # 提取内容
-            ai_content = accumulated_text
+            ai_content = text_buffer.getvalue()
             ai_response = {"content": ai_content}
             
             # 解析响应（带重试机制）
@@ -2073,7 +2063,7 @@ async def continue_outline_generator(
                     )
                     
                     # 重新调用AI生成
-                    accumulated_text = ""
+                    text_buffer = StreamTextBuffer()
                     chunk_count = 0
                     
                     # 在prompt中添加格式强调
@@ -2085,7 +2075,7 @@ async def continue_outline_generator(
                         model=model_param
                     ):
                         chunk_count += 1
-                        accumulated_text += chunk
+                        text_buffer.append(chunk)
                         
                         # 发送内容块
                         yield await SSEResponse.send_chunk(chunk)
@@ -2094,7 +2084,7 @@ async def continue_outline_generator(
                         if chunk_count % 20 == 0:
                             yield await SSEResponse.send_heartbeat()
                     
-                    ai_content = accumulated_text
+                    ai_content = text_buffer.getvalue()
                     ai_response = {"content": ai_content}
                     logger.info(f"🔄 第{batch_num + 1}批重试生成完成，累计{len(ai_content)}字符")
             
@@ -2684,70 +2674,110 @@ async def batch_expand_outlines_generator(
         total_chapters_created = 0
         skipped_outlines = []
         
-        for idx, outline in enumerate(outlines):
-            try:
-                # 计算当前进度 (20% - 90%)
-                progress = 20 + int((idx / total_outlines) * 70)
-                
-                yield await SSEResponse.send_progress(
-                    f"📝 处理第 {idx + 1}/{total_outlines} 个大纲: {outline.title}",
-                    progress
-                )
-                
-                # 检查大纲是否已经展开过
-                existing_chapters_result = await db.execute(
-                    select(Chapter)
-                    .where(Chapter.outline_id == outline.id)
-                    .limit(1)
-                )
-                existing_chapter = existing_chapters_result.scalar_one_or_none()
+        # 检查大纲是否已经展开过（一次查询）
+        expanded_ids_result = await db.execute(
+            select(Chapter.outline_id)
+            .where(Chapter.outline_id.in_([o.id for o in outlines]))
+            .distinct()
+        )
+        expanded_ids = set(expanded_ids_result.scalars().all())
+        
+        pending_outlines = []
+        for outline in outlines:
+            if outline.id in expanded_ids:
+                logger.info(f"大纲 {outline.title} (ID: {outline.id}) 已经展开过，跳过")
+                skipped_outlines.append({
+                    "outline_id": outline.id,
+                    "outline_title": outline.title,
+                    "reason": "已展开"
+                })
+                yield await SSEResponse.send_progress(f"⏭️ {outline.title} 已展开过，跳过", 20)
+            else:
+                pending_outlines.append(outline)
+        
+        # 并发展开（按完成顺序推送每个大纲的结果），请求的并发数限制在 1 ~ OUTLINE_EXPAND_CONCURRENCY
+        concurrency_limit = settings.outline_expand_concurrency
+        max_concurrency = max(1, min(int(data.get("max_concurrency") or concurrency_limit), concurrency_limit))
+        total_pending = len(pending_outlines)
+        if total_pending:
+            yield await SSEResponse.send_progress(
+                f"🤖 AI并发分析 {total_pending} 个大纲（同时 {min(max_concurrency, total_pending)} 个）",
+                22
+            )
+        
+        results_by_id: Dict[str, Dict[str, Any]] = {}
+        completed = 0
+        async with aclosing(expansion_service.iter_outline_expansions(
+            outlines=pending_outlines,
+            project=project,
+            user_id=project.user_id,
+            target_chapter_count=chapters_per_outline,
+            expansion_strategy=expansion_strategy,
+            enable_scene_analysis=data.get("enable_scene_analysis", True),
+            provider=data.get("provider"),
+            model=data.get("model"),
+            max_concurrency=max_concurrency
+        )) as completions:
+            async for outline, chapter_plans, error in completions:
+                completed += 1
+                # 计算当前进度 (22% - 85%)
+                progress = 22 + int((completed / total_pending) * 63)
                 
-                if existing_chapter:
-                    logger.info(f"大纲 {outline.title} (ID: {outline.id}) 已经展开过，跳过")
-                    skipped_outlines.append({
-                        "outline_id": outline.id,
-                        "outline_title": outline.title,
-                        "reason": "已展开"
-                    })
+                if error is not None:
+                    logger.error(f"展开大纲 {outline.id} 失败: {str(error)}", exc_info=error)
                     yield await SSEResponse.send_progress(
-                        f"⏭️ {outline.title} 已展开过，跳过",
-                        progress + 1
+                        f"❌ [{completed}/{total_pending}] {outline.title} 展开失败: {str(error)}",
+                        progress
                     )
+                    results_by_id[outline.id] = {
+                        "outline_id": outline.id,
+                        "outline_title": outline.title,
+                        "target_chapter_count": chapters_per_outline,
+                        "actual_chapter_count": 0,
+                        "expansion_strategy": expansion_strategy,
+                        "chapter_plans": [],
+                        "created_chapters": None,
+                        "error": str(error)
+                    }
                     continue
                 
-                # 分析大纲生成章节规划
                 yield await SSEResponse.send_progress(
-                    f"🤖 AI分析大纲: {outline.title}",
-                    progress + 2
-                )
-                
-                chapter_plans = await expansion_service.analyze_outline_for_chapters(
-                    outline=outline,
-                    project=project,
-                    db=db,
-                    target_chapter_count=chapters_per_outline,
-                    expansion_strategy=expansion_strategy,
-                    enable_scene_analysis=data.get("enable_scene_analysis", True),
-                    provider=data.get("provider"),
-                    model=data.get("model")
+                    f"✅ [{completed}/{total_pending}] {outline.title} 规划生成完成 ({len(chapter_plans)} 章)",
+                    progress
                 )
-                
+                results_by_id[outline.id] = {
+                    "outline_id": outline.id,
+                    "outline_title": outline.title,
+                    "target_chapter_count": chapters_per_outline,
+                    "actual_chapter_count": len(chapter_plans),
+                    "expansion_strategy": expansion_strategy,
+                    "chapter_plans": chapter_plans,
+                    "created_chapters": None
+                }
+                logger.info(f"大纲 {outline.title} 展开完成，生成 {len(chapter_plans)} 个章节规划")
+        
+        # 结果按大纲顺序整理
+        expansion_results = [results_by_id[o.id] for o in pending_outlines]
+        
+        if auto_create_chapters:
+            # 统一创建章节：按大纲顺序分配章节序号后一次提交
+            to_create = [
+                (outline, results_by_id[outline.id]["chapter_plans"])
+                for outline in pending_outlines
+                if results_by_id[outline.id]["chapter_plans"]
+            ]
+            if to_create:
                 yield await SSEResponse.send_progress(
-                    f"✅ {outline.title} 规划生成完成 ({len(chapter_plans)} 章)",
-                    progress + 3
+                    f"💾 创建 {sum(len(plans) for _, plans in to_create)} 个章节并统一编号...",
+                    88
                 )
-                
-                created_chapters = None
-                if auto_create_chapters:
-                    # 创建章节记录
-                    chapters = await expansion_service.create_chapters_from_plans(
-                        outline_id=outline.id,
-                        chapter_plans=chapter_plans,
-                        project_id=outline.project_id,
-                        db=db,
-                        start_chapter_number=None  # 自动计算章节序号
-                    )
-                    created_chapters = [
+                created = await expansion_service.create_chapters_for_outlines(
+                    expansions=to_create,
+                    project_id=project_id,
+                    db=db
+                )
+                for outline_id, chapters in created.items():
+                    results_by_id[outline_id]["created_chapters"] = [
                         {
                             "id": ch.id,
                             "chapter_number": ch.chapter_number,
@@ -2760,40 +2790,6 @@ async def batch_expand_outlines_generator(
                         for ch in chapters
                     ]
                     total_chapters_created += len(chapters)
-                    
-                    yield await SSEResponse.send_progress(
-                        f"💾 {outline.title} 章节创建完成 ({len(chapters)} 章)",
-                        progress + 4
-                    )
-                
-                expansion_results.append({
-                    "outline_id": outline.id,
-                    "outline_title": outline.title,
-                    "target_chapter_count": chapters_per_outline,
-                    "actual_chapter_count": len(chapter_plans),
-                    "expansion_strategy": expansion_strategy,
-                    "chapter_plans": chapter_plans,
-                    "created_chapters": created_chapters
-                })
-                
-                logger.info(f"大纲 {outline.title} 展开完成，生成 {len(chapter_plans)} 个章节规划")
-                
-            except Exception as e:
-                logger.error(f"展开大纲 {outline.id} 失败: {str(e)}", exc_info=True)
-                yield await SSEResponse.send_progress(
-                    f"❌ {outline.title} 展开失败: {str(e)}",
-                    progress
-                )
-                expansion_results.append({
-                    "outline_id": outline.id,
-                    "outline_title": outline.title,
-                    "target_chapter_count": chapters_per_outline,
-                    "actual_chapter_count": 0,
-                    "expansion_strategy": expansion_strategy,
-                    "chapter_plans": [],
-                    "created_chapters": None,
-                    "error": str(e)
-                })
         
         yield await SSEResponse.send_progress("整理结果数据...", 95)
         
@@ -2857,9 +2853,12 @@ async def batch_expand_outlines_stream(
         "expansion_strategy": "balanced",  // balanced/climax/detail
         "auto_create_chapters": false,  // 是否自动创建章节
         "enable_scene_analysis": true,  // 是否启用场景分析
+        "max_concurrency": 4,  // 可选，同时展开的大纲数，默认且最大为 OUTLINE_EXPAND_CONCURRENCY
         "provider": "openai",  // 可选
         "model": "gpt-4"  // 可选
     }
+    
+    各大纲并发展开，进度按完成顺序推送；自动创建章节时在全部展开后统一编号并一次提交
     """
     # 验证用户权限
     user_id = getattr(request.state, 'user_id', None)
@@ -107,11 +107,12 @@ async def polish_batch(
         
         results = []
         
+        # 获取自定义提示词模板（所有文本共用）
+        template = await PromptService.get_template("AI_DENOISING", user_id, db)
+        
         for idx, text in enumerate(texts):
             logger.info(f"处理第 {idx+1}/{len(texts)} 个文本")
             
-            # 获取自定义提示词模板
-            template = await PromptService.get_template("AI_DENOISING", user_id, db)
             # 格式化提示词
             prompt = PromptService.format_prompt(template, original_text=text)
             
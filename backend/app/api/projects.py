@@ -1,12 +1,13 @@
 """项目管理API"""
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, delete
-from typing import List
-import json
+from typing import List, Optional, Tuple
+import os
+import tempfile
 from urllib.parse import quote
-from app.database import get_db
+from app.database import get_db, get_read_db, session_scope
 from app.models.project import Project
 from app.models.character import Character
 from app.models.outline import Outline
@@ -26,8 +27,18 @@ from app.schemas.import_export import (
     ImportResult
 )
 from app.services.import_export_service import ImportExportService
+from app.services.project_import_service import ProjectImportService
+from app.services.project_export_service import (
+    EXPORT_FORMATS,
+    ProjectExportService,
+    encode_stream,
+    export_filename,
+)
 from app.services.memory_service import memory_service
 from app.logger import get_logger
+from app.config import settings
+from app.utils.json_stream import JSONStreamReader, file_reader
+from app.utils.sse_response import SSEResponse, create_sse_response
 from app.utils.data_consistency import (
     run_full_data_consistency_check,
     fix_missing_organization_records,
@@ -291,15 +302,17 @@ async def delete_project(
         raise
 
 
-@router.get("/{project_id}/export", summary="导出项目章节为TXT")
+@router.get("/{project_id}/export", summary="导出项目章节为TXT/Markdown/EPUB")
 async def export_project_chapters(
     project_id: str,
-    db: AsyncSession = Depends(get_db),
-    request: Request = None
+    db: AsyncSession = Depends(get_read_db),
+    request: Request = None,
+    format: str = Query("txt", description="导出格式: txt / markdown / epub"),
+    gzip: bool = Query(False, description="是否gzip压缩（EPUB已压缩，忽略）")
 ):
     """
-    导出项目的所有章节内容为TXT文本文件
-    按章节顺序组织，包含项目基本信息
+    导出项目的所有章节内容为TXT、Markdown或EPUB文件
+    按章节顺序组织，包含项目基本信息；章节逐批读取并逐章写出，内存占用与作品长度无关
     """
     try:
         # 从认证中间件获取用户ID
@@ -308,7 +321,10 @@ async def export_project_chapters(
             logger.warning("未登录用户尝试导出项目")
             raise HTTPException(status_code=401, detail="未登录")
         
-        logger.info(f"开始导出项目: project_id={project_id}, user_id={user_id}")
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+        
+        logger.info(f"开始导出项目: project_id={project_id}, user_id={user_id}, format={format}")
         
         # 只查询当前用户的项目
         result = await db.execute(
@@ -323,72 +339,35 @@ async def export_project_chapters(
             logger.warning(f"项目不存在或无权访问: project_id={project_id}, user_id={user_id}")
             raise HTTPException(status_code=404, detail="项目不存在")
         
-        chapters_result = await db.execute(
-            select(Chapter)
-            .where(Chapter.project_id == project_id)
-            .order_by(Chapter.chapter_number)
-        )
-        chapters = chapters_result.scalars().all()
+        chapter_count = (await db.execute(
+            select(func.count(Chapter.id)).where(Chapter.project_id == project_id)
+        )).scalar() or 0
         
-        if not chapters:
+        if not chapter_count:
             logger.warning(f"项目没有章节: {project_id}")
             raise HTTPException(status_code=404, detail="项目没有任何章节")
         
-        txt_content = []
-        
-        txt_content.append("=" * 80)
-        txt_content.append(f"项目标题: {project.title}")
-        txt_content.append("=" * 80)
-        
-        if project.description:
-            txt_content.append(f"\n简介: {project.description}\n")
-        
-        if project.theme:
-            txt_content.append(f"主题: {project.theme}")
-        
-        if project.genre:
-            txt_content.append(f"类型: {project.genre}")
-        
-        txt_content.append(f"总章节数: {len(chapters)}")
-        txt_content.append(f"总字数: {project.current_words}")
-        txt_content.append("\n" + "=" * 80 + "\n\n")
-        
-        for chapter in chapters:
-            # 只显示主章节号，不显示子索引
-            txt_content.append(f"第 {chapter.chapter_number} 章  {chapter.title}")
-            txt_content.append("-" * 80)
-            txt_content.append("")  # 空行
-            
-            if chapter.content:
-                txt_content.append(chapter.content)
-            else:
-                txt_content.append("（本章暂无内容）")
-            
-            txt_content.append("\n\n" + "=" * 80 + "\n\n")
-        
-        txt_content.append(f"--- 全文完 ---")
-        
-        # 获取当前时间
-        from datetime import datetime
-        export_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        txt_content.append(f"\n导出时间: {export_time}")
-        
-        final_content = "\n".join(txt_content)
-        
-        safe_title = "".join(c for c in project.title if c.isalnum() or c in (' ', '-', '_', '，', '。', '、'))
-        filename = f"{safe_title}.txt"
+        project_info = {
+            "id": project.id,
+            "title": project.title,
+            "description": project.description,
+            "theme": project.theme,
+            "genre": project.genre,
+            "current_words": project.current_words,
+        }
         
-        from urllib.parse import quote
+        extension, media_type = EXPORT_FORMATS[format]
+        gzip = gzip and format != "epub"
+        filename = export_filename(project.title, extension, gzip=gzip)
         encoded_filename = quote(filename)
         
-        logger.info(f"导出成功: {filename}, 共{len(chapters)}章, {len(final_content)}字符")
+        logger.info(f"导出开始发送: {filename}, 共{chapter_count}章")
         
-        return Response(
-            content=final_content.encode('utf-8'),
-            media_type="text/plain; charset=utf-8",
+        return StreamingResponse(
+            ProjectExportService.stream(user_id, project_info, chapter_count, export_format=format, gzip=gzip),
+            media_type="application/gzip" if gzip else media_type,
             headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
-                "Content-Type": "text/plain; charset=utf-8"
+                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
             }
         )
         
@@ -556,7 +535,7 @@ async def export_project_data(
     project_id: str,
     request: Request,
     options: ExportOptions,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     导出项目完整数据为JSON格式
@@ -590,32 +569,31 @@ async def export_project_data(
             logger.warning(f"项目不存在或无权访问: project_id={project_id}, user_id={user_id}")
             raise HTTPException(status_code=404, detail="项目不存在")
         
-        # 导出数据
-        export_data = await ImportExportService.export_project(
-            project_id=project_id,
-            db=db,
-            include_generation_history=options.include_generation_history,
-            include_writing_styles=options.include_writing_styles
-        )
-        
-        # 转换为JSON
-        json_content = export_data.model_dump_json(indent=2, exclude_none=True, by_alias=True)
-        
         # 生成文件名
         safe_title = "".join(c for c in project.title if c.isalnum() or c in (' ', '-', '_'))
         from datetime import datetime
         date_str = datetime.now().strftime("%Y%m%d")
-        filename = f"project_{safe_title}_{date_str}.json"
+        filename = f"project_{safe_title}_{date_str}.json{'.gz' if options.gzip else ''}"
         encoded_filename = quote(filename)
         
-        logger.info(f"项目数据导出成功: {filename}")
-        
-        return Response(
-            content=json_content.encode('utf-8'),
-            media_type="application/json; charset=utf-8",
+        async def json_body():
+            # 响应发送期间使用独立的只读会话
+            async with session_scope(user_id, read_only=True, name="project_export_data", replica=True) as export_db:
+                pieces = ImportExportService.stream_project_json(
+                    project_id=project_id,
+                    db=export_db,
+                    include_generation_history=options.include_generation_history,
+                    include_writing_styles=options.include_writing_styles
+                )
+                async for data in encode_stream(pieces, gzip=options.gzip):
+                    yield data
+            logger.info(f"项目数据导出成功: {filename}")
+        
+        return StreamingResponse(
+            json_body(),
+            media_type="application/gzip" if options.gzip else "application/json; charset=utf-8",
             headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}",
-                "Content-Type": "application/json; charset=utf-8"
+                "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
             }
         )
         
@@ -626,12 +604,41 @@ async def export_project_data(
         raise HTTPException(status_code=500, detail=f"导出失败: {str(e)}")
 
 
+async def _save_upload(file: UploadFile) -> Tuple[str, int]:
+    """
+    把上传的导入文件分块写入临时文件（不在内存中保留完整内容）
+    
+    Returns:
+        (临时文件路径, 文件大小)
+    """
+    if not file.filename.endswith('.json'):
+        raise HTTPException(status_code=400, detail="只支持JSON格式文件")
+    
+    max_size = settings.import_max_file_mb * 1024 * 1024
+    size = 0
+    tmp = tempfile.NamedTemporaryFile(prefix="project_import_", suffix=".json", delete=False)
+    try:
+        with tmp:
+            while True:
+                chunk = await file.read(1024 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail=f"文件大小超过{settings.import_max_file_mb}MB限制")
+                tmp.write(chunk)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    return tmp.name, size
+
+
 @router.post("/validate-import", response_model=ImportValidationResult, summary="验证导入文件")
 async def validate_import_file(
     file: UploadFile = File(...)
 ):
     """
-    验证导入文件的格式和内容
+    验证导入文件的格式和内容（流式解析，不整体载入文件）
     
     Args:
         file: 上传的JSON文件
@@ -642,26 +649,12 @@ async def validate_import_file(
     try:
         logger.info(f"验证导入文件: {file.filename}")
         
-        # 检查文件类型
-        if not file.filename.endswith('.json'):
-            raise HTTPException(status_code=400, detail="只支持JSON格式文件")
-        
-        # 读取文件内容
-        content = await file.read()
-        
-        # 检查文件大小（50MB限制）
-        max_size = 50 * 1024 * 1024  # 50MB
-        if len(content) > max_size:
-            raise HTTPException(status_code=413, detail="文件大小超过50MB限制")
-        
-        # 解析JSON
+        path, _ = await _save_upload(file)
         try:
-            data = json.loads(content.decode('utf-8'))
-        except json.JSONDecodeError as e:
-            raise HTTPException(status_code=400, detail=f"无效的JSON格式: {str(e)}")
-        
-        # 验证数据
-        validation_result = ImportExportService.validate_import_data(data)
+            with open(path, "rb") as f:
+                validation_result = await ProjectImportService.validate(JSONStreamReader(file_reader(f)))
+        finally:
+            os.unlink(path)
         
         logger.info(f"文件验证完成: valid={validation_result.valid}")
         return validation_result
@@ -677,13 +670,14 @@ async def validate_import_file(
 async def import_project(
     file: UploadFile = File(...),
     request: Request = None,
-    db: AsyncSession = Depends(get_db)
+    resume_project_id: Optional[str] = Query(None, description="续传：上次未完成导入的项目ID")
 ):
     """
     导入项目数据（创建新项目）
     
     Args:
         file: 上传的JSON文件
+        resume_project_id: 上次导入中断时返回的项目ID，传入后跳过已导入的数据继续导入
     
     Returns:
         导入结果
@@ -697,26 +691,13 @@ async def import_project(
         
         logger.info(f"开始导入项目: {file.filename}, user_id={user_id}")
         
-        # 检查文件类型
-        if not file.filename.endswith('.json'):
-            raise HTTPException(status_code=400, detail="只支持JSON格式文件")
-        
-        # 读取文件内容
-        content = await file.read()
-        
-        # 检查文件大小
-        max_size = 50 * 1024 * 1024  # 50MB
-        if len(content) > max_size:
-            raise HTTPException(status_code=413, detail="文件大小超过50MB限制")
-        
-        # 解析JSON
+        path, _ = await _save_upload(file)
         try:
-            data = json.loads(content.decode('utf-8'))
-        except json.JSONDecodeError as e:
-            raise HTTPException(status_code=400, detail=f"无效的JSON格式: {str(e)}")
-        
-        # 导入数据（传入user_id）
-        import_result = await ImportExportService.import_project(data, db, user_id)
+            import_result = None
+            async for event in ProjectImportService.import_file(path, user_id, resume_project_id):
+                import_result = event.get("result", import_result)
+        finally:
+            os.unlink(path)
         
         if import_result.success:
             logger.info(f"项目导入成功: {import_result.project_id}")
@@ -729,4 +710,48 @@ async def import_project(
         raise
     except Exception as e:
         logger.error(f"导入项目失败: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"导入失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"导入失败: {str(e)}")
+
+
+@router.post("/import-stream", summary="导入项目（SSE进度）")
+async def import_project_stream(
+    file: UploadFile = File(...),
+    request: Request = None,
+    resume_project_id: Optional[str] = Query(None, description="续传：上次未完成导入的项目ID")
+):
+    """
+    导入项目数据，通过SSE推送校验与分批写入进度，最后发送导入结果
+    
+    Args:
+        file: 上传的JSON文件
+        resume_project_id: 上次导入中断时返回的项目ID
+    """
+    user_id = getattr(request.state, 'user_id', None)
+    if not user_id:
+        logger.warning("未登录用户尝试导入项目")
+        raise HTTPException(status_code=401, detail="未登录")
+    
+    logger.info(f"开始导入项目(SSE): {file.filename}, user_id={user_id}")
+    
+    # 响应开始后上传文件可能被关闭，先写入临时文件
+    path, _ = await _save_upload(file)
+    
+    async def generate():
+        try:
+            async for event in ProjectImportService.import_file(path, user_id, resume_project_id):
+                if "result" in event:
+                    result = event["result"]
+                    if result.success:
+                        yield await SSEResponse.send_progress("项目导入完成", 100, "success")
+                    yield await SSEResponse.send_result(result.model_dump())
+                else:
+                    yield await SSEResponse.send_progress(event["message"], event["progress"])
+            yield await SSEResponse.send_done()
+        except Exception as e:
+            logger.error(f"导入项目失败: {str(e)}", exc_info=True)
+            yield await SSEResponse.send_error(f"导入失败: {str(e)}")
+        finally:
+            os.unlink(path)
+    
+    return create_sse_response(generate())
+
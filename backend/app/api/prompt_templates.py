@@ -21,6 +21,7 @@ from app.schemas.prompt_template import (
     PromptTemplatePreviewRequest
 )
 from app.services.prompt_service import PromptService
+from app.services.prompt_registry import prompt_template_registry
 from app.logger import get_logger
 
 logger = get_logger(__name__)
@@ -239,6 +240,7 @@ async def create_or_update_template(
         logger.info(f"用户 {user_id} 创建模板 {data.template_key}")
     
     await db.commit()
+    prompt_template_registry.invalidate(user_id)
     await db.refresh(template)
     
     return template
@@ -276,6 +278,7 @@ async def update_template(
         setattr(template, key, value)
     
     await db.commit()
+    prompt_template_registry.invalidate(user_id)
     await db.refresh(template)
     logger.info(f"用户 {user_id} 更新模板 {template_key}")
     
@@ -309,6 +312,7 @@ async def delete_template(
     
     await db.delete(template)
     await db.commit()
+    prompt_template_registry.invalidate(user_id)
     logger.info(f"用户 {user_id} 删除模板 {template_key}")
     
     return {"message": "模板已删除", "template_key": template_key}
@@ -345,6 +349,7 @@ async def reset_to_default(
     if template:
         await db.delete(template)
         await db.commit()
+        prompt_template_registry.invalidate(user_id)
         logger.info(f"用户 {user_id} 删除自定义模板 {template_key}，恢复为系统默认")
         return {"message": "已重置为系统默认", "template_key": template_key}
     else:
@@ -573,6 +578,7 @@ async def import_templates(
             created_or_updated += 1
     
     await db.commit()
+    prompt_template_registry.invalidate(user_id)
     
     statistics = {
         "total": len(data.templates),
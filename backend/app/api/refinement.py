@@ -10,6 +10,8 @@ from app.database import get_db
 from app.models.refinement import ChapterRefinement
 from app.models.chapter import Chapter
 from app.services.refinement_service import ChapterRefinementService
+from app.services.duplicate_detector import refresh_duplicate_index
+from app.services.ai_clients.llm_scheduler import LLMPriority, with_llm_priority
 from app.config import RefinementConfig
 from app.logger import get_logger
 
@@ -71,6 +73,7 @@ class RefinementDiff(BaseModel):
 
 # ==================== 后台任务 ====================
 
+@with_llm_priority(LLMPriority.BATCH)
 async def run_batch_refinement(
     project_id: str,
     start_chapter: int,
@@ -322,6 +325,7 @@ async def rollback_to_original(
     chapter.refinement_id = None
     chapter.refinement_model = None
     
+    await refresh_duplicate_index(chapter, db)
     await db.commit()
     
     return {
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, or_, and_
 from typing import List, Optional
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.relationship import (
     RelationshipType,
     CharacterRelationship,
@@ -61,7 +61,7 @@ async def get_project_relationships(
     project_id: str,
     request: Request,
     character_id: Optional[str] = Query(None, description="筛选特定角色的关系"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     # 验证用户权限
     user_id = getattr(request.state, 'user_id', None)
@@ -97,7 +97,7 @@ async def get_project_relationships(
 async def get_relationship_graph(
     project_id: str,
     request: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     # 验证用户权限
     user_id = getattr(request.state, 'user_id', None)
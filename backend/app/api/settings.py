@@ -56,8 +56,19 @@ async def get_user_ai_service(
     依赖：获取当前用户的AI服务实例
     从数据库读取用户设置并创建对应的AI服务
     """
+    return await load_user_ai_service(user.user_id, db)
+
+
+async def load_user_ai_service(user_id: str, db: AsyncSession) -> AIService:
+    """
+    按用户设置创建AI服务实例（也供任务队列worker在请求上下文之外使用）
+    
+    Args:
+        user_id: 用户ID
+        db: 数据库会话
+    """
     result = await db.execute(
-        select(Settings).where(Settings.user_id == user.user_id)
+        select(Settings).where(Settings.user_id == user_id)
     )
     settings = result.scalar_one_or_none()
     
@@ -65,13 +76,13 @@ async def get_user_ai_service(
         # 如果用户没有设置，从.env读取并保存
         env_defaults = read_env_defaults()
         settings = Settings(
-            user_id=user.user_id,
+            user_id=user_id,
             **env_defaults
         )
         db.add(settings)
         await db.commit()
         await db.refresh(settings)
-        logger.info(f"用户 {user.user_id} 首次使用AI服务，已从.env同步设置到数据库")
+        logger.info(f"用户 {user_id} 首次使用AI服务，已从.env同步设置到数据库")
     
     # 使用用户设置创建AI服务实例（包括系统提示词）
     return create_user_ai_service(
@@ -370,7 +381,8 @@ async def test_api_connection(data: ApiTestRequest):
             provider=provider,
             model=llm_model,
             temperature=0.7,
-            max_tokens=8000
+            max_tokens=8000,
+            use_cache=False
         )
         
         end_time = time.time()
@@ -1,11 +1,14 @@
 """项目创建向导流式API - 使用SSE避免超时"""
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Dict, Any, AsyncGenerator
+from sqlalchemy import select, insert
+from typing import Dict, Any, AsyncGenerator, Awaitable, Callable, List, Optional
+import asyncio
 import json
 import re
+import uuid
 
+from app.config import settings
 from app.database import get_db
 from app.models.project import Project
 from app.models.character import Character
@@ -19,8 +22,10 @@ from app.services.ai_service import AIService
 from app.services.mcp_tool_service import MCPToolService
 from app.services.prompt_service import prompt_service, PromptService
 from app.services.plot_expansion_service import PlotExpansionService
+from app.services.world_snapshot import world_snapshot_cache
 from app.logger import get_logger
 from app.utils.sse_response import SSEResponse, create_sse_response
+from app.utils.stream_buffer import StreamTextBuffer
 from app.api.settings import get_user_ai_service
 
 router = APIRouter(prefix="/wizard-stream", tags=["项目创建向导(流式)"])
@@ -150,17 +155,14 @@ async def world_building_generator(
                 retry_suffix = f" (重试{world_retry_count}/{MAX_WORLD_RETRIES})" if world_retry_count > 0 else ""
                 yield await SSEResponse.send_progress(f"生成世界观{retry_suffix}...", 10 + world_retry_count * 5)
                 
-                # 流式生成世界观
-                accumulated_text = ""
+                # 流式生成世界观（相同输入的重试直接使用缓存结果）
+                text_buffer = StreamTextBuffer()
                 chunk_count = 0
+                world_request = dict(prompt=final_prompt, provider=provider, model=model)
                 
-                async for chunk in user_ai_service.generate_text_stream(
-                    prompt=final_prompt,
-                    provider=provider,
-                    model=model
-                ):
+                async for chunk in user_ai_service.generate_text_stream(**world_request, use_cache=True):
                     chunk_count += 1
-                    accumulated_text += chunk
+                    text_buffer.append(chunk)
                     
                     # 发送内容块
                     yield await SSEResponse.send_chunk(chunk)
@@ -168,11 +170,12 @@ async def world_building_generator(
                     # 世界观生成独立进度：5-95%
                     if chunk_count % 5 == 0:
                         progress = min(5 + (chunk_count // 3), 95)
-                        yield await SSEResponse.send_progress(f"世界观生成中... ({len(accumulated_text)}字符)", progress)
+                        yield await SSEResponse.send_progress(f"世界观生成中... ({len(text_buffer)}字符)", progress)
                     
                     # 每20个块发送心跳
                     if chunk_count % 20 == 0:
                         yield await SSEResponse.send_heartbeat()
+                accumulated_text = text_buffer.getvalue()
                 
                 # 检查是否返回空响应
                 if not accumulated_text or not accumulated_text.strip():
@@ -214,6 +217,7 @@ async def world_building_generator(
                     world_generation_success = True  # 解析成功，标记完成
                             
                 except json.JSONDecodeError as e:
+                    await user_ai_service.discard_cached_response(**world_request)
                     logger.error(f"❌ 世界构建JSON解析失败（尝试{world_retry_count+1}/{MAX_WORLD_RETRIES}）: {e}")
                     logger.error(f"   原始内容长度: {len(accumulated_text)}")
                     logger.error(f"   原始内容预览: {accumulated_text[:200]}")
@@ -334,17 +338,14 @@ async def world_building_generator(
                     rules=world_data.get('rules', '未设定')
                 )
                 
-                # ✅ 使用流式生成职业体系
-                career_response = ""
+                # ✅ 使用流式生成职业体系（相同输入的重试直接使用缓存结果）
+                text_buffer = StreamTextBuffer()
                 chunk_count = 0
+                career_request = dict(prompt=career_prompt, provider=provider, model=model)
                 
-                async for chunk in user_ai_service.generate_text_stream(
-                    prompt=career_prompt,
-                    provider=provider,
-                    model=model
-                ):
+                async for chunk in user_ai_service.generate_text_stream(**career_request, use_cache=True):
                     chunk_count += 1
-                    career_response += chunk
+                    text_buffer.append(chunk)
                     
                     # 发送内容块
                     yield await SSEResponse.send_chunk(chunk)
@@ -353,13 +354,14 @@ async def world_building_generator(
                     if chunk_count % 5 == 0:
                         progress = min(10 + (chunk_count // 3), 95)
                         yield await SSEResponse.send_progress(
-                            f"生成职业体系中... ({len(career_response)}字符)",
+                            f"生成职业体系中... ({len(text_buffer)}字符)",
                             progress
                         )
                     
                     # 每20个块发送心跳
                     if chunk_count % 20 == 0:
                         yield await SSEResponse.send_heartbeat()
+                career_response = text_buffer.getvalue()
                 
                 if not career_response or not career_response.strip():
                     logger.warning(f"⚠️ AI返回空职业体系（尝试{career_retry_count+1}/{MAX_CAREER_RETRIES}）")
@@ -454,6 +456,7 @@ async def world_building_generator(
                     )
                     
                 except json.JSONDecodeError as e:
+                    await user_ai_service.discard_cached_response(**career_request)
                     logger.error(f"❌ 职业体系JSON解析失败（尝试{career_retry_count+1}/{MAX_CAREER_RETRIES}）: {e}")
                     career_retry_count += 1
                     if career_retry_count < MAX_CAREER_RETRIES:
@@ -539,12 +542,157 @@ async def generate_world_building_stream(
     return create_sse_response(world_building_generator(data, db, user_ai_service))
 
 
+# 向导角色生成：每批生成的角色数与单批最大重试次数
+CHARACTER_BATCH_SIZE = 3
+CHARACTER_BATCH_MAX_RETRIES = 3
+
+
+def _character_batch_requirements(
+    requirements: str,
+    batch_idx: int,
+    total_batches: int,
+    batch_size: int,
+    known_characters: List[Dict[str, Any]]
+) -> str:
+    """
+    构建单批角色的生成要求
+    
+    各批次并发生成，按批次序号分工（首批主角与核心配角、中间批配角与反派、末批可含组织），
+    并附上已知角色（项目已有角色与已完成批次的角色）作为去重名单
+    """
+    if batch_idx == 0:
+        if batch_size == 1:
+            batch_requirements = f"{requirements}\n请生成1个主角(protagonist)"
+        else:
+            batch_requirements = f"{requirements}\n请精确生成{batch_size}个角色:1个主角(protagonist)和{batch_size-1}个核心配角(supporting)"
+    else:
+        batch_requirements = f"{requirements}\n请精确生成{batch_size}个角色"
+        if batch_idx == total_batches - 1:
+            batch_requirements += "\n可以包含组织或反派(antagonist)"
+        else:
+            batch_requirements += "\n主要是配角(supporting)和反派(antagonist)，不要生成主角"
+    
+    if known_characters:
+        batch_requirements += "\n\n【已生成的角色】:\n"
+        for char in known_characters:
+            batch_requirements += f"- {char.get('name')}: {char.get('role_type', '未知')}, {(char.get('personality') or '暂无')[:50]}...\n"
+        batch_requirements += "\n新角色不得与上述角色重名，并与已有角色形成合理的关系网络和互动。\n"
+    return batch_requirements
+
+
+async def _generate_character_batch(
+    user_ai_service: AIService,
+    template: str,
+    batch_idx: int,
+    total_batches: int,
+    batch_size: int,
+    known_characters: Callable[[], List[Dict[str, Any]]],
+    report: Callable[[str, str], Awaitable[None]],
+    prompt_fields: Dict[str, Any],
+    character_reference_materials: str,
+    provider: Optional[str],
+    model: Optional[str]
+) -> List[Dict[str, Any]]:
+    """
+    生成一批角色（带重试）
+    
+    每次尝试前重新读取已知角色作为去重名单；生成数量不符或与已知角色重名时重试。
+    最后一次尝试仍重名时丢弃重名角色。
+    
+    Args:
+        known_characters: 返回当前已知角色的函数（其他批次完成后会增加）
+        report: 进度回调 (消息, 状态)
+        prompt_fields: CHARACTERS_BATCH_GENERATION 模板的其余字段（不含 count/requirements）
+    
+    Raises:
+        ValueError: 重试后仍然失败
+    """
+    last_error = ""
+    for attempt in range(CHARACTER_BATCH_MAX_RETRIES):
+        batch_request = None
+        try:
+            retry_suffix = f" (重试{attempt}/{CHARACTER_BATCH_MAX_RETRIES})" if attempt > 0 else ""
+            await report(f"生成第{batch_idx+1}/{total_batches}批角色 ({batch_size}个){retry_suffix}...", "processing")
+            
+            known = known_characters()
+            base_prompt = PromptService.format_prompt(
+                template,
+                count=batch_size,  # 传递精确数量
+                requirements=_character_batch_requirements(
+                    prompt_fields["requirements"], batch_idx, total_batches, batch_size, known
+                ) + prompt_fields["careers_context"],  # 添加职业上下文
+                **{k: v for k, v in prompt_fields.items() if k not in ("requirements", "careers_context")}
+            )
+            
+            # 如果有MCP参考资料，增强提示词
+            if character_reference_materials:
+                prompt = f"""{base_prompt}
+
+【参考资料】
+以下是通过MCP工具收集的真实背景资料，请参考这些信息设计更真实的角色：
+
+{character_reference_materials}
+
+请结合上述资料，设计符合历史/文化背景的角色。"""
+            else:
+                prompt = base_prompt
+            
+            text_buffer = StreamTextBuffer()
+            batch_request = dict(prompt=prompt, provider=provider, model=model)
+            async for chunk in user_ai_service.generate_text_stream(**batch_request, use_cache=True):
+                text_buffer.append(chunk)
+            
+            # 解析批次结果 - 使用统一的JSON清洗方法
+            cleaned_text = user_ai_service._clean_json_response(text_buffer.getvalue())
+            characters_data = json.loads(cleaned_text)
+            if not isinstance(characters_data, list):
+                characters_data = [characters_data]
+            
+            # 严格验证生成数量是否精确匹配
+            if len(characters_data) != batch_size:
+                raise ValueError(f"批次{batch_idx+1}生成数量不正确: 期望{batch_size}个, 实际{len(characters_data)}个")
+            
+            # 与已知角色（或本批内）重名
+            taken = {c.get("name") for c in known_characters()}
+            unique = []
+            for char_data in characters_data:
+                name = char_data.get("name")
+                if name and name in taken:
+                    continue
+                taken.add(name)
+                unique.append(char_data)
+            if len(unique) != len(characters_data):
+                duplicated = [c.get("name") for c in characters_data if c not in unique]
+                if attempt < CHARACTER_BATCH_MAX_RETRIES - 1:
+                    raise ValueError(f"批次{batch_idx+1}存在重名角色: {duplicated}")
+                logger.warning(f"⚠️ 批次{batch_idx+1}重试后仍有重名角色，已丢弃: {duplicated}")
+            
+            return unique
+            
+        except json.JSONDecodeError as e:
+            await user_ai_service.discard_cached_response(**batch_request)
+            logger.error(f"批次{batch_idx+1}解析失败(尝试{attempt+1}/{CHARACTER_BATCH_MAX_RETRIES}): {e}")
+            last_error = f"JSON解析失败: {str(e)}"
+            if attempt < CHARACTER_BATCH_MAX_RETRIES - 1:
+                await report(f"批次{batch_idx+1}解析失败，准备重试...", "warning")
+        except Exception as e:
+            # 数量不符、重名等校验失败的结果不能留在缓存中，否则重试会取到同一结果
+            if batch_request is not None:
+                await user_ai_service.discard_cached_response(**batch_request)
+            logger.error(f"批次{batch_idx+1}生成异常(尝试{attempt+1}/{CHARACTER_BATCH_MAX_RETRIES}): {e}")
+            last_error = str(e)
+            if attempt < CHARACTER_BATCH_MAX_RETRIES - 1:
+                await report(f"⚠️ {last_error}，准备重试...", "warning")
+    
+    raise ValueError(f"批次{batch_idx+1}在{CHARACTER_BATCH_MAX_RETRIES}次重试后仍然失败: {last_error}")
+
+
 async def characters_generator(
     data: Dict[str, Any],
     db: AsyncSession,
     user_ai_service: AIService
 ) -> AsyncGenerator[str, None]:
-    """角色批量生成流式生成器 - 优化版:分批+重试+MCP工具增强"""
+    """角色批量生成流式生成器 - 优化版:并发分批+去重重试+批量写入+MCP工具增强"""
     db_committed = False
     try:
         yield await SSEResponse.send_progress("开始生成角色...", 5)
@@ -636,10 +784,8 @@ async def characters_generator(
         
         # 获取项目的职业列表，用于角色职业分配
         yield await SSEResponse.send_progress("加载职业体系...", 13)
-        career_result = await db.execute(
-            select(Career).where(Career.project_id == project_id).order_by(Career.type, Career.id)
-        )
-        careers = career_result.scalars().all()
+        snapshot = await world_snapshot_cache.get(db, project_id)
+        careers = snapshot.careers
         
         main_careers = [c for c in careers if c.type == "main"]
         sub_careers = [c for c in careers if c.type == "sub"]
@@ -668,171 +814,76 @@ async def characters_generator(
         else:
             logger.warning("⚠️ 项目没有职业体系，跳过职业分配")
         
-        # 优化的分批策略:每批生成3个,平衡效率和成功率
-        BATCH_SIZE = 3  # 每批生成3个角色
-        MAX_RETRIES = 3  # 每批最多重试3次
-        all_characters = []
-        total_batches = (count + BATCH_SIZE - 1) // BATCH_SIZE
+        # 各批次并发生成（每批3个），按批次序号分工；每次尝试都以项目已有角色和已完成批次的角色作为去重名单
+        total_batches = (count + CHARACTER_BATCH_SIZE - 1) // CHARACTER_BATCH_SIZE
+        existing_characters = [
+            {"name": c.name, "role_type": c.role_type, "personality": c.personality}
+            for c in snapshot.characters
+        ]
+        batch_results: Dict[int, List[Dict[str, Any]]] = {}
+        
+        def known_characters() -> List[Dict[str, Any]]:
+            return existing_characters + [c for idx in sorted(batch_results) for c in batch_results[idx]]
+        
+        # 获取自定义提示词模板（各批次共用，批次任务不使用数据库会话）
+        template = await PromptService.get_template("CHARACTERS_BATCH_GENERATION", user_id, db)
+        prompt_fields = {
+            "time_period": world_context.get("time_period", ""),
+            "location": world_context.get("location", ""),
+            "atmosphere": world_context.get("atmosphere", ""),
+            "rules": world_context.get("rules", ""),
+            "theme": theme or project.theme or "",
+            "genre": genre or project.genre or "",
+            "requirements": requirements,
+            "careers_context": careers_context,
+        }
         
-        for batch_idx in range(total_batches):
-            # 精确计算当前批次应该生成的数量
-            remaining = count - len(all_characters)
-            current_batch_size = min(BATCH_SIZE, remaining)
-            
-            # 如果已经达到目标数量,直接退出
-            if current_batch_size <= 0:
-                logger.info(f"已生成{len(all_characters)}个角色,达到目标数量{count}")
-                break
-            
-            batch_progress = 15 + (batch_idx * 60 // total_batches)
-            
-            # 重试逻辑
-            retry_count = 0
-            batch_success = False
-            batch_error_message = ""
-            
-            while retry_count < MAX_RETRIES and not batch_success:
-                try:
-                    retry_suffix = f" (重试{retry_count}/{MAX_RETRIES})" if retry_count > 0 else ""
-                    yield await SSEResponse.send_progress(
-                        f"生成第{batch_idx+1}/{total_batches}批角色 ({current_batch_size}个){retry_suffix}...",
-                        batch_progress
+        events: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(max(1, settings.wizard_character_concurrency))
+        
+        async def report(message: str, status: str):
+            await events.put(("progress", message, status))
+        
+        async def run_batch(batch_idx: int):
+            batch_size = min(CHARACTER_BATCH_SIZE, count - batch_idx * CHARACTER_BATCH_SIZE)
+            try:
+                async with semaphore:
+                    batch_results[batch_idx] = await _generate_character_batch(
+                        user_ai_service, template, batch_idx, total_batches, batch_size,
+                        known_characters, report, prompt_fields, character_reference_materials,
+                        provider, model
                     )
-                    
-                    # 构建批次要求 - 包含已生成角色信息保持连贯
-                    existing_chars_context = ""
-                    if all_characters:
-                        existing_chars_context = "\n\n【已生成的角色】:\n"
-                        for char in all_characters:
-                            existing_chars_context += f"- {char.get('name')}: {char.get('role_type', '未知')}, {char.get('personality', '暂无')[:50]}...\n"
-                        existing_chars_context += "\n请确保新角色与已有角色形成合理的关系网络和互动。\n"
-                    
-                    # 构建精确的批次要求,明确告诉AI要生成的数量
-                    if batch_idx == 0:
-                        if current_batch_size == 1:
-                            batch_requirements = f"{requirements}\n请生成1个主角(protagonist)"
-                        else:
-                            batch_requirements = f"{requirements}\n请精确生成{current_batch_size}个角色:1个主角(protagonist)和{current_batch_size-1}个核心配角(supporting)"
-                    else:
-                        batch_requirements = f"{requirements}\n请精确生成{current_batch_size}个角色{existing_chars_context}"
-                        if batch_idx == total_batches - 1:
-                            batch_requirements += "\n可以包含组织或反派(antagonist)"
-                        else:
-                            batch_requirements += "\n主要是配角(supporting)和反派(antagonist)"
-                    
-                    # 获取自定义提示词模板
-                    template = await PromptService.get_template("CHARACTERS_BATCH_GENERATION", user_id, db)
-                    # 构建基础提示词
-                    base_prompt = PromptService.format_prompt(
-                        template,
-                        count=current_batch_size,  # 传递精确数量
-                        time_period=world_context.get("time_period", ""),
-                        location=world_context.get("location", ""),
-                        atmosphere=world_context.get("atmosphere", ""),
-                        rules=world_context.get("rules", ""),
-                        theme=theme or project.theme or "",
-                        genre=genre or project.genre or "",
-                        requirements=batch_requirements + careers_context  # 添加职业上下文
+                await events.put(("done", batch_idx, None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await events.put(("failed", batch_idx, str(e)))
+        
+        tasks = [asyncio.create_task(run_batch(batch_idx)) for batch_idx in range(total_batches)]
+        try:
+            finished = 0
+            while finished < total_batches:
+                kind, payload, detail = await events.get()
+                progress = 15 + finished * 65 // total_batches
+                if kind == "progress":
+                    yield await SSEResponse.send_progress(payload, progress, detail)
+                elif kind == "done":
+                    finished += 1
+                    logger.info(f"批次{payload+1}成功生成{len(batch_results[payload])}个角色 [{finished}/{total_batches}]")
+                    yield await SSEResponse.send_progress(
+                        f"✅ 第{payload+1}批角色完成 ({len(batch_results[payload])}个) [{finished}/{total_batches}]",
+                        15 + finished * 65 // total_batches
                     )
-                    
-                    # 如果有MCP参考资料，增强提示词
-                    if character_reference_materials:
-                        prompt = f"""{base_prompt}
-
-【参考资料】
-以下是通过MCP工具收集的真实背景资料，请参考这些信息设计更真实的角色：
-
-{character_reference_materials}
-
-请结合上述资料，设计符合历史/文化背景的角色。"""
-                    else:
-                        prompt = base_prompt
-                    
-                    # 流式生成（带字数统计）
-                    accumulated_text = ""
-                    chunk_count = 0
-                    
-                    async for chunk in user_ai_service.generate_text_stream(
-                        prompt=prompt,
-                        provider=provider,
-                        model=model
-                    ):
-                        chunk_count += 1
-                        accumulated_text += chunk
-                        
-                        # 发送内容块
-                        yield await SSEResponse.send_chunk(chunk)
-                        
-                        # 定期更新进度和字数
-                        if chunk_count % 5 == 0:
-                            progress = min(batch_progress + 5 + (chunk_count // 10), batch_progress + 15)
-                            yield await SSEResponse.send_progress(
-                                f"生成角色中... ({len(accumulated_text)}字符)",
-                                progress
-                            )
-                        
-                        # 每20个块发送心跳
-                        if chunk_count % 20 == 0:
-                            yield await SSEResponse.send_heartbeat()
-                    
-                    # 解析批次结果 - 使用统一的JSON清洗方法
-                    cleaned_text = user_ai_service._clean_json_response(accumulated_text)
-                    characters_data = json.loads(cleaned_text)
-                    if not isinstance(characters_data, list):
-                        characters_data = [characters_data]
-                    
-                    # 严格验证生成数量是否精确匹配
-                    if len(characters_data) != current_batch_size:
-                        error_msg = f"批次{batch_idx+1}生成数量不正确: 期望{current_batch_size}个, 实际{len(characters_data)}个"
-                        logger.error(error_msg)
-                        
-                        # 如果还有重试机会，继续重试
-                        if retry_count < MAX_RETRIES - 1:
-                            retry_count += 1
-                            yield await SSEResponse.send_progress(
-                                f"⚠️ {error_msg}，准备重试...",
-                                batch_progress,
-                                "warning"
-                            )
-                            continue
-                        else:
-                            # 最后一次重试仍失败，直接返回错误
-                            yield await SSEResponse.send_error(error_msg)
-                            return
-                    
-                    all_characters.extend(characters_data)
-                    batch_success = True
-                    logger.info(f"批次{batch_idx+1}成功添加{len(characters_data)}个角色,当前总数{len(all_characters)}/{count}")
-                    
-                except json.JSONDecodeError as e:
-                    logger.error(f"批次{batch_idx+1}解析失败(尝试{retry_count+1}/{MAX_RETRIES}): {e}")
-                    batch_error_message = f"JSON解析失败: {str(e)}"
-                    retry_count += 1
-                    if retry_count < MAX_RETRIES:
-                        yield await SSEResponse.send_progress(
-                            f"解析失败，准备重试...",
-                            batch_progress,
-                            "warning"
-                        )
-                except Exception as e:
-                    logger.error(f"批次{batch_idx+1}生成异常(尝试{retry_count+1}/{MAX_RETRIES}): {e}")
-                    batch_error_message = f"生成异常: {str(e)}"
-                    retry_count += 1
-                    if retry_count < MAX_RETRIES:
-                        yield await SSEResponse.send_progress(
-                            f"生成异常，准备重试...",
-                            batch_progress,
-                            "warning"
-                        )
-            
-            # 检查批次是否成功
-            if not batch_success:
-                error_msg = f"批次{batch_idx+1}在{MAX_RETRIES}次重试后仍然失败"
-                if batch_error_message:
-                    error_msg += f": {batch_error_message}"
-                logger.error(error_msg)
-                yield await SSEResponse.send_error(error_msg)
-                return
+                else:
+                    logger.error(detail)
+                    yield await SSEResponse.send_error(detail)
+                    return
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        all_characters = [c for batch_idx in range(total_batches) for c in batch_results[batch_idx]]
         
         # 保存到数据库 - 分阶段处理以保证一致性
         yield await SSEResponse.send_progress("验证角色数据...", 82)
@@ -883,11 +934,44 @@ async def characters_generator(
         
         yield await SSEResponse.send_progress("保存角色到数据库...", 85)
         
-        # 第一阶段：创建所有Character记录
+        # 第一阶段：预先分配ID，建立名称到角色ID、组织ID的映射（批次间已去重，名称唯一）
+        entries = [(str(uuid.uuid4()), char_data) for char_data in all_characters]
+        character_name_to_id = {}
+        organization_name_to_id = {}
+        organization_rows = []
+        for char_id, char_data in entries:
+            name = char_data.get("name", "未命名角色")
+            if name in character_name_to_id:
+                continue
+            character_name_to_id[name] = char_id
+            if char_data.get("is_organization", False):
+                org_id = str(uuid.uuid4())
+                organization_name_to_id[name] = org_id
+                organization_rows.append({
+                    "id": org_id,
+                    "character_id": char_id,
+                    "project_id": project_id,
+                    "member_count": 0,
+                    "power_level": char_data.get("power_level", 50),
+                    "location": char_data.get("location"),
+                    "motto": char_data.get("motto"),
+                    "color": char_data.get("color")
+                })
+        
+        # 预定义关系类型一次加载（同名取第一个）
+        relationship_type_ids = {}
+        for type_id, type_name in (await db.execute(select(RelationshipType.id, RelationshipType.name))).all():
+            relationship_type_ids.setdefault(type_name, type_id)
+        career_name_to_obj = {c.name: c for c in careers}
+        
+        # 第二阶段：一次遍历构建角色对象及职业关联、角色关系、组织成员的行
         created_characters = []
-        character_name_to_obj = {}  # 名称到对象的映射，用于后续关系创建
+        career_rows = []
+        relationship_rows = {}  # (from_id, to_id) -> 行，避免重复关系
+        member_rows = {}  # (organization_id, character_id) -> 行
+        member_counts = {}
         
-        for char_data in all_characters:
+        for char_id, char_data in entries:
             # 从relationships_array提取文本描述以保持向后兼容
             relationships_text = ""
             relationships_array = char_data.get("relationships_array", [])
@@ -910,6 +994,7 @@ async def characters_generator(
             is_organization = char_data.get("is_organization", False)
             
             character = Character(
+                id=char_id,
                 project_id=project_id,
                 name=char_data.get("name", "未命名角色"),
                 age=str(char_data.get("age", "")) if not is_organization else None,
@@ -925,274 +1010,128 @@ async def characters_generator(
                 organization_members=json.dumps(char_data.get("organization_members", []), ensure_ascii=False) if is_organization else None,
                 traits=json.dumps(char_data.get("traits", []), ensure_ascii=False) if char_data.get("traits") else None
             )
-            db.add(character)
-            created_characters.append((character, char_data))
-        
-        await db.flush()  # 获取所有角色的ID
-        
-        # 第二阶段：为角色分配职业并创建CharacterCareer关联
-        if main_careers or sub_careers:
-            yield await SSEResponse.send_progress("分配角色职业...", 86)
-            careers_assigned = 0
+            created_characters.append(character)
             
-            # 构建职业名称到对象的映射
-            career_name_to_obj = {c.name: c for c in careers}
+            # 组织实体不分配职业，也不处理角色关系和成员关系（组织通过成员关系关联）
+            if is_organization:
+                continue
             
-            for character, char_data in created_characters:
-                # 跳过组织
-                if character.is_organization:
-                    continue
-                
+            # 分配职业：CharacterCareer关联行 + Character冗余字段
+            if career_name_to_obj:
                 try:
-                    career_assignment = char_data.get("career_assignment", {})
+                    career_assignment = char_data.get("career_assignment") or {}
                     
-                    # 分配主职业
                     main_career_name = career_assignment.get("main_career")
-                    main_career_stage = career_assignment.get("main_stage", 1)
-                    
-                    if main_career_name and main_career_name in career_name_to_obj:
-                        main_career = career_name_to_obj[main_career_name]
-                        
-                        # 创建CharacterCareer关联
-                        char_career = CharacterCareer(
-                            character_id=character.id,
-                            career_id=main_career.id,
-                            career_type="main",
-                            current_stage=min(main_career_stage, main_career.max_stage),
-                            stage_progress=0
-                        )
-                        db.add(char_career)
-                        
-                        # 更新Character冗余字段
+                    main_career = career_name_to_obj.get(main_career_name) if main_career_name else None
+                    if main_career:
+                        stage = min(career_assignment.get("main_stage", 1), main_career.max_stage)
+                        career_rows.append({
+                            "character_id": char_id,
+                            "career_id": main_career.id,
+                            "career_type": "main",
+                            "current_stage": stage,
+                            "stage_progress": 0
+                        })
                         character.main_career_id = main_career.id
-                        character.main_career_stage = char_career.current_stage
-                        
-                        careers_assigned += 1
-                        logger.info(f"  ✅ 分配主职业：{character.name} -> {main_career.name} (阶段{char_career.current_stage})")
-                    else:
-                        if main_career_name:
-                            logger.warning(f"  ⚠️ 主职业不存在：{character.name} -> {main_career_name}")
+                        character.main_career_stage = stage
+                    elif main_career_name:
+                        logger.warning(f"  ⚠️ 主职业不存在：{character.name} -> {main_career_name}")
                     
-                    # 分配副职业
-                    sub_career_assignments = career_assignment.get("sub_careers", [])
                     sub_career_list = []
-                    
-                    for sub_assign in sub_career_assignments[:2]:  # 最多2个副职业
+                    for sub_assign in career_assignment.get("sub_careers", [])[:2]:  # 最多2个副职业
                         sub_career_name = sub_assign.get("career")
-                        sub_career_stage = sub_assign.get("stage", 1)
-                        
-                        if sub_career_name and sub_career_name in career_name_to_obj:
-                            sub_career = career_name_to_obj[sub_career_name]
-                            
-                            # 创建CharacterCareer关联
-                            char_career = CharacterCareer(
-                                character_id=character.id,
-                                career_id=sub_career.id,
-                                career_type="sub",
-                                current_stage=min(sub_career_stage, sub_career.max_stage),
-                                stage_progress=0
-                            )
-                            db.add(char_career)
-                            
-                            # 添加到副职业列表
-                            sub_career_list.append({
+                        sub_career = career_name_to_obj.get(sub_career_name) if sub_career_name else None
+                        if sub_career:
+                            stage = min(sub_assign.get("stage", 1), sub_career.max_stage)
+                            career_rows.append({
+                                "character_id": char_id,
                                 "career_id": sub_career.id,
-                                "stage": char_career.current_stage
+                                "career_type": "sub",
+                                "current_stage": stage,
+                                "stage_progress": 0
                             })
-                            
-                            careers_assigned += 1
-                            logger.info(f"  ✅ 分配副职业：{character.name} -> {sub_career.name} (阶段{char_career.current_stage})")
-                        else:
-                            if sub_career_name:
-                                logger.warning(f"  ⚠️ 副职业不存在：{character.name} -> {sub_career_name}")
+                            sub_career_list.append({"career_id": sub_career.id, "stage": stage})
+                        elif sub_career_name:
+                            logger.warning(f"  ⚠️ 副职业不存在：{character.name} -> {sub_career_name}")
                     
-                    # 更新Character冗余字段
                     if sub_career_list:
                         character.sub_careers = json.dumps(sub_career_list, ensure_ascii=False)
-                    
                 except Exception as e:
                     logger.warning(f"  ❌ 分配职业失败：{character.name} - {str(e)}")
-                    continue
             
-            await db.flush()
-            logger.info(f"💼 职业分配完成：共分配{careers_assigned}个职业")
-            yield await SSEResponse.send_progress(f"已分配{careers_assigned}个职业", 87)
-        
-        # 刷新并建立名称映射
-        for character, _ in created_characters:
-            await db.refresh(character)
-            character_name_to_obj[character.name] = character
-            logger.info(f"向导创建角色：{character.name} (ID: {character.id}, 是否组织: {character.is_organization})")
-        
-        # 第三阶段：为is_organization=True的角色创建Organization记录
-        yield await SSEResponse.send_progress("创建组织记录...", 88)
-        organization_name_to_obj = {}  # 组织名称到Organization对象的映射
-        
-        for character, char_data in created_characters:
-            if character.is_organization:
-                # 检查是否已存在Organization记录
-                org_check = await db.execute(
-                    select(Organization).where(Organization.character_id == character.id)
-                )
-                existing_org = org_check.scalar_one_or_none()
-                
-                if not existing_org:
-                    # 创建Organization记录
-                    org = Organization(
-                        character_id=character.id,
-                        project_id=project_id,
-                        member_count=0,  # 初始为0，后续添加成员时会更新
-                        power_level=char_data.get("power_level", 50),
-                        location=char_data.get("location"),
-                        motto=char_data.get("motto"),
-                        color=char_data.get("color")
-                    )
-                    db.add(org)
-                    logger.info(f"向导创建组织记录：{character.name}")
-                else:
-                    org = existing_org
-                
-                # 建立组织名称映射（无论是新建还是已存在）
-                organization_name_to_obj[character.name] = org
-        
-        await db.flush()  # 确保Organization记录有ID
-        
-        # 刷新角色以获取ID
-        for character, _ in created_characters:
-            await db.refresh(character)
-        
-        # 第四阶段：创建角色间的关系
-        yield await SSEResponse.send_progress("创建角色关系...", 91)
-        relationships_created = 0
-        
-        for character, char_data in created_characters:
-            # 跳过组织实体的角色关系处理（组织通过成员关系关联）
-            if character.is_organization:
-                continue
-            
-            # 处理relationships数组
+            # 角色关系：目标名称解析为ID
             relationships_data = char_data.get("relationships_array", [])
             if not relationships_data and isinstance(char_data.get("relationships"), list):
                 relationships_data = char_data.get("relationships")
-            
-            if relationships_data and isinstance(relationships_data, list):
+            if isinstance(relationships_data, list):
                 for rel in relationships_data:
-                    try:
-                        target_name = rel.get("target_character_name")
-                        if not target_name:
-                            logger.debug(f"  ⚠️  {character.name}的关系缺少target_character_name，跳过")
-                            continue
-                        
-                        # 使用名称映射快速查找
-                        target_char = character_name_to_obj.get(target_name)
-                        
-                        if target_char:
-                            # 避免创建重复关系
-                            existing_rel = await db.execute(
-                                select(CharacterRelationship).where(
-                                    CharacterRelationship.project_id == project_id,
-                                    CharacterRelationship.character_from_id == character.id,
-                                    CharacterRelationship.character_to_id == target_char.id
-                                )
-                            )
-                            if existing_rel.scalar_one_or_none():
-                                logger.debug(f"  ℹ️  关系已存在：{character.name} -> {target_name}")
-                                continue
-                            
-                            relationship = CharacterRelationship(
-                                project_id=project_id,
-                                character_from_id=character.id,
-                                character_to_id=target_char.id,
-                                relationship_name=rel.get("relationship_type", "未知关系"),
-                                intimacy_level=rel.get("intimacy_level", 50),
-                                description=rel.get("description", ""),
-                                started_at=rel.get("started_at"),
-                                source="ai"
-                            )
-                            
-                            # 匹配预定义关系类型
-                            rel_type_result = await db.execute(
-                                select(RelationshipType).where(
-                                    RelationshipType.name == rel.get("relationship_type")
-                                )
-                            )
-                            rel_type = rel_type_result.scalar_one_or_none()
-                            if rel_type:
-                                relationship.relationship_type_id = rel_type.id
-                            
-                            db.add(relationship)
-                            relationships_created += 1
-                            logger.info(f"  ✅ 向导创建关系：{character.name} -> {target_name} ({rel.get('relationship_type')})")
-                        else:
-                            logger.warning(f"  ⚠️  目标角色不存在：{character.name} -> {target_name}（可能是AI幻觉）")
-                    except Exception as e:
-                        logger.warning(f"  ❌ 向导创建关系失败：{character.name} - {str(e)}")
+                    if not isinstance(rel, dict):
                         continue
+                    target_id = character_name_to_id.get(rel.get("target_character_name"))
+                    if not target_id or (char_id, target_id) in relationship_rows:
+                        continue
+                    relationship_rows[(char_id, target_id)] = {
+                        "project_id": project_id,
+                        "character_from_id": char_id,
+                        "character_to_id": target_id,
+                        "relationship_type_id": relationship_type_ids.get(rel.get("relationship_type")),
+                        "relationship_name": rel.get("relationship_type", "未知关系"),
+                        "intimacy_level": rel.get("intimacy_level", 50),
+                        "description": rel.get("description", ""),
+                        "started_at": rel.get("started_at"),
+                        "source": "ai"
+                    }
             
-        # 第五阶段：创建组织成员关系
-        yield await SSEResponse.send_progress("创建组织成员关系...", 94)
-        members_created = 0
-        
-        for character, char_data in created_characters:
-            # 跳过组织实体本身
-            if character.is_organization:
-                continue
-            
-            # 处理组织成员关系
+            # 组织成员关系：组织名称解析为ID
             org_memberships = char_data.get("organization_memberships", [])
-            if org_memberships and isinstance(org_memberships, list):
+            if isinstance(org_memberships, list):
                 for membership in org_memberships:
-                    try:
-                        org_name = membership.get("organization_name")
-                        if not org_name:
-                            logger.debug(f"  ⚠️  {character.name}的组织成员关系缺少organization_name，跳过")
-                            continue
-                        
-                        # 使用映射快速查找组织
-                        org = organization_name_to_obj.get(org_name)
-                        
-                        if org:
-                            # 检查是否已存在成员关系
-                            existing_member = await db.execute(
-                                select(OrganizationMember).where(
-                                    OrganizationMember.organization_id == org.id,
-                                    OrganizationMember.character_id == character.id
-                                )
-                            )
-                            if existing_member.scalar_one_or_none():
-                                logger.debug(f"  ℹ️  成员关系已存在：{character.name} -> {org_name}")
-                                continue
-                            
-                            # 创建成员关系
-                            member = OrganizationMember(
-                                organization_id=org.id,
-                                character_id=character.id,
-                                position=membership.get("position", "成员"),
-                                rank=membership.get("rank", 0),
-                                loyalty=membership.get("loyalty", 50),
-                                joined_at=membership.get("joined_at"),
-                                status=membership.get("status", "active"),
-                                source="ai"
-                            )
-                            db.add(member)
-                            
-                            # 更新组织成员计数
-                            org.member_count += 1
-                            
-                            members_created += 1
-                            logger.info(f"  ✅ 向导添加成员：{character.name} -> {org_name} ({membership.get('position')})")
-                        else:
-                            # 这种情况理论上已经被预处理清理了，但保留日志以防万一
-                            logger.debug(f"  ℹ️  组织引用已被清理：{character.name} -> {org_name}")
-                    except Exception as e:
-                        logger.warning(f"  ❌ 向导添加组织成员失败：{character.name} - {str(e)}")
+                    if not isinstance(membership, dict):
+                        continue
+                    org_id = organization_name_to_id.get(membership.get("organization_name"))
+                    if not org_id or (org_id, char_id) in member_rows:
                         continue
+                    member_rows[(org_id, char_id)] = {
+                        "organization_id": org_id,
+                        "character_id": char_id,
+                        "position": membership.get("position", "成员"),
+                        "rank": membership.get("rank", 0),
+                        "loyalty": membership.get("loyalty", 50),
+                        "joined_at": membership.get("joined_at"),
+                        "status": membership.get("status", "active"),
+                        "source": "ai"
+                    }
+                    member_counts[org_id] = member_counts.get(org_id, 0) + 1
+        
+        for org_row in organization_rows:
+            org_row["member_count"] = member_counts.get(org_row["id"], 0)
+        
+        # 第三阶段：批量写入（角色一次flush，其余每张表一条批量INSERT）
+        yield await SSEResponse.send_progress("写入职业、组织、关系与成员...", 90)
+        db.add_all(created_characters)
+        await db.flush()
+        if organization_rows:
+            await db.execute(insert(Organization), organization_rows)
+        if career_rows:
+            await db.execute(insert(CharacterCareer), career_rows)
+        if relationship_rows:
+            await db.execute(insert(CharacterRelationship), list(relationship_rows.values()))
+        if member_rows:
+            await db.execute(insert(OrganizationMember), list(member_rows.values()))
+        
+        # 一次查询加载数据库生成的时间戳
+        await db.execute(
+            select(Character)
+            .where(Character.id.in_([c.id for c in created_characters]))
+            .execution_options(populate_existing=True)
+        )
         
         logger.info(f"📊 向导数据统计：")
         logger.info(f"  - 创建角色/组织：{len(created_characters)} 个")
-        logger.info(f"  - 创建组织详情：{len(organization_name_to_obj)} 个")
-        logger.info(f"  - 创建角色关系：{relationships_created} 条")
-        logger.info(f"  - 创建组织成员：{members_created} 条")
+        logger.info(f"  - 创建组织详情：{len(organization_rows)} 个")
+        logger.info(f"  - 分配职业：{len(career_rows)} 个")
+        logger.info(f"  - 创建角色关系：{len(relationship_rows)} 条")
+        logger.info(f"  - 创建组织成员：{len(member_rows)} 条")
         
         # 更新项目的角色数量和向导步骤状态为2（角色已完成）
         project.character_count = len(created_characters)
@@ -1202,9 +1141,6 @@ async def characters_generator(
         await db.commit()
         db_committed = True
         
-        # 重新提取character对象
-        created_characters = [char for char, _ in created_characters]
-        
         # 发送结果
         yield await SSEResponse.send_result({
             "message": f"成功生成{len(created_characters)}个角色/组织（分{total_batches}批完成）",
@@ -1299,15 +1235,8 @@ async def outline_generator(
         
         # 获取角色信息
         yield await SSEResponse.send_progress("加载角色信息...", 15)
-        result = await db.execute(
-            select(Character).where(Character.project_id == project_id)
-        )
-        characters = result.scalars().all()
-        
-        characters_info = "\n".join([
-            f"- {char.name} ({'组织' if char.is_organization else '角色'}, {char.role_type}): {char.personality[:100] if char.personality else '暂无描述'}"
-            for char in characters
-        ])
+        snapshot = await world_snapshot_cache.get(db, project_id)
+        characters_info = snapshot.characters_brief()
         
         # 第一阶段：生成3个粗粒度大纲节点
         yield await SSEResponse.send_progress(f"生成{outline_count}个大纲节点...", 10)
@@ -1338,17 +1267,14 @@ async def outline_generator(
             requirements=outline_requirements
         )
         
-        # 流式生成大纲（带字数统计）
-        accumulated_text = ""
+        # 流式生成大纲（带字数统计，相同输入的重试直接使用缓存结果）
+        text_buffer = StreamTextBuffer()
         chunk_count = 0
+        outline_request = dict(prompt=outline_prompt, provider=provider, model=model)
         
-        async for chunk in user_ai_service.generate_text_stream(
-            prompt=outline_prompt,
-            provider=provider,
-            model=model
-        ):
+        async for chunk in user_ai_service.generate_text_stream(**outline_request, use_cache=True):
             chunk_count += 1
-            accumulated_text += chunk
+            text_buffer.append(chunk)
             
             # 发送内容块
             yield await SSEResponse.send_chunk(chunk)
@@ -1357,13 +1283,14 @@ async def outline_generator(
             if chunk_count % 5 == 0:
                 progress = min(10 + (chunk_count // 3), 90)
                 yield await SSEResponse.send_progress(
-                    f"生成大纲中... ({len(accumulated_text)}字符)",
+                    f"生成大纲中... ({len(text_buffer)}字符)",
                     progress
                 )
             
             # 每20个块发送心跳
             if chunk_count % 20 == 0:
                 yield await SSEResponse.send_heartbeat()
+        accumulated_text = text_buffer.getvalue()
         
         # 解析大纲结果 - 使用统一的JSON清洗方法
         yield await SSEResponse.send_progress("解析大纲...", 96)
@@ -1374,6 +1301,7 @@ async def outline_generator(
             if not isinstance(outline_data, list):
                 outline_data = [outline_data]
         except json.JSONDecodeError as e:
+            await user_ai_service.discard_cached_response(**outline_request)
             logger.error(f"大纲JSON解析失败: {e}")
             yield await SSEResponse.send_error("大纲生成失败，请重试")
             return
@@ -1616,7 +1544,7 @@ async def world_building_regenerate_generator(
                 yield await SSEResponse.send_progress(f"重新生成世界观{retry_suffix}...", 10 + world_retry_count * 5)
                 
                 # 流式生成世界观
-                accumulated_text = ""
+                text_buffer = StreamTextBuffer()
                 chunk_count = 0
                 
                 async for chunk in user_ai_service.generate_text_stream(
@@ -1625,16 +1553,17 @@ async def world_building_regenerate_generator(
                     model=model
                 ):
                     chunk_count += 1
-                    accumulated_text += chunk
+                    text_buffer.append(chunk)
                     
                     yield await SSEResponse.send_chunk(chunk)
                     
                     if chunk_count % 5 == 0:
                         progress = min(10 + (chunk_count // 5), 85)
-                        yield await SSEResponse.send_progress(f"生成中... ({len(accumulated_text)}字符)", progress)
+                        yield await SSEResponse.send_progress(f"生成中... ({len(text_buffer)}字符)", progress)
                     
                     if chunk_count % 20 == 0:
                         yield await SSEResponse.send_heartbeat()
+                accumulated_text = text_buffer.getvalue()
                 
                 # 检查是否返回空响应
                 if not accumulated_text or not accumulated_text.strip():
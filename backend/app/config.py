@@ -43,6 +43,11 @@ class Settings(BaseSettings):
     # 数据库配置 - PostgreSQL
     database_url: str = DATABASE_URL
     
+    # 只读副本（可选）：配置后纯读接口通过 get_read_db 走副本，写操作仍走主库
+    database_read_url: Optional[str] = None
+    database_read_pool_size: int = 30  # 副本核心连接池大小
+    database_read_max_overflow: int = 20  # 副本最大溢出连接数
+    
     # PostgreSQL连接池配置（优化后支持150-200并发用户）
     database_pool_size: int = 50  # 核心连接池大小（优化：从30提升到50）
     database_max_overflow: int = 30  # 最大溢出连接数（优化：从20提升到30）
@@ -65,6 +70,44 @@ class Settings(BaseSettings):
     database_slow_query_threshold: float = 1.0  # 慢查询阈值（秒）
     database_enable_metrics: bool = True  # 启用性能指标收集
     
+    # 后台任务进度写入配置
+    task_progress_flush_ms: int = 500  # 进度字段合并写入间隔（毫秒）
+    
+    # 持久化任务队列配置（批量生成、章节分析）
+    job_worker_embedded: bool = True  # API进程内运行队列worker；多实例部署可关闭并单独运行 python -m app.worker
+    job_worker_concurrency: int = 4  # 每个worker同时执行的任务数
+    job_lease_seconds: int = 120  # 任务租约时长（秒），每1/3租约心跳续期
+    job_poll_interval_seconds: float = 2.0  # 空闲时轮询间隔（秒）
+    job_max_attempts: int = 3  # 租约过期后最多被重新领取的次数
+    
+    # 项目导出配置
+    export_yield_per: int = 50  # 流式导出时每批从数据库游标读取的章节数
+    
+    # 项目导入配置
+    import_batch_size: int = 200  # 批量导入时每批插入并提交的行数
+    import_max_file_mb: int = 500  # 导入文件大小上限（MB）
+    
+    # 世界状态快照缓存（角色、职业、大纲，本进程写入会主动失效）
+    world_snapshot_ttl_seconds: int = 300  # 快照最长有效期（秒），兜底其他进程的写入
+    world_snapshot_max_projects: int = 500  # 最多缓存的项目数
+    
+    # 批量展开大纲配置
+    outline_expand_concurrency: int = 4  # 同时展开的大纲数（1为逐个展开）
+    
+    # 向导角色生成配置
+    wizard_character_concurrency: int = 3  # 同时生成的角色批次数（每批3个，1为逐批生成）
+    
+    # 剧情分析配置
+    plot_analysis_chunk_chars: int = 8000  # 超过该长度的章节按段落切分后并发分析再合并
+    plot_analysis_max_chunks: int = 4  # 单章最多切分段数（超出时增大每段长度）
+    
+    # SSE流式响应配置
+    sse_flush_interval_ms: int = 50  # 内容块合并窗口（毫秒）
+    sse_flush_max_chars: int = 256  # 合并的内容达到该字符数时立即发送
+    sse_heartbeat_seconds: float = 15.0  # 连接空闲超过该时长才发送心跳
+    sse_queue_size: int = 256  # 每个流的待发送队列上限，满时生成端等待（背压）
+    sse_slow_client_timeout_seconds: float = 60.0  # 生成端被阻塞超过该时长视为慢客户端并终止流
+    
     # AI服务配置
     openai_api_key: Optional[str] = None
     openai_base_url: Optional[str] = None
@@ -77,6 +120,40 @@ class Settings(BaseSettings):
     default_temperature: float = 0.7
     default_max_tokens: int = 32000
     
+    # 长期记忆存储（独立运行的任务队列worker必须与API进程读写同一目录：同一主机或共享卷）
+    chroma_persist_dir: str = str(DATA_DIR / "chroma_db")  # ChromaDB持久化目录
+    
+    # Embedding执行器配置（长期记忆系统）
+    embedding_batch_size: int = 32  # 单批次最大编码文本数
+    embedding_batch_wait_ms: int = 10  # 凑批等待窗口（毫秒）
+    embedding_max_workers: int = 1  # 编码线程数
+    embedding_cache_enabled: bool = True  # 是否启用Embedding持久化缓存
+    embedding_cache_dir: str = str(DATA_DIR / "embedding_cache")  # 缓存目录
+    embedding_cache_max_entries: int = 50000  # 最大缓存条数（LRU淘汰）
+    memory_reindex_page_size: int = 200  # 重建记忆索引时每页读取并编码的记忆数
+    memory_reindex_max_per_second: float = 100.0  # 重建索引限速（条/秒），0表示不限速
+    memory_alias_cache_ttl_seconds: int = 30  # 项目集合别名进程内缓存有效期（秒），其他进程重建索引后的切换在该时间内生效
+    
+    # 提示词模板注册表（用户自定义模板缓存，模板修改会主动失效）
+    prompt_template_cache_ttl_seconds: int = 300  # 缓存最长有效期（秒），兜底其他进程的修改
+    prompt_template_cache_max_users: int = 10000  # 最多缓存的用户数
+    
+    # 认证中间件用户缓存
+    auth_user_cache_ttl_seconds: int = 30  # 用户信息缓存时长（秒），状态变更会主动失效
+    auth_user_cache_max_entries: int = 10000  # 最大缓存用户数
+    
+    # LLM请求调度（按提供商生效，见 llm_scheduler）
+    llm_max_concurrent_requests: int = 5  # 非流式请求并发上限
+    llm_max_concurrent_streams: int = 5  # 流式请求并发上限（流在整个生成期间占用名额）
+    llm_interactive_reserved_slots: int = 1  # 上述两个上限中只允许交互式请求使用的名额，批量/后台任务不能占满
+    
+    # LLM响应缓存（内容寻址，相同提示词直接返回缓存结果，默认关闭）
+    llm_cache_enabled: bool = False  # 是否启用LLM响应缓存
+    llm_cache_path: str = str(DATA_DIR / "llm_cache.sqlite3")  # SQLite缓存文件
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600  # 条目有效期（秒）
+    llm_cache_max_entries: int = 20000  # 最大条目数（按最近访问淘汰）
+    llm_cache_max_mb: int = 256  # 响应内容总大小上限（MB）
+    
     # 二次优化配置
     refinement_api_base: Optional[str] = None  # LiteLLM端点
     refinement_api_key: Optional[str] = None   # API Key
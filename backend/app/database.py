@@ -1,10 +1,12 @@
 """数据库连接和会话管理 - PostgreSQL 多用户数据隔离"""
 import asyncio
-from typing import Dict, Any
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Any, Tuple
 from datetime import datetime
 from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import Session, declarative_base
 from fastapi import Request, HTTPException
 from app.config import settings
 from app.logger import get_logger
@@ -20,12 +22,14 @@ from app.models import (
     Project, Outline, Character, Chapter, GenerationHistory,
     Settings, WritingStyle, ProjectDefaultStyle,
     RelationshipType, CharacterRelationship, Organization, OrganizationMember,
-    StoryMemory, PlotAnalysis, AnalysisTask, BatchGenerationTask,
+    StoryMemory, PlotAnalysis, AnalysisTask, BatchGenerationTask, MemoryReindexTask,
     RegenerationTask, Career, CharacterCareer, User, MCPPlugin, PromptTemplate,
-    ChapterRefinement
+    ChapterRefinement, ChapterSummaryGroup, ChapterSegmentSignature
 )
 
-# 引擎缓存：每个用户一个引擎
+# 引擎缓存：主库与只读副本各一个共享引擎
+PRIMARY_ENGINE_KEY = "shared_postgres"
+REPLICA_ENGINE_KEY = "shared_postgres_read"
 _engine_cache: Dict[str, Any] = {}
 
 # 锁管理：用于保护引擎创建过程
@@ -42,6 +46,12 @@ _session_stats = {
     "last_check": None
 }
 
+# 会话工厂缓存：每个引擎 × 读写模式一个工厂（避免每个请求重复创建 sessionmaker）
+_session_factories: Dict[Tuple[int, bool], async_sessionmaker] = {}
+
+# 按作用域统计会话耗时: "名称:rw|ro" -> 计数/错误/总耗时/最大耗时
+_scope_stats: Dict[str, Dict[str, float]] = {}
+
 # 全局 AsyncSessionLocal（用于启动时的任务恢复等）
 _global_engine = None
 AsyncSessionLocal = None
@@ -64,6 +74,95 @@ async def _init_global_session():
         )
 
 
+def _build_engine(database_url: str, pool_size: int, max_overflow: int, label: str):
+    """按配置创建异步引擎（SQLite 启用 WAL，PostgreSQL 使用完整连接池）
+    
+    Args:
+        database_url: 数据库连接URL
+        pool_size: 核心连接数
+        max_overflow: 溢出连接数
+        label: 日志中显示的引擎名称
+    """
+    # 检测数据库类型
+    is_sqlite = 'sqlite' in database_url.lower()
+    
+    # 基础引擎参数
+    engine_args = {
+        "echo": settings.database_echo_pool,
+        "echo_pool": settings.database_echo_pool,
+        "future": True,
+    }
+    
+    if is_sqlite:
+        # SQLite 配置（使用 NullPool，不支持连接池参数）
+        engine_args["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": 30.0,  # 等待锁释放的超时时间（秒）
+        }
+        # 启用连接前检测以支持更好的并发
+        engine_args["pool_pre_ping"] = True
+        
+        logger.info(f"📊 [{label}] 使用 SQLite 数据库（NullPool，超时30秒，WAL模式）")
+    else:
+        # PostgreSQL 配置（完整连接池支持）
+        connect_args = {
+            "server_settings": {
+                "application_name": settings.app_name,
+                "jit": "off",
+                "search_path": "public",
+            },
+            "command_timeout": 60,
+            "statement_cache_size": 500,
+        }
+        
+        engine_args.update({
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": settings.database_pool_timeout,
+            "pool_pre_ping": settings.database_pool_pre_ping,
+            "pool_recycle": settings.database_pool_recycle,
+            "pool_use_lifo": settings.database_pool_use_lifo,
+            "pool_reset_on_return": settings.database_pool_reset_on_return,
+            "max_identifier_length": settings.database_max_identifier_length,
+            "connect_args": connect_args
+        })
+        
+        total_connections = pool_size + max_overflow
+        estimated_concurrent_users = total_connections * 2
+        
+        logger.info(
+            f"📊 [{label}] PostgreSQL 连接池配置:\n"
+            f"   ├─ 核心连接: {pool_size}\n"
+            f"   ├─ 溢出连接: {max_overflow}\n"
+            f"   ├─ 总连接数: {total_connections}\n"
+            f"   ├─ 获取超时: {settings.database_pool_timeout}秒\n"
+            f"   ├─ 连接回收: {settings.database_pool_recycle}秒\n"
+            f"   └─ 预估并发: {estimated_concurrent_users}+用户"
+        )
+    
+    engine = create_async_engine(database_url, **engine_args)
+    
+    # 如果是 SQLite，启用 WAL 模式以支持读写并发
+    if is_sqlite:
+        try:
+            from sqlalchemy import event
+            
+            @event.listens_for(engine.sync_engine, "connect")
+            def set_sqlite_pragma(dbapi_conn, connection_record):
+                cursor = dbapi_conn.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.execute("PRAGMA cache_size=-64000")  # 64MB 缓存
+                cursor.execute("PRAGMA busy_timeout=30000")  # 30秒超时
+                cursor.close()
+            
+            logger.info(f"✅ [{label}] SQLite WAL 模式已启用（支持读写并发）")
+        except Exception as e:
+            logger.warning(f"⚠️ [{label}] 启用 WAL 模式失败: {e}，使用默认配置")
+    
+    return engine
+
+
 async def get_engine(user_id: str):
     """获取或创建用户专属的数据库引擎（线程安全）
     
@@ -76,94 +175,167 @@ async def get_engine(user_id: str):
         用户专属的异步引擎
     """
     # PostgreSQL模式：所有用户共享同一个引擎
-    cache_key = "shared_postgres"
+    cache_key = PRIMARY_ENGINE_KEY
     if cache_key in _engine_cache:
         return _engine_cache[cache_key]
     
     async with _cache_lock:
         if cache_key not in _engine_cache:
-            # 检测数据库类型
-            is_sqlite = 'sqlite' in settings.database_url.lower()
-            
-            # 基础引擎参数
-            engine_args = {
-                "echo": settings.database_echo_pool,
-                "echo_pool": settings.database_echo_pool,
-                "future": True,
-            }
-            
-            if is_sqlite:
-                # SQLite 配置（使用 NullPool，不支持连接池参数）
-                engine_args["connect_args"] = {
-                    "check_same_thread": False,
-                    "timeout": 30.0,  # 等待锁释放的超时时间（秒）
-                }
-                # 启用连接前检测以支持更好的并发
-                engine_args["pool_pre_ping"] = True
-                
-                logger.info("📊 使用 SQLite 数据库（NullPool，超时30秒，WAL模式）")
-            else:
-                # PostgreSQL 配置（完整连接池支持）
-                connect_args = {
-                    "server_settings": {
-                        "application_name": settings.app_name,
-                        "jit": "off",
-                        "search_path": "public",
-                    },
-                    "command_timeout": 60,
-                    "statement_cache_size": 500,
-                }
-                
-                engine_args.update({
-                    "pool_size": settings.database_pool_size,
-                    "max_overflow": settings.database_max_overflow,
-                    "pool_timeout": settings.database_pool_timeout,
-                    "pool_pre_ping": settings.database_pool_pre_ping,
-                    "pool_recycle": settings.database_pool_recycle,
-                    "pool_use_lifo": settings.database_pool_use_lifo,
-                    "pool_reset_on_return": settings.database_pool_reset_on_return,
-                    "max_identifier_length": settings.database_max_identifier_length,
-                    "connect_args": connect_args
-                })
-                
-                total_connections = settings.database_pool_size + settings.database_max_overflow
-                estimated_concurrent_users = total_connections * 2
-                
-                logger.info(
-                    f"📊 PostgreSQL 连接池配置:\n"
-                    f"   ├─ 核心连接: {settings.database_pool_size}\n"
-                    f"   ├─ 溢出连接: {settings.database_max_overflow}\n"
-                    f"   ├─ 总连接数: {total_connections}\n"
-                    f"   ├─ 获取超时: {settings.database_pool_timeout}秒\n"
-                    f"   ├─ 连接回收: {settings.database_pool_recycle}秒\n"
-                    f"   └─ 预估并发: {estimated_concurrent_users}+用户"
-                )
-            
-            engine = create_async_engine(settings.database_url, **engine_args)
-            _engine_cache[cache_key] = engine
-            
-            # 如果是 SQLite，启用 WAL 模式以支持读写并发
-            if is_sqlite:
-                try:
-                    from sqlalchemy import event
-                    from sqlalchemy.pool import NullPool
-                    
-                    @event.listens_for(engine.sync_engine, "connect")
-                    def set_sqlite_pragma(dbapi_conn, connection_record):
-                        cursor = dbapi_conn.cursor()
-                        cursor.execute("PRAGMA journal_mode=WAL")
-                        cursor.execute("PRAGMA synchronous=NORMAL")
-                        cursor.execute("PRAGMA cache_size=-64000")  # 64MB 缓存
-                        cursor.execute("PRAGMA busy_timeout=30000")  # 30秒超时
-                        cursor.close()
-                    
-                    logger.info("✅ SQLite WAL 模式已启用（支持读写并发）")
-                except Exception as e:
-                    logger.warning(f"⚠️ 启用 WAL 模式失败: {e}，使用默认配置")
+            _engine_cache[cache_key] = _build_engine(
+                settings.database_url,
+                settings.database_pool_size,
+                settings.database_max_overflow,
+                "主库"
+            )
         
         return _engine_cache[cache_key]
 
 
+async def get_read_engine(user_id: str):
+    """获取只读副本引擎；未配置 DATABASE_READ_URL 时返回主库引擎
+    
+    Args:
+        user_id: 用户ID
+        
+    Returns:
+        副本（或主库）异步引擎
+    """
+    if not settings.database_read_url:
+        return await get_engine(user_id)
+    
+    cache_key = REPLICA_ENGINE_KEY
+    if cache_key in _engine_cache:
+        return _engine_cache[cache_key]
+    
+    async with _cache_lock:
+        if cache_key not in _engine_cache:
+            _engine_cache[cache_key] = _build_engine(
+                settings.database_read_url,
+                settings.database_read_pool_size,
+                settings.database_read_max_overflow,
+                "只读副本"
+            )
+        
+        return _engine_cache[cache_key]
+
+
+class ReplicaRoutingSession(Session):
+    """读写分离会话：查询走只读副本，一旦发生写操作（flush 或 DML 语句）后续所有语句都固定走主库
+    
+    固定主库保证同一请求内"先写后读"能读到自己的写入。
+    """
+    
+    def __init__(self, *args, replica_bind=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._replica_bind = replica_bind
+        self._stick_to_primary = False
+    
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._replica_bind is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self._flushing or getattr(clause, "is_dml", False):
+            self._stick_to_primary = True
+        if self._stick_to_primary:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        return self._replica_bind
+    
+    @property
+    def reads_from_replica(self) -> bool:
+        """查询当前是否路由到只读副本（副本数据可能落后于主库）"""
+        return self._replica_bind is not None and not self._stick_to_primary
+
+
+async def get_session_factory(
+    user_id: str,
+    read_only: bool = False,
+    replica: bool = False
+) -> async_sessionmaker:
+    """获取共享的会话工厂（每个引擎、每种模式只创建一次）
+    
+    Args:
+        user_id: 用户ID
+        read_only: 只读模式（autoflush=False，适合只查询的后台任务）
+        replica: 查询路由到只读副本（写操作后自动固定到主库）
+        
+    Returns:
+        会话工厂
+    """
+    engine = await get_engine(user_id)
+    read_engine = await get_read_engine(user_id) if replica else engine
+    key = (id(read_engine), read_only)
+    factory = _session_factories.get(key)
+    if factory is None:
+        if read_engine is engine:
+            factory = async_sessionmaker(
+                engine,
+                class_=AsyncSession,
+                expire_on_commit=False,
+                autoflush=not read_only
+            )
+        else:
+            factory = async_sessionmaker(
+                engine,
+                class_=AsyncSession,
+                sync_session_class=ReplicaRoutingSession,
+                replica_bind=read_engine.sync_engine,
+                expire_on_commit=False,
+                autoflush=not read_only
+            )
+        _session_factories[key] = factory
+    return factory
+
+
+def _record_scope(name: str, elapsed_ms: float, failed: bool):
+    """记录一次会话作用域的耗时"""
+    entry = _scope_stats.setdefault(name, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+    entry["count"] += 1
+    entry["total_ms"] += elapsed_ms
+    entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+    if failed:
+        entry["errors"] += 1
+
+
+@asynccontextmanager
+async def session_scope(
+    user_id: str,
+    read_only: bool = False,
+    name: str = "background",
+    replica: bool = False
+) -> AsyncIterator[AsyncSession]:
+    """后台任务使用的会话作用域
+    
+    - 读写模式：正常退出时提交，异常时回滚并继续抛出
+    - 只读模式：autoflush=False，退出时直接关闭，不做提交/回滚
+    
+    Args:
+        user_id: 用户ID
+        read_only: 是否只读
+        name: 作用域名称，用于 get_database_stats 中的耗时统计
+        replica: 查询路由到只读副本（未配置副本时等同主库）
+    """
+    factory = await get_session_factory(user_id, read_only=read_only, replica=replica)
+    scope_name = f"{name}:{'ro' if read_only else 'rw'}"
+    start = time.monotonic()
+    failed = False
+    session = factory()
+    try:
+        yield session
+        if not read_only and session.in_transaction():
+            await session.commit()
+    except BaseException:
+        failed = True
+        if not read_only:
+            try:
+                if session.in_transaction():
+                    await session.rollback()
+            except Exception as rollback_error:
+                logger.error(f"❌ 会话作用域回滚失败 [{scope_name}][User:{user_id}]: {str(rollback_error)}")
+        raise
+    finally:
+        await session.close()
+        _record_scope(scope_name, (time.monotonic() - start) * 1000, failed)
+
+
 async def get_db(request: Request):
     """获取数据库会话的依赖函数
     
@@ -174,16 +346,34 @@ async def get_db(request: Request):
     if not user_id:
         raise HTTPException(status_code=401, detail="未登录或用户ID缺失")
     
-    engine = await get_engine(user_id)
+    async with _request_session(user_id, replica=False) as session:
+        yield session
+
+
+async def get_read_db(request: Request):
+    """获取只读接口使用的数据库会话（依赖函数）
     
-    AsyncSessionLocal = async_sessionmaker(
-        engine,
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
+    配置了 DATABASE_READ_URL 时查询走只读副本；同一会话内一旦发生写操作，
+    后续语句固定走主库。未配置副本时与 get_db 等价。
+    """
+    user_id = getattr(request.state, "user_id", None)
+    
+    if not user_id:
+        raise HTTPException(status_code=401, detail="未登录或用户ID缺失")
+    
+    async with _request_session(user_id, replica=True) as session:
+        yield session
+
+
+@asynccontextmanager
+async def _request_session(user_id: str, replica: bool) -> AsyncIterator[AsyncSession]:
+    """请求级会话：统计会话数量，退出时回滚未提交事务并关闭"""
+    AsyncSessionLocal = await get_session_factory(user_id, replica=replica)
     
     session = AsyncSessionLocal()
     session_id = id(session)
+    start = time.monotonic()
+    failed = False
     
     global _session_stats
     _session_stats["created"] += 1
@@ -196,6 +386,7 @@ async def get_db(request: Request):
         if session.in_transaction():
             await session.rollback()
     except GeneratorExit:
+        failed = True
         _session_stats["generator_exits"] += 1
         logger.warning(f"⚠️ GeneratorExit [User:{user_id}][ID:{session_id}] - SSE连接断开（总计:{_session_stats['generator_exits']}次）")
         try:
@@ -206,6 +397,7 @@ async def get_db(request: Request):
             _session_stats["errors"] += 1
             logger.error(f"❌ GeneratorExit回滚失败 [User:{user_id}][ID:{session_id}]: {str(rollback_error)}")
     except Exception as e:
+        failed = True
         _session_stats["errors"] += 1
         logger.error(f"❌ 会话异常 [User:{user_id}][ID:{session_id}]: {str(e)}")
         try:
@@ -226,6 +418,7 @@ async def get_db(request: Request):
             _session_stats["closed"] += 1
             _session_stats["active"] -= 1
             _session_stats["last_check"] = datetime.now().isoformat()
+            _record_scope("request:replica" if replica else "request:rw", (time.monotonic() - start) * 1000, failed)
             
             logger.debug(f"📊 会话关闭 [User:{user_id}][ID:{session_id}] - 活跃:{_session_stats['active']}, 总创建:{_session_stats['created']}, 总关闭:{_session_stats['closed']}, 错误:{_session_stats['errors']}")
             
@@ -245,6 +438,7 @@ async def get_db(request: Request):
             except:
                 pass
 
+
 async def init_db(user_id: str = None):
     """
     初始化数据库（已弃用）
@@ -274,11 +468,30 @@ async def close_db():
             await engine.dispose()
             logger.info(f"用户 {user_id} 的数据库连接已关闭")
         _engine_cache.clear()
+        _session_factories.clear()
         logger.info("所有数据库连接已关闭")
     except Exception as e:
         logger.error(f"关闭数据库连接失败: {str(e)}", exc_info=True)
         raise
 
+def _pool_stats(engine, total_connections: int) -> Dict[str, Any]:
+    """读取引擎连接池的实时状态（引擎不存在时返回空字典）"""
+    if engine is None:
+        return {}
+    try:
+        pool = engine.pool
+        return {
+            "size": pool.size(),  # 当前连接池大小
+            "checked_in": pool.checkedin(),  # 可用连接数
+            "checked_out": pool.checkedout(),  # 正在使用的连接数
+            "overflow": pool.overflow(),  # 溢出连接数
+            "usage_percent": (pool.checkedout() / max(total_connections, 1)) * 100,
+        }
+    except Exception as e:
+        logger.warning(f"获取连接池状态失败: {e}")
+        return {"error": str(e)}
+
+
 async def get_database_stats():
     """获取数据库连接和会话统计信息
     
@@ -287,23 +500,9 @@ async def get_database_stats():
     """
     from app.config import settings
     
-    # 获取连接池详细状态
-    pool_stats = {}
-    cache_key = "shared_postgres"
-    if cache_key in _engine_cache:
-        engine = _engine_cache[cache_key]
-        try:
-            pool = engine.pool
-            pool_stats = {
-                "size": pool.size(),  # 当前连接池大小
-                "checked_in": pool.checkedin(),  # 可用连接数
-                "checked_out": pool.checkedout(),  # 正在使用的连接数
-                "overflow": pool.overflow(),  # 溢出连接数
-                "usage_percent": (pool.checkedout() / (settings.database_pool_size + settings.database_max_overflow)) * 100,
-            }
-        except Exception as e:
-            logger.warning(f"获取连接池状态失败: {e}")
-            pool_stats = {"error": str(e)}
+    # 获取连接池详细状态（主库 + 只读副本）
+    pool_stats = _pool_stats(_engine_cache.get(PRIMARY_ENGINE_KEY), settings.database_pool_size + settings.database_max_overflow)
+    replica_pool_stats = _pool_stats(_engine_cache.get(REPLICA_ENGINE_KEY), settings.database_read_pool_size + settings.database_read_max_overflow)
     
     stats = {
         "session_stats": {
@@ -315,9 +514,20 @@ async def get_database_stats():
             "last_check": _session_stats["last_check"],
         },
         "pool_stats": pool_stats,  # 新增：连接池实时状态
+        "replica_pool_stats": replica_pool_stats,  # 只读副本连接池（未配置时为空）
+        "scope_stats": {
+            name: {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "avg_ms": round(entry["total_ms"] / entry["count"], 2) if entry["count"] else 0.0,
+                "max_ms": round(entry["max_ms"], 2),
+            }
+            for name, entry in _scope_stats.items()
+        },
         "engine_cache": {
             "total_engines": len(_engine_cache),
             "engine_keys": list(_engine_cache.keys()),
+            "session_factories": len(_session_factories),
         },
         "config": {
             "database_type": "PostgreSQL",
@@ -328,6 +538,9 @@ async def get_database_stats():
             "pool_recycle": settings.database_pool_recycle,
             "session_max_active_threshold": settings.database_session_max_active,
             "session_leak_threshold": settings.database_session_leak_threshold,
+            "read_replica_enabled": bool(settings.database_read_url),
+            "read_pool_size": settings.database_read_pool_size,
+            "read_max_overflow": settings.database_read_max_overflow,
         },
         "health": {
             "status": "healthy",
@@ -353,14 +566,15 @@ async def get_database_stats():
         stats["health"]["errors"].append(f"活跃会话数异常: {_session_stats['active']}")
     
     # 连接池使用率检查
-    if pool_stats and "usage_percent" in pool_stats:
-        usage = pool_stats["usage_percent"]
-        if usage > 90:
-            stats["health"]["status"] = "warning"
-            stats["health"]["warnings"].append(f"连接池使用率过高: {usage:.1f}%")
-        elif usage > 95:
-            stats["health"]["status"] = "critical"
-            stats["health"]["errors"].append(f"连接池几乎耗尽: {usage:.1f}%")
+    for label, pool_info in (("连接池", pool_stats), ("副本连接池", replica_pool_stats)):
+        if pool_info and "usage_percent" in pool_info:
+            usage = pool_info["usage_percent"]
+            if usage > 90:
+                stats["health"]["status"] = "warning"
+                stats["health"]["warnings"].append(f"{label}使用率过高: {usage:.1f}%")
+            elif usage > 95:
+                stats["health"]["status"] = "critical"
+                stats["health"]["errors"].append(f"{label}几乎耗尽: {usage:.1f}%")
     
     error_rate = (_session_stats["errors"] / max(_session_stats["created"], 1)) * 100
     if error_rate > 5:
@@ -390,7 +604,7 @@ async def check_database_health(user_id: str = None) -> dict:
     
     try:
         # 检查引擎是否存在
-        cache_key = "shared_postgres"
+        cache_key = PRIMARY_ENGINE_KEY
         if user_id:
             engine = await get_engine(user_id)
         else:
@@ -429,6 +643,21 @@ async def check_database_health(user_id: str = None) -> dict:
             
             result["checks"]["pool"] = pool_status
         
+        # 检查只读副本连接（已创建副本引擎时）
+        replica_engine = _engine_cache.get(REPLICA_ENGINE_KEY)
+        if replica_engine is not None:
+            try:
+                async with replica_engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+                result["checks"]["replica"] = {"status": "ok", "healthy": True}
+            except Exception as replica_error:
+                result["healthy"] = False
+                result["checks"]["replica"] = {
+                    "status": "error",
+                    "message": str(replica_error),
+                    "healthy": False
+                }
+        
     except Exception as e:
         result["healthy"] = False
         result["checks"]["error"] = {
@@ -452,5 +681,6 @@ async def reset_session_stats():
         "generator_exits": 0,
         "last_check": datetime.now().isoformat()
     }
+    _scope_stats.clear()
     logger.info("✅ 会话统计信息已重置")
     return _session_stats
\ No newline at end of file
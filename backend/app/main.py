@@ -1,9 +1,11 @@
 """FastAPI应用主入口"""
+import asyncio
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse, FileResponse
 from fastapi.exceptions import RequestValidationError
+from sqlalchemy.orm.exc import StaleDataError
 from contextlib import asynccontextmanager
 from pathlib import Path
 
@@ -12,6 +14,8 @@ from app.database import close_db, _session_stats
 from app.logger import setup_logging, get_logger
 from app.middleware import RequestIDMiddleware
 from app.middleware.auth_middleware import AuthMiddleware
+from app.services.ai_clients.llm_scheduler import llm_scheduler
+from app.services.task_progress_writer import progress_writer
 from app.mcp.registry import mcp_registry
 
 setup_logging(
@@ -25,11 +29,11 @@ logger = get_logger(__name__)
 
 
 async def resume_interrupted_tasks():
-    """恢复中断的批量生成任务"""
+    """将没有租约的运行中任务（旧版本遗留或租约已被清除）放回队列，由worker继续执行"""
     from app.database import AsyncSessionLocal, _init_global_session
+    from app.models.analysis_task import AnalysisTask
     from app.models.batch_generation_task import BatchGenerationTask
-    from app.models.chapter import Chapter
-    from sqlalchemy import select, and_
+    from sqlalchemy import update
     
     # 初始化全局会话
     await _init_global_session()
@@ -40,50 +44,32 @@ async def resume_interrupted_tasks():
     
     try:
         async with AsyncSessionLocal() as db:
-            # 查找所有running状态的任务（说明是被中断的）
-            result = await db.execute(
-                select(BatchGenerationTask).where(
-                    BatchGenerationTask.status.in_(['running', 'pending'])
+            # 有租约的running任务由租约过期机制接管，这里只处理无租约的任务
+            batch_result = await db.execute(
+                update(BatchGenerationTask)
+                .where(
+                    BatchGenerationTask.status.in_(['running', 'interrupted']),
+                    BatchGenerationTask.lease_owner.is_(None)
                 )
+                .values(status='pending')
             )
-            interrupted_tasks = result.scalars().all()
-            
-            if not interrupted_tasks:
-                logger.info("📋 没有需要恢复的中断任务")
-                return
-            
-            logger.info(f"📋 发现 {len(interrupted_tasks)} 个中断任务，准备恢复...")
-            
-            for task in interrupted_tasks:
-                # 统计已完成的章节数
-                result = await db.execute(
-                    select(Chapter).where(
-                        and_(
-                            Chapter.project_id == task.project_id,
-                            Chapter.content != None,
-                            Chapter.content != ''
-                        )
-                    )
+            # 旧版本批量生成内部同步执行的分析任务没有租约，重新排队分析
+            analysis_result = await db.execute(
+                update(AnalysisTask)
+                .where(
+                    AnalysisTask.status == 'running',
+                    AnalysisTask.lease_owner.is_(None)
                 )
-                completed_chapters = len(result.scalars().all())
-                
-                # 计算需要继续的起始章节
-                next_chapter = completed_chapters + 1
-                remaining = task.start_chapter_number + task.chapter_count - next_chapter
-                
-                if remaining <= 0:
-                    # 任务实际已完成
-                    task.status = 'completed'
-                    task.completed_chapters = task.chapter_count
-                    logger.info(f"  ✅ 任务 {task.id[:8]} 实际已完成")
-                else:
-                    # 标记为interrupted，等待手动或自动恢复
-                    task.status = 'interrupted'
-                    task.completed_chapters = completed_chapters
-                    logger.info(f"  ⚠️ 任务 {task.id[:8]} 已中断: {completed_chapters}/{task.chapter_count}章完成，需从第{next_chapter}章继续")
-            
+                .values(status='pending', progress=0)
+            )
             await db.commit()
-            logger.info("📋 中断任务状态已更新")
+            
+            if batch_result.rowcount:
+                logger.info(f"📋 {batch_result.rowcount} 个中断的批量任务已放回队列，将从已完成章节继续")
+            if analysis_result.rowcount:
+                logger.info(f"📋 {analysis_result.rowcount} 个中断的分析任务已放回队列")
+            if not batch_result.rowcount and not analysis_result.rowcount:
+                logger.info("📋 没有需要恢复的中断任务")
             
     except Exception as e:
         logger.error(f"恢复中断任务时出错: {e}")
@@ -97,10 +83,25 @@ async def lifespan(app: FastAPI):
     # 恢复中断的任务
     await resume_interrupted_tasks()
     
+    # 启动内嵌的任务队列worker
+    job_worker = None
+    job_worker_task = None
+    if config_settings.job_worker_embedded:
+        from app.worker import create_worker
+        job_worker = create_worker()
+        job_worker_task = asyncio.create_task(job_worker.run())
+    app.state.job_worker = job_worker
+    
     logger.info("应用启动完成")
     
     yield
     
+    # 停止任务队列worker（执行中的任务交还队列）
+    if job_worker:
+        await job_worker.stop()
+        job_worker_task.cancel()
+        await asyncio.gather(job_worker_task, return_exceptions=True)
+    
     # 清理MCP插件
     await mcp_registry.cleanup_all()
     
@@ -108,6 +109,16 @@ async def lifespan(app: FastAPI):
     from app.services.ai_service import cleanup_http_clients
     await cleanup_http_clients()
     
+    # 写入未落库的任务进度
+    try:
+        await progress_writer.flush()
+    except Exception as e:
+        logger.warning(f"写入任务进度失败: {e}")
+    
+    # Embedding缓存刷盘
+    from app.services.embedding_cache import flush_embedding_caches
+    flush_embedding_caches()
+    
     # 关闭数据库连接
     await close_db()
     
@@ -133,6 +144,15 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         }
     )
 
+@app.exception_handler(StaleDataError)
+async def stale_data_exception_handler(request: Request, exc: StaleDataError):
+    """处理乐观锁冲突（记录已被其他请求或任务修改）"""
+    logger.warning(f"乐观锁冲突: {request.method} {request.url.path}: {str(exc)}")
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": "数据已被其他操作修改，请刷新后重试"}
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """处理所有未捕获的异常"""
@@ -184,14 +204,92 @@ async def db_session_stats():
     - errors: 错误次数
     - generator_exits: SSE断开次数
     - last_check: 最后检查时间
+    - progress_writer: 任务进度合并写入统计
     """
     return {
         "status": "ok",
         "session_stats": _session_stats,
+        "progress_writer": progress_writer.get_stats(),
         "warning": "活跃会话数过多" if _session_stats["active"] > 10 else None
     }
 
 
+@app.get("/health/llm-scheduler")
+async def llm_scheduler_stats():
+    """
+    LLM 调度器准入指标
+    
+    按提供商返回：
+    - in_flight: 进行中的请求数
+    - queued: 各优先级排队数（interactive/batch/background）
+    - admitted: 各优先级累计准入次数
+    - avg_wait_ms / max_wait_ms: 各优先级排队等待时间
+    - throttled: 因速率或token预算受限而延迟准入的次数
+    """
+    return {
+        "status": "ok",
+        "providers": llm_scheduler.get_stats()
+    }
+
+
+@app.get("/health/sse-streams")
+async def sse_stream_stats():
+    """
+    SSE 流式传输统计
+    
+    返回：
+    - active / streams: 当前与累计的流数量
+    - chunks / frames / writes / bytes: 合并前的内容块数、发出的帧数、写入次数与字节数
+    - heartbeats: 空闲心跳次数
+    - progress_dropped: 合并窗口内被新进度覆盖的进度消息数
+    - slow_clients / producer_blocked_ms: 慢客户端终止次数与生成端因背压等待的总时长
+    """
+    from app.utils.sse_response import get_sse_stats
+    
+    return {
+        "status": "ok",
+        "sse": get_sse_stats()
+    }
+
+
+@app.get("/health/job-queue")
+async def job_queue_stats(request: Request):
+    """
+    持久化任务队列状态
+    
+    返回：
+    - queues: 各任务类型的 pending / running（持有租约）/ expired（租约过期待接管）数量
+    - worker: 本进程内嵌worker的领取、成功、失败、租约丢失次数（未启用时为空）
+    """
+    from datetime import datetime
+    from sqlalchemy import select, func
+    from app.database import session_scope
+    from app.services.job_queue import job_queue
+    from app.worker import register_default_jobs
+    
+    register_default_jobs()
+    now = datetime.now()
+    queues = {}
+    async with session_scope("_job_queue_", read_only=True, name="job_stats") as db:
+        for name, kind in job_queue.kinds.items():
+            model = kind.model
+            row = (await db.execute(
+                select(
+                    func.count().filter(model.status == 'pending'),
+                    func.count().filter(model.status == 'running', model.lease_expires_at >= now),
+                    func.count().filter(model.status == 'running', model.lease_expires_at < now),
+                )
+            )).one()
+            queues[name] = {"pending": row[0], "running": row[1], "expired": row[2]}
+    
+    job_worker = getattr(request.app.state, "job_worker", None)
+    return {
+        "status": "ok",
+        "queues": queues,
+        "worker": job_worker.get_stats() if job_worker else None
+    }
+
+
 from app.api import (
     projects, outlines, characters, chapters,
     wizard_stream, relationships, organizations,
@@ -1,51 +1,59 @@
 """
 认证中间件 - 从 Cookie 中提取用户信息并注入到 request.state
 """
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Receive, Scope, Send
 from app.user_manager import user_manager
+from app.services.ai_clients.llm_scheduler import set_llm_user
 from app.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    """认证中间件"""
+class AuthMiddleware:
+    """
+    认证中间件（纯ASGI实现）
     
-    async def dispatch(self, request: Request, call_next):
+    每个请求（包括静态资源和SSE重连）都会经过这里，因此：
+    - 不使用 BaseHTTPMiddleware，避免为每个请求额外创建任务和响应包装
+    - 用户信息走 user_manager 的短TTL缓存，状态变更时主动失效
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """
         处理请求，从 Cookie 中提取用户 ID 并注入到 request.state
         """
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        
+        # request.state 写入 scope["state"]，后续的 Request 对象共享同一状态
+        connection = HTTPConnection(scope)
+        state = connection.state
+        state.user_id = None
+        state.user = None
+        state.is_admin = False
+        
         # 从 Cookie 中获取用户 ID
-        user_id = request.cookies.get("user_id")
+        user_id = connection.cookies.get("user_id")
         
-        # 注入到 request.state
         if user_id:
-            user = await user_manager.get_user(user_id)
+            user = await user_manager.get_user_cached(user_id)
             if user:
                 # 检查用户是否被禁用 (trust_level = -1)
                 if user.trust_level == -1:
                     logger.warning(f"禁用用户尝试访问: {user_id} ({user.username})")
-                    # 清除用户状态，视为未登录
-                    request.state.user_id = None
-                    request.state.user = None
-                    request.state.is_admin = False
                 else:
                     # 用户正常，注入状态
-                    request.state.user_id = user_id
-                    request.state.user = user
-                    request.state.is_admin = user.is_admin
-            else:
-                # 用户不存在，清除状态
-                request.state.user_id = None
-                request.state.user = None
-                request.state.is_admin = False
-        else:
-            # 未登录
-            request.state.user_id = None
-            request.state.user = None
-            request.state.is_admin = False
+                    state.user_id = user_id
+                    state.user = user
+                    state.is_admin = user.is_admin
+        
+        # LLM调度按用户公平排队，用户标识随上下文传递到后台任务
+        set_llm_user(state.user_id)
         
         # 继续处理请求
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        await self.app(scope, receive, send)
@@ -7,6 +7,7 @@ from app.models.relationship import CharacterRelationship, Organization, Organiz
 from app.models.generation_history import GenerationHistory
 from app.models.analysis_task import AnalysisTask
 from app.models.batch_generation_task import BatchGenerationTask
+from app.models.memory_reindex_task import MemoryReindexTask
 from app.models.settings import Settings
 from app.models.memory import StoryMemory, PlotAnalysis
 from app.models.writing_style import WritingStyle
@@ -19,6 +20,8 @@ from app.models.prompt_template import PromptTemplate
 from app.models.foreshadow import Foreshadow, ForeshadowStatus, ForeshadowType
 from app.models.timeline import TimelineEvent
 from app.models.refinement import ChapterRefinement
+from app.models.chapter_summary_group import ChapterSummaryGroup
+from app.models.chapter_segment_signature import ChapterSegmentSignature
 
 __all__ = [
     "Project",
@@ -32,6 +35,7 @@ __all__ = [
     "GenerationHistory",
     "AnalysisTask",
     "BatchGenerationTask",
+    "MemoryReindexTask",
     "Settings",
     "StoryMemory",
     "PlotAnalysis",
@@ -47,5 +51,7 @@ __all__ = [
     "Foreshadow",
     "ForeshadowStatus",
     "ForeshadowType",
-    "ChapterRefinement"
+    "ChapterRefinement",
+    "ChapterSummaryGroup",
+    "ChapterSegmentSignature"
 ]
\ No newline at end of file
@@ -28,10 +28,17 @@ class AnalysisTask(Base):
     started_at = Column(DateTime, nullable=True, comment="开始执行时间")
     completed_at = Column(DateTime, nullable=True, comment="完成时间")
     
+    # 持久化任务队列（租约/心跳）
+    lease_owner = Column(String(100), nullable=True, comment="持有租约的worker标识")
+    lease_expires_at = Column(DateTime, nullable=True, comment="租约过期时间")
+    heartbeat_at = Column(DateTime, nullable=True, comment="最近一次心跳时间")
+    attempts = Column(Integer, default=0, comment="被worker领取的次数")
+    
     # 索引优化查询
     __table_args__ = (
         Index('idx_chapter_id_created', 'chapter_id', 'created_at'),
         Index('idx_status', 'status'),
+        Index('idx_analysis_tasks_lease', 'status', 'lease_expires_at'),
     )
     
     def __repr__(self):
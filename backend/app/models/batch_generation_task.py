@@ -20,6 +20,8 @@ class BatchGenerationTask(Base):
     style_id = Column(Integer, comment="使用的写作风格ID")
     target_word_count = Column(Integer, default=3000, comment="目标字数")
     enable_analysis = Column(Boolean, default=False, comment="是否启用同步分析")
+    pipelined = Column(Boolean, default=False, comment="是否启用流水线模式（预取下一章上下文、后台分析）")
+    model = Column(String(100), comment="自定义模型（为空使用用户默认模型）")
     
     # 任务状态
     status = Column(String(20), default="pending", comment="任务状态: pending/running/completed/failed/cancelled")
@@ -30,12 +32,19 @@ class BatchGenerationTask(Base):
     current_chapter_number = Column(Integer, comment="当前正在生成的章节序号")
     current_retry_count = Column(Integer, default=0, comment="当前章节重试次数")
     max_retries = Column(Integer, default=3, comment="最大重试次数")
+    stage_metrics = Column(JSON, comment="各阶段耗时与吞吐统计")
     
     # 时间记录
     created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
     started_at = Column(DateTime, comment="开始时间")
     completed_at = Column(DateTime, comment="完成时间")
     
+    # 持久化任务队列（租约/心跳）
+    lease_owner = Column(String(100), comment="持有租约的worker标识")
+    lease_expires_at = Column(DateTime, index=True, comment="租约过期时间")
+    heartbeat_at = Column(DateTime, comment="最近一次心跳时间")
+    attempts = Column(Integer, default=0, comment="被worker领取的次数")
+    
     # 错误信息
     error_message = Column(String(500), comment="错误信息")
     
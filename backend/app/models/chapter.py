@@ -31,8 +31,13 @@ class Chapter(Base):
     refinement_id = Column(String(36), nullable=True, comment="关联优化记录ID")
     refinement_model = Column(String(100), nullable=True, comment="优化使用的模型")
     
+    # 乐观并发控制：ORM更新时校验并递增版本号，并发修改会抛出 StaleDataError
+    version = Column(Integer, nullable=False, default=1, server_default="1", comment="行版本号（乐观锁）")
+    
     created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="更新时间")
     
+    __mapper_args__ = {"version_id_col": version}
+    
     def __repr__(self):
         return f"<Chapter(id={self.id}, chapter_number={self.chapter_number}, title={self.title}, outline_id={self.outline_id})>"
\ No newline at end of file
@@ -0,0 +1,24 @@
+"""章节片段MinHash签名数据模型"""
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ChapterSegmentSignature(Base):
+    """章节片段签名表 - 重复检测的持久化MinHash索引，每章一行，正文变化时增量重建"""
+    __tablename__ = "chapter_segment_signatures"
+    
+    chapter_id = Column(String(36), ForeignKey("chapters.id", ondelete="CASCADE"), primary_key=True)
+    project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # 签名指纹（正文 + 签名方案），与当前正文或签名方案不一致即视为过期
+    content_hash = Column(String(64), nullable=False, comment="章节正文与签名方案的sha256")
+    segment_count = Column(Integer, nullable=False, default=0, comment="片段数量")
+    num_perm = Column(Integer, nullable=False, comment="MinHash置换数量")
+    signatures = Column(LargeBinary, nullable=False, comment="片段签名矩阵(segment_count x num_perm, uint32)")
+    
+    created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+    
+    def __repr__(self):
+        return f"<ChapterSegmentSignature(chapter_id={self.chapter_id}, segments={self.segment_count})>"
@@ -0,0 +1,33 @@
+"""章节分组摘要缓存数据模型"""
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+
+
+class ChapterSummaryGroup(Base):
+    """章节分组摘要表 - 物化前章摘要中的远期/中期分组，避免每次生成都重新合并"""
+    __tablename__ = "chapter_summary_groups"
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # 分组范围
+    tier = Column(String(20), nullable=False, comment="层级: distant/medium")
+    start_chapter = Column(Integer, nullable=False, comment="起始章节号")
+    end_chapter = Column(Integer, nullable=False, comment="结束章节号")
+    chars_per_group = Column(Integer, nullable=False, comment="分组摘要字数上限")
+    
+    # 组内章节指纹（章节ID、序号、更新时间、摘要长度），任一章节变化即失效
+    fingerprint = Column(String(64), nullable=False, comment="组内章节指纹")
+    content = Column(Text, nullable=False, comment="合并后的分组摘要")
+    
+    created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="更新时间")
+    
+    __table_args__ = (
+        Index('ix_chapter_summary_groups_range', 'project_id', 'tier', 'start_chapter', 'end_chapter'),
+    )
+    
+    def __repr__(self):
+        return f"<ChapterSummaryGroup(project_id={self.project_id}, tier={self.tier}, range={self.start_chapter}-{self.end_chapter})>"
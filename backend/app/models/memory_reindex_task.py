@@ -0,0 +1,69 @@
+"""记忆重建索引任务模型 - 追踪向量库重建进度（可续传）"""
+from sqlalchemy import Column, String, Integer, Float, Text, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+
+
+class MemoryReindexTask(Base):
+    """
+    记忆重建索引任务表 - 从 story_memories 分页读取、重新编码并写入新的版本化集合
+
+    状态流转: pending -> running -> completed/failed
+    """
+    __tablename__ = "memory_reindex_tasks"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), comment="任务ID")
+    user_id = Column(String(100), nullable=False, comment="用户ID")
+    project_id = Column(String(36), nullable=False, index=True, comment="项目ID")
+
+    # 重建目标
+    target_collection = Column(String(100), nullable=True, comment="写入的版本化集合名称（首次执行时生成）")
+    embedding_model = Column(String(100), nullable=True, comment="使用的embedding模型")
+
+    # 任务状态
+    status = Column(String(20), nullable=False, default='pending', comment="任务状态: pending/running/completed/failed")
+    progress = Column(Integer, default=0, comment="进度 0-100")
+    cursor = Column(String(100), nullable=True, comment="已处理的最后一条记忆ID（续传位置）")
+    processed_count = Column(Integer, default=0, comment="已写入的记忆数")
+    total_count = Column(Integer, default=0, comment="记忆总数")
+    throughput = Column(Float, nullable=True, comment="写入速度（条/秒）")
+    eta_seconds = Column(Integer, nullable=True, comment="预计剩余时间（秒）")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+
+    # 时间戳
+    created_at = Column(DateTime, server_default=func.now(), comment="创建时间")
+    started_at = Column(DateTime, nullable=True, comment="开始执行时间")
+    completed_at = Column(DateTime, nullable=True, comment="完成时间")
+
+    # 持久化任务队列（租约/心跳）
+    lease_owner = Column(String(100), nullable=True, comment="持有租约的worker标识")
+    lease_expires_at = Column(DateTime, nullable=True, comment="租约过期时间")
+    heartbeat_at = Column(DateTime, nullable=True, comment="最近一次心跳时间")
+    attempts = Column(Integer, default=0, comment="被worker领取的次数")
+
+    __table_args__ = (
+        Index('idx_memory_reindex_tasks_lease', 'status', 'lease_expires_at'),
+    )
+
+    def __repr__(self):
+        return f"<MemoryReindexTask(id={self.id[:8]}..., project_id={self.project_id[:8]}..., status={self.status})>"
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            "task_id": self.id,
+            "project_id": self.project_id,
+            "status": self.status,
+            "progress": self.progress,
+            "processed_count": self.processed_count,
+            "total_count": self.total_count,
+            "throughput": self.throughput,
+            "eta_seconds": self.eta_seconds,
+            "embedding_model": self.embedding_model,
+            "target_collection": self.target_collection,
+            "error_message": self.error_message,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+        }
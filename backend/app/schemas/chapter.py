@@ -38,6 +38,8 @@ class ChapterUpdate(BaseModel):
     summary: Optional[str] = None
     # word_count 自动计算，不允许手动修改
     status: Optional[str] = None
+    # 客户端读取时的版本号，提供时与当前版本不一致则返回409
+    version: Optional[int] = None
 
 
 class ChapterResponse(BaseModel):
@@ -55,6 +57,7 @@ class ChapterResponse(BaseModel):
     expansion_plan: Optional[str] = None
     outline_title: Optional[str] = None  # 大纲标题（从Outline表联查）
     outline_order: Optional[int] = None  # 大纲排序序号（从Outline表联查）
+    version: int = 1  # 行版本号（乐观锁）
     created_at: datetime
     updated_at: datetime
     
@@ -66,6 +69,14 @@ class ChapterListResponse(BaseModel):
     """章节列表响应模型"""
     total: int
     items: list[ChapterResponse]
+    next_cursor: Optional[str] = None  # 下一页游标（"chapter_number:id"），为空表示没有更多
+
+
+class ChapterBriefListResponse(BaseModel):
+    """章节投影列表响应模型（fields 模式，仅包含请求的字段）"""
+    total: int
+    items: list[dict]
+    next_cursor: Optional[str] = None
 
 
 class ChapterGenerateRequest(BaseModel):
@@ -94,6 +105,7 @@ class BatchGenerateRequest(BaseModel):
         le=20000
     )
     enable_analysis: bool = Field(False, description="是否启用同步分析")
+    pipelined: bool = Field(False, description="是否启用流水线模式：生成当前章时预取下一章上下文，分析在后台有界并发执行")
     enable_mcp: bool = Field(True, description="是否启用MCP工具增强（搜索参考资料）")
     max_retries: int = Field(10, description="每个章节的最大重试次数", ge=0, le=20)
     model: Optional[str] = Field(None, description="指定使用的AI模型，不提供则使用用户默认模型")
@@ -122,6 +134,8 @@ class BatchGenerateStatusResponse(BaseModel):
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
     error_message: Optional[str] = None
+    pipelined: bool = False
+    stage_metrics: Optional[dict] = None
 
 
 class SceneData(BaseModel):
@@ -8,6 +8,7 @@ class ExportOptions(BaseModel):
     """导出选项"""
     include_generation_history: bool = Field(False, description="是否包含生成历史")
     include_writing_styles: bool = Field(True, description="是否包含写作风格")
+    gzip: bool = Field(False, description="是否gzip压缩导出文件")
 
 
 class ChapterExportData(BaseModel):
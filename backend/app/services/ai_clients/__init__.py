@@ -2,5 +2,14 @@
 from .base_client import BaseAIClient
 from .openai_client import OpenAIClient
 from .anthropic_client import AnthropicClient
+from .llm_scheduler import LLMPriority, llm_scheduler, set_llm_user, with_llm_priority
 
-__all__ = ["BaseAIClient", "OpenAIClient", "AnthropicClient"]
\ No newline at end of file
+__all__ = [
+    "BaseAIClient",
+    "OpenAIClient",
+    "AnthropicClient",
+    "LLMPriority",
+    "llm_scheduler",
+    "set_llm_user",
+    "with_llm_priority",
+]
\ No newline at end of file
@@ -1,10 +1,12 @@
 """Anthropic 客户端"""
+import hashlib
 from typing import Any, AsyncGenerator, Dict, Optional
 
 from anthropic import AsyncAnthropic
 
 from app.logger import get_logger
 from app.services.ai_config import AIClientConfig, default_config
+from .llm_scheduler import estimate_request_tokens, llm_scheduler
 
 logger = get_logger(__name__)
 
@@ -18,6 +20,8 @@ class AnthropicClient:
         if base_url:
             kwargs["base_url"] = base_url
         self.client = AsyncAnthropic(**kwargs)
+        key_hash = hashlib.md5(api_key.encode()).hexdigest()[:8]
+        self.provider_key = f"{self.__class__.__name__}_{base_url or 'default'}_{key_hash}"
 
     async def chat_completion(
         self,
@@ -44,7 +48,9 @@ class AnthropicClient:
             elif tool_choice == "auto":
                 kwargs["tool_choice"] = {"type": "auto"}
 
-        response = await self.client.messages.create(**kwargs)
+        tokens = estimate_request_tokens(messages, max_tokens)
+        async with llm_scheduler.slot(self.provider_key, tokens, self.config.rate_limit):
+            response = await self.client.messages.create(**kwargs)
 
         tool_calls = []
         content = ""
@@ -82,7 +88,9 @@ class AnthropicClient:
             kwargs["system"] = system_prompt
 
         try:
-            async with self.client.messages.stream(**kwargs) as stream:
+            tokens = estimate_request_tokens(messages, max_tokens)
+            async with llm_scheduler.slot(self.provider_key, tokens, self.config.rate_limit, stream=True), \
+                    self.client.messages.stream(**kwargs) as stream:
                 try:
                     async for text in stream.text_stream:
                         yield text
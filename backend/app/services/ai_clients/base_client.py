@@ -2,26 +2,19 @@
 import asyncio
 import hashlib
 from abc import ABC, abstractmethod
-from typing import Any, AsyncGenerator, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Optional
 
 import httpx
 
 from app.logger import get_logger
 from app.services.ai_config import AIClientConfig, default_config
+from .llm_scheduler import estimate_request_tokens, llm_scheduler
 
 logger = get_logger(__name__)
 
 # 全局 HTTP 客户端池
 _http_client_pool: Dict[str, httpx.AsyncClient] = {}
-_global_semaphore: Optional[asyncio.Semaphore] = None
-
-
-def _get_semaphore(max_concurrent: int) -> asyncio.Semaphore:
-    """获取全局信号量"""
-    global _global_semaphore
-    if _global_semaphore is None:
-        _global_semaphore = asyncio.Semaphore(max_concurrent)
-    return _global_semaphore
 
 
 class BaseAIClient(ABC):
@@ -43,6 +36,11 @@ class BaseAIClient(ABC):
         key_hash = hashlib.md5(self.api_key.encode()).hexdigest()[:8]
         return f"{self.__class__.__name__}_{self.base_url}_{key_hash}"
 
+    @property
+    def provider_key(self) -> str:
+        """提供商标识（用于调度和响应缓存）"""
+        return self._get_client_key()
+
     def _get_or_create_client(self) -> httpx.AsyncClient:
         """获取或创建 HTTP 客户端"""
         client_key = self._get_client_key()
@@ -83,42 +81,68 @@ class BaseAIClient(ABC):
         payload: Dict[str, Any],
         stream: bool = False,
     ) -> Any:
-        """带重试的 HTTP 请求"""
+        """
+        带重试的 HTTP 请求（经 LLM 调度器准入）
+
+        流式请求返回异步上下文管理器，流式名额在整个流期间持有。
+        """
         url = f"{self.base_url}{endpoint}"
         headers = self._build_headers()
+
+        if stream:
+            return self._scheduled_stream(method, url, headers, payload)
+
+        async with self._schedule(payload):
+            return await self._send_with_retry(method, url, headers, payload)
+
+    def _schedule(self, payload: Dict[str, Any], stream: bool = False):
+        """按提供商申请调度许可（流式请求占用流式名额）"""
+        tokens = estimate_request_tokens(payload.get("messages", []), payload.get("max_tokens", 0))
+        return llm_scheduler.slot(self.provider_key, tokens, self.config.rate_limit, stream=stream)
+
+    @asynccontextmanager
+    async def _scheduled_stream(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+    ) -> AsyncIterator[httpx.Response]:
+        async with self._schedule(payload, stream=True):
+            async with self.http_client.stream(method, url, headers=headers, json=payload) as response:
+                yield response
+
+    async def _send_with_retry(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+    ) -> Any:
         retry_cfg = self.config.retry
-        rate_cfg = self.config.rate_limit
-
-        semaphore = _get_semaphore(rate_cfg.max_concurrent_requests)
-
-        async with semaphore:
-            await asyncio.sleep(rate_cfg.request_delay)
-
-            for attempt in range(retry_cfg.max_retries):
-                try:
-                    if attempt > 0:
-                        delay = min(
-                            retry_cfg.base_delay * (retry_cfg.exponential_base ** attempt),
-                            retry_cfg.max_delay,
-                        )
-                        logger.warning(f"⚠️ 重试 {attempt + 1}/{retry_cfg.max_retries}，等待 {delay}s")
-                        await asyncio.sleep(delay)
-
-                    if stream:
-                        return self.http_client.stream(method, url, headers=headers, json=payload)
-
-                    response = await self.http_client.request(method, url, headers=headers, json=payload)
-                    response.raise_for_status()
-                    return response.json()
-
-                except httpx.HTTPStatusError as e:
-                    if e.response.status_code in retry_cfg.non_retryable_status_codes:
-                        raise
-                    if attempt == retry_cfg.max_retries - 1:
-                        raise
-                except (httpx.ConnectError, httpx.TimeoutException):
-                    if attempt == retry_cfg.max_retries - 1:
-                        raise
+
+        for attempt in range(retry_cfg.max_retries):
+            try:
+                if attempt > 0:
+                    delay = min(
+                        retry_cfg.base_delay * (retry_cfg.exponential_base ** attempt),
+                        retry_cfg.max_delay,
+                    )
+                    logger.warning(f"⚠️ 重试 {attempt + 1}/{retry_cfg.max_retries}，等待 {delay}s")
+                    await asyncio.sleep(delay)
+
+                response = await self.http_client.request(method, url, headers=headers, json=payload)
+                response.raise_for_status()
+                return response.json()
+
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code in retry_cfg.non_retryable_status_codes:
+                    raise
+                if attempt == retry_cfg.max_retries - 1:
+                    raise
+            except (httpx.ConnectError, httpx.TimeoutException):
+                if attempt == retry_cfg.max_retries - 1:
+                    raise
 
     @abstractmethod
     async def chat_completion(
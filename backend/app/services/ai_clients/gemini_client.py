@@ -1,7 +1,9 @@
 """Gemini 客户端"""
+import hashlib
 from typing import Any, AsyncGenerator, Dict, List, Optional
 import httpx
 from app.services.ai_config import AIClientConfig, default_config
+from .llm_scheduler import estimate_request_tokens, llm_scheduler
 from app.logger import get_logger
 
 logger = get_logger(__name__)
@@ -14,6 +16,8 @@ class GeminiClient:
         self.api_key = api_key
         self.base_url = (base_url or "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
         self.config = config or default_config
+        key_hash = hashlib.md5(api_key.encode()).hexdigest()[:8]
+        self.provider_key = f"{self.__class__.__name__}_{self.base_url}_{key_hash}"
         http_cfg = self.config.http
         self.client = httpx.AsyncClient(
             timeout=httpx.Timeout(
@@ -70,7 +74,9 @@ class GeminiClient:
         if tools:
             payload["tools"] = self._convert_tools_to_gemini(tools)
 
-        response = await self.client.post(url, json=payload)
+        tokens = estimate_request_tokens(messages, max_tokens)
+        async with llm_scheduler.slot(self.provider_key, tokens, self.config.rate_limit):
+            response = await self.client.post(url, json=payload)
         response.raise_for_status()
         data = response.json()
         
@@ -127,7 +133,9 @@ class GeminiClient:
             payload["systemInstruction"] = {"parts": [{"text": system_prompt}]}
 
         try:
-            async with self.client.stream("POST", url, json=payload) as response:
+            tokens = estimate_request_tokens(messages, max_tokens)
+            async with llm_scheduler.slot(self.provider_key, tokens, self.config.rate_limit, stream=True), \
+                    self.client.stream("POST", url, json=payload) as response:
                 response.raise_for_status()
                 try:
                     async for line in response.aiter_lines():
@@ -0,0 +1,316 @@
+"""LLM 请求调度器 - 按提供商限流 + 用户间加权公平排队 + 优先级
+
+替代原先进程级的全局信号量和每次请求固定的 request_delay：
+- 每个提供商（base_url + API Key）独立的并发上限、请求令牌桶和 token 预算
+- 同一优先级内按用户做自时钟公平排队（SCFQ），单个用户的批量任务不会饿死其他用户
+- 优先级：交互式流 > 批量生成 > 后台分析
+- 流式请求在整个生成期间占用名额，与非流式请求分别计数（两个上限）；
+  优先级只决定排队顺序、不会抢占已准入的请求，因此两个上限中各预留 interactive_reserved_slots 个名额
+  只给交互式请求，批量生成与分段剧情分析的长流不能把名额占满
+- 记录排队/准入指标，供 /health/llm-scheduler 查看
+"""
+import asyncio
+import functools
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.logger import get_logger
+from app.services.ai_config import RateLimitConfig, default_config
+
+logger = get_logger(__name__)
+
+
+class LLMPriority(IntEnum):
+    """请求优先级（数值越小越优先）"""
+    INTERACTIVE = 0
+    BATCH = 1
+    BACKGROUND = 2
+
+
+_current_user: ContextVar[Optional[str]] = ContextVar("llm_user", default=None)
+_current_priority: ContextVar[LLMPriority] = ContextVar("llm_priority", default=LLMPriority.INTERACTIVE)
+
+
+def set_llm_user(user_id: Optional[str]):
+    """设置当前请求上下文的用户（由认证中间件调用，随上下文传递到后台任务）"""
+    _current_user.set(user_id)
+
+
+def with_llm_priority(priority: LLMPriority):
+    """
+    装饰器：在被装饰的协程执行期间使用指定优先级
+
+    被直接 await 的协程与调用方共享上下文，因此退出时需要恢复原优先级。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _current_priority.set(priority)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _current_priority.reset(token)
+        return wrapper
+    return decorator
+
+
+def estimate_request_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+    """粗略估算请求消耗的 token（输入按约2字符/token，输出按 max_tokens 计）"""
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in messages or [])
+    return prompt_chars // 2 + (max_tokens or 0)
+
+
+class TokenBucket:
+    """令牌桶"""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """取出 amount 个令牌还需等待的秒数（超过容量的请求按容量计）"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    finish_tag: float
+    seq: int
+    user_id: str = field(compare=False)
+    tokens: int = field(compare=False)
+    stream: bool = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class _ProviderQueue:
+    """单个提供商的准入队列"""
+
+    def __init__(self, key: str, config: RateLimitConfig, loop: asyncio.AbstractEventLoop):
+        self.key = key
+        self.config = config
+        self.loop = loop
+        self.in_flight = 0
+        self.streams_in_flight = 0
+        self.heap: List[_Waiter] = []
+        self.virtual_time = 0.0
+        self.user_finish: Dict[str, float] = {}
+        self.request_bucket = TokenBucket(config.requests_per_second, config.request_burst)
+        self.token_bucket = (
+            TokenBucket(config.tokens_per_minute / 60, config.tokens_per_minute)
+            if config.tokens_per_minute > 0 else None
+        )
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {
+            "admitted": {p.name.lower(): 0 for p in LLMPriority},
+            "wait_ms_total": {p.name.lower(): 0.0 for p in LLMPriority},
+            "wait_ms_max": {p.name.lower(): 0.0 for p in LLMPriority},
+            "throttled": 0,
+            "cancelled": 0,
+        }
+
+    def enqueue(self, user_id: str, priority: LLMPriority, tokens: int, seq: int, stream: bool = False) -> _Waiter:
+        # 自时钟公平排队：开始标签取系统虚拟时间与该用户上次完成标签的较大值
+        cost = 1 + tokens / 1000
+        start = max(self.virtual_time, self.user_finish.get(user_id, 0.0))
+        finish = start + cost
+        self.user_finish[user_id] = finish
+        waiter = _Waiter(
+            priority=int(priority),
+            finish_tag=finish,
+            seq=seq,
+            user_id=user_id,
+            tokens=tokens,
+            stream=stream,
+            enqueued_at=time.monotonic(),
+            future=self.loop.create_future(),
+        )
+        heapq.heappush(self.heap, waiter)
+        return waiter
+
+    def _has_capacity(self, waiter: _Waiter) -> bool:
+        """流式与非流式请求分别计数；非交互式请求不能占用预留给交互式请求的名额"""
+        if waiter.stream:
+            in_flight, limit = self.streams_in_flight, self.config.max_concurrent_streams
+        else:
+            in_flight, limit = self.in_flight, self.config.max_concurrent_requests
+        if waiter.priority != LLMPriority.INTERACTIVE:
+            limit = max(1, limit - self.config.interactive_reserved_slots)
+        return in_flight < limit
+
+    def _saturated(self) -> bool:
+        return (
+            self.in_flight >= self.config.max_concurrent_requests
+            and self.streams_in_flight >= self.config.max_concurrent_streams
+        )
+
+    def dispatch(self):
+        """按优先级和公平标签依次准入，受并发、请求速率和 token 预算约束"""
+        self._timer = None
+        now = time.monotonic()
+        # 所属名额已满的请求暂时跳过，不阻塞排在后面、使用另一类名额的请求
+        blocked: List[_Waiter] = []
+        while self.heap and not self._saturated():
+            waiter = self.heap[0]
+            if waiter.future.done():
+                heapq.heappop(self.heap)
+                continue
+            if not self._has_capacity(waiter):
+                blocked.append(heapq.heappop(self.heap))
+                continue
+
+            wait = self.request_bucket.wait_time(1, now)
+            if self.token_bucket:
+                wait = max(wait, self.token_bucket.wait_time(waiter.tokens, now))
+            if wait > 0:
+                self.stats["throttled"] += 1
+                self._timer = self.loop.call_later(wait, self.dispatch)
+                break
+
+            heapq.heappop(self.heap)
+            self.request_bucket.take(1)
+            if self.token_bucket:
+                self.token_bucket.take(waiter.tokens)
+            if waiter.stream:
+                self.streams_in_flight += 1
+            else:
+                self.in_flight += 1
+            self.virtual_time = waiter.finish_tag
+
+            name = LLMPriority(waiter.priority).name.lower()
+            waited_ms = (now - waiter.enqueued_at) * 1000
+            self.stats["admitted"][name] += 1
+            self.stats["wait_ms_total"][name] += waited_ms
+            self.stats["wait_ms_max"][name] = max(self.stats["wait_ms_max"][name], waited_ms)
+            waiter.future.set_result(None)
+
+        for waiter in blocked:
+            heapq.heappush(self.heap, waiter)
+
+        # 队列清空后回收用户标签，避免长期运行时无限增长
+        if not self.heap:
+            self.user_finish.clear()
+            self.virtual_time = 0.0
+
+    def release(self, stream: bool = False):
+        if stream:
+            self.streams_in_flight -= 1
+        else:
+            self.in_flight -= 1
+        if self._timer is None:
+            self.dispatch()
+
+    def snapshot(self) -> Dict[str, Any]:
+        queued = {p.name.lower(): 0 for p in LLMPriority}
+        users = set()
+        for waiter in self.heap:
+            if not waiter.future.done():
+                queued[LLMPriority(waiter.priority).name.lower()] += 1
+                users.add(waiter.user_id)
+        admitted = self.stats["admitted"]
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.config.max_concurrent_requests,
+            "streams_in_flight": self.streams_in_flight,
+            "max_concurrent_streams": self.config.max_concurrent_streams,
+            "interactive_reserved": self.config.interactive_reserved_slots,
+            "queued": queued,
+            "queued_users": len(users),
+            "admitted": dict(admitted),
+            "avg_wait_ms": {
+                name: round(self.stats["wait_ms_total"][name] / count, 2) if count else 0.0
+                for name, count in admitted.items()
+            },
+            "max_wait_ms": {name: round(v, 2) for name, v in self.stats["wait_ms_max"].items()},
+            "throttled": self.stats["throttled"],
+            "cancelled": self.stats["cancelled"],
+            "request_tokens": round(self.request_bucket.tokens, 2),
+            "budget_tokens": round(self.token_bucket.tokens, 2) if self.token_bucket else None,
+        }
+
+
+class LLMScheduler:
+    """LLM 请求调度器（进程级单例）"""
+
+    def __init__(self):
+        self._queues: Dict[str, _ProviderQueue] = {}
+        self._seq = itertools.count()
+
+    def _get_queue(self, provider_key: str, config: RateLimitConfig) -> _ProviderQueue:
+        loop = asyncio.get_running_loop()
+        queue = self._queues.get(provider_key)
+        if queue is None or queue.loop is not loop:
+            queue = _ProviderQueue(provider_key, config, loop)
+            self._queues[provider_key] = queue
+        return queue
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        provider_key: str,
+        tokens: int = 0,
+        config: Optional[RateLimitConfig] = None,
+        stream: bool = False,
+    ) -> AsyncIterator[None]:
+        """
+        获取一个请求许可，退出时归还
+
+        Args:
+            provider_key: 提供商标识（base_url + API Key 摘要）
+            tokens: 预估 token 数，用于 token 预算和公平排队权重
+            config: 限流配置
+            stream: 流式请求（在整个流期间持有，占用流式名额）
+        """
+        queue = self._get_queue(provider_key, config or default_config.rate_limit)
+        user_id = _current_user.get() or "anonymous"
+        priority = _current_priority.get()
+        waiter = queue.enqueue(user_id, priority, tokens, next(self._seq), stream)
+        queue.dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已准入但调用方被取消，归还许可
+                queue.release(stream)
+            else:
+                waiter.future.cancel()
+                queue.stats["cancelled"] += 1
+            raise
+
+        try:
+            yield
+        finally:
+            queue.release(stream)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取准入指标
+
+        Returns:
+            每个提供商的并发、排队、准入次数与等待时间
+        """
+        return {key: queue.snapshot() for key, queue in self._queues.items()}
+
+
+llm_scheduler = LLMScheduler()
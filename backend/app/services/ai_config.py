@@ -2,6 +2,8 @@
 from dataclasses import dataclass, field
 from typing import Optional
 
+from app.config import settings
+
 
 @dataclass
 class HTTPClientConfig:
@@ -27,9 +29,13 @@ class RetryConfig:
 
 @dataclass
 class RateLimitConfig:
-    """限流配置"""
-    max_concurrent_requests: int = 5
-    request_delay: float = 0.2
+    """限流配置（按提供商生效，见 llm_scheduler；并发上限默认取自 Settings）"""
+    max_concurrent_requests: int = field(default_factory=lambda: settings.llm_max_concurrent_requests)
+    max_concurrent_streams: int = field(default_factory=lambda: settings.llm_max_concurrent_streams)
+    interactive_reserved_slots: int = field(default_factory=lambda: settings.llm_interactive_reserved_slots)
+    requests_per_second: float = 5.0
+    request_burst: int = 5
+    tokens_per_minute: int = 0  # 0 表示不限制 token 预算
 
 
 @dataclass
@@ -13,6 +13,8 @@ from app.services.ai_providers.anthropic_provider import AnthropicProvider
 from app.services.ai_providers.gemini_provider import GeminiProvider
 from app.services.ai_providers.base_provider import BaseAIProvider
 from app.services.json_helper import clean_json_response, parse_json
+from app.services.llm_response_cache import llm_response_cache
+from app.utils.stream_buffer import StreamTextBuffer
 from app.mcp.adapters.universal import universal_mcp_adapter
 
 # 导出清理函数
@@ -89,19 +91,56 @@ class AIService:
         system_prompt: Optional[str] = None,
         tools: Optional[List[Dict]] = None,
         tool_choice: Optional[str] = None,
+        use_cache: bool = False,
     ) -> Dict[str, Any]:
-        """生成文本"""
+        """
+        生成文本
+        
+        默认不使用响应缓存（重新生成需要新的结果）；质量复查、一致性检查等确定性调用可传 use_cache=True，
+        在启用LLM响应缓存时相同参数的非工具调用直接返回缓存结果。
+        """
         prov = self._get_provider(provider)
-        return await prov.generate(
+        params = self._resolve_params(prompt, model, temperature, max_tokens, system_prompt)
+        
+        cache_key = self._response_cache_key(prov, params) if use_cache and not tools else None
+        if cache_key:
+            cached = await llm_response_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"⚡ LLM响应缓存命中: {params['model']}")
+                return cached
+        elif llm_response_cache and not use_cache:
+            llm_response_cache.record_bypass()
+        
+        result = await prov.generate(**params, tools=tools, tool_choice=tool_choice)
+        
+        if cache_key and result.get("content") and not result.get("tool_calls"):
+            await llm_response_cache.put(cache_key, result, provider=prov.client.provider_key, model=params["model"])
+        return result
+
+    def _resolve_params(
+        self,
+        prompt: str,
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        system_prompt: Optional[str],
+    ) -> Dict[str, Any]:
+        """补全默认生成参数"""
+        return dict(
             prompt=prompt,
             model=model or self.default_model,
             temperature=temperature or self.default_temperature,
             max_tokens=max_tokens or self.default_max_tokens,
             system_prompt=system_prompt or self.default_system_prompt,
-            tools=tools,
-            tool_choice=tool_choice,
         )
 
+    @staticmethod
+    def _response_cache_key(prov: BaseAIProvider, params: Dict[str, Any]) -> Optional[str]:
+        """响应缓存键（缓存未启用时返回None）"""
+        if not llm_response_cache:
+            return None
+        return llm_response_cache.make_key(provider=prov.client.provider_key, **params)
+
     async def generate_text_stream(
         self,
         prompt: str,
@@ -110,17 +149,54 @@ class AIService:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         system_prompt: Optional[str] = None,
+        use_cache: bool = False,
     ) -> AsyncGenerator[str, None]:
-        """流式生成"""
+        """
+        流式生成
+        
+        use_cache=True 时命中响应缓存则整段返回缓存内容，未命中时正常流式输出并在结束后缓存全文；
+        调用方校验结果失败（如JSON解析失败）时应调用 discard_cached_response，避免重试取到同一结果。
+        """
         prov = self._get_provider(provider)
-        async for chunk in prov.generate_stream(
-            prompt=prompt,
-            model=model or self.default_model,
-            temperature=temperature or self.default_temperature,
-            max_tokens=max_tokens or self.default_max_tokens,
-            system_prompt=system_prompt or self.default_system_prompt,
-        ):
+        params = self._resolve_params(prompt, model, temperature, max_tokens, system_prompt)
+        
+        cache_key = self._response_cache_key(prov, params) if use_cache else None
+        if cache_key:
+            cached = await llm_response_cache.get(cache_key)
+            if cached is not None and cached.get("content"):
+                logger.debug(f"⚡ LLM响应缓存命中（流式）: {params['model']}")
+                yield cached["content"]
+                return
+        elif llm_response_cache:
+            llm_response_cache.record_bypass()
+        
+        content_buffer = StreamTextBuffer() if cache_key else None
+        async for chunk in prov.generate_stream(**params):
+            if content_buffer is not None:
+                content_buffer.append(chunk)
             yield chunk
+        
+        if content_buffer is not None and content_buffer.getvalue():
+            await llm_response_cache.put(
+                cache_key, {"content": content_buffer.getvalue()},
+                provider=prov.client.provider_key, model=params["model"]
+            )
+
+    async def discard_cached_response(
+        self,
+        prompt: str,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+    ):
+        """删除与这组请求参数对应的缓存响应（结果未通过调用方校验时使用）"""
+        if not llm_response_cache:
+            return
+        prov = self._get_provider(provider)
+        params = self._resolve_params(prompt, model, temperature, max_tokens, system_prompt)
+        await llm_response_cache.delete(self._response_cache_key(prov, params))
 
     async def call_with_json_retry(
         self,
@@ -132,20 +208,29 @@ class AIService:
         provider: Optional[str] = None,
         model: Optional[str] = None,
         expected_type: Optional[str] = None,
+        use_cache: bool = False,
     ) -> Union[Dict, List]:
-        """带重试的 JSON 调用"""
+        """带重试的 JSON 调用（use_cache=True 时使用响应缓存，默认不使用）"""
         last_response = ""
         
+        # 只缓存解析成功的结果（以原始提示词为键），避免缓存无效JSON导致重复重试
+        prov = self._get_provider(provider)
+        cache_key = None
+        if use_cache and llm_response_cache:
+            params = self._resolve_params(prompt, model, temperature, max_tokens, system_prompt)
+            cache_key = self._response_cache_key(prov, {**params, "expected_type": expected_type})
+            cached = await llm_response_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("⚡ LLM JSON响应缓存命中")
+                return cached["data"]
+        elif llm_response_cache:
+            llm_response_cache.record_bypass()
+        
         for attempt in range(1, max_retries + 1):
             current_prompt = prompt if attempt == 1 else self._add_json_hint(prompt, last_response, attempt)
             
-            result = await self.generate_text(
-                prompt=current_prompt,
-                provider=provider,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                system_prompt=system_prompt,
+            result = await prov.generate(
+                **self._resolve_params(current_prompt, model, temperature, max_tokens, system_prompt)
             )
             
             last_response = result.get("content", "")
@@ -156,6 +241,8 @@ class AIService:
                     raise ValueError("期望对象")
                 if expected_type == "array" and not isinstance(data, list):
                     raise ValueError("期望数组")
+                if cache_key:
+                    await llm_response_cache.put(cache_key, {"data": data}, provider=prov.client.provider_key, model=model or self.default_model)
                 return data
             except Exception as e:
                 if attempt == max_retries:
@@ -1,18 +1,22 @@
 """章节上下文构建服务 - 实现RTCO框架的智能上下文构建"""
 
 from dataclasses import dataclass, field
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Awaitable
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, func, case
+import asyncio
+import hashlib
 import json
+import time
 
 from app.models.chapter import Chapter
 from app.models.project import Project
 from app.models.outline import Outline
-from app.models.character import Character
 from app.models.career import Career, CharacterCareer
 from app.models.memory import StoryMemory
 from app.models.foreshadow import Foreshadow, ForeshadowStatus
+from app.models.chapter_summary_group import ChapterSummaryGroup
+from app.services.world_snapshot import world_snapshot_cache
 from app.logger import get_logger
 
 logger = get_logger(__name__)
@@ -76,6 +80,21 @@ class ChapterContext:
         return total
 
 
+@dataclass
+class ContextSection:
+    """
+    上下文片段声明
+    
+    build 接收一个数据库会话并返回片段文本，结果写入 ChapterContext 的同名字段。
+    各片段互不依赖，可并发构建。
+    """
+    name: str                                   # ChapterContext字段名
+    label: str                                  # 日志中显示的名称
+    build: Callable[[AsyncSession], Awaitable[Optional[str]]]
+    enabled: bool = True                        # 是否需要构建
+    uses_db: bool = True                        # 是否需要独立数据库会话
+
+
 class ChapterContextBuilder:
     """
     章节上下文构建器
@@ -125,6 +144,14 @@ class ChapterContextBuilder:
         }
     }
     
+    # 不依赖上一章正文、可在上一章生成期间预取的片段
+    PREFETCHABLE_SECTIONS = (
+        "chapter_characters",
+        "full_outline_context",
+        "foreshadow_context",
+        "style_guide",
+    )
+    
     def __init__(self, memory_service=None):
         """
         初始化构建器
@@ -143,7 +170,8 @@ class ChapterContextBuilder:
         db: AsyncSession,
         style_content: Optional[str] = None,
         target_word_count: int = 3000,
-        temp_narrative_perspective: Optional[str] = None
+        temp_narrative_perspective: Optional[str] = None,
+        prefetched_sections: Optional[Dict[str, Optional[str]]] = None
     ) -> ChapterContext:
         """
         构建章节生成所需的上下文
@@ -157,11 +185,13 @@ class ChapterContextBuilder:
             style_content: 写作风格内容（可选）
             target_word_count: 目标字数
             temp_narrative_perspective: 临时叙事视角（可选，覆盖项目默认）
+            prefetched_sections: 已预取的上下文片段（见 prefetch），命中的片段不再重复构建
         
         Returns:
             ChapterContext: 结构化的上下文对象
         """
         chapter_number = chapter.chapter_number
+        build_start = time.perf_counter()
         logger.info(f"📝 开始构建章节上下文: 第{chapter_number}章")
         
         # 确定叙事视角
@@ -189,86 +219,32 @@ class ChapterContextBuilder:
             chapter, outline, project.outline_mode
         )
         
-        # === 衔接锚点（根据章节调整长度，大幅增加）===
-        if chapter_number == 1:
-            context.continuation_point = None
-            logger.info("  ✅ 第1章无需衔接锚点")
-        elif chapter_number <= 10:
-            context.continuation_point = await self._get_last_ending(
-                chapter, db, self.ENDING_LENGTH_SHORT
-            )
-            logger.info(f"  ✅ 衔接锚点（1-10章）: {len(context.continuation_point or '')}字符")
-        elif chapter_number <= 30:
-            context.continuation_point = await self._get_last_ending(
-                chapter, db, self.ENDING_LENGTH_NORMAL
-            )
-            logger.info(f"  ✅ 衔接锚点（11-30章）: {len(context.continuation_point or '')}字符")
-        else:
-            context.continuation_point = await self._get_last_ending(
-                chapter, db, self.ENDING_LENGTH_LONG
-            )
-            logger.info(f"  ✅ 衔接锚点（31章+）: {len(context.continuation_point or '')}字符")
-        
-        # === P1-重要信息 ===
-        context.chapter_characters = await self._build_chapter_characters(
-            chapter, project, outline, db
-        )
+        # === P1-重要信息（无数据库依赖）===
         context.emotional_tone = self._extract_emotional_tone(chapter, outline)
         
         # 写作风格（摘要化）
         if style_content:
             context.style_instruction = self._summarize_style(style_content)
         
-        # === P2-参考信息（条件触发，更早启用）===
-        # 从第5章开始就获取记忆，帮助保持连贯性
-        if chapter_number > 5 and self.memory_service:
-            if chapter_number <= 30:
-                memory_limit = self.MEMORY_COUNT_LIGHT
-            elif chapter_number <= 50:
-                memory_limit = self.MEMORY_COUNT_MEDIUM
-            else:
-                memory_limit = self.MEMORY_COUNT_FULL
-            context.relevant_memories = await self._get_relevant_memories(
-                user_id, project.id, chapter_number, 
-                context.chapter_outline,
-                limit=memory_limit
-            )
-            logger.info(f"  ✅ 相关记忆: {len(context.relevant_memories or '')}字符")
+        # === 声明各上下文片段及其输入，互不依赖的片段并发构建 ===
+        sections = self._declare_sections(chapter, project, outline, user_id, context)
         
-        # 故事骨架（20章+，更早启用）
-        if chapter_number > self.SKELETON_THRESHOLD:
-            context.story_skeleton = await self._build_story_skeleton(
-                project.id, chapter_number, db
-            )
-            logger.info(f"  ✅ 故事骨架: {len(context.story_skeleton or '')}字符")
+        if chapter_number == 1:
+            logger.info("  ✅ 第1章无需衔接锚点")
         
-        # === 前几章摘要（第3章开始，增强连贯性）===
-        if chapter_number >= 3:
-            context.previous_chapters_summary = await self._build_previous_chapters_summary(
-                project.id, chapter_number, db
-            )
-            if context.previous_chapters_summary:
-                logger.info(f"  ✅ 前章摘要: {len(context.previous_chapters_summary)}字符")
+        # 已预取的片段直接使用
+        prefetched_sections = prefetched_sections or {}
+        for name, value in prefetched_sections.items():
+            setattr(context, name, value)
+        if prefetched_sections:
+            logger.info(f"  ⚡ 使用预取片段: {', '.join(prefetched_sections)}")
         
-        # === 完整大纲上下文（把握全局方向）===
-        context.full_outline_context = await self._build_full_outline_context(
-            project.id, chapter_number, db
+        section_timings = await self._run_sections(
+            [section for section in sections if section.enabled and section.name not in prefetched_sections],
+            context, user_id, db
         )
-        if context.full_outline_context:
-            logger.info(f"  ✅ 大纲上下文: {len(context.full_outline_context)}字符")
-        
-        # === 伏笔上下文（始终构建）===
-        context.foreshadow_context = await self._build_foreshadow_context(
-            project.id, chapter_number, db
-        )
-        if context.foreshadow_context:
-            logger.info(f"  ✅ 伏笔上下文: {len(context.foreshadow_context)}字符")
-        
-        # === 风格指南（章节数 >= 3 时启用）===
-        if chapter_number >= 3:
-            context.style_guide = await self._build_style_guide(project, db)
-            if context.style_guide:
-                logger.info(f"  ✅ 风格指南: {len(context.style_guide)}字符")
+        for name in prefetched_sections:
+            section_timings[name] = 0.0
         
         # === 统计信息 ===
         context.context_stats = {
@@ -282,13 +258,206 @@ class ChapterContextBuilder:
             "outline_context_length": len(context.full_outline_context or ""),
             "foreshadow_length": len(context.foreshadow_context or ""),
             "style_guide_length": len(context.style_guide or ""),
-            "total_length": context.get_total_context_length()
+            "total_length": context.get_total_context_length(),
+            "section_timings_ms": section_timings,
+            "build_ms": round((time.perf_counter() - build_start) * 1000, 2)
         }
         
-        logger.info(f"📊 上下文构建完成: 总长度 {context.context_stats['total_length']} 字符")
+        logger.info(
+            f"📊 上下文构建完成: 总长度 {context.context_stats['total_length']} 字符, "
+            f"耗时 {context.context_stats['build_ms']}ms"
+        )
         
         return context
     
+    def _declare_sections(
+        self,
+        chapter: Chapter,
+        project: Project,
+        outline: Optional[Outline],
+        user_id: str,
+        context: ChapterContext
+    ) -> List[ContextSection]:
+        """
+        声明本章的上下文片段及其输入
+        
+        所有片段只依赖 project_id / chapter_number / 已加载的对象，以及已构建好的本章大纲，互不依赖
+        """
+        chapter_number = chapter.chapter_number
+        if chapter_number <= 10:
+            ending_length, ending_label = self.ENDING_LENGTH_SHORT, "1-10章"
+        elif chapter_number <= 30:
+            ending_length, ending_label = self.ENDING_LENGTH_NORMAL, "11-30章"
+        else:
+            ending_length, ending_label = self.ENDING_LENGTH_LONG, "31章+"
+        
+        if chapter_number <= 30:
+            memory_limit = self.MEMORY_COUNT_LIGHT
+        elif chapter_number <= 50:
+            memory_limit = self.MEMORY_COUNT_MEDIUM
+        else:
+            memory_limit = self.MEMORY_COUNT_FULL
+        
+        return [
+            # 衔接锚点（根据章节调整长度，大幅增加）
+            ContextSection(
+                name="continuation_point",
+                label=f"衔接锚点（{ending_label}）",
+                enabled=chapter_number > 1,
+                build=lambda session: self._get_last_ending(chapter, session, ending_length)
+            ),
+            ContextSection(
+                name="chapter_characters",
+                label="本章角色",
+                build=lambda session: self._build_chapter_characters(chapter, project, outline, session)
+            ),
+            # 从第5章开始就获取记忆，帮助保持连贯性
+            ContextSection(
+                name="relevant_memories",
+                label="相关记忆",
+                enabled=chapter_number > 5 and self.memory_service is not None,
+                uses_db=False,
+                build=lambda session: self._get_relevant_memories(
+                    user_id, project.id, chapter_number,
+                    context.chapter_outline,
+                    limit=memory_limit
+                )
+            ),
+            # 故事骨架（20章+，更早启用）
+            ContextSection(
+                name="story_skeleton",
+                label="故事骨架",
+                enabled=chapter_number > self.SKELETON_THRESHOLD,
+                build=lambda session: self._build_story_skeleton(project.id, chapter_number, session)
+            ),
+            # 前几章摘要（第3章开始，增强连贯性）
+            ContextSection(
+                name="previous_chapters_summary",
+                label="前章摘要",
+                enabled=chapter_number >= 3,
+                build=lambda session: self._build_previous_chapters_summary(project.id, chapter_number, user_id, session)
+            ),
+            # 完整大纲上下文（把握全局方向）
+            ContextSection(
+                name="full_outline_context",
+                label="大纲上下文",
+                build=lambda session: self._build_full_outline_context(project.id, chapter_number, session)
+            ),
+            # 伏笔上下文（始终构建）
+            ContextSection(
+                name="foreshadow_context",
+                label="伏笔上下文",
+                build=lambda session: self._build_foreshadow_context(project.id, chapter_number, session)
+            ),
+            # 风格指南（章节数 >= 3 时启用）
+            ContextSection(
+                name="style_guide",
+                label="风格指南",
+                enabled=chapter_number >= 3,
+                build=lambda session: self._build_style_guide(project, session)
+            ),
+        ]
+
+    async def prefetch(
+        self,
+        chapter: Chapter,
+        project: Project,
+        outline: Optional[Outline],
+        user_id: str,
+        db: AsyncSession
+    ) -> Dict[str, Optional[str]]:
+        """
+        预取不依赖上一章正文的上下文片段（用于批量生成流水线）
+        
+        上一章仍在生成时即可调用，结果通过 build(prefetched_sections=...) 传回。
+        风格指南基于前3章，只有当前3章早于上一章完成时（第5章起）才可预取。
+        
+        Args:
+            chapter: 待生成的章节对象
+            project: 项目对象
+            outline: 大纲对象（可选）
+            user_id: 用户ID
+            db: 数据库会话
+        
+        Returns:
+            {片段字段名: 片段文本}
+        """
+        names = set(self.PREFETCHABLE_SECTIONS)
+        if chapter.chapter_number <= 4:
+            names.discard("style_guide")
+        
+        context = ChapterContext(chapter_number=chapter.chapter_number)
+        sections = [
+            section for section in self._declare_sections(chapter, project, outline, user_id, context)
+            if section.enabled and section.name in names
+        ]
+        await self._run_sections(sections, context, user_id, db)
+        return {section.name: getattr(context, section.name) for section in sections}
+    
+    async def _run_sections(
+        self,
+        sections: List[ContextSection],
+        context: ChapterContext,
+        user_id: str,
+        db: AsyncSession
+    ) -> Dict[str, float]:
+        """
+        并发构建上下文片段
+        
+        每个需要数据库的片段使用独立的只读会话作用域（同一个AsyncSession不允许并发执行查询），
+        结果写回 context 的同名字段。
+        
+        Args:
+            sections: 已启用的上下文片段
+            context: 待填充的上下文对象
+            user_id: 用户ID（用于获取该用户的会话工厂）
+            db: 调用方的数据库会话（未绑定引擎时退化为共用该会话顺序构建）
+        
+        Returns:
+            各片段耗时（毫秒）
+        """
+        from app.database import session_scope
+        
+        timings: Dict[str, float] = {}
+        
+        async def run(section: ContextSection, shared_session: Optional[AsyncSession] = None):
+            start = time.perf_counter()
+            try:
+                if not section.uses_db:
+                    return await section.build(None)
+                if shared_session is not None:
+                    return await section.build(shared_session)
+                async with session_scope(user_id, read_only=True, name="chapter_context") as session:
+                    return await section.build(session)
+            finally:
+                timings[section.name] = round((time.perf_counter() - start) * 1000, 2)
+        
+        if db.bind is None:
+            # 无法创建独立会话，共用调用方会话顺序执行
+            results = []
+            for section in sections:
+                try:
+                    results.append(await run(section, db))
+                except Exception as e:
+                    results.append(e)
+        else:
+            results = await asyncio.gather(
+                *(run(section) for section in sections),
+                return_exceptions=True
+            )
+        
+        # 所有片段结束后再抛出异常，确保独立会话都已关闭
+        for section, result in zip(sections, results):
+            if isinstance(result, BaseException):
+                logger.error(f"❌ 构建{section.label}失败: {str(result)}")
+                raise result
+            setattr(context, section.name, result)
+            logger.info(
+                f"  ✅ {section.label}: {len(result or '')}字符 ({timings.get(section.name, 0)}ms)"
+            )
+        
+        return timings
+    
     async def _build_chapter_outline(
         self,
         chapter: Chapter,
@@ -389,11 +558,9 @@ class ChapterContextBuilder:
         Returns:
             本章角色信息文本
         """
-        # 获取所有角色
-        characters_result = await db.execute(
-            select(Character).where(Character.project_id == project.id)
-        )
-        characters = characters_result.scalars().all()
+        # 获取所有角色（世界状态快照，批量生成时不重复查询）
+        snapshot = await world_snapshot_cache.get(db, project.id)
+        characters = snapshot.characters
         
         if not characters:
             return "暂无角色信息"
@@ -419,28 +586,31 @@ class ChapterContextBuilder:
         
         # 筛选角色
         if filter_character_names:
-            characters = [c for c in characters if c.name in filter_character_names]
+            characters = snapshot.filter_characters(filter_character_names)
         
         if not characters:
             return "暂无相关角色"
         
         # 构建精简的角色信息（每个角色最多100字符）
-        char_lines = []
-        for c in characters[:10]:  # 最多10个角色
-            role_type = "主角" if c.role_type == "protagonist" else (
-                "反派" if c.role_type == "antagonist" else "配角"
-            )
+        def build() -> str:
+            char_lines = []
+            for c in characters[:10]:  # 最多10个角色
+                role_type = "主角" if c.role_type == "protagonist" else (
+                    "反派" if c.role_type == "antagonist" else "配角"
+                )
+                
+                # 性格摘要（最多50字符）
+                personality_brief = ""
+                if c.personality:
+                    personality_brief = c.personality[:50]
+                    if len(c.personality) > 50:
+                        personality_brief += "..."
+                
+                char_lines.append(f"- {c.name}({role_type}): {personality_brief}")
             
-            # 性格摘要（最多50字符）
-            personality_brief = ""
-            if c.personality:
-                personality_brief = c.personality[:50]
-                if len(c.personality) > 50:
-                    personality_brief += "..."
-            
-            char_lines.append(f"- {c.name}({role_type}): {personality_brief}")
+            return "\n".join(char_lines)
         
-        return "\n".join(char_lines)
+        return snapshot.memo(("chapter_characters", tuple(c.id for c in characters[:10])), build)
     
     def _extract_emotional_tone(
         self,
@@ -825,6 +995,7 @@ class ChapterContextBuilder:
         self,
         project_id: str,
         chapter_number: int,
+        user_id: str,
         db: AsyncSession
     ) -> Optional[str]:
         """
@@ -835,6 +1006,10 @@ class ChapterContextBuilder:
         - 中期层（第26-40章）：每5章合并摘要，约1500字/组 = 4500字
         - 远期层（第1-25章）：每10章合并摘要，约1200字/组 = 3600字
         总计约：20000字，充分利用上下文空间
+        
+        远期/中期分组按章节号对齐，合并结果物化到 chapter_summary_groups 表，
+        只有组内章节发生变化（指纹不同）时才重新合并。
+        查询只投影元数据列，章节摘要足够时不会加载 content。
         """
         if chapter_number <= 1:
             return None
@@ -842,16 +1017,21 @@ class ChapterContextBuilder:
         config = self.TIERED_CONTEXT_CONFIG
         summaries = []
         
-        # 获取所有前置章节
+        # 获取所有前置章节的元数据（不加载 content/summary 正文）
         result = await db.execute(
-            select(Chapter)
+            select(
+                Chapter.id,
+                Chapter.chapter_number,
+                Chapter.updated_at,
+                func.coalesce(func.length(Chapter.summary), 0).label("summary_length")
+            )
             .where(Chapter.project_id == project_id)
             .where(Chapter.chapter_number < chapter_number)
             .where(Chapter.content.isnot(None))
             .where(Chapter.content != "")
             .order_by(Chapter.chapter_number)
         )
-        all_chapters = result.scalars().all()
+        all_chapters = result.all()
         
         if not all_chapters:
             return None
@@ -864,46 +1044,44 @@ class ChapterContextBuilder:
         medium_chapters = [ch for ch in all_chapters if medium_start <= ch.chapter_number < recent_start]
         distant_chapters = [ch for ch in all_chapters if ch.chapter_number < medium_start]
         
+        distant_groups = self._group_by_chapter_number(distant_chapters, config["distant"]["group_size"])
+        medium_groups = self._group_by_chapter_number(medium_chapters, config["medium"]["group_size"])
+        
+        group_summaries = await self._load_group_summaries(
+            project_id,
+            [("distant", group, config["distant"]["chars_per_group"]) for group in distant_groups] +
+            [("medium", group, config["medium"]["chars_per_group"]) for group in medium_groups],
+            user_id,
+            db
+        )
+        
         # === 第1层：远期摘要（最早的章节，压缩最狠）===
-        if distant_chapters:
+        if distant_groups:
             summaries.append("【远期剧情回顾】")
-            group_size = config["distant"]["group_size"]
-            chars_per_group = config["distant"]["chars_per_group"]
-            
-            # 按组合并
-            for i in range(0, len(distant_chapters), group_size):
-                group = distant_chapters[i:i+group_size]
-                if group:
-                    start_ch = group[0].chapter_number
-                    end_ch = group[-1].chapter_number
-                    
-                    # 合并该组的摘要
-                    group_summary = self._merge_chapter_summaries(group, chars_per_group)
-                    summaries.append(f"\n--- 第{start_ch}-{end_ch}章概要 ---")
-                    summaries.append(group_summary)
+            for group in distant_groups:
+                start_ch = group[0].chapter_number
+                end_ch = group[-1].chapter_number
+                summaries.append(f"\n--- 第{start_ch}-{end_ch}章概要 ---")
+                summaries.append(group_summaries[("distant", start_ch, end_ch)])
         
         # === 第2层：中期摘要（中等距离，适度压缩）===
-        if medium_chapters:
+        if medium_groups:
             summaries.append("\n【中期剧情发展】")
-            group_size = config["medium"]["group_size"]
-            chars_per_group = config["medium"]["chars_per_group"]
-            
-            for i in range(0, len(medium_chapters), group_size):
-                group = medium_chapters[i:i+group_size]
-                if group:
-                    start_ch = group[0].chapter_number
-                    end_ch = group[-1].chapter_number
-                    
-                    group_summary = self._merge_chapter_summaries(group, chars_per_group)
-                    summaries.append(f"\n--- 第{start_ch}-{end_ch}章概要 ---")
-                    summaries.append(group_summary)
+            for group in medium_groups:
+                start_ch = group[0].chapter_number
+                end_ch = group[-1].chapter_number
+                summaries.append(f"\n--- 第{start_ch}-{end_ch}章概要 ---")
+                summaries.append(group_summaries[("medium", start_ch, end_ch)])
         
         # === 第3层：近期详情（最近的章节，详细保留）===
         if recent_chapters:
             summaries.append("\n【近期剧情详情】")
             chars_per_chapter = config["recent"]["chars_per_chapter"]
             
-            for ch in recent_chapters:
+            recent_sources = await self._load_summary_sources(
+                [ch.id for ch in recent_chapters], min_summary_length=100, db=db
+            )
+            for ch in recent_sources:
                 chapter_summary = self._get_chapter_summary(ch, chars_per_chapter)
                 summaries.append(f"\n=== 第{ch.chapter_number}章《{ch.title}》===")
                 summaries.append(chapter_summary)
@@ -913,6 +1091,166 @@ class ChapterContextBuilder:
         
         return result_text
     
+    @staticmethod
+    def _group_by_chapter_number(chapters: List[Any], group_size: int) -> List[List[Any]]:
+        """
+        按章节号对齐分组（第1-10章、第11-20章……），层级边界处的分组可能不完整
+        
+        对齐分组保证同一组在相邻章节的生成中保持不变，从而可以复用物化结果
+        """
+        groups: Dict[int, List[Any]] = {}
+        for ch in chapters:
+            groups.setdefault((ch.chapter_number - 1) // group_size, []).append(ch)
+        return [groups[key] for key in sorted(groups)]
+    
+    @staticmethod
+    def _group_fingerprint(group: List[Any], chars_per_group: int) -> str:
+        """计算分组指纹：组内任一章节增删、更新或摘要长度变化都会改变指纹"""
+        parts = [str(chars_per_group)]
+        for ch in group:
+            parts.append(f"{ch.id}:{ch.chapter_number}:{ch.updated_at}:{ch.summary_length}")
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+    
+    async def _load_summary_sources(
+        self,
+        chapter_ids: List[str],
+        min_summary_length: int,
+        db: AsyncSession
+    ) -> List[Any]:
+        """
+        加载生成摘要所需的章节字段
+        
+        仅当摘要长度不足 min_summary_length 时才在SQL中返回 content，否则 content 为 NULL
+        """
+        if not chapter_ids:
+            return []
+        result = await db.execute(
+            select(
+                Chapter.id,
+                Chapter.chapter_number,
+                Chapter.title,
+                Chapter.summary,
+                case(
+                    (func.coalesce(func.length(Chapter.summary), 0) >= min_summary_length, None),
+                    else_=Chapter.content
+                ).label("content")
+            )
+            .where(Chapter.id.in_(chapter_ids))
+            .order_by(Chapter.chapter_number)
+        )
+        return result.all()
+    
+    async def _load_group_summaries(
+        self,
+        project_id: str,
+        groups: List[tuple],
+        user_id: str,
+        db: AsyncSession
+    ) -> Dict[tuple, str]:
+        """
+        读取（或重新合并并物化）分组摘要
+        
+        Args:
+            project_id: 项目ID
+            groups: (层级, 分组章节元数据, 分组字数上限) 列表
+            user_id: 用户ID（物化写入使用该用户的独立会话作用域）
+            db: 数据库会话（只用于读取）
+        
+        Returns:
+            {(层级, 起始章节, 结束章节): 分组摘要}
+        """
+        if not groups:
+            return {}
+        
+        cached_result = await db.execute(
+            select(ChapterSummaryGroup).where(ChapterSummaryGroup.project_id == project_id)
+        )
+        cached = {
+            (row.tier, row.start_chapter, row.end_chapter, row.chars_per_group): row
+            for row in cached_result.scalars().all()
+        }
+        
+        summaries: Dict[tuple, str] = {}
+        stale = []
+        for tier, group, chars_per_group in groups:
+            start_ch, end_ch = group[0].chapter_number, group[-1].chapter_number
+            fingerprint = self._group_fingerprint(group, chars_per_group)
+            row = cached.get((tier, start_ch, end_ch, chars_per_group))
+            if row is not None and row.fingerprint == fingerprint:
+                summaries[(tier, start_ch, end_ch)] = row.content
+            else:
+                stale.append((tier, group, chars_per_group, fingerprint, row))
+        
+        if not stale:
+            return summaries
+        
+        # 只为失效的分组加载摘要/内容
+        sources = await self._load_summary_sources(
+            [ch.id for _, group, _, _, _ in stale for ch in group],
+            min_summary_length=50,
+            db=db
+        )
+        sources_by_id = {ch.id: ch for ch in sources}
+        
+        writes = []
+        for tier, group, chars_per_group, fingerprint, row in stale:
+            start_ch, end_ch = group[0].chapter_number, group[-1].chapter_number
+            content = self._merge_chapter_summaries(
+                [sources_by_id[ch.id] for ch in group if ch.id in sources_by_id],
+                chars_per_group
+            )
+            summaries[(tier, start_ch, end_ch)] = content
+            writes.append(((tier, start_ch, end_ch, chars_per_group), fingerprint, content))
+        
+        # 清理当前布局用不到的分组：层级边界随章节推进而移动，不完整分组和移出中期窗口的分组不会再被复用
+        current_keys = {(tier, group[0].chapter_number, group[-1].chapter_number) for tier, group, _ in groups}
+        obsolete_ids = []
+        for (tier, start_ch, end_ch, _), row in cached.items():
+            if (tier, start_ch, end_ch) in current_keys:
+                continue
+            group_size = self.TIERED_CONTEXT_CONFIG.get(tier, {}).get("group_size", 0)
+            if tier == "medium" or end_ch - start_ch + 1 < group_size:
+                obsolete_ids.append(row.id)
+        
+        # 物化写入使用独立的读写会话作用域，不提交或回滚调用方的会话
+        from app.database import session_scope
+        
+        try:
+            async with session_scope(user_id, name="chapter_summary_groups") as write_db:
+                existing_result = await write_db.execute(
+                    select(ChapterSummaryGroup).where(ChapterSummaryGroup.project_id == project_id)
+                )
+                existing = {
+                    (row.tier, row.start_chapter, row.end_chapter, row.chars_per_group): row
+                    for row in existing_result.scalars().all()
+                }
+                for key, fingerprint, content in writes:
+                    row = existing.get(key)
+                    if row is None:
+                        tier, start_ch, end_ch, chars_per_group = key
+                        write_db.add(ChapterSummaryGroup(
+                            project_id=project_id,
+                            tier=tier,
+                            start_chapter=start_ch,
+                            end_chapter=end_ch,
+                            chars_per_group=chars_per_group,
+                            fingerprint=fingerprint,
+                            content=content
+                        ))
+                    else:
+                        row.fingerprint = fingerprint
+                        row.content = content
+                if obsolete_ids:
+                    await write_db.execute(
+                        delete(ChapterSummaryGroup).where(ChapterSummaryGroup.id.in_(obsolete_ids))
+                    )
+            logger.info(f"  💾 分组摘要已物化: 重新合并{len(stale)}组, 复用{len(groups) - len(stale)}组")
+        except Exception as e:
+            # 物化失败不影响本次生成
+            logger.warning(f"⚠️ 保存分组摘要失败: {str(e)}")
+        
+        return summaries
+    
     def _get_chapter_summary(self, chapter: Chapter, max_chars: int) -> str:
         """
         获取单章摘要
@@ -0,0 +1,138 @@
+"""章节序号重排 - 基于集合的批量更新
+
+一对多模式下章节序号由大纲顺序和大纲内子序号决定。原先在大纲展开/删除后逐个大纲 COUNT、SELECT 再逐章修改ORM对象，
+书中部展开一次在200+大纲的项目上就是数百次往返。这里用一条窗口函数语句算出全部章节的新序号，
+再用一条 UPDATE 写回发生变化的行：
+- PostgreSQL / SQLite 3.33+：UPDATE ... FROM (子查询)
+- 更早的 SQLite：UPDATE ... SET chapter_number = (关联子查询)
+批量更新不经过ORM的乐观锁，语句中同时递增 version，持有旧版本号的并发修改仍会被拒绝。
+"""
+import sqlite3
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.logger import get_logger
+from app.models.chapter import Chapter
+from app.models.outline import Outline
+
+logger = get_logger(__name__)
+
+
+def _supports_update_from(db: AsyncSession) -> bool:
+    """数据库是否支持 UPDATE ... FROM（SQLite 3.33 起支持）"""
+    if db.get_bind().dialect.name != "sqlite":
+        return True
+    return sqlite3.sqlite_version_info >= (3, 33, 0)
+
+
+async def _sync_loaded_chapters(db: AsyncSession, project_id: str):
+    """批量更新绕过了会话，把已加载的章节对象的序号和版本号同步为数据库中的值"""
+    loaded = {
+        obj.id: obj for obj in db.sync_session.identity_map.values()
+        if isinstance(obj, Chapter) and obj.project_id == project_id
+    }
+    if not loaded:
+        return
+    rows = await db.execute(
+        select(Chapter.id, Chapter.chapter_number, Chapter.version).where(Chapter.id.in_(list(loaded)))
+    )
+    for row in rows:
+        chapter = loaded[row.id]
+        set_committed_value(chapter, "chapter_number", row.chapter_number)
+        set_committed_value(chapter, "version", row.version)
+
+
+async def renumber_outline_chapters(
+    db: AsyncSession,
+    project_id: str,
+    from_order_index: Optional[int] = None
+) -> int:
+    """
+    按大纲顺序和子序号重排项目的章节序号（一对多模式）
+
+    新序号 = ROW_NUMBER() OVER (ORDER BY 大纲序号, 大纲ID, 子序号, 章节ID)，未关联大纲的章节不参与编号。
+    不提交事务，由调用方决定提交时机。
+
+    Args:
+        db: 数据库会话
+        project_id: 项目ID
+        from_order_index: 只更新序号不小于该值的大纲下的章节（之前的章节序号不受影响）；为None时更新全部
+
+    Returns:
+        序号发生变化的章节数
+    """
+    numbered = (
+        select(
+            Chapter.id.label("chapter_id"),
+            Chapter.chapter_number.label("chapter_number"),
+            Outline.order_index.label("order_index"),
+            func.row_number().over(
+                order_by=(Outline.order_index, Outline.id, Chapter.sub_index, Chapter.id)
+            ).label("new_number"),
+        )
+        .join(Outline, Outline.id == Chapter.outline_id)
+        .where(Chapter.project_id == project_id)
+        .subquery("numbered")
+    )
+    changed = numbered.c.new_number != numbered.c.chapter_number
+    if from_order_index is not None:
+        changed = changed & (numbered.c.order_index >= from_order_index)
+
+    if _supports_update_from(db):
+        stmt = (
+            update(Chapter)
+            .where(Chapter.id == numbered.c.chapter_id)
+            .where(changed)
+            .values(chapter_number=numbered.c.new_number, version=Chapter.version + 1)
+        )
+    else:
+        new_number = select(numbered.c.new_number).where(numbered.c.chapter_id == Chapter.id).scalar_subquery()
+        stmt = (
+            update(Chapter)
+            .where(Chapter.id.in_(select(numbered.c.chapter_id).where(changed)))
+            .values(chapter_number=new_number, version=Chapter.version + 1)
+        )
+
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    updated_count = result.rowcount or 0
+    if updated_count:
+        await _sync_loaded_chapters(db, project_id)
+    return updated_count
+
+
+async def shift_chapter_numbers(db: AsyncSession, project_id: str, after_number: int, delta: int) -> int:
+    """
+    把序号大于 after_number 的章节整体平移 delta（一对一模式删除/插入大纲时使用），不提交事务
+
+    Returns:
+        更新的章节数
+    """
+    result = await db.execute(
+        update(Chapter)
+        .where(Chapter.project_id == project_id, Chapter.chapter_number > after_number)
+        .values(chapter_number=Chapter.chapter_number + delta, version=Chapter.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    updated_count = result.rowcount or 0
+    if updated_count:
+        await _sync_loaded_chapters(db, project_id)
+    return updated_count
+
+
+async def shift_outline_order(db: AsyncSession, project_id: str, after_index: int, delta: int) -> int:
+    """
+    把序号大于 after_index 的大纲整体平移 delta，不提交事务
+
+    Returns:
+        更新的大纲数
+    """
+    result = await db.execute(
+        update(Outline)
+        .where(Outline.project_id == project_id, Outline.order_index > after_index)
+        .values(order_index=Outline.order_index + delta)
+        .execution_options(synchronize_session="evaluate")
+    )
+    return result.rowcount or 0
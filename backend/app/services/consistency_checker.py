@@ -81,7 +81,8 @@ class ConsistencyChecker:
             result = await self.ai_service.generate_text(
                 prompt=prompt,
                 max_tokens=2000,
-                temperature=0.3
+                temperature=0.3,
+                use_cache=True
             )
             
             content = result.get("content", "")
@@ -184,7 +185,8 @@ class ConsistencyChecker:
             result = await self.ai_service.generate_text(
                 prompt=prompt,
                 max_tokens=2000,
-                temperature=0.3
+                temperature=0.3,
+                use_cache=True
             )
             
             content = result.get("content", "")
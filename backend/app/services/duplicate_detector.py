@@ -1,21 +1,140 @@
-"""重复内容检测服务 - 支持流式返回"""
-from typing import Dict, Any, List, AsyncGenerator
+"""重复内容检测服务 - 支持流式返回
+
+片段两两比较是 O(章节² × 句子²)，因此用字符n-gram MinHash + LSH 分桶生成候选对，
+只对落入同一桶的片段使用 SequenceMatcher 复核。片段签名按章节持久化，正文变化时增量重建。
+"""
+from typing import Dict, Any, List, AsyncGenerator, Optional, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+import asyncio
+import hashlib
 import re
+import zlib
 from difflib import SequenceMatcher
 
+import numpy as np
+
 from app.models.chapter import Chapter
+from app.models.chapter_segment_signature import ChapterSegmentSignature
 from app.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+class MinHashLSH:
+    """
+    字符n-gram MinHash + LSH 分桶
+    
+    - 每个片段取字符 shingle_size-gram 集合，计算 num_perm 个最小哈希
+    - 签名切成 bands 段，任一段完全相同的片段成为候选对（Jaccard 约 (1/bands)^(1/rows) 以上时大概率成为候选）
+    - 哈希函数 (a*x + b) mod p 取 p = 2^32 - 5，操作数先对 p 取模，乘积不超过 uint64
+    """
+    
+    _PRIME = np.uint64((1 << 32) - 5)
+    
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle_size: int = 2, max_bucket_size: int = 200):
+        """
+        Args:
+            num_perm: MinHash置换数量（签名长度）
+            bands: LSH分段数（每段 num_perm // bands 行，段数越多召回越高、候选越多）
+            shingle_size: 字符n-gram长度
+            max_bucket_size: 单个桶最多参与配对的片段数，防止高频套话导致候选对爆炸
+        
+        默认 32 段 × 4 行（阈值约 0.42）配合 2-gram：SequenceMatcher 相似度 0.7 的片段对，
+        字符 3-gram 的 Jaccard 往往只有 0.3~0.5，阈值再高会大量漏检。
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_bucket_size = max_bucket_size
+        
+        # 固定种子，保证持久化的签名在进程重启后仍可比较
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, int(self._PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(self._PRIME), size=num_perm, dtype=np.uint64)
+    
+    @property
+    def scheme(self) -> str:
+        """签名方案标识（哈希函数与 shingle 长度），变化后已持久化的签名不可再用"""
+        return f"p{int(self._PRIME)}-k{self.shingle_size}-n{self.num_perm}"
+    
+    def _shingle_hashes(self, text: str) -> np.ndarray:
+        """片段的 shingle 哈希集合"""
+        k = self.shingle_size
+        if len(text) <= k:
+            shingles = {text}
+        else:
+            shingles = {text[i:i + k] for i in range(len(text) - k + 1)}
+        return np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+    
+    def signatures(self, segments: List[str]) -> np.ndarray:
+        """
+        计算片段签名矩阵
+        
+        Returns:
+            (len(segments), num_perm) 的 uint32 矩阵
+        """
+        result = np.empty((len(segments), self.num_perm), dtype=np.uint32)
+        for idx, segment in enumerate(segments):
+            hashes = self._shingle_hashes(segment) % self._PRIME
+            result[idx] = ((np.outer(hashes, self._a) + self._b) % self._PRIME).min(axis=0)
+        return result
+    
+    def candidate_pairs(self, signatures: np.ndarray) -> Set[Tuple[int, int]]:
+        """
+        LSH分桶，返回候选片段对（行号 i < j）
+        
+        Args:
+            signatures: (n, num_perm) 签名矩阵
+        """
+        pairs: Set[Tuple[int, int]] = set()
+        n = len(signatures)
+        if n < 2:
+            return pairs
+        
+        truncated_buckets = 0
+        dropped_members = 0
+        for band in range(self.bands):
+            band_slice = np.ascontiguousarray(signatures[:, band * self.rows:(band + 1) * self.rows])
+            keys = band_slice.view(np.dtype((np.void, band_slice.dtype.itemsize * self.rows))).ravel()
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            # 相邻相同的键构成一个桶
+            boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+            for bucket in np.split(order, boundaries):
+                if len(bucket) < 2:
+                    continue
+                if len(bucket) > self.max_bucket_size:
+                    truncated_buckets += 1
+                    dropped_members += len(bucket) - self.max_bucket_size
+                members = sorted(bucket[:self.max_bucket_size].tolist())
+                for x in range(len(members)):
+                    for y in range(x + 1, len(members)):
+                        pairs.add((members[x], members[y]))
+        if truncated_buckets:
+            logger.warning(
+                f"⚠️ LSH分桶: {truncated_buckets}个桶超过{self.max_bucket_size}个片段，"
+                f"{dropped_members}个片段未参与该桶配对（高频套话），可能漏检"
+            )
+        return pairs
+
+
 class DuplicateDetector:
     """重复内容检测器"""
     
+    # 索引使用固定的片段长度下限，保证持久化签名与片段一一对应
+    INDEX_MIN_LENGTH = 30
+    
     def __init__(self, similarity_threshold: float = 0.7):
         self.threshold = similarity_threshold
+        self.lsh = MinHashLSH()
     
     def extract_segments(self, content: str, min_length: int = 30) -> List[str]:
         """提取文本片段用于比较"""
@@ -38,32 +157,37 @@ class DuplicateDetector:
             return 0.0
         return SequenceMatcher(None, text1, text2).ratio()
     
+    def _verify(self, text1: str, text2: str) -> Optional[float]:
+        """复核候选对，先用上界快速排除，达到阈值时返回相似度"""
+        matcher = SequenceMatcher(None, text1, text2)
+        if matcher.real_quick_ratio() < self.threshold or matcher.quick_ratio() < self.threshold:
+            return None
+        similarity = matcher.ratio()
+        return similarity if similarity >= self.threshold else None
+    
+    @staticmethod
+    def _clip(segment: str) -> str:
+        return segment[:100] + "..." if len(segment) > 100 else segment
+    
     def find_duplicates_in_chapter(self, content: str, min_length: int = 30) -> List[Dict[str, Any]]:
         """检测章节内部重复"""
         segments = self.extract_segments(content, min_length)
+        signatures = self.lsh.signatures(segments)
+        return self._internal_duplicates(segments, self.lsh.candidate_pairs(signatures))
+    
+    def _internal_duplicates(self, segments: List[str], pairs: Set[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """复核章节内部候选对"""
         duplicates = []
-        checked = set()
-        
-        for i, seg1 in enumerate(segments):
-            for j, seg2 in enumerate(segments):
-                if i >= j:
-                    continue
-                
-                pair_key = (min(i, j), max(i, j))
-                if pair_key in checked:
-                    continue
-                checked.add(pair_key)
-                
-                similarity = self.calculate_similarity(seg1, seg2)
-                if similarity >= self.threshold:
-                    duplicates.append({
-                        "segment1": seg1[:100] + "..." if len(seg1) > 100 else seg1,
-                        "segment2": seg2[:100] + "..." if len(seg2) > 100 else seg2,
-                        "similarity": round(similarity * 100, 1),
-                        "position1": i,
-                        "position2": j
-                    })
-        
+        for i, j in sorted(pairs):
+            similarity = self._verify(segments[i], segments[j])
+            if similarity is not None:
+                duplicates.append({
+                    "segment1": self._clip(segments[i]),
+                    "segment2": self._clip(segments[j]),
+                    "similarity": round(similarity * 100, 1),
+                    "position1": i,
+                    "position2": j
+                })
         return duplicates
     
     def find_duplicates_between_chapters(
@@ -77,21 +201,197 @@ class DuplicateDetector:
         """检测两章节间重复"""
         segments1 = self.extract_segments(content1, min_length)
         segments2 = self.extract_segments(content2, min_length)
+        if not segments1 or not segments2:
+            return []
+        
+        signatures = self.lsh.signatures(segments1 + segments2)
+        offset = len(segments1)
+        pairs = [
+            (i, j - offset)
+            for i, j in self.lsh.candidate_pairs(signatures)
+            if i < offset <= j
+        ]
+        return self._cross_duplicates(segments1, segments2, sorted(pairs), chapter1_info, chapter2_info)
+    
+    def _cross_duplicates(
+        self,
+        segments1: List[str],
+        segments2: List[str],
+        pairs: List[Tuple[int, int]],
+        chapter1_info: Dict,
+        chapter2_info: Dict
+    ) -> List[Dict[str, Any]]:
+        """复核两章节间候选对"""
         duplicates = []
+        for i, j in pairs:
+            similarity = self._verify(segments1[i], segments2[j])
+            if similarity is not None:
+                duplicates.append({
+                    "chapter1": chapter1_info,
+                    "chapter2": chapter2_info,
+                    "segment1": self._clip(segments1[i]),
+                    "segment2": self._clip(segments2[j]),
+                    "similarity": round(similarity * 100, 1)
+                })
+        return duplicates
+    
+    # ==================== 持久化索引 ====================
+    
+    def _content_hash(self, content: str) -> str:
+        """签名指纹：正文与签名方案、片段长度下限共同决定，任一变化即视为过期"""
+        raw = f"{self.lsh.scheme}-m{self.INDEX_MIN_LENGTH}\n{content or ''}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def _signature_values(self, chapter_id: str, project_id: str, content: str, segments: List[str]) -> Dict[str, Any]:
+        """计算章节的签名行字段（纯计算，可在线程中执行）"""
+        return {
+            "chapter_id": chapter_id,
+            "project_id": project_id,
+            "content_hash": self._content_hash(content),
+            "segment_count": len(segments),
+            "num_perm": self.lsh.num_perm,
+            "signatures": self.lsh.signatures(segments).tobytes()
+        }
+    
+    def _decode_signatures(self, row) -> np.ndarray:
+        return np.frombuffer(row.signatures, dtype=np.uint32).reshape(row.segment_count, row.num_perm)
+    
+    async def refresh_chapter_index(self, chapter: Chapter, db: AsyncSession) -> None:
+        """
+        章节保存后增量更新其片段签名（不提交，由调用方提交）
         
-        for seg1 in segments1:
-            for seg2 in segments2:
-                similarity = self.calculate_similarity(seg1, seg2)
-                if similarity >= self.threshold:
-                    duplicates.append({
-                        "chapter1": chapter1_info,
-                        "chapter2": chapter2_info,
-                        "segment1": seg1[:100] + "..." if len(seg1) > 100 else seg1,
-                        "segment2": seg2[:100] + "..." if len(seg2) > 100 else seg2,
-                        "similarity": round(similarity * 100, 1)
-                    })
+        正文为空时删除该章签名。
+        """
+        existing = await db.get(ChapterSegmentSignature, chapter.id)
+        if not chapter.content or not chapter.content.strip():
+            if existing:
+                await db.delete(existing)
+            return
         
-        return duplicates
+        content_hash = self._content_hash(chapter.content)
+        if existing and existing.content_hash == content_hash and existing.num_perm == self.lsh.num_perm:
+            return
+        
+        values = self._signature_values(
+            chapter.id, chapter.project_id, chapter.content,
+            self.extract_segments(chapter.content, self.INDEX_MIN_LENGTH)
+        )
+        if existing:
+            for key in ("content_hash", "segment_count", "num_perm", "signatures"):
+                setattr(existing, key, values[key])
+        else:
+            db.add(ChapterSegmentSignature(**values))
+    
+    def _index_chapters(
+        self,
+        chapters: List[Tuple[str, str, str]],
+        rows: Dict[str, ChapterSegmentSignature]
+    ) -> Tuple[List[List[str]], List[np.ndarray], List[Dict[str, Any]]]:
+        """
+        切分片段并校验签名，过期或缺失的章节重新计算签名（CPU密集，在线程中执行）
+        
+        Args:
+            chapters: (章节ID, 项目ID, 正文) 列表
+            rows: 章节ID -> 已持久化的签名行
+        
+        Returns:
+            (每章片段列表, 每章签名矩阵, 需要写入的签名行字段)
+        """
+        all_segments: List[List[str]] = []
+        all_signatures: List[np.ndarray] = []
+        fresh_rows: List[Dict[str, Any]] = []
+        for chapter_id, project_id, content in chapters:
+            segments = self.extract_segments(content, self.INDEX_MIN_LENGTH)
+            row = rows.get(chapter_id)
+            if (
+                row is None
+                or row.content_hash != self._content_hash(content)
+                or row.num_perm != self.lsh.num_perm
+                or row.segment_count != len(segments)
+            ):
+                values = self._signature_values(chapter_id, project_id, content, segments)
+                fresh_rows.append(values)
+                signatures = np.frombuffer(values["signatures"], dtype=np.uint32).reshape(len(segments), self.lsh.num_perm)
+            else:
+                signatures = self._decode_signatures(row)
+            all_segments.append(segments)
+            all_signatures.append(signatures)
+        return all_segments, all_signatures, fresh_rows
+    
+    async def _load_project_index(
+        self,
+        project_id: str,
+        chapters: List[Chapter],
+        user_id: str,
+        db: AsyncSession
+    ) -> Tuple[List[List[str]], List[np.ndarray], int]:
+        """
+        加载项目的片段签名，过期或缺失的章节重建签名并持久化
+        
+        签名计算在线程中执行；重建结果通过独立的会话作用域写入，不提交调用方的会话。
+        
+        Returns:
+            (每章片段列表, 每章签名矩阵, 重建的章节数)
+        """
+        from app.database import session_scope
+        
+        rows_result = await db.execute(
+            select(ChapterSegmentSignature).where(ChapterSegmentSignature.project_id == project_id)
+        )
+        rows = {row.chapter_id: row for row in rows_result.scalars().all()}
+        
+        all_segments, all_signatures, fresh_rows = await asyncio.to_thread(
+            self._index_chapters,
+            [(chapter.id, chapter.project_id, chapter.content) for chapter in chapters],
+            rows
+        )
+        
+        if fresh_rows:
+            try:
+                async with session_scope(user_id, name="duplicate_index") as write_db:
+                    existing_result = await write_db.execute(
+                        select(ChapterSegmentSignature).where(
+                            ChapterSegmentSignature.chapter_id.in_([values["chapter_id"] for values in fresh_rows])
+                        )
+                    )
+                    existing = {row.chapter_id: row for row in existing_result.scalars().all()}
+                    for values in fresh_rows:
+                        row = existing.get(values["chapter_id"])
+                        if row is None:
+                            write_db.add(ChapterSegmentSignature(**values))
+                        else:
+                            for key in ("content_hash", "segment_count", "num_perm", "signatures"):
+                                setattr(row, key, values[key])
+                logger.info(f"🧮 重复检测索引更新: {len(fresh_rows)}/{len(chapters)}章重建签名")
+            except Exception as e:
+                logger.warning(f"⚠️ 保存重复检测索引失败，本次仅在内存中使用: {str(e)}")
+        
+        return all_segments, all_signatures, len(fresh_rows)
+    
+    def _project_candidates(
+        self,
+        all_signatures: List[np.ndarray]
+    ) -> Dict[Tuple[int, int], List[Tuple[int, int]]]:
+        """
+        全书LSH分桶，按章节对归组候选片段对
+        
+        Returns:
+            {(章节下标a, 章节下标b): [(片段a, 片段b), ...]}，a == b 表示章节内部
+        """
+        owners = np.concatenate([
+            np.full(len(sig), idx, dtype=np.int64) for idx, sig in enumerate(all_signatures)
+        ]) if all_signatures else np.empty(0, dtype=np.int64)
+        positions = np.concatenate([
+            np.arange(len(sig), dtype=np.int64) for sig in all_signatures
+        ]) if all_signatures else np.empty(0, dtype=np.int64)
+        stacked = np.concatenate(all_signatures) if all_signatures else np.empty((0, self.lsh.num_perm), dtype=np.uint32)
+        
+        grouped: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for i, j in self.lsh.candidate_pairs(stacked):
+            grouped.setdefault((int(owners[i]), int(owners[j])), []).append((int(positions[i]), int(positions[j])))
+        for pairs in grouped.values():
+            pairs.sort()
+        return grouped
     
     async def check_chapter(self, chapter_id: str, db: AsyncSession) -> Dict[str, Any]:
         """检测单章节内部重复"""
@@ -111,43 +411,68 @@ class DuplicateDetector:
             "has_issues": len(duplicates) > 0
         }
     
-    async def check_project(self, project_id: str, db: AsyncSession, max_chapters: int = 20) -> Dict[str, Any]:
-        """检测项目所有章节间重复（同步版本）"""
-        result = await db.execute(
-            select(Chapter).where(
-                Chapter.project_id == project_id,
-                Chapter.content != None,
-                Chapter.content != ""
-            ).order_by(Chapter.chapter_number).limit(max_chapters)
-        )
-        chapters = result.scalars().all()
-        
-        if len(chapters) < 2:
-            return {"error": "需要至少2个已完成章节"}
+    async def _load_chapters(self, project_id: str, db: AsyncSession, max_chapters: Optional[int]) -> List[Chapter]:
+        query = select(Chapter).where(
+            Chapter.project_id == project_id,
+            Chapter.content != None,
+            Chapter.content != ""
+        ).order_by(Chapter.chapter_number)
+        if max_chapters:
+            query = query.limit(max_chapters)
+        result = await db.execute(query)
+        return list(result.scalars().all())
+    
+    def _project_issues(
+        self,
+        chapter_infos: List[Dict[str, Any]],
+        all_segments: List[List[str]],
+        all_signatures: List[np.ndarray]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """全书分桶并复核候选对（CPU密集，在线程中执行）"""
+        candidates = self._project_candidates(all_signatures)
         
         cross_duplicates = []
         internal_issues = []
         
-        for ch in chapters:
-            internal = self.find_duplicates_in_chapter(ch.content)
+        for idx, info in enumerate(chapter_infos):
+            internal = self._internal_duplicates(all_segments[idx], set(candidates.get((idx, idx), [])))
             if internal:
                 internal_issues.append({
-                    "chapter_number": ch.chapter_number,
-                    "chapter_title": ch.title,
+                    "chapter_number": info["number"],
+                    "chapter_title": info["title"],
                     "duplicates": internal[:5]
                 })
         
-        for i, ch1 in enumerate(chapters):
-            for j, ch2 in enumerate(chapters):
-                if i >= j:
-                    continue
-                
-                cross = self.find_duplicates_between_chapters(
-                    ch1.content, ch2.content,
-                    {"number": ch1.chapter_number, "title": ch1.title},
-                    {"number": ch2.chapter_number, "title": ch2.title}
-                )
-                cross_duplicates.extend(cross[:3])
+        for (a, b), pairs in sorted(candidates.items()):
+            if a == b:
+                continue
+            cross = self._cross_duplicates(
+                all_segments[a], all_segments[b], pairs, chapter_infos[a], chapter_infos[b]
+            )
+            cross_duplicates.extend(cross[:3])
+        
+        return internal_issues, cross_duplicates
+    
+    async def check_project(
+        self,
+        project_id: str,
+        db: AsyncSession,
+        user_id: str,
+        max_chapters: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """检测项目所有章节间重复（同步版本）"""
+        chapters = await self._load_chapters(project_id, db, max_chapters)
+        
+        if len(chapters) < 2:
+            return {"error": "需要至少2个已完成章节"}
+        
+        all_segments, all_signatures, _ = await self._load_project_index(project_id, chapters, user_id, db)
+        internal_issues, cross_duplicates = await asyncio.to_thread(
+            self._project_issues,
+            [{"number": ch.chapter_number, "title": ch.title} for ch in chapters],
+            all_segments,
+            all_signatures
+        )
         
         return {
             "project_id": project_id,
@@ -159,20 +484,14 @@ class DuplicateDetector:
         }
     
     async def check_project_stream(
-        self, 
-        project_id: str, 
-        db: AsyncSession, 
-        max_chapters: int = 50
+        self,
+        project_id: str,
+        db: AsyncSession,
+        user_id: str,
+        max_chapters: Optional[int] = None
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """流式检测项目章节间重复"""
-        result = await db.execute(
-            select(Chapter).where(
-                Chapter.project_id == project_id,
-                Chapter.content != None,
-                Chapter.content != ""
-            ).order_by(Chapter.chapter_number).limit(max_chapters)
-        )
-        chapters = list(result.scalars().all())
+        """流式检测项目章节间重复（默认检测全书，分桶与复核在线程中执行）"""
+        chapters = await self._load_chapters(project_id, db, max_chapters)
         
         if len(chapters) < 2:
             yield {"type": "error", "message": "需要至少2个已完成章节"}
@@ -182,11 +501,22 @@ class DuplicateDetector:
         internal_count = 0
         cross_count = 0
         
+        # 阶段0: 加载/增量更新片段签名索引
+        yield {"type": "progress", "phase": "index", "current": 0, "total": total, "message": "加载重复检测索引..."}
+        all_segments, all_signatures, rebuilt = await self._load_project_index(project_id, chapters, user_id, db)
+        candidates = await asyncio.to_thread(self._project_candidates, all_signatures)
+        yield {
+            "type": "progress", "phase": "index", "current": total, "total": total,
+            "message": f"索引就绪（重建{rebuilt}章），候选片段对 {sum(len(p) for p in candidates.values())} 个"
+        }
+        
         # 阶段1: 检测每章内部重复
         yield {"type": "progress", "phase": "internal", "current": 0, "total": total, "message": "开始检测章节内部重复..."}
         
         for i, ch in enumerate(chapters):
-            internal = self.find_duplicates_in_chapter(ch.content)
+            internal = await asyncio.to_thread(
+                self._internal_duplicates, all_segments[i], set(candidates.get((i, i), []))
+            )
             if internal:
                 internal_count += len(internal)
                 yield {
@@ -199,35 +529,32 @@ class DuplicateDetector:
             
             yield {"type": "progress", "phase": "internal", "current": i + 1, "total": total}
         
-        # 阶段2: 检测章节间重复
-        pairs_total = total * (total - 1) // 2
+        # 阶段2: 检测章节间重复（只复核LSH候选章节对）
+        cross_pairs = sorted(key for key in candidates if key[0] != key[1])
+        pairs_total = len(cross_pairs)
         yield {"type": "progress", "phase": "cross", "current": 0, "total": pairs_total, "message": "开始检测章节间重复..."}
         
-        pair_count = 0
-        for i, ch1 in enumerate(chapters):
-            for j, ch2 in enumerate(chapters):
-                if i >= j:
-                    continue
-                
-                pair_count += 1
-                cross = self.find_duplicates_between_chapters(
-                    ch1.content, ch2.content,
-                    {"number": ch1.chapter_number, "title": ch1.title},
-                    {"number": ch2.chapter_number, "title": ch2.title}
-                )
-                
-                if cross:
-                    cross_count += len(cross)
-                    yield {
-                        "type": "cross",
-                        "chapter1": {"number": ch1.chapter_number, "title": ch1.title},
-                        "chapter2": {"number": ch2.chapter_number, "title": ch2.title},
-                        "duplicates": cross[:3],
-                        "count": len(cross)
-                    }
-                
-                if pair_count % 10 == 0:
-                    yield {"type": "progress", "phase": "cross", "current": pair_count, "total": pairs_total}
+        for pair_count, (a, b) in enumerate(cross_pairs, 1):
+            ch1, ch2 = chapters[a], chapters[b]
+            cross = await asyncio.to_thread(
+                self._cross_duplicates,
+                all_segments[a], all_segments[b], candidates[(a, b)],
+                {"number": ch1.chapter_number, "title": ch1.title},
+                {"number": ch2.chapter_number, "title": ch2.title}
+            )
+            
+            if cross:
+                cross_count += len(cross)
+                yield {
+                    "type": "cross",
+                    "chapter1": {"number": ch1.chapter_number, "title": ch1.title},
+                    "chapter2": {"number": ch2.chapter_number, "title": ch2.title},
+                    "duplicates": cross[:3],
+                    "count": len(cross)
+                }
+            
+            if pair_count % 10 == 0:
+                yield {"type": "progress", "phase": "cross", "current": pair_count, "total": pairs_total}
         
         # 完成
         yield {
@@ -239,3 +566,11 @@ class DuplicateDetector:
             "total_issues": internal_count + cross_count,
             "has_issues": internal_count > 0 or cross_count > 0
         }
+
+
+async def refresh_duplicate_index(chapter: Chapter, db: AsyncSession) -> None:
+    """章节正文保存前增量更新重复检测索引（不提交，失败只记录日志，不影响保存）"""
+    try:
+        await DuplicateDetector().refresh_chapter_index(chapter, db)
+    except Exception as e:
+        logger.warning(f"⚠️ 更新重复检测索引失败: {str(e)}")
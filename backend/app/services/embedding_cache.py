@@ -0,0 +1,262 @@
+"""Embedding持久化缓存 - 基于内容寻址的内存映射向量存储
+
+章节分析、重新分析以及固定查询语句（如"重要 转折 高潮 关键"）会反复编码完全相同的文本。
+该缓存以 (模型名, sha256(文本)) 为键，将向量保存在 float32 内存映射文件中，容量满时按LRU淘汰。
+
+存储布局（每个模型一个目录）：
+- vectors.f32: (capacity, dim) float32 向量
+- keys.bin:    (capacity,) 32字节 sha256 摘要，空槽为全零
+- ticks.u64:   (capacity,) 最近访问时间（纳秒时间戳），各进程共用同一时钟，用于重启后恢复LRU顺序
+- meta.json:   模型名、维度、容量，不匹配时重建
+- cache.lock:  跨进程文件锁
+
+多个 uvicorn worker 与独立的任务队列 worker 共享同一组文件，每个进程各自维护索引：
+- 所有读写都在文件锁内进行
+- 命中时校验槽位中的键，被其他进程淘汰或覆盖的槽位按未命中处理
+- 分配空槽前确认槽位仍为空，已被其他进程占用的槽位并入本进程索引
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows：只有进程内锁，不支持多进程共享缓存目录
+    fcntl = None
+
+logger = get_logger(__name__)
+
+_EMPTY_KEY = b"\x00" * 32
+
+# 本进程打开的缓存，退出时统一刷盘
+_open_caches: "weakref.WeakSet[EmbeddingCache]" = weakref.WeakSet()
+
+
+class EmbeddingCache:
+    """
+    内容寻址的Embedding缓存
+
+    - 键：sha256(文本)，按模型名分目录存储
+    - 值：float32 向量，存放在内存映射文件中，进程重启后仍然有效
+    - 淘汰：LRU，复用被淘汰的槽位
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, dim: int, capacity: int = 50000):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存根目录
+            model_name: Embedding模型名称（不同模型的向量互不复用）
+            dim: 向量维度
+            capacity: 最大缓存条数
+        """
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = max(1, capacity)
+        self.directory = Path(cache_dir) / re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[bytes, int]" = OrderedDict()
+        self._free_slots: List[int] = []
+        self._tick = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "stale": 0}
+        self._lock_file = open(self.directory / "cache.lock", "a+b")
+
+        with self._locked():
+            self._open_store()
+        _open_caches.add(self)
+
+    @contextmanager
+    def _locked(self):
+        """进程内锁 + 跨进程文件锁"""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _open_store(self):
+        """打开（或重建）内存映射文件并恢复索引"""
+        meta_path = self.directory / "meta.json"
+        meta = {"model_name": self.model_name, "dim": self.dim, "capacity": self.capacity}
+
+        reuse = False
+        if meta_path.exists():
+            try:
+                reuse = json.loads(meta_path.read_text(encoding="utf-8")) == meta
+            except (OSError, ValueError):
+                reuse = False
+        mode = "r+" if reuse else "w+"
+
+        self._vectors = np.memmap(
+            self.directory / "vectors.f32", dtype=np.float32, mode=mode,
+            shape=(self.capacity, self.dim)
+        )
+        self._keys = np.memmap(
+            self.directory / "keys.bin", dtype="S32", mode=mode, shape=(self.capacity,)
+        )
+        self._ticks = np.memmap(
+            self.directory / "ticks.u64", dtype=np.uint64, mode=mode, shape=(self.capacity,)
+        )
+
+        if not reuse:
+            meta_path.write_text(json.dumps(meta), encoding="utf-8")
+            self._free_slots = list(range(self.capacity - 1, -1, -1))
+            logger.info(f"🆕 创建Embedding缓存: {self.directory} (容量{self.capacity}, 维度{self.dim})")
+            return
+
+        # 按访问时间恢复LRU顺序
+        used = []
+        for slot in range(self.capacity):
+            key = self._slot_key(slot)
+            if key == _EMPTY_KEY:
+                self._free_slots.append(slot)
+            else:
+                used.append((int(self._ticks[slot]), key, slot))
+        used.sort()
+        for tick, key, slot in used:
+            self._index[key] = slot
+        self._tick = used[-1][0] if used else 0
+        self._free_slots.reverse()
+        logger.info(f"📦 加载Embedding缓存: {self.directory} ({len(self._index)}/{self.capacity}条)")
+
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def _slot_key(self, slot: int) -> bytes:
+        """槽位中当前保存的键（numpy的S32会去掉末尾的零字节，需补齐）"""
+        return bytes(self._keys[slot]).ljust(32, b"\x00")
+
+    def _resync(self, key: bytes, slot: int):
+        """槽位已被其他进程淘汰并复用：从索引移除旧键，按槽位中的实际内容重新登记"""
+        del self._index[key]
+        actual = self._slot_key(slot)
+        if actual == _EMPTY_KEY:
+            self._free_slots.append(slot)
+        elif actual not in self._index:
+            self._index[actual] = slot
+            self._index.move_to_end(actual, last=False)
+
+    def _allocate_slot(self) -> int:
+        """分配空槽，没有空槽时淘汰最久未使用的条目"""
+        while self._free_slots:
+            slot = self._free_slots.pop()
+            other = self._slot_key(slot)
+            if other == _EMPTY_KEY:
+                return slot
+            # 已被其他进程写入：并入本进程索引
+            self._index[other] = slot
+            self._index.move_to_end(other, last=False)
+        _, slot = self._index.popitem(last=False)
+        self._stats["evictions"] += 1
+        return slot
+
+    def _touch(self, key: bytes, slot: int):
+        # 使用墙钟时间而非进程内计数，其他进程写入的访问时间才可比较；同一纳秒内的访问保持递增
+        self._tick = max(time.time_ns(), self._tick + 1)
+        self._ticks[slot] = self._tick
+        self._index.move_to_end(key)
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        批量查询缓存
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入顺序一致的结果列表，未命中的位置为None
+        """
+        results: List[Optional[List[float]]] = []
+        with self._locked():
+            for text in texts:
+                key = self._digest(text)
+                slot = self._index.get(key)
+                if slot is not None and self._slot_key(slot) != key:
+                    self._resync(key, slot)
+                    self._stats["stale"] += 1
+                    slot = None
+                if slot is None:
+                    self._stats["misses"] += 1
+                    results.append(None)
+                    continue
+                self._touch(key, slot)
+                self._stats["hits"] += 1
+                results.append(self._vectors[slot].tolist())
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """
+        批量写入缓存
+
+        Args:
+            texts: 文本列表
+            vectors: 对应的向量列表
+        """
+        with self._locked():
+            for text, vector in zip(texts, vectors):
+                if len(vector) != self.dim:
+                    continue
+                key = self._digest(text)
+                slot = self._index.get(key)
+                if slot is not None and self._slot_key(slot) != key:
+                    self._resync(key, slot)
+                    slot = None
+                if slot is None:
+                    slot = self._allocate_slot()
+                    # 先清空键再写向量，避免崩溃时键与向量不一致
+                    self._keys[slot] = _EMPTY_KEY
+                    self._vectors[slot] = vector
+                    self._keys[slot] = key
+                    self._index[key] = slot
+                    self._stats["writes"] += 1
+                self._touch(key, slot)
+
+    def flush(self):
+        """将内存映射文件刷到磁盘"""
+        with self._locked():
+            self._vectors.flush()
+            self._keys.flush()
+            self._ticks.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            命中率、条目数、淘汰次数等指标
+        """
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._index),
+            "capacity": self.capacity,
+            "model_name": self.model_name,
+        }
+
+
+def flush_embedding_caches():
+    """将本进程打开的全部Embedding缓存刷到磁盘（进程退出前调用）"""
+    for cache in list(_open_caches):
+        try:
+            cache.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding缓存刷盘失败: {cache.directory}: {e}")
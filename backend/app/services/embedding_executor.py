@@ -0,0 +1,185 @@
+"""Embedding执行器 - 专用线程池 + 微批处理队列
+
+SentenceTransformer.encode 是CPU密集的同步调用，直接在 async 方法中执行会阻塞事件循环，
+导致其他用户的SSE流卡顿。该执行器将所有编码请求放入队列，由调度协程在一个很短的时间窗口内
+合并为一次 encode(list, batch_size=N) 调用，并在专用线程池中执行。
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingExecutor:
+    """
+    Embedding编码执行器
+
+    - 所有用户的并发编码请求在 max_wait_ms 窗口内合并为一个批次
+    - 批次在专用线程池中执行，不阻塞事件循环
+    - 调用方拿到可等待的 Future，结果按提交顺序返回
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        batch_size: int = 32,
+        max_wait_ms: int = 10,
+        max_workers: int = 1
+    ):
+        """
+        初始化执行器
+
+        Args:
+            model: SentenceTransformer 模型实例（需提供 encode 方法）
+            batch_size: 单批次最大文本数量
+            max_wait_ms: 凑批等待窗口（毫秒）
+            max_workers: 编码线程数
+        """
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="embedding"
+        )
+
+        # 队列和调度协程绑定到首次使用时的事件循环
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self._stats = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "errors": 0,
+            "total_encode_seconds": 0.0,
+            "last_batch_size": 0,
+            "last_batch_ms": 0.0,
+        }
+
+    def _ensure_dispatcher(self) -> asyncio.Queue:
+        """确保当前事件循环中存在队列和调度协程"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._dispatcher is None or self._dispatcher.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._dispatcher = loop.create_task(self._dispatch_loop())
+        return self._queue
+
+    async def encode(self, text: str) -> List[float]:
+        """
+        编码单条文本
+
+        Args:
+            text: 待编码文本
+
+        Returns:
+            向量（float列表）
+        """
+        results = await self.encode_batch([text])
+        return results[0]
+
+    async def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        编码多条文本（与其他并发请求合并批处理）
+
+        Args:
+            texts: 待编码文本列表
+
+        Returns:
+            与输入顺序一致的向量列表
+        """
+        if not texts:
+            return []
+
+        queue = self._ensure_dispatcher()
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            queue.put_nowait((text, future))
+            futures.append(future)
+
+        self._stats["requests"] += 1
+        self._stats["texts"] += len(texts)
+        return list(await asyncio.gather(*futures))
+
+    async def _dispatch_loop(self):
+        """调度协程：凑批后在线程池中执行编码"""
+        queue = self._queue
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await queue.get()]
+
+            # 在等待窗口内尽量凑满一个批次
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # 窗口已过，只取已经排队的请求
+                    while len(batch) < self.batch_size and not queue.empty():
+                        batch.append(queue.get_nowait())
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """在线程池中执行一个批次并分发结果"""
+        texts = [text for text, _ in batch]
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(self._pool, self._encode_sync, texts)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"❌ Embedding批量编码失败({len(texts)}条): {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stats["batches"] += 1
+            self._stats["last_batch_size"] = len(texts)
+            self._stats["last_batch_ms"] = round(elapsed * 1000, 2)
+            self._stats["total_encode_seconds"] += elapsed
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(texts))
+            logger.debug(f"🧮 Embedding批次完成: {len(texts)}条, 耗时{elapsed * 1000:.1f}ms")
+
+    def _encode_sync(self, texts: List[str]) -> List[List[float]]:
+        """同步编码（在线程池中执行）"""
+        return self.model.encode(texts, batch_size=self.batch_size).tolist()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取执行器统计信息
+
+        Returns:
+            队列深度、批次数量、平均批大小等指标
+        """
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "avg_batch_size": round(self._stats["texts"] / batches, 2) if batches else 0.0,
+            "avg_batch_ms": round(self._stats["total_encode_seconds"] * 1000 / batches, 2) if batches else 0.0,
+            "batch_size_limit": self.batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def shutdown(self):
+        """关闭线程池"""
+        if self._dispatcher and not self._dispatcher.done():
+            self._dispatcher.cancel()
+        self._pool.shutdown(wait=False)
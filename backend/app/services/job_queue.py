@@ -0,0 +1,383 @@
+"""持久化任务队列 - 基于任务表的租约 + 心跳，支持多 worker 水平扩展
+
+批量生成和章节分析原先以 FastAPI BackgroundTasks 在请求所在进程内执行，进程重启后只能标记为中断。
+现在任务行本身就是队列：
+- 领取：SELECT ... FOR UPDATE SKIP LOCKED 选取 pending 或租约已过期的 running 任务，
+  再以条件 UPDATE（领取次数与租约均未变化）写入租约，未更新到行说明已被其他 worker 抢先领取
+  （SQLite 不支持行锁，依靠条件 UPDATE 保证不重复领取）
+- 心跳：执行期间每 1/3 租约时长续期；续期失败（租约被其他 worker 接管）时取消本地执行
+- 恢复：worker 崩溃后租约过期，任务被其他 worker 重新领取，处理函数从已完成位置继续
+- 失败：处理函数抛出异常时记录错误并让租约立即过期，任务重新排队
+- 上限：领取次数超过 job_max_attempts 的任务标记为 failed，避免反复崩溃或失败的任务无限重试
+
+多实例水平扩展只支持 PostgreSQL；SQLite 下领取不会重复，但多个进程并发写入会频繁遇到数据库锁，应只运行一个 worker。
+
+批量生成内部同步执行的分析以本进程的内联租约创建并由执行方续期，进程崩溃后租约过期，由 worker 重新领取。
+"""
+import asyncio
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Type
+
+from sqlalchemy import and_, case, func, or_, select, update
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 队列维护操作使用的会话标识（所有用户共享同一引擎）
+_QUEUE_SESSION_USER = "_job_queue_"
+
+
+@dataclass
+class JobKind:
+    """一类任务：对应的任务表与处理函数"""
+    name: str
+    model: Type
+    handler: Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class JobQueue:
+    """任务队列（领取、心跳、释放）"""
+
+    def __init__(self):
+        self.kinds: Dict[str, JobKind] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self.inline_owner = f"inline:{socket.gethostname()}:{os.getpid()}"
+
+    def register(self, name: str, model: Type, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """
+        注册任务类型
+
+        Args:
+            name: 任务类型名称
+            model: 任务表模型（需有 status/created_at/user_id 及租约列）
+            handler: 处理函数，参数为领取时的任务行快照
+        """
+        self.kinds[name] = JobKind(name=name, model=model, handler=handler)
+
+    def notify(self):
+        """提示本进程的 worker 立即检查新任务（跨进程依靠轮询）"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait_for_work(self, timeout: float):
+        """空闲等待，直到超时或收到 notify"""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    def inline_lease(self) -> Dict[str, Any]:
+        """
+        内联执行任务的初始租约列（创建任务行时写入，随后由 run_inline 续期）
+
+        Returns:
+            status/租约/领取次数列的值
+        """
+        now = datetime.now()
+        return {
+            "status": 'running',
+            "lease_owner": self.inline_owner,
+            "lease_expires_at": now + timedelta(seconds=settings.job_lease_seconds),
+            "heartbeat_at": now,
+            "attempts": 1,
+        }
+
+    async def run_inline(self, model: Type, job_id: str, awaitable: Awaitable[Any]) -> Any:
+        """
+        在当前协程内执行以 inline_lease 创建的任务，执行期间续期租约
+
+        正常结束时清除租约；被取消或抛出异常且任务仍为 running 时让租约立即过期，由 worker 重新领取
+
+        Args:
+            model: 任务表模型
+            job_id: 任务ID
+            awaitable: 实际执行任务的协程
+
+        Returns:
+            协程的返回值
+        """
+        kind = JobKind(name=model.__tablename__, model=model, handler=None)
+        runner = asyncio.ensure_future(awaitable)
+        heartbeat_task = asyncio.create_task(self._inline_heartbeat(kind, job_id))
+        error = None
+        try:
+            return await runner
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            if not runner.done():
+                runner.cancel()
+            raise
+        finally:
+            heartbeat_task.cancel()
+            try:
+                await self.release(kind, job_id, self.inline_owner, error=error)
+            except Exception as e:
+                logger.warning(f"⚠️ [{kind.name}] 释放内联任务 {job_id} 租约失败: {str(e)}")
+
+    async def _inline_heartbeat(self, kind: JobKind, job_id: str):
+        interval = max(settings.job_lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.heartbeat(kind, job_id, self.inline_owner):
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ [{kind.name}] 内联任务 {job_id} 心跳失败: {str(e)}")
+
+    async def claim(self, kind: JobKind, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        领取一个任务
+
+        Args:
+            kind: 任务类型
+            worker_id: worker 标识
+
+        Returns:
+            任务行快照（列名 -> 值），没有可领取的任务时返回None
+        """
+        from app.database import session_scope
+
+        model = kind.model
+        while True:
+            now = datetime.now()
+            async with session_scope(_QUEUE_SESSION_USER, name="job_claim") as session:
+                row = (await session.execute(
+                    select(model)
+                    .where(or_(
+                        model.status == 'pending',
+                        and_(
+                            model.status == 'running',
+                            model.lease_owner.isnot(None),
+                            model.lease_expires_at < now
+                        )
+                    ))
+                    .order_by(model.created_at)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )).scalar_one_or_none()
+                if row is None:
+                    return None
+
+                attempts = row.attempts or 0
+                # 条件更新：期间被其他 worker 领取（状态、领取次数或租约已变化）时不会更新到行
+                unchanged = (
+                    model.id == row.id,
+                    model.status == row.status,
+                    func.coalesce(model.attempts, 0) == attempts,
+                    model.lease_owner.is_(None) if row.lease_owner is None else model.lease_owner == row.lease_owner,
+                    model.lease_expires_at.is_(None) if row.lease_expires_at is None
+                    else model.lease_expires_at == row.lease_expires_at,
+                )
+
+                if attempts >= settings.job_max_attempts:
+                    reason = f"：{row.error_message}" if row.error_message else "（worker异常退出）"
+                    await session.execute(
+                        update(model).where(*unchanged).values(
+                            status='failed',
+                            error_message=f"任务执行{attempts}次均未完成{reason}"[:1000],
+                            completed_at=now,
+                            lease_owner=None,
+                            lease_expires_at=None
+                        ).execution_options(synchronize_session=False)
+                    )
+                    logger.error(f"❌ [{kind.name}] 任务 {row.id} 超过最大领取次数，标记为失败")
+                    continue
+
+                resumed = row.status == 'running'
+                values = {
+                    "status": 'running',
+                    "lease_owner": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=settings.job_lease_seconds),
+                    "heartbeat_at": now,
+                    "attempts": attempts + 1,
+                }
+                result = await session.execute(
+                    update(model).where(*unchanged).values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    continue
+                snapshot = {column.name: getattr(row, column.key) for column in model.__mapper__.columns}
+                snapshot.update(values)
+
+            logger.info(
+                f"📥 [{kind.name}] {worker_id} 领取任务 {snapshot['id']}"
+                f"{'（接管过期租约）' if resumed else ''}，第{snapshot['attempts']}次"
+            )
+            return snapshot
+
+    async def heartbeat(self, kind: JobKind, job_id: str, worker_id: str) -> bool:
+        """
+        续期租约
+
+        Returns:
+            False 表示租约已不属于该 worker
+        """
+        from app.database import session_scope
+
+        model = kind.model
+        now = datetime.now()
+        async with session_scope(_QUEUE_SESSION_USER, name="job_heartbeat") as session:
+            result = await session.execute(
+                update(model)
+                .where(model.id == job_id, model.lease_owner == worker_id)
+                .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=settings.job_lease_seconds))
+            )
+        return result.rowcount > 0
+
+    async def release(
+        self,
+        kind: JobKind,
+        job_id: str,
+        worker_id: str,
+        requeue: bool = False,
+        error: Optional[str] = None
+    ):
+        """
+        释放租约
+
+        Args:
+            requeue: True 表示 worker 正在停止，让租约立即过期以便其他 worker 接管（不计入领取次数）
+            error: 处理函数抛出的异常信息；记录后让租约立即过期重新排队（计入领取次数，超过上限后标记为失败）
+        """
+        from app.database import session_scope
+
+        model = kind.model
+        if requeue:
+            values = {"lease_expires_at": datetime.now(), "attempts": model.attempts - 1}
+        elif error is not None:
+            # 处理函数已自行把任务标记为完成/失败时只清除租约
+            running = model.status == 'running'
+            values = {
+                "lease_owner": case((running, model.lease_owner), else_=None),
+                "lease_expires_at": case((running, datetime.now()), else_=None),
+                "error_message": case((running, error[:1000]), else_=model.error_message),
+            }
+        else:
+            values = {"lease_owner": None, "lease_expires_at": None}
+        async with session_scope(_QUEUE_SESSION_USER, name="job_release") as session:
+            await session.execute(
+                update(model)
+                .where(model.id == job_id, model.lease_owner == worker_id)
+                .values(**values)
+            )
+
+
+class JobWorker:
+    """队列 worker：轮询领取任务并在并发上限内执行"""
+
+    def __init__(self, queue: JobQueue, worker_id: Optional[str] = None, concurrency: Optional[int] = None):
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = max(1, concurrency or settings.job_worker_concurrency)
+        self._running: Set[asyncio.Task] = set()
+        self._stopping = False
+        self._stats = {"claimed": 0, "succeeded": 0, "failed": 0, "lease_lost": 0}
+
+    async def run(self):
+        """主循环，直到 stop() 被调用"""
+        logger.info(f"🚀 任务队列worker启动: {self.worker_id}（并发{self.concurrency}，任务类型: {', '.join(self.queue.kinds)}）")
+        slots = asyncio.Semaphore(self.concurrency)
+        while not self._stopping:
+            await slots.acquire()
+            if self._stopping:
+                slots.release()
+                break
+            job = None
+            try:
+                job = await self._claim_any()
+            except Exception as e:
+                logger.error(f"❌ 领取任务失败: {str(e)}")
+            if job is None:
+                slots.release()
+                await self.queue.wait_for_work(settings.job_poll_interval_seconds)
+                continue
+            task = asyncio.create_task(self._execute(*job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _claim_any(self):
+        for kind in self.queue.kinds.values():
+            job = await self.queue.claim(kind, self.worker_id)
+            if job is not None:
+                self._stats["claimed"] += 1
+                return kind, job
+        return None
+
+    async def _execute(self, kind: JobKind, job: Dict[str, Any]):
+        job_id = job["id"]
+        handler_task = asyncio.create_task(kind.handler(job))
+        heartbeat_task = asyncio.create_task(self._heartbeat_loop(kind, job_id, handler_task))
+        requeue = False
+        error = None
+        try:
+            await handler_task
+            self._stats["succeeded"] += 1
+        except asyncio.CancelledError:
+            # worker 停止或租约丢失：停止时让其他 worker 接管
+            requeue = self._stopping
+            if not handler_task.done():
+                handler_task.cancel()
+        except Exception as e:
+            self._stats["failed"] += 1
+            error = str(e) or type(e).__name__
+            logger.error(f"❌ [{kind.name}] 任务 {job_id} 执行异常，重新排队: {error}", exc_info=True)
+        finally:
+            heartbeat_task.cancel()
+            try:
+                await self.queue.release(kind, job_id, self.worker_id, requeue=requeue, error=error)
+            except Exception as e:
+                logger.warning(f"⚠️ [{kind.name}] 释放任务 {job_id} 租约失败: {str(e)}")
+
+    async def _heartbeat_loop(self, kind: JobKind, job_id: str, handler_task: asyncio.Task):
+        interval = max(settings.job_lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.queue.heartbeat(kind, job_id, self.worker_id):
+                    self._stats["lease_lost"] += 1
+                    logger.error(f"🛑 [{kind.name}] 任务 {job_id} 租约已被接管，停止本地执行")
+                    handler_task.cancel()
+                    return
+            except Exception as e:
+                # 数据库暂时不可用时继续执行，租约过期前还有两次续期机会
+                logger.warning(f"⚠️ [{kind.name}] 任务 {job_id} 心跳失败: {str(e)}")
+
+    async def stop(self):
+        """停止领取新任务，取消执行中的任务并让其租约立即过期"""
+        self._stopping = True
+        self.queue.notify()
+        running = list(self._running)
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        logger.info(f"🛑 任务队列worker已停止: {self.worker_id}（交还{len(running)}个任务）")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取worker统计
+
+        Returns:
+            领取/成功/失败次数与当前执行数
+        """
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running": len(self._running),
+            **self._stats,
+        }
+
+
+# 全局实例
+job_queue = JobQueue()
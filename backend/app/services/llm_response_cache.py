@@ -0,0 +1,203 @@
+"""LLM响应缓存 - 基于内容寻址的SQLite持久化缓存
+
+质量评分复查、未修改章节的一致性检查等确定性调用会以完全相同的提示词重复调用模型。
+这些调用方显式传入 use_cache=True 后，该缓存以 (提供商, 接口地址, 模型, 温度, 最大token, 系统提示词, 提示词) 的 sha256 为键保存响应，
+命中时直接返回，不消耗 token；重新生成等需要新结果的调用不使用缓存。默认关闭，通过 LLM_CACHE_ENABLED 开启。
+向导与灵感模式的流式调用同样使用缓存，结果未通过校验时由调用方删除对应条目，重试时重新请求模型。
+
+- 过期：写入超过 ttl_seconds 的条目视为未命中并删除
+- 容量：条目数或总字节数超限时按最近访问时间淘汰
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LLMResponseCache:
+    """LLM响应缓存（SQLite后端，线程安全）"""
+
+    def __init__(self, db_path: str, ttl_seconds: int, max_entries: int, max_bytes: int):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite 文件路径
+            ttl_seconds: 条目有效期（秒）
+            max_entries: 最大条目数
+            max_bytes: 响应内容总字节上限
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_responses_accessed ON llm_responses(accessed_at)")
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "expired": 0, "evictions": 0, "bypassed": 0}
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """根据请求参数生成缓存键"""
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _get_sync(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._conn.execute(
+                "UPDATE llm_responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._stats["hits"] += 1
+        return json.loads(row[0])
+
+    def _put_sync(self, key: str, response: Dict[str, Any], provider: str, model: str):
+        payload = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses "
+                "(key, provider, model, response, size, created_at, accessed_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, provider, model, payload, len(payload.encode("utf-8")), now, now)
+            )
+            self._stats["writes"] += 1
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """按最近访问时间淘汰，直到条目数和总字节数都不超限"""
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM llm_responses ORDER BY accessed_at"
+        ).fetchall()
+        victims = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM llm_responses WHERE key = ?", victims)
+        self._stats["evictions"] += len(victims)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，未命中或已过期返回None"""
+        try:
+            return await asyncio.to_thread(self._get_sync, key)
+        except Exception as e:
+            logger.warning(f"⚠️ LLM响应缓存读取失败: {str(e)}")
+            return None
+
+    async def put(self, key: str, response: Dict[str, Any], provider: str = "", model: str = ""):
+        """写入缓存（失败只记录日志）"""
+        try:
+            await asyncio.to_thread(self._put_sync, key, response, provider, model)
+        except Exception as e:
+            logger.warning(f"⚠️ LLM响应缓存写入失败: {str(e)}")
+
+    def _delete_sync(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+
+    async def delete(self, key: str):
+        """删除单个条目（失败只记录日志）"""
+        try:
+            await asyncio.to_thread(self._delete_sync, key)
+        except Exception as e:
+            logger.warning(f"⚠️ LLM响应缓存删除失败: {str(e)}")
+
+    def record_bypass(self):
+        self._stats["bypassed"] += 1
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM llm_responses").rowcount
+        logger.info(f"🧹 LLM响应缓存已清空: {deleted}条")
+        return deleted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            命中率、条目数、占用字节等指标
+        """
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+            ).fetchone()
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "enabled": True,
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+def _create_cache() -> Optional[LLMResponseCache]:
+    if not settings.llm_cache_enabled:
+        return None
+    try:
+        cache = LLMResponseCache(
+            db_path=settings.llm_cache_path,
+            ttl_seconds=settings.llm_cache_ttl_seconds,
+            max_entries=settings.llm_cache_max_entries,
+            max_bytes=settings.llm_cache_max_mb * 1024 * 1024,
+        )
+        logger.info(f"✅ LLM响应缓存已启用: {settings.llm_cache_path}")
+        return cache
+    except Exception as e:
+        logger.warning(f"⚠️ LLM响应缓存初始化失败，将直接调用模型: {str(e)}")
+        return None
+
+
+# 全局实例（未开启时为None）
+llm_response_cache: Optional[LLMResponseCache] = _create_cache()
@@ -0,0 +1,240 @@
+"""记忆重建索引 - 从关系库重新生成项目的向量集合
+
+更换 Embedding 模型或 data/chroma_db 丢失后，原先只能让 LLM 重新分析所有章节。
+story_memories 表保存了全部记忆内容，重建索引只需重新编码：
+- 按记忆ID分页读取（键集分页），每页批量编码后 upsert 到新的版本化集合
+- 每页写入后记录游标；worker 崩溃后任务由队列重新领取，从游标继续
+- 按 memory_reindex_max_per_second 限速，避免与在线生成争抢编码线程
+- 全部写入后与关系库对账（补写期间新增的记忆、删除期间已删除的记忆），再原子切换集合别名
+- 切换后等待各进程的别名缓存过期，再对账一次（补写切换前后仍写入旧集合的记忆），最后删除旧集合
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select, update
+
+from app.config import settings
+from app.logger import get_logger
+from app.models.memory import StoryMemory
+from app.models.memory_reindex_task import MemoryReindexTask
+
+logger = get_logger(__name__)
+
+# 读取的记忆列（不加载 full_context 等大字段）
+_MEMORY_COLUMNS = (
+    StoryMemory.id, StoryMemory.vector_id, StoryMemory.chapter_id, StoryMemory.memory_type,
+    StoryMemory.title, StoryMemory.content, StoryMemory.tags, StoryMemory.related_characters,
+    StoryMemory.importance_score, StoryMemory.story_timeline, StoryMemory.is_foreshadow,
+    StoryMemory.created_at,
+)
+
+
+def _memory_record(row: Any) -> Dict[str, Any]:
+    """把记忆行转换为向量库写入格式"""
+    return {
+        "id": row.vector_id or row.id,
+        "content": row.content,
+        "type": row.memory_type,
+        "metadata": {
+            "chapter_id": row.chapter_id or "",
+            "chapter_number": row.story_timeline or 0,
+            "importance_score": row.importance_score if row.importance_score is not None else 0.5,
+            "tags": row.tags or [],
+            "title": row.title or "",
+            "is_foreshadow": row.is_foreshadow or 0,
+            "related_characters": row.related_characters or [],
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+        }
+    }
+
+
+class MemoryReindexService:
+    """记忆重建索引"""
+
+    @staticmethod
+    async def enqueue(db, user_id: str, project_id: str) -> MemoryReindexTask:
+        """
+        创建重建任务（项目已有未完成的任务时直接返回；上次失败的任务从游标继续）
+
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            project_id: 项目ID
+
+        Returns:
+            重建任务
+        """
+        from app.services.job_queue import job_queue
+
+        latest = (await db.execute(
+            select(MemoryReindexTask)
+            .where(MemoryReindexTask.project_id == project_id)
+            .order_by(MemoryReindexTask.created_at.desc())
+            .limit(1)
+        )).scalar_one_or_none()
+
+        if latest and latest.status in ('pending', 'running'):
+            return latest
+
+        if latest and latest.status == 'failed' and latest.target_collection:
+            latest.status = 'pending'
+            latest.error_message = None
+            latest.attempts = 0
+            latest.completed_at = None
+            task = latest
+            logger.info(f"🔁 重建索引任务从游标继续: {task.id} (已写入{task.processed_count}条)")
+        else:
+            task = MemoryReindexTask(user_id=user_id, project_id=project_id, status='pending', progress=0)
+            db.add(task)
+        await db.commit()
+        job_queue.notify()
+        return task
+
+    @staticmethod
+    async def run(task_id: str, user_id: str, project_id: str):
+        """
+        执行重建（任务队列处理函数）
+
+        Args:
+            task_id: 任务ID
+            user_id: 用户ID
+            project_id: 项目ID
+        """
+        from app.database import session_scope
+        from app.services.memory_service import memory_service
+        from app.services.task_progress_writer import progress_writer
+
+        try:
+            async with session_scope(user_id, name="memory_reindex") as db:
+                task = await db.get(MemoryReindexTask, task_id)
+                if task.target_collection is None or task.embedding_model != memory_service.embedding_model_name:
+                    # 首次执行，或续传前模型已更换：写入新的集合
+                    task.target_collection = memory_service.new_collection_version(user_id, project_id)
+                    task.embedding_model = memory_service.embedding_model_name
+                    task.cursor = None
+                    task.processed_count = 0
+                task.started_at = task.started_at or datetime.now()
+                task.total_count = (await db.execute(
+                    select(func.count(StoryMemory.id)).where(StoryMemory.project_id == project_id)
+                )).scalar() or 0
+                target = task.target_collection
+                cursor: Optional[str] = task.cursor
+                processed = task.processed_count or 0
+                total = task.total_count
+
+            logger.info(
+                f"🔄 开始重建记忆索引: 项目{project_id[:8]} -> {target}"
+                f"（{total}条{f'，从第{processed}条继续' if cursor else ''}）"
+            )
+
+            page_size = max(1, settings.memory_reindex_page_size)
+            max_rate = settings.memory_reindex_max_per_second
+            started = time.monotonic()
+            written = 0
+
+            while True:
+                async with session_scope(user_id, read_only=True, name="memory_reindex_page") as db:
+                    query = (
+                        select(*_MEMORY_COLUMNS)
+                        .where(StoryMemory.project_id == project_id)
+                        .order_by(StoryMemory.id)
+                        .limit(page_size)
+                    )
+                    if cursor is not None:
+                        query = query.where(StoryMemory.id > cursor)
+                    rows = (await db.execute(query)).all()
+                if not rows:
+                    break
+
+                await memory_service.upsert_memories(
+                    user_id, project_id, target, [_memory_record(row) for row in rows]
+                )
+                cursor = rows[-1].id
+                processed += len(rows)
+                written += len(rows)
+
+                # 限速：按本次执行写入的总量控制平均速度
+                elapsed = time.monotonic() - started
+                if max_rate > 0 and elapsed < written / max_rate:
+                    await asyncio.sleep(written / max_rate - elapsed)
+                    elapsed = time.monotonic() - started
+
+                throughput = written / elapsed if elapsed > 0 else None
+                remaining = max(total - processed, 0)
+                await progress_writer.write_now(
+                    MemoryReindexTask, task_id, user_id,
+                    cursor=cursor,
+                    processed_count=processed,
+                    progress=min(99, int(processed * 100 / total)) if total else 99,
+                    throughput=round(throughput, 2) if throughput else None,
+                    eta_seconds=int(remaining / throughput) if throughput else None
+                )
+
+            await MemoryReindexService._reconcile(user_id, project_id, target)
+
+            previous = memory_service.swap_collection_alias(user_id, project_id, target)
+            if previous != target:
+                # 其他进程在别名缓存过期前仍会写入旧集合：等待过期后再对账，然后才删除旧集合
+                if settings.memory_alias_cache_ttl_seconds > 0:
+                    await asyncio.sleep(settings.memory_alias_cache_ttl_seconds)
+                await MemoryReindexService._reconcile(user_id, project_id, target)
+                memory_service.drop_collection(previous)
+            async with session_scope(user_id, name="memory_reindex_finish") as db:
+                await db.execute(
+                    update(StoryMemory)
+                    .where(StoryMemory.project_id == project_id)
+                    .values(embedding_model=memory_service.embedding_model_name)
+                )
+                task = await db.get(MemoryReindexTask, task_id)
+                task.status = 'completed'
+                task.progress = 100
+                task.eta_seconds = 0
+                task.completed_at = datetime.now()
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"✅ 记忆索引重建完成: 项目{project_id[:8]}，本次写入{written}条，"
+                f"耗时{elapsed:.1f}秒（{written / elapsed if elapsed > 0 else 0:.1f}条/秒）"
+            )
+
+        except asyncio.CancelledError:
+            # 租约丢失或 worker 停止：保留游标，由队列重新领取后继续
+            raise
+        except Exception as e:
+            logger.error(f"❌ 记忆索引重建失败: 项目{project_id[:8]}: {str(e)}", exc_info=True)
+            await progress_writer.write_now(
+                MemoryReindexTask, task_id, user_id,
+                status='failed',
+                error_message=str(e)[:1000],
+                completed_at=datetime.now()
+            )
+
+    @staticmethod
+    async def _reconcile(user_id: str, project_id: str, target: str):
+        """对账：补写重建期间新增（ID在游标之前）的记忆，删除期间已被删除的记忆"""
+        from app.database import session_scope
+        from app.services.memory_service import memory_service
+
+        async with session_scope(user_id, read_only=True, name="memory_reindex_reconcile") as db:
+            rows = (await db.execute(
+                select(StoryMemory.id, StoryMemory.vector_id).where(StoryMemory.project_id == project_id)
+            )).all()
+        expected = {row.vector_id or row.id: row.id for row in rows}
+        indexed = set(memory_service.list_memory_ids(user_id, project_id, target))
+
+        stale = [vector_id for vector_id in indexed if vector_id not in expected]
+        memory_service.delete_memory_ids(user_id, project_id, target, stale)
+
+        missing: List[str] = [memory_id for vector_id, memory_id in expected.items() if vector_id not in indexed]
+        page_size = max(1, settings.memory_reindex_page_size)
+        for start in range(0, len(missing), page_size):
+            async with session_scope(user_id, read_only=True, name="memory_reindex_reconcile") as db:
+                page = (await db.execute(
+                    select(*_MEMORY_COLUMNS).where(StoryMemory.id.in_(missing[start:start + page_size]))
+                )).all()
+            await memory_service.upsert_memories(user_id, project_id, target, [_memory_record(row) for row in page])
+
+        if stale or missing:
+            logger.info(f"🧮 记忆索引对账: 补写{len(missing)}条，删除{len(stale)}条")
@@ -5,11 +5,18 @@ from typing import List, Dict, Any, Optional
 import json
 from datetime import datetime
 from app.logger import get_logger
+from app.config import settings
+from app.services.embedding_executor import EmbeddingExecutor
+from app.services.embedding_cache import EmbeddingCache
 import os
 import hashlib
+import time
 
 logger = get_logger(__name__)
 
+# 集合别名登记表（重建索引后项目别名指向新的版本化集合）
+ALIAS_COLLECTION = "collection_aliases"
+
 # 配置模型缓存目录
 # 优先使用 backend/embedding 目录（打包后的实际位置）
 import sys
@@ -85,12 +92,16 @@ class MemoryService:
             
         try:
             # 确保数据目录存在
-            chroma_dir = "data/chroma_db"
+            chroma_dir = settings.chroma_persist_dir
             os.makedirs(chroma_dir, exist_ok=True)
             
             # 初始化ChromaDB客户端(使用新API - PersistentClient)
             self.client = chromadb.PersistentClient(path=chroma_dir)
             
+            # 集合别名进程内缓存：基础名称 -> (过期时间, 当前集合名称)
+            self._alias_collection = None
+            self._alias_cache: Dict[str, tuple] = {}
+            
             # 初始化多语言embedding模型(支持中文)
             logger.info("🔄 正在加载Embedding模型...")
             
@@ -142,6 +153,7 @@ class MemoryService:
             
             try:
                 logger.info("🔄 尝试加载主模型: sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+                self.embedding_model_name = 'paraphrase-multilingual-MiniLM-L12-v2'
                 
                 # 使用绝对路径检查本地模型
                 abs_cache_dir = os.path.abspath(model_cache_dir)
@@ -206,6 +218,7 @@ class MemoryService:
                         device='cpu',
                         trust_remote_code=False
                     )
+                    self.embedding_model_name = 'all-MiniLM-L6-v2'
                     logger.info("✅ 使用备用Embedding模型 (all-MiniLM-L6-v2)")
                 except Exception as e2:
                     logger.error(f"❌ 所有模型加载失败: {str(e2)}")
@@ -218,28 +231,39 @@ class MemoryService:
                     logger.error(f"   {os.path.abspath(model_cache_dir)}/models--sentence-transformers--paraphrase-multilingual-MiniLM-L12-v2/")
                     raise RuntimeError("无法加载任何Embedding模型")
             
+            # 编码请求统一交给执行器，合并批处理并在线程池中执行
+            self.embedding_executor = EmbeddingExecutor(
+                self.embedding_model,
+                batch_size=settings.embedding_batch_size,
+                max_wait_ms=settings.embedding_batch_wait_ms,
+                max_workers=settings.embedding_max_workers
+            )
+            
+            # 内容寻址的向量缓存，重复文本不再重新编码
+            self.embedding_cache = None
+            if settings.embedding_cache_enabled:
+                try:
+                    self.embedding_cache = EmbeddingCache(
+                        cache_dir=settings.embedding_cache_dir,
+                        model_name=self.embedding_model_name,
+                        dim=self.embedding_model.get_sentence_embedding_dimension(),
+                        capacity=settings.embedding_cache_max_entries
+                    )
+                except Exception as cache_err:
+                    logger.warning(f"⚠️ Embedding缓存初始化失败，将直接编码: {str(cache_err)}")
+            
             self._initialized = True
             logger.info("✅ MemoryService初始化成功")
             logger.info(f"  - ChromaDB目录: {chroma_dir}")
-            logger.info(f"  - Embedding模型: paraphrase-multilingual-MiniLM-L12-v2")
+            logger.info(f"  - Embedding模型: {self.embedding_model_name}")
             
         except Exception as e:
             logger.error(f"❌ MemoryService初始化失败: {str(e)}")
             raise
     
-    def get_collection(self, user_id: str, project_id: str):
-        """
-        获取或创建项目的记忆集合
-        
-        每个用户的每个项目有独立的collection,实现数据隔离
-        
-        Args:
-            user_id: 用户ID
-            project_id: 项目ID
-        
-        Returns:
-            ChromaDB Collection对象
-        """
+    @staticmethod
+    def _base_collection_name(user_id: str, project_id: str) -> str:
+        """项目集合的基础名称（别名）"""
         # ChromaDB collection命名规则：
         # 1. 3-63字符（最重要！）
         # 2. 开头和结尾必须是字母或数字
@@ -251,14 +275,55 @@ class MemoryService:
         # 格式: u_{user_hash}_p_{project_hash} (约30字符)
         user_hash = hashlib.sha256(user_id.encode()).hexdigest()[:8]
         project_hash = hashlib.sha256(project_id.encode()).hexdigest()[:8]
-        collection_name = f"u_{user_hash}_p_{project_hash}"
+        return f"u_{user_hash}_p_{project_hash}"
+    
+    def _alias_registry(self):
+        """别名登记集合：基础名称 -> 当前使用的版本化集合（只存元数据）"""
+        if self._alias_collection is None:
+            self._alias_collection = self.client.get_or_create_collection(name=ALIAS_COLLECTION, embedding_function=None)
+        return self._alias_collection
+    
+    def _lookup_alias(self, base_name: str) -> str:
+        """从别名登记集合读取当前集合名称并刷新进程内缓存"""
+        entry = self._alias_registry().get(ids=[base_name], include=["metadatas"])
+        target = entry["metadatas"][0]["target"] if entry["ids"] else base_name
+        self._alias_cache[base_name] = (time.monotonic() + settings.memory_alias_cache_ttl_seconds, target)
+        return target
+    
+    def resolve_collection_name(self, user_id: str, project_id: str) -> str:
+        """
+        解析项目当前使用的集合名称
         
+        重建索引完成后别名指向新的版本化集合，未重建过的项目直接使用基础名称。
+        解析结果在进程内缓存，本进程切换别名时立即失效，其他进程的切换在 memory_alias_cache_ttl_seconds 内生效。
+        """
+        base_name = self._base_collection_name(user_id, project_id)
+        cached = self._alias_cache.get(base_name)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        return self._lookup_alias(base_name)
+    
+    def get_collection(self, user_id: str, project_id: str, collection_name: Optional[str] = None):
+        """
+        获取或创建项目的记忆集合
+        
+        每个用户的每个项目有独立的collection,实现数据隔离
+        
+        Args:
+            user_id: 用户ID
+            project_id: 项目ID
+            collection_name: 指定集合名称（重建索引写入新版本集合时使用），默认按别名解析
+        
+        Returns:
+            ChromaDB Collection对象
+        """
         try:
             return self.client.get_or_create_collection(
-                name=collection_name,
+                name=collection_name or self.resolve_collection_name(user_id, project_id),
                 metadata={
                     "user_id": user_id,
                     "project_id": project_id,
+                    "embedding_model": self.embedding_model_name,
                     "created_at": datetime.now().isoformat()
                 }
             )
@@ -266,6 +331,95 @@ class MemoryService:
             logger.error(f"❌ 获取collection失败: {str(e)}")
             raise
     
+    def new_collection_version(self, user_id: str, project_id: str) -> str:
+        """生成新的版本化集合名称（基础名称 + 时间戳）"""
+        return f"{self._base_collection_name(user_id, project_id)}_v{int(time.time() * 1000)}"
+    
+    def swap_collection_alias(self, user_id: str, project_id: str, target_name: str) -> Optional[str]:
+        """
+        把项目别名原子切换到新集合
+        
+        旧集合保留，由调用方在对账完成后通过 drop_collection 删除
+        （切换前后仍可能有写入落在旧集合，立即删除会丢失这些写入）
+        
+        Args:
+            user_id: 用户ID
+            project_id: 项目ID
+            target_name: 新集合名称
+        
+        Returns:
+            被替换的旧集合名称
+        """
+        base_name = self._base_collection_name(user_id, project_id)
+        previous = self._lookup_alias(base_name)
+        self._alias_registry().upsert(
+            ids=[base_name],
+            embeddings=[[0.0]],
+            metadatas=[{
+                "target": target_name,
+                "embedding_model": self.embedding_model_name,
+                "updated_at": datetime.now().isoformat()
+            }]
+        )
+        self._alias_cache.pop(base_name, None)
+        logger.info(f"🔀 项目{project_id[:8]}的向量集合已切换: {previous} -> {target_name}")
+        return previous
+    
+    def drop_collection(self, collection_name: str):
+        """删除已被别名替换的旧集合（失败只记录警告）"""
+        try:
+            self.client.delete_collection(name=collection_name)
+            logger.info(f"🗑️ 已删除旧向量集合: {collection_name}")
+        except Exception as e:
+            logger.warning(f"⚠️ 删除旧集合{collection_name}失败: {str(e)}")
+    
+    @staticmethod
+    def _chroma_metadata(memory_type: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """准备元数据(ChromaDB要求所有值为基础类型)"""
+        chroma_metadata = {
+            "memory_type": memory_type,
+            "chapter_id": str(metadata.get("chapter_id", "")),
+            "chapter_number": int(metadata.get("chapter_number", 0)),
+            "importance": float(metadata.get("importance_score", 0.5)),
+            "tags": json.dumps(metadata.get("tags", []), ensure_ascii=False),
+            "title": str(metadata.get("title", ""))[:200],  # 限制长度
+            "is_foreshadow": int(metadata.get("is_foreshadow", 0)),
+            "created_at": metadata.get("created_at") or datetime.now().isoformat()
+        }
+        
+        # 添加相关角色信息
+        if metadata.get("related_characters"):
+            chroma_metadata["related_characters"] = json.dumps(
+                metadata["related_characters"], 
+                ensure_ascii=False
+            )
+        return chroma_metadata
+    
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        生成文本向量（优先读取缓存，未命中的文本合并为一批编码）
+        
+        Args:
+            texts: 文本列表
+        
+        Returns:
+            与输入顺序一致的向量列表
+        """
+        if not self.embedding_cache:
+            return await self.embedding_executor.encode_batch(texts)
+        
+        embeddings = self.embedding_cache.get_many(texts)
+        missing = [i for i, emb in enumerate(embeddings) if emb is None]
+        if missing:
+            # 同一批内的重复文本只编码一次
+            missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = await self.embedding_executor.encode_batch(missing_texts)
+            self.embedding_cache.put_many(missing_texts, encoded)
+            encoded_map = dict(zip(missing_texts, encoded))
+            for i in missing:
+                embeddings[i] = encoded_map[texts[i]]
+        return embeddings
+    
     async def add_memory(
         self,
         user_id: str,
@@ -293,26 +447,9 @@ class MemoryService:
             collection = self.get_collection(user_id, project_id)
             
             # 生成文本的向量表示
-            embedding = self.embedding_model.encode(content).tolist()
-            
-            # 准备元数据(ChromaDB要求所有值为基础类型)
-            chroma_metadata = {
-                "memory_type": memory_type,
-                "chapter_id": str(metadata.get("chapter_id", "")),
-                "chapter_number": int(metadata.get("chapter_number", 0)),
-                "importance": float(metadata.get("importance_score", 0.5)),
-                "tags": json.dumps(metadata.get("tags", []), ensure_ascii=False),
-                "title": str(metadata.get("title", ""))[:200],  # 限制长度
-                "is_foreshadow": int(metadata.get("is_foreshadow", 0)),
-                "created_at": datetime.now().isoformat()
-            }
+            embedding = (await self._embed_texts([content]))[0]
             
-            # 添加相关角色信息
-            if metadata.get("related_characters"):
-                chroma_metadata["related_characters"] = json.dumps(
-                    metadata["related_characters"], 
-                    ensure_ascii=False
-                )
+            chroma_metadata = self._chroma_metadata(memory_type, metadata)
             
             # 存储到向量库
             collection.add(
@@ -355,31 +492,19 @@ class MemoryService:
             ids = []
             documents = []
             metadatas = []
-            embeddings = []
             
             # 批量准备数据
             for mem in memories:
                 ids.append(mem['id'])
                 documents.append(mem['content'])
                 
-                # 生成embedding
-                embedding = self.embedding_model.encode(mem['content']).tolist()
-                embeddings.append(embedding)
-                
                 # 准备元数据
-                metadata = mem.get('metadata', {})
-                chroma_metadata = {
-                    "memory_type": mem['type'],
-                    "chapter_id": str(metadata.get("chapter_id", "")),
-                    "chapter_number": int(metadata.get("chapter_number", 0)),
-                    "importance": float(metadata.get("importance_score", 0.5)),
-                    "tags": json.dumps(metadata.get("tags", []), ensure_ascii=False),
-                    "title": str(metadata.get("title", ""))[:200],
-                    "is_foreshadow": int(metadata.get("is_foreshadow", 0)),
-                    "created_at": datetime.now().isoformat()
-                }
+                chroma_metadata = self._chroma_metadata(mem['type'], mem.get('metadata', {}))
                 metadatas.append(chroma_metadata)
             
+            # 一次性批量生成embedding
+            embeddings = await self._embed_texts(documents)
+            
             # 批量添加
             collection.add(
                 ids=ids,
@@ -395,6 +520,49 @@ class MemoryService:
             logger.error(f"❌ 批量添加记忆失败: {str(e)}")
             return 0
     
+    async def upsert_memories(
+        self,
+        user_id: str,
+        project_id: str,
+        collection_name: str,
+        memories: List[Dict[str, Any]]
+    ) -> int:
+        """
+        批量编码并写入指定集合(重建索引使用，已存在的ID会被覆盖)
+        
+        Args:
+            user_id: 用户ID
+            project_id: 项目ID
+            collection_name: 目标集合名称
+            memories: 记忆列表,每个包含id、content、type、metadata
+        
+        Returns:
+            写入的数量
+        """
+        if not memories:
+            return 0
+        
+        collection = self.get_collection(user_id, project_id, collection_name=collection_name)
+        documents = [mem['content'] for mem in memories]
+        embeddings = await self._embed_texts(documents)
+        collection.upsert(
+            ids=[mem['id'] for mem in memories],
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=[self._chroma_metadata(mem['type'], mem.get('metadata', {})) for mem in memories]
+        )
+        return len(memories)
+    
+    def list_memory_ids(self, user_id: str, project_id: str, collection_name: str) -> List[str]:
+        """列出集合中的全部记忆ID（不读取向量和文档）"""
+        collection = self.get_collection(user_id, project_id, collection_name=collection_name)
+        return collection.get(include=[])["ids"]
+    
+    def delete_memory_ids(self, user_id: str, project_id: str, collection_name: str, ids: List[str]):
+        """从集合中删除指定ID的记忆"""
+        if ids:
+            self.get_collection(user_id, project_id, collection_name=collection_name).delete(ids=ids)
+    
     async def search_memories(
         self,
         user_id: str,
@@ -424,7 +592,7 @@ class MemoryService:
             collection = self.get_collection(user_id, project_id)
             
             # 生成查询向量
-            query_embedding = self.embedding_model.encode(query).tolist()
+            query_embedding = (await self._embed_texts([query]))[0]
             
             # 构建过滤条件 - ChromaDB要求使用$and组合多个条件
             where_filter = None
@@ -777,23 +945,24 @@ class MemoryService:
             是否删除成功
         """
         try:
-            # 生成collection名称
-            user_hash = hashlib.sha256(user_id.encode()).hexdigest()[:8]
-            project_hash = hashlib.sha256(project_id.encode()).hexdigest()[:8]
-            collection_name = f"u_{user_hash}_p_{project_hash}"
+            base_name = self._base_collection_name(user_id, project_id)
+            current_name = self._lookup_alias(base_name)
             
-            # 删除整个collection(这会清理所有向量数据)
-            try:
-                self.client.delete_collection(name=collection_name)
-                logger.info(f"🗑️ 已删除项目{project_id[:8]}的向量数据库collection: {collection_name}")
-                return True
-            except Exception as e:
-                # 如果collection不存在,也算成功
-                if "does not exist" in str(e).lower():
-                    logger.info(f"ℹ️ 项目{project_id[:8]}的collection不存在,无需删除")
-                    return True
-                else:
-                    raise
+            # 删除整个collection(这会清理所有向量数据)，重建过索引的项目同时删除版本化集合和别名
+            for collection_name in dict.fromkeys([current_name, base_name]):
+                try:
+                    self.client.delete_collection(name=collection_name)
+                    logger.info(f"🗑️ 已删除项目{project_id[:8]}的向量数据库collection: {collection_name}")
+                except Exception as e:
+                    # 如果collection不存在,也算成功
+                    if "does not exist" in str(e).lower() or "not found" in str(e).lower():
+                        logger.info(f"ℹ️ 项目{project_id[:8]}的collection不存在,无需删除")
+                    else:
+                        raise
+            if current_name != base_name:
+                self._alias_registry().delete(ids=[base_name])
+            self._alias_cache.pop(base_name, None)
+            return True
                 
         except Exception as e:
             logger.error(f"❌ 删除项目记忆失败: {str(e)}")
@@ -827,7 +996,7 @@ class MemoryService:
             
             if content:
                 # 重新生成embedding
-                embedding = self.embedding_model.encode(content).tolist()
+                embedding = (await self._embed_texts([content]))[0]
                 update_data['embeddings'] = [embedding]
                 update_data['documents'] = [content]
             
@@ -856,6 +1025,13 @@ class MemoryService:
             logger.error(f"❌ 更新记忆失败: {str(e)}")
             return False
     
+    def _embedding_stats(self) -> Dict[str, Any]:
+        """编码执行器与向量缓存的运行统计"""
+        return {
+            "embedding_executor": self.embedding_executor.get_stats(),
+            "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None
+        }
+    
     async def get_memory_stats(
         self,
         user_id: str,
@@ -882,7 +1058,9 @@ class MemoryService:
                     "total_count": 0,
                     "by_type": {},
                     "by_chapter": {},
-                    "foreshadow_count": 0
+                    "foreshadow_count": 0,
+                    "foreshadow_resolved": 0,
+                    **self._embedding_stats()
                 }
             
             # 统计各类型数量
@@ -906,7 +1084,8 @@ class MemoryService:
                 "by_type": type_counts,
                 "by_chapter": chapter_counts,
                 "foreshadow_count": foreshadow_count,
-                "foreshadow_resolved": sum(1 for m in all_memories['metadatas'] if m.get('is_foreshadow') == 2)
+                "foreshadow_resolved": sum(1 for m in all_memories['metadatas'] if m.get('is_foreshadow') == 2),
+                **self._embedding_stats()
             }
             
             logger.info(f"📊 记忆统计: 总计{stats['total_count']}条, 伏笔{foreshadow_count}个")
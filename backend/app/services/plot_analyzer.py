@@ -1,10 +1,14 @@
 """剧情分析服务 - 自动分析章节的钩子、伏笔、冲突等元素"""
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
 from app.services.ai_service import AIService
 from app.services.prompt_service import prompt_service, PromptService
+from app.utils.text_split import find_best_split_point
+from app.utils.stream_buffer import StreamTextBuffer
 from app.logger import get_logger
 import json
+import math
 import re
 import asyncio
 
@@ -51,9 +55,6 @@ class PlotAnalyzer:
         """
         logger.info(f"🔍 开始分析第{chapter_number}章: {title}")
         
-        # 如果内容过长,截取前8000字(避免超token)
-        analysis_content = content[:8000] if len(content) > 8000 else content
-        
         # 获取自定义提示词模板
         try:
             if user_id and db:
@@ -65,40 +66,75 @@ class PlotAnalyzer:
             logger.warning(f"⚠️ 获取提示词模板失败，使用默认模板: {str(e)}")
             template = PromptService.PLOT_ANALYSIS
         
+        # 长章节按段落切分并发分析，避免截断导致后半章的钩子、伏笔丢失
+        if len(content) > settings.plot_analysis_chunk_chars:
+            return await self._analyze_in_chunks(
+                chapter_number=chapter_number,
+                title=title,
+                content=content,
+                word_count=word_count,
+                template=template,
+                max_retries=max_retries
+            )
+        
         # 格式化提示词
         prompt = PromptService.format_prompt(
             template,
             chapter_number=chapter_number,
             title=title,
             word_count=word_count,
-            content=analysis_content
+            content=content
         )
         
+        return await self._run_analysis(prompt, chapter_number, len(content), max_retries)
+    
+    async def _run_analysis(
+        self,
+        prompt: str,
+        chapter_number: int,
+        content_length: int,
+        max_retries: int,
+        part_label: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """
+        调用AI分析并解析结果（带重试机制）
+        
+        Args:
+            prompt: 完整提示词
+            chapter_number: 章节号
+            content_length: 待分析内容长度（用于日志）
+            max_retries: 最大重试次数
+            part_label: 分段标识（用于日志），如"第1/3段"
+        
+        Returns:
+            分析结果字典,失败返回None
+        """
         last_error = None
         
         for attempt in range(1, max_retries + 1):
             try:
                 # 调用AI进行分析
-                logger.info(f"  📡 调用AI分析(内容长度: {len(analysis_content)}字, 尝试 {attempt}/{max_retries})...")
-                accumulated_text = ""
+                logger.info(f"  📡 调用AI分析{part_label}(内容长度: {content_length}字, 尝试 {attempt}/{max_retries})...")
+                response_buffer = StreamTextBuffer()
                 
                 try:
                     async for chunk in self.ai_service.generate_text_stream(
                         prompt=prompt,
                         temperature=0.3  # 降低温度以获得更稳定的JSON输出
                     ):
-                        accumulated_text += chunk
+                        response_buffer.append(chunk)
                 except GeneratorExit:
                     # 流式响应被中断
-                    logger.warning(f"⚠️ 流式响应被中断(GeneratorExit)，已累积 {len(accumulated_text)} 字符")
+                    logger.warning(f"⚠️ 流式响应被中断(GeneratorExit)，已累积 {len(response_buffer)} 字符")
                     # 如果已经累积了足够内容，继续尝试解析
-                    if len(accumulated_text) < 100:
+                    if len(response_buffer) < 100:
                         raise Exception("流式响应中断，内容不足")
                 except Exception as stream_error:
                     logger.error(f"❌ 流式生成出错: {str(stream_error)}")
                     raise
                 
                 # 检查响应是否为空
+                accumulated_text = response_buffer.getvalue()
                 if not accumulated_text or len(accumulated_text.strip()) < 10:
                     logger.warning(f"⚠️ AI响应为空或过短(长度: {len(accumulated_text)}), 尝试 {attempt}/{max_retries}")
                     last_error = "AI响应为空或过短"
@@ -108,7 +144,7 @@ class PlotAnalyzer:
                         await asyncio.sleep(wait_time)
                         continue
                     else:
-                        logger.error(f"❌ 第{chapter_number}章分析失败: AI响应为空，已达最大重试次数")
+                        logger.error(f"❌ 第{chapter_number}章{part_label}分析失败: AI响应为空，已达最大重试次数")
                         return None
                 
                 # 提取内容
@@ -119,7 +155,7 @@ class PlotAnalyzer:
                 analysis_result = self._parse_analysis_response(response_text)
                 
                 if analysis_result:
-                    logger.info(f"✅ 第{chapter_number}章分析完成 (尝试 {attempt}/{max_retries})")
+                    logger.info(f"✅ 第{chapter_number}章{part_label}分析完成 (尝试 {attempt}/{max_retries})")
                     logger.info(f"  - 钩子: {len(analysis_result.get('hooks', []))}个")
                     logger.info(f"  - 伏笔: {len(analysis_result.get('foreshadows', []))}个")
                     logger.info(f"  - 情节点: {len(analysis_result.get('plot_points', []))}个")
@@ -135,7 +171,7 @@ class PlotAnalyzer:
                         await asyncio.sleep(wait_time)
                         continue
                     else:
-                        logger.error(f"❌ 第{chapter_number}章分析失败: JSON解析错误，已达最大重试次数")
+                        logger.error(f"❌ 第{chapter_number}章{part_label}分析失败: JSON解析错误，已达最大重试次数")
                         return None
                     
             except Exception as e:
@@ -148,13 +184,265 @@ class PlotAnalyzer:
                     await asyncio.sleep(wait_time)
                     continue
                 else:
-                    logger.error(f"❌ 第{chapter_number}章分析失败: {last_error}，已达最大重试次数")
+                    logger.error(f"❌ 第{chapter_number}章{part_label}分析失败: {last_error}，已达最大重试次数")
                     return None
         
         # 不应该到达这里，但作为安全措施
-        logger.error(f"❌ 第{chapter_number}章分析失败: {last_error}")
+        logger.error(f"❌ 第{chapter_number}章{part_label}分析失败: {last_error}")
         return None
     
+    async def _analyze_in_chunks(
+        self,
+        chapter_number: int,
+        title: str,
+        content: str,
+        word_count: int,
+        template: str,
+        max_retries: int
+    ) -> Optional[Dict[str, Any]]:
+        """
+        分段并发分析长章节（map-reduce）
+        
+        按段落边界切分后每段独立调用AI（经LLM调度器排队并发），再合并各段结果，
+        钩子、伏笔、情节点的位置映射回全文。
+        
+        Args:
+            chapter_number: 章节号
+            title: 章节标题
+            content: 章节完整内容
+            word_count: 字数
+            template: 提示词模板
+            max_retries: 每段最大重试次数
+        
+        Returns:
+            合并后的分析结果,全部分段失败返回None
+        """
+        parts = self._split_for_analysis(content)
+        total = len(parts)
+        logger.info(f"  ✂️ 第{chapter_number}章共{len(content)}字，切分为{total}段并发分析: {[len(text) for _, text in parts]}")
+        
+        async def analyze_part(index: int, offset: int, text: str) -> Optional[Dict[str, Any]]:
+            part_content = (
+                f"【说明】本章共{len(content)}字，以下为第{index}/{total}部分（第{offset + 1}~{offset + len(text)}字），"
+                f"只分析这一部分，keyword必须从这一部分原文逐字复制。\n\n{text}"
+            )
+            prompt = PromptService.format_prompt(
+                template,
+                chapter_number=chapter_number,
+                title=f"{title}（第{index}/{total}部分）",
+                word_count=word_count,
+                content=part_content
+            )
+            return await self._run_analysis(prompt, chapter_number, len(text), max_retries, part_label=f"第{index}/{total}段")
+        
+        results = await asyncio.gather(
+            *(analyze_part(i + 1, offset, text) for i, (offset, text) in enumerate(parts))
+        )
+        
+        succeeded = [(offset, text, result) for (offset, text), result in zip(parts, results) if result]
+        if not succeeded:
+            logger.error(f"❌ 第{chapter_number}章分段分析全部失败")
+            return None
+        if len(succeeded) < total:
+            covered = sum(len(text) for _, text, _ in succeeded)
+            logger.warning(f"⚠️ 第{chapter_number}章有{total - len(succeeded)}段分析失败，覆盖率 {covered * 100 // len(content)}%")
+        
+        merged = self._merge_chunk_results(succeeded, content)
+        logger.info(
+            f"✅ 第{chapter_number}章分段分析合并完成: 钩子{len(merged['hooks'])}个, "
+            f"伏笔{len(merged['foreshadows'])}个, 情节点{len(merged['plot_points'])}个, "
+            f"角色{len(merged['character_states'])}个"
+        )
+        return merged
+    
+    def _split_for_analysis(self, content: str) -> List[Tuple[int, str]]:
+        """
+        按段落边界把内容切分为长度相近的若干段
+        
+        Returns:
+            [(在全文中的起始位置, 段落文本)]
+        """
+        max_chars = max(1, settings.plot_analysis_chunk_chars)
+        count = min(max(1, settings.plot_analysis_max_chunks), math.ceil(len(content) / max_chars))
+        target = len(content) / count
+        
+        bounds = [0]
+        for i in range(1, count):
+            cut = find_best_split_point(content, int(target * i), search_range=min(500, int(target / 4)))
+            if cut <= bounds[-1] or cut >= len(content):
+                cut = int(target * i)
+            bounds.append(cut)
+        bounds.append(len(content))
+        return [(bounds[i], content[bounds[i]:bounds[i + 1]]) for i in range(count)]
+    
+    def _merge_chunk_results(
+        self,
+        chunk_results: List[Tuple[int, str, Dict[str, Any]]],
+        content: str
+    ) -> Dict[str, Any]:
+        """
+        合并各段分析结果
+        
+        - 钩子/伏笔/情节点：按关键词去重，位置映射回全文（text_position），钩子位置描述按全文重新计算
+        - 角色状态：同名角色合并，取首段的初始状态和末段的最终状态
+        - 冲突/情绪：取强度最高的一段为主，类型与参与方取并集
+        - 评分与对话/描写比例：按段落长度加权平均
+        
+        Args:
+            chunk_results: [(段落起始位置, 段落文本, 分析结果)]
+            content: 章节完整内容
+        
+        Returns:
+            与单次分析格式相同的结果字典
+        """
+        total_length = max(1, sum(len(text) for _, text, _ in chunk_results))
+        merged: Dict[str, Any] = {
+            'hooks': [],
+            'foreshadows': [],
+            'plot_points': [],
+            'character_states': [],
+            'scenes': [],
+            'suggestions': [],
+        }
+        seen_keywords = {'hooks': set(), 'foreshadows': set(), 'plot_points': set()}
+        characters: Dict[str, Dict[str, Any]] = {}
+        conflicts = []
+        emotions = []
+        pacing_votes: Dict[str, int] = {}
+        weighted: Dict[str, float] = {}
+        justifications = []
+        summaries = []
+        
+        for offset, text, result in chunk_results:
+            weight = len(text) / total_length
+            
+            # 1. 钩子、伏笔、情节点：位置映射回全文
+            for field in ('hooks', 'foreshadows', 'plot_points'):
+                for item in result.get(field) or []:
+                    if not isinstance(item, dict):
+                        continue
+                    keyword = item.get('keyword', '')
+                    dedup_key = keyword or item.get('content', '')
+                    if dedup_key in seen_keywords[field]:
+                        continue
+                    seen_keywords[field].add(dedup_key)
+                    
+                    item = dict(item)
+                    position, length = self._find_text_position(text, keyword)
+                    if position >= 0:
+                        item['text_position'] = offset + position
+                        item['text_length'] = length
+                        if field == 'hooks':
+                            ratio = (offset + position) / max(1, len(content))
+                            item['position'] = '开头' if ratio < 1 / 3 else ('中段' if ratio < 2 / 3 else '结尾')
+                    merged[field].append(item)
+            
+            # 2. 角色状态：同名合并
+            for state in result.get('character_states') or []:
+                if not isinstance(state, dict):
+                    continue
+                name = state.get('character_name', '未知角色')
+                existing = characters.get(name)
+                if existing is None:
+                    characters[name] = dict(state)
+                    continue
+                if state.get('state_after'):
+                    existing['state_after'] = state['state_after']
+                for key in ('psychological_change', 'key_event'):
+                    if state.get(key) and state[key] != existing.get(key):
+                        existing[key] = "；".join(filter(None, [existing.get(key), state[key]]))
+                if isinstance(state.get('relationship_changes'), dict):
+                    existing['relationship_changes'] = {**(existing.get('relationship_changes') or {}), **state['relationship_changes']}
+                if isinstance(state.get('career_changes'), dict):
+                    existing['career_changes'] = self._merge_career_changes(existing.get('career_changes'), state['career_changes'])
+            
+            # 3. 冲突、情绪
+            if isinstance(result.get('conflict'), dict) and result['conflict']:
+                conflicts.append(result['conflict'])
+            if isinstance(result.get('emotional_arc'), dict) and result['emotional_arc']:
+                emotions.append(result['emotional_arc'])
+            
+            # 4. 场景、建议、摘要
+            known_locations = {scene.get('location') for scene in merged['scenes']}
+            for scene in result.get('scenes') or []:
+                if isinstance(scene, dict) and scene.get('location') not in known_locations:
+                    merged['scenes'].append(scene)
+                    known_locations.add(scene.get('location'))
+            for suggestion in result.get('suggestions') or []:
+                if suggestion not in merged['suggestions']:
+                    merged['suggestions'].append(suggestion)
+            if result.get('summary'):
+                summaries.append(result['summary'])
+            
+            # 5. 节奏投票与加权指标
+            if result.get('pacing'):
+                pacing_votes[result['pacing']] = pacing_votes.get(result['pacing'], 0) + len(text)
+            scores = result.get('scores') or {}
+            for key in ('pacing', 'engagement', 'coherence', 'overall'):
+                if isinstance(scores.get(key), (int, float)):
+                    weighted[f"score_{key}"] = weighted.get(f"score_{key}", 0.0) + scores[key] * weight
+            for key in ('dialogue_ratio', 'description_ratio'):
+                if isinstance(result.get(key), (int, float)):
+                    weighted[key] = weighted.get(key, 0.0) + result[key] * weight
+            if scores.get('score_justification'):
+                justifications.append(scores['score_justification'])
+        
+        merged['character_states'] = list(characters.values())
+        merged['suggestions'] = merged['suggestions'][:5]
+        
+        if conflicts:
+            main_conflict = dict(max(conflicts, key=lambda c: c.get('level', 0) or 0))
+            main_conflict['types'] = list(dict.fromkeys(t for c in conflicts for t in (c.get('types') or [])))
+            main_conflict['parties'] = list(dict.fromkeys(p for c in conflicts for p in (c.get('parties') or [])))
+            if 'resolution_progress' in conflicts[-1]:
+                main_conflict['resolution_progress'] = conflicts[-1]['resolution_progress']
+            merged['conflict'] = main_conflict
+        else:
+            merged['conflict'] = {}
+        
+        if emotions:
+            main_emotion = dict(max(emotions, key=lambda e: e.get('intensity', 0) or 0))
+            main_emotion['curve'] = "→".join(e['curve'] for e in emotions if e.get('curve'))
+            main_emotion['secondary_emotions'] = list(dict.fromkeys(
+                s for e in emotions for s in (e.get('secondary_emotions') or [])
+            ))
+            merged['emotional_arc'] = main_emotion
+        else:
+            merged['emotional_arc'] = {}
+        
+        merged['scores'] = {
+            key: round(weighted[f"score_{key}"], 1)
+            for key in ('pacing', 'engagement', 'coherence', 'overall')
+            if f"score_{key}" in weighted
+        }
+        if justifications:
+            merged['scores']['score_justification'] = "；".join(justifications)
+        for key in ('dialogue_ratio', 'description_ratio'):
+            if key in weighted:
+                merged[key] = round(weighted[key], 2)
+        if pacing_votes:
+            merged['pacing'] = max(pacing_votes, key=pacing_votes.get)
+        last_result = chunk_results[-1][2]
+        if last_result.get('plot_stage'):
+            merged['plot_stage'] = last_result['plot_stage']
+        if summaries:
+            merged['summary'] = "".join(summaries)
+        
+        return merged
+    
+    @staticmethod
+    def _merge_career_changes(first: Optional[Dict[str, Any]], second: Dict[str, Any]) -> Dict[str, Any]:
+        """合并两段的职业变化：阶段变化累加，列表拼接"""
+        if not first:
+            return dict(second)
+        merged = dict(first)
+        merged['main_career_stage_change'] = (first.get('main_career_stage_change') or 0) + (second.get('main_career_stage_change') or 0)
+        for key in ('sub_career_changes', 'new_careers'):
+            merged[key] = list(first.get(key) or []) + list(second.get(key) or [])
+        if second.get('career_breakthrough'):
+            merged['career_breakthrough'] = "；".join(filter(None, [first.get('career_breakthrough'), second['career_breakthrough']]))
+        return merged
+    
     def _parse_analysis_response(self, response: str) -> Optional[Dict[str, Any]]:
         """
         解析AI返回的分析结果（使用统一的JSON清洗方法）
@@ -250,7 +538,7 @@ class PlotAnalyzer:
             for i, hook in enumerate(analysis.get('hooks', [])):
                 if hook.get('strength', 0) >= 6:  # 只保存强度>=6的钩子
                     keyword = hook.get('keyword', '')
-                    position, length = self._find_text_position(chapter_content, keyword)
+                    position, length = self._resolve_position(hook, chapter_content, keyword)
                     
                     logger.info(f"  钩子位置: keyword='{keyword[:30]}...', pos={position}, len={length}")
                     
@@ -276,7 +564,7 @@ class PlotAnalyzer:
             for i, foreshadow in enumerate(analysis.get('foreshadows', [])):
                 is_planted = foreshadow.get('type') == 'planted'
                 keyword = foreshadow.get('keyword', '')
-                position, length = self._find_text_position(chapter_content, keyword)
+                position, length = self._resolve_position(foreshadow, chapter_content, keyword)
                 
                 logger.info(f"  伏笔位置: keyword='{keyword[:30]}...', pos={position}, len={length}")
                 
@@ -303,7 +591,7 @@ class PlotAnalyzer:
             for i, plot_point in enumerate(analysis.get('plot_points', [])):
                 if plot_point.get('importance', 0) >= 0.6:  # 只保存重要性>=0.6的情节点
                     keyword = plot_point.get('keyword', '')
-                    position, length = self._find_text_position(chapter_content, keyword)
+                    position, length = self._resolve_position(plot_point, chapter_content, keyword)
                     
                     logger.info(f"  情节点位置: keyword='{keyword[:30]}...', pos={position}, len={length}")
                     
@@ -373,6 +661,13 @@ class PlotAnalyzer:
             logger.error(f"❌ 提取记忆失败: {str(e)}")
             return []
     
+    def _resolve_position(self, item: Dict[str, Any], full_text: str, keyword: str) -> tuple[int, int]:
+        """获取条目在全文中的位置（分段分析时已映射回全文的位置优先）"""
+        position = item.get('text_position')
+        if isinstance(position, int) and position >= 0:
+            return (position, item.get('text_length') or len(keyword))
+        return self._find_text_position(full_text, keyword)
+    
     def _find_text_position(self, full_text: str, keyword: str) -> tuple[int, int]:
         """
         在全文中查找关键词位置
@@ -1,16 +1,21 @@
 """大纲剧情展开服务 - 将大纲节点展开为多个章节"""
-from typing import List, Dict, Any, Optional
+from contextlib import aclosing
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
+import asyncio
 import json
 
+from app.config import settings
 from app.models.outline import Outline
 from app.models.project import Project
-from app.models.character import Character
 from app.models.chapter import Chapter
 from app.services.ai_service import AIService
 from app.services.prompt_service import prompt_service, PromptService
+from app.services.world_snapshot import world_snapshot_cache
+from app.services.chapter_numbering import renumber_outline_chapters
 from app.logger import get_logger
+from app.utils.stream_buffer import StreamTextBuffer
 
 logger = get_logger(__name__)
 
@@ -95,15 +100,8 @@ class PlotExpansionService:
     ) -> List[Dict[str, Any]]:
         """单批次生成章节规划"""
         # 获取角色信息
-        characters_result = await db.execute(
-            select(Character).where(Character.project_id == project.id)
-        )
-        characters = characters_result.scalars().all()
-        characters_info = "\n".join([
-            f"- {char.name} ({'组织' if char.is_organization else '角色'}, {char.role_type}): "
-            f"{char.personality[:100] if char.personality else '暂无描述'}"
-            for char in characters
-        ])
+        snapshot = await world_snapshot_cache.get(db, project.id)
+        characters_info = snapshot.characters_brief()
         
         # 获取大纲上下文（前后大纲）
         context_info = await self._get_outline_context(outline, project.id, db)
@@ -133,16 +131,16 @@ class PlotExpansionService:
         
         # 调用AI生成章节规划
         logger.info(f"调用AI生成章节规划...")
-        accumulated_text = ""
+        text_buffer = StreamTextBuffer()
         async for chunk in self.ai_service.generate_text_stream(
             prompt=prompt,
             provider=provider,
             model=model
         ):
-            accumulated_text += chunk
+            text_buffer.append(chunk)
         
         # 提取内容
-        ai_content = accumulated_text
+        ai_content = text_buffer.getvalue()
         
         # 解析AI响应
         chapter_plans = self._parse_expansion_response(ai_content, outline.id)
@@ -169,15 +167,8 @@ class PlotExpansionService:
         logger.info(f"分批生成计划: 总共{target_chapter_count}章，分{total_batches}批，每批{batch_size}章")
         
         # 获取角色信息（所有批次共用）
-        characters_result = await db.execute(
-            select(Character).where(Character.project_id == project.id)
-        )
-        characters = characters_result.scalars().all()
-        characters_info = "\n".join([
-            f"- {char.name} ({'组织' if char.is_organization else '角色'}, {char.role_type}): "
-            f"{char.personality[:100] if char.personality else '暂无描述'}"
-            for char in characters
-        ])
+        snapshot = await world_snapshot_cache.get(db, project.id)
+        characters_info = snapshot.characters_brief()
         
         # 获取大纲上下文
         context_info = await self._get_outline_context(outline, project.id, db)
@@ -238,16 +229,16 @@ class PlotExpansionService:
             
             # 调用AI生成当前批次
             logger.info(f"调用AI生成第{batch_num + 1}批...")
-            accumulated_text = ""
+            text_buffer = StreamTextBuffer()
             async for chunk in self.ai_service.generate_text_stream(
                 prompt=prompt,
                 provider=provider,
                 model=model
             ):
-                accumulated_text += chunk
+                text_buffer.append(chunk)
             
             # 提取内容
-            ai_content = accumulated_text
+            ai_content = text_buffer.getvalue()
             
             # 解析AI响应
             batch_plans = self._parse_expansion_response(ai_content, outline.id)
@@ -263,6 +254,68 @@ class PlotExpansionService:
         logger.info(f"分批生成完成，共生成 {len(all_chapter_plans)} 个章节规划")
         return all_chapter_plans
     
+    async def iter_outline_expansions(
+        self,
+        outlines: List[Outline],
+        project: Project,
+        user_id: str,
+        target_chapter_count: int = 3,
+        expansion_strategy: str = "balanced",
+        enable_scene_analysis: bool = True,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[Outline, List[Dict[str, Any]], Optional[Exception]]]:
+        """
+        并发展开多个大纲，按完成顺序产出结果
+        
+        一对多模式下每个大纲的展开只依赖自身内容和共享的世界状态（前后大纲、角色），互不依赖，
+        因此在并发上限内同时调用AI。每个大纲使用独立的只读会话（AsyncSession不能被并发使用）。
+        迭代器被提前关闭时取消尚未完成的展开。
+        
+        Args:
+            outlines: 要展开的大纲列表
+            project: 项目对象
+            user_id: 用户ID（用于创建数据库会话）
+            max_concurrency: 同时展开的大纲数，默认且最大为 settings.outline_expand_concurrency
+            其余参数同 analyze_outline_for_chapters
+            
+        Yields:
+            (大纲, 章节规划列表, 异常或None)
+        """
+        from app.database import session_scope
+        
+        limit = settings.outline_expand_concurrency
+        semaphore = asyncio.Semaphore(max(1, min(max_concurrency or limit, limit)))
+        
+        async def expand(outline: Outline) -> List[Dict[str, Any]]:
+            async with semaphore:
+                async with session_scope(user_id, read_only=True, name="outline_expand") as db:
+                    return await self.analyze_outline_for_chapters(
+                        outline=outline,
+                        project=project,
+                        db=db,
+                        target_chapter_count=target_chapter_count,
+                        expansion_strategy=expansion_strategy,
+                        enable_scene_analysis=enable_scene_analysis,
+                        provider=provider,
+                        model=model
+                    )
+        
+        pending = {asyncio.create_task(expand(outline)): outline for outline in outlines}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outline = pending.pop(task)
+                    error = task.exception()
+                    yield outline, ([] if error else task.result()), error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
     async def batch_expand_outlines(
         self,
         project_id: str,
@@ -309,40 +362,40 @@ class PlotExpansionService:
                 "expansions": []
             }
         
-        # 逐个展开大纲
-        expansions = []
+        # 并发展开大纲（各大纲互不依赖），结果按大纲顺序整理
+        results_by_id: Dict[str, Dict[str, Any]] = {}
         total_chapters = 0
         
-        for outline in outlines:
-            try:
-                chapter_plans = await self.analyze_outline_for_chapters(
-                    outline=outline,
-                    project=project,
-                    db=db,
-                    target_chapter_count=target_chapters_per_outline,
-                    expansion_strategy=expansion_strategy,
-                    provider=provider,
-                    model=model
-                )
+        async with aclosing(self.iter_outline_expansions(
+            outlines=outlines,
+            project=project,
+            user_id=project.user_id,
+            target_chapter_count=target_chapters_per_outline,
+            expansion_strategy=expansion_strategy,
+            provider=provider,
+            model=model
+        )) as completions:
+            async for outline, chapter_plans, error in completions:
+                if error is not None:
+                    logger.error(f"展开大纲 {outline.id} 失败: {str(error)}")
+                    results_by_id[outline.id] = {
+                        "outline_id": outline.id,
+                        "outline_title": outline.title,
+                        "error": str(error),
+                        "chapter_count": 0
+                    }
+                    continue
                 
-                expansions.append({
+                results_by_id[outline.id] = {
                     "outline_id": outline.id,
                     "outline_title": outline.title,
                     "chapter_plans": chapter_plans,
                     "chapter_count": len(chapter_plans)
-                })
-                
+                }
                 total_chapters += len(chapter_plans)
                 logger.info(f"大纲 {outline.title} 展开为 {len(chapter_plans)} 章")
-                
-            except Exception as e:
-                logger.error(f"展开大纲 {outline.id} 失败: {str(e)}")
-                expansions.append({
-                    "outline_id": outline.id,
-                    "outline_title": outline.title,
-                    "error": str(e),
-                    "chapter_count": 0
-                })
+        
+        expansions = [results_by_id[outline.id] for outline in outlines]
         
         result = {
             "total_outlines": len(outlines),
@@ -416,27 +469,7 @@ class PlotExpansionService:
         
         chapters = []
         for idx, plan in enumerate(chapter_plans):
-            # 保存完整的展开规划数据（JSON格式）
-            expansion_plan_json = json.dumps({
-                "key_events": plan.get("key_events", []),
-                "character_focus": plan.get("character_focus", []),
-                "emotional_tone": plan.get("emotional_tone", ""),
-                "narrative_goal": plan.get("narrative_goal", ""),
-                "conflict_type": plan.get("conflict_type", ""),
-                "estimated_words": plan.get("estimated_words", 3000),
-                "scenes": plan.get("scenes", []) if plan.get("scenes") else None
-            }, ensure_ascii=False)
-            
-            chapter = Chapter(
-                project_id=project_id,
-                outline_id=outline_id,
-                chapter_number=start_chapter_number + idx,
-                sub_index=plan.get("sub_index", idx + 1),
-                title=plan.get("title", f"第{start_chapter_number + idx}章"),
-                summary=plan.get("plot_summary", ""),
-                expansion_plan=expansion_plan_json,
-                status="draft"
-            )
+            chapter = self._build_chapter(outline_id, project_id, plan, idx, start_chapter_number + idx)
             db.add(chapter)
             chapters.append(chapter)
         
@@ -456,44 +489,108 @@ class PlotExpansionService:
         
         return chapters
     
-    async def _get_outline_context(
+    async def create_chapters_for_outlines(
         self,
-        outline: Outline,
+        expansions: List[Tuple[Outline, List[Dict[str, Any]]]],
         project_id: str,
         db: AsyncSession
-    ) -> str:
-        """获取大纲的上下文（前后大纲）"""
-        # 获取前一个大纲
-        prev_result = await db.execute(
-            select(Outline)
-            .where(
-                Outline.project_id == project_id,
-                Outline.order_index < outline.order_index
-            )
-            .order_by(Outline.order_index.desc())
-            .limit(1)
-        )
-        prev_outline = prev_result.scalar_one_or_none()
+    ) -> Dict[str, List[Chapter]]:
+        """
+        为多个大纲的章节规划一次性创建章节记录（批量展开的提交阶段）
         
-        # 获取后一个大纲
-        next_result = await db.execute(
-            select(Outline)
-            .where(
-                Outline.project_id == project_id,
-                Outline.order_index > outline.order_index
-            )
-            .order_by(Outline.order_index)
-            .limit(1)
+        先以临时序号写入全部章节，再按大纲顺序统一重排序号，只提交一次；
+        不依赖各大纲展开完成的先后顺序。
+        
+        Args:
+            expansions: [(大纲, 章节规划列表)]
+            project_id: 项目ID
+            db: 数据库会话
+            
+        Returns:
+            大纲ID -> 创建的章节列表
+        """
+        created: Dict[str, List[Chapter]] = {}
+        untitled: List[Chapter] = []
+        for outline, chapter_plans in expansions:
+            chapters = []
+            for idx, plan in enumerate(chapter_plans):
+                chapter = self._build_chapter(outline.id, project_id, plan, idx, 0)
+                if "title" not in plan:
+                    untitled.append(chapter)
+                db.add(chapter)
+                chapters.append(chapter)
+            created[outline.id] = chapters
+        
+        if not any(created.values()):
+            return created
+        
+        await db.flush()
+        from_order_index = min(
+            (outline.order_index for outline, _ in expansions if outline.order_index is not None),
+            default=None
         )
-        next_outline = next_result.scalar_one_or_none()
+        await renumber_outline_chapters(db, project_id, from_order_index=from_order_index)
         
-        context = ""
-        if prev_outline:
-            context += f"【前一节】{prev_outline.title}: {prev_outline.content[:200]}...\n\n"
-        if next_outline:
-            context += f"【后一节】{next_outline.title}: {next_outline.content[:200]}...\n"
+        # 规划中没有标题的章节按最终序号命名
+        for chapter in untitled:
+            chapter.title = f"第{chapter.chapter_number}章"
         
-        return context if context else "（无前后文）"
+        await db.commit()
+        
+        logger.info(
+            f"成功为 {len(created)} 个大纲创建 {sum(len(c) for c in created.values())} 个章节记录（统一重排序号后一次提交）"
+        )
+        return created
+    
+    @staticmethod
+    def _build_chapter(
+        outline_id: str,
+        project_id: str,
+        plan: Dict[str, Any],
+        idx: int,
+        chapter_number: int
+    ) -> Chapter:
+        """根据单个章节规划构建章节对象（保存完整的展开规划数据）"""
+        expansion_plan_json = json.dumps({
+            "key_events": plan.get("key_events", []),
+            "character_focus": plan.get("character_focus", []),
+            "emotional_tone": plan.get("emotional_tone", ""),
+            "narrative_goal": plan.get("narrative_goal", ""),
+            "conflict_type": plan.get("conflict_type", ""),
+            "estimated_words": plan.get("estimated_words", 3000),
+            "scenes": plan.get("scenes", []) if plan.get("scenes") else None
+        }, ensure_ascii=False)
+        
+        return Chapter(
+            project_id=project_id,
+            outline_id=outline_id,
+            chapter_number=chapter_number,
+            sub_index=plan.get("sub_index", idx + 1),
+            title=plan.get("title", f"第{chapter_number}章"),
+            summary=plan.get("plot_summary", ""),
+            expansion_plan=expansion_plan_json,
+            status="draft"
+        )
+    
+    async def _get_outline_context(
+        self,
+        outline: Outline,
+        project_id: str,
+        db: AsyncSession
+    ) -> str:
+        """获取大纲的上下文（前后大纲，来自世界状态快照）"""
+        snapshot = await world_snapshot_cache.get(db, project_id)
+        
+        def build() -> str:
+            prev_outline, next_outline = snapshot.outline_neighbors(outline.order_index)
+            context = ""
+            if prev_outline:
+                context += f"【前一节】{prev_outline.title}: {prev_outline.content[:200]}...\n\n"
+            if next_outline:
+                context += f"【后一节】{next_outline.title}: {next_outline.content[:200]}...\n"
+            return context if context else "（无前后文）"
+        
+        return snapshot.memo(("outline_context", outline.order_index), build)
     
     
     def _parse_expansion_response(
@@ -567,74 +664,19 @@ class PlotExpansionService:
         """
         logger.info(f"开始重新排序大纲 {current_outline_id} 之后的所有章节")
         
-        # 1. 获取当前大纲信息
-        current_outline_result = await db.execute(
-            select(Outline).where(Outline.id == current_outline_id)
-        )
-        current_outline = current_outline_result.scalar_one_or_none()
+        # 1. 获取当前大纲序号
+        current_order_index = (await db.execute(
+            select(Outline.order_index).where(Outline.id == current_outline_id)
+        )).scalar_one_or_none()
         
-        if not current_outline:
+        if current_order_index is None:
             logger.warning(f"大纲 {current_outline_id} 不存在，跳过重新排序")
             return
         
-        # 2. 获取当前大纲及之后的所有大纲（按order_index排序）
-        subsequent_outlines_result = await db.execute(
-            select(Outline)
-            .where(
-                Outline.project_id == project_id,
-                Outline.order_index >= current_outline.order_index
-            )
-            .order_by(Outline.order_index)
-        )
-        subsequent_outlines = subsequent_outlines_result.scalars().all()
-        
-        # 3. 计算每个大纲的起始章节号
-        current_chapter_number = 1
-        
-        # 先计算前面大纲的章节总数
-        prev_outlines_result = await db.execute(
-            select(Outline)
-            .where(
-                Outline.project_id == project_id,
-                Outline.order_index < current_outline.order_index
-            )
-            .order_by(Outline.order_index)
-        )
-        prev_outlines = prev_outlines_result.scalars().all()
+        # 2. 窗口函数计算全部章节的新序号，一条语句更新当前大纲及之后发生变化的章节
+        updated_count = await renumber_outline_chapters(db, project_id, from_order_index=current_order_index)
         
-        for prev_outline in prev_outlines:
-            count_result = await db.execute(
-                select(func.count(Chapter.id))
-                .where(
-                    Chapter.project_id == project_id,
-                    Chapter.outline_id == prev_outline.id
-                )
-            )
-            current_chapter_number += count_result.scalar() or 0
-        
-        # 4. 逐个大纲更新章节序号
-        updated_count = 0
-        for outline in subsequent_outlines:
-            # 获取该大纲的所有章节（按sub_index排序）
-            chapters_result = await db.execute(
-                select(Chapter)
-                .where(
-                    Chapter.project_id == project_id,
-                    Chapter.outline_id == outline.id
-                )
-                .order_by(Chapter.sub_index)
-            )
-            chapters = chapters_result.scalars().all()
-            
-            # 更新每个章节的chapter_number
-            for chapter in chapters:
-                if chapter.chapter_number != current_chapter_number:
-                    logger.debug(f"更新章节 {chapter.id}: {chapter.chapter_number} -> {current_chapter_number}")
-                    chapter.chapter_number = current_chapter_number
-                    updated_count += 1
-                current_chapter_number += 1
-        
-        # 5. 提交更新
+        # 3. 提交更新
         await db.commit()
         logger.info(f"重新排序完成，共更新 {updated_count} 个章节的序号")
 
@@ -0,0 +1,305 @@
+"""项目流式导出服务 - TXT / Markdown / EPUB，内存占用与作品长度无关
+
+原先导出会一次性读出全部章节，拼成完整字符串后再返回，百万字作品在内存中会同时存在多份全文。
+现在章节通过服务端游标（yield_per）分批读取，每章生成后立即写出：
+- TXT / Markdown：逐章输出文本
+- EPUB：边写边输出 ZIP 数据（ZipFile 写入不可回溯的流时使用数据描述符），目录和清单最后写入
+- gzip：可选，对输出流逐块压缩
+"""
+import html
+import zipfile
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.logger import get_logger
+from app.models.chapter import Chapter
+
+logger = get_logger(__name__)
+
+EXPORT_FORMATS = {
+    "txt": ("txt", "text/plain; charset=utf-8"),
+    "markdown": ("md", "text/markdown; charset=utf-8"),
+    "epub": ("epub", "application/epub+zip"),
+}
+
+# 合并小片段后再写出，减少写入次数
+_WRITE_BUFFER_BYTES = 64 * 1024
+
+
+async def iter_chapter_rows(db: AsyncSession, project_id: str, *columns) -> AsyncIterator[Any]:
+    """
+    按章节顺序以服务端游标分批读取章节的指定列
+
+    Args:
+        db: 数据库会话
+        project_id: 项目ID
+        columns: 需要的列（只取列，不加载ORM对象）
+
+    Yields:
+        章节行
+    """
+    result = await db.stream(
+        select(*columns)
+        .where(Chapter.project_id == project_id)
+        .order_by(Chapter.chapter_number)
+        .execution_options(yield_per=settings.export_yield_per)
+    )
+    async for row in result:
+        yield row
+
+
+async def encode_stream(
+    pieces: AsyncIterator[Union[str, bytes]],
+    gzip: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    把文本片段编码为字节并合并写出，可选 gzip 压缩
+
+    Args:
+        pieces: 文本或字节片段
+        gzip: 是否 gzip 压缩
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    buffer: List[bytes] = []
+    size = 0
+    async for piece in pieces:
+        data = piece.encode("utf-8") if isinstance(piece, str) else piece
+        if compressor is not None:
+            data = compressor.compress(data)
+        if not data:
+            continue
+        buffer.append(data)
+        size += len(data)
+        if size >= _WRITE_BUFFER_BYTES:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if compressor is not None:
+        buffer.append(compressor.flush())
+    if buffer:
+        yield b"".join(buffer)
+
+
+class _ZipSink:
+    """ZipFile 的只写输出：收集写入的数据，由调用方按章取走"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _xhtml_page(title: str, body: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="zh-CN" xml:lang="zh-CN">\n'
+        f'<head><meta charset="utf-8"/><title>{html.escape(title)}</title></head>\n'
+        f'<body>\n{body}\n</body>\n</html>\n'
+    )
+
+
+def _paragraphs(text: str) -> str:
+    lines = [line.strip() for line in text.splitlines()]
+    return "\n".join(f"<p>{html.escape(line)}</p>" for line in lines if line)
+
+
+class ProjectExportService:
+    """项目章节流式导出"""
+
+    @staticmethod
+    def _chapter_heading(chapter_number: int, title: str) -> str:
+        # 只显示主章节号，不显示子索引
+        return f"第 {chapter_number} 章  {title}"
+
+    @staticmethod
+    async def iter_txt(db: AsyncSession, project: Dict[str, Any], chapter_count: int) -> AsyncIterator[str]:
+        """
+        逐章输出TXT（格式与原整体导出一致）
+
+        Args:
+            db: 数据库会话
+            project: 项目信息（id/title/description/theme/genre/current_words）
+            chapter_count: 章节数
+        """
+        header = ["=" * 80, f"项目标题: {project['title']}", "=" * 80]
+        if project.get("description"):
+            header.append(f"\n简介: {project['description']}\n")
+        if project.get("theme"):
+            header.append(f"主题: {project['theme']}")
+        if project.get("genre"):
+            header.append(f"类型: {project['genre']}")
+        header.append(f"总章节数: {chapter_count}")
+        header.append(f"总字数: {project.get('current_words')}")
+        header.append("\n" + "=" * 80 + "\n\n")
+        yield "\n".join(header) + "\n"
+
+        async for row in iter_chapter_rows(db, project["id"], Chapter.chapter_number, Chapter.title, Chapter.content):
+            yield "\n".join([
+                ProjectExportService._chapter_heading(row.chapter_number, row.title),
+                "-" * 80,
+                "",
+                row.content or "（本章暂无内容）",
+                "\n\n" + "=" * 80 + "\n\n",
+            ]) + "\n"
+
+        export_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        yield f"--- 全文完 ---\n\n导出时间: {export_time}"
+
+    @staticmethod
+    async def iter_markdown(db: AsyncSession, project: Dict[str, Any], chapter_count: int) -> AsyncIterator[str]:
+        """
+        逐章输出Markdown
+
+        Args:
+            db: 数据库会话
+            project: 项目信息
+            chapter_count: 章节数
+        """
+        header = [f"# {project['title']}", ""]
+        if project.get("description"):
+            header += [f"> {line}" for line in project["description"].splitlines()] + [""]
+        if project.get("theme"):
+            header.append(f"- 主题: {project['theme']}")
+        if project.get("genre"):
+            header.append(f"- 类型: {project['genre']}")
+        header.append(f"- 总章节数: {chapter_count}")
+        header.append(f"- 总字数: {project.get('current_words')}")
+        header += ["", "---", ""]
+        yield "\n".join(header) + "\n"
+
+        async for row in iter_chapter_rows(db, project["id"], Chapter.chapter_number, Chapter.title, Chapter.content):
+            content = (row.content or "（本章暂无内容）").strip()
+            yield f"## {ProjectExportService._chapter_heading(row.chapter_number, row.title)}\n\n{content}\n\n"
+
+        yield f"---\n\n导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+
+    @staticmethod
+    async def iter_epub(db: AsyncSession, project: Dict[str, Any], chapter_count: int) -> AsyncIterator[bytes]:
+        """
+        逐章输出EPUB 3（ZIP流）
+
+        Args:
+            db: 数据库会话
+            project: 项目信息
+            chapter_count: 章节数
+        """
+        title = project["title"]
+        sink = _ZipSink()
+        archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+        # mimetype 必须是第一个且不压缩
+        archive.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>\n'
+            '</container>\n'
+        )
+
+        intro = [f"<h1>{html.escape(title)}</h1>"]
+        if project.get("description"):
+            intro.append(_paragraphs(project["description"]))
+        meta = [f"总章节数: {chapter_count}", f"总字数: {project.get('current_words')}"]
+        if project.get("theme"):
+            meta.insert(0, f"主题: {project['theme']}")
+        if project.get("genre"):
+            meta.insert(0, f"类型: {project['genre']}")
+        intro.append(_paragraphs("\n".join(meta)))
+        archive.writestr("OEBPS/title.xhtml", _xhtml_page(title, "\n".join(intro)))
+        yield sink.drain()
+
+        toc: List[tuple] = []
+        async for row in iter_chapter_rows(db, project["id"], Chapter.chapter_number, Chapter.title, Chapter.content):
+            index = len(toc) + 1
+            href = f"chapters/ch{index:05d}.xhtml"
+            heading = ProjectExportService._chapter_heading(row.chapter_number, row.title)
+            body = f"<h2>{html.escape(heading)}</h2>\n{_paragraphs(row.content or '（本章暂无内容）')}"
+            archive.writestr(f"OEBPS/{href}", _xhtml_page(heading, body))
+            toc.append((f"ch{index:05d}", href, heading))
+            yield sink.drain()
+
+        nav_items = "\n".join(f'<li><a href="{href}">{html.escape(label)}</a></li>' for _, href, label in toc)
+        archive.writestr(
+            "OEBPS/nav.xhtml",
+            _xhtml_page("目录", f'<nav epub:type="toc" id="toc"><h1>目录</h1>\n<ol>\n{nav_items}\n</ol></nav>')
+        )
+        manifest = "\n".join(
+            f'<item id="{item_id}" href="{href}" media-type="application/xhtml+xml"/>' for item_id, href, _ in toc
+        )
+        spine = "\n".join(f'<itemref idref="{item_id}"/>' for item_id, _, _ in toc)
+        modified = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+        archive.writestr(
+            "OEBPS/content.opf",
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">\n'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'<dc:identifier id="book-id">urn:uuid:{project["id"]}</dc:identifier>\n'
+            f'<dc:title>{html.escape(title)}</dc:title>\n'
+            '<dc:language>zh-CN</dc:language>\n'
+            f'<meta property="dcterms:modified">{modified}</meta>\n'
+            '</metadata>\n'
+            '<manifest>\n'
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+            '<item id="title" href="title.xhtml" media-type="application/xhtml+xml"/>\n'
+            f'{manifest}\n'
+            '</manifest>\n'
+            '<spine>\n<itemref idref="title"/>\n'
+            f'{spine}\n'
+            '</spine>\n'
+            '</package>\n'
+        )
+        archive.close()
+        yield sink.drain()
+
+    @staticmethod
+    async def stream(
+        user_id: str,
+        project: Dict[str, Any],
+        chapter_count: int,
+        export_format: str = "txt",
+        gzip: bool = False
+    ) -> AsyncIterator[bytes]:
+        """
+        在独立的只读会话中流式导出（响应开始发送后请求级会话可能已关闭）
+
+        Args:
+            user_id: 用户ID
+            project: 项目信息
+            chapter_count: 章节数
+            export_format: txt / markdown / epub
+            gzip: 是否 gzip 压缩（EPUB 本身已压缩，忽略该选项）
+        """
+        from app.database import session_scope
+
+        writers = {
+            "txt": ProjectExportService.iter_txt,
+            "markdown": ProjectExportService.iter_markdown,
+            "epub": ProjectExportService.iter_epub,
+        }
+        async with session_scope(user_id, read_only=True, name="project_export", replica=True) as db:
+            pieces = writers[export_format](db, project, chapter_count)
+            async for data in encode_stream(pieces, gzip=gzip and export_format != "epub"):
+                yield data
+        logger.info(f"📦 项目导出完成: {project['id']} ({export_format}{', gzip' if gzip else ''}, {chapter_count}章)")
+
+
+def export_filename(title: str, extension: str, gzip: bool = False) -> str:
+    """生成导出文件名（去除文件名中的特殊字符）"""
+    safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_', '，', '。', '、'))
+    return f"{safe_title}.{extension}{'.gz' if gzip else ''}"
@@ -0,0 +1,597 @@
+"""项目批量导入服务 - 增量解析 + 分批插入 + 可续传
+
+原先导入对整个上传文件 json.loads 后逐行 db.add()，每个角色/大纲都 flush 一次以获取ID，
+整个导入在一个长事务中完成。几百章、上千条关系的备份导入缓慢且长时间占用连接。
+现在：
+- 校验：JSONStreamReader 逐项读取，用导出数据模型校验每一项，不通过则不写入任何数据
+- 导入：再次流式读取，ID 在本地生成，按 import_batch_size 分批 insert 并提交
+- 依赖：章节与大纲的关联、组织的父组织在全部数据写入后统一更新；依赖的分段尚未出现时暂存后处理
+- 续传：导入中的项目 wizard_status 为 importing，失败后以同一文件重新导入并传入项目ID，
+  已写入的行按各分段的顺序跳过，名称映射从数据库重建
+"""
+import json
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.logger import get_logger
+from app.models.chapter import Chapter
+from app.models.character import Character
+from app.models.outline import Outline
+from app.models.project import Project
+from app.models.relationship import CharacterRelationship, Organization, OrganizationMember
+from app.models.writing_style import WritingStyle
+from app.schemas.import_export import (
+    ChapterExportData,
+    CharacterExportData,
+    GenerationHistoryExportData,
+    ImportResult,
+    ImportValidationResult,
+    OrganizationExportData,
+    OrganizationMemberExportData,
+    OutlineExportData,
+    RelationshipExportData,
+    WritingStyleExportData,
+)
+from app.services.import_export_service import ImportExportService
+from app.utils.json_stream import JSONStreamReader, file_reader
+
+logger = get_logger(__name__)
+
+# 各分段的数据模型
+SECTION_SCHEMAS: Dict[str, type] = {
+    "chapters": ChapterExportData,
+    "characters": CharacterExportData,
+    "outlines": OutlineExportData,
+    "relationships": RelationshipExportData,
+    "organizations": OrganizationExportData,
+    "organization_members": OrganizationMemberExportData,
+    "writing_styles": WritingStyleExportData,
+    "generation_history": GenerationHistoryExportData,
+}
+
+# 写入顺序无关、但需要其他分段先完成的分段
+SECTION_DEPENDENCIES: Dict[str, str] = {
+    "relationships": "characters",
+    "organizations": "characters",
+    "organization_members": "organizations",
+}
+
+SECTION_MODELS: Dict[str, type] = {
+    "chapters": Chapter,
+    "characters": Character,
+    "outlines": Outline,
+    "relationships": CharacterRelationship,
+    "organizations": Organization,
+    "organization_members": OrganizationMember,
+    "writing_styles": WritingStyle,
+}
+
+IMPORTING_STATUS = "importing"
+
+# 校验错误最多列出的条数
+_MAX_LISTED_ERRORS = 20
+
+
+def _parse_item(section: str, item: Any) -> Any:
+    """按导出格式解析一项数据；显式的 null（旧版导出或手工编辑的文件）按缺省处理，使用模型默认值"""
+    if isinstance(item, dict):
+        item = {key: value for key, value in item.items() if value is not None}
+    return SECTION_SCHEMAS[section].model_validate(item)
+
+
+class ProjectImportService:
+    """项目批量导入（每个实例处理一次导入）"""
+
+    def __init__(self, user_id: str, batch_size: Optional[int] = None):
+        self.user_id = user_id
+        self.batch_size = max(1, batch_size or settings.import_batch_size)
+        self.project_id: Optional[str] = None
+        self.statistics: Dict[str, int] = {section: 0 for section in SECTION_MODELS}
+        self.warnings: List[str] = []
+
+        self._batches: Dict[str, List[Dict[str, Any]]] = {section: [] for section in SECTION_MODELS}
+        self._skip: Dict[str, int] = {}
+        self._done: Set[str] = set()
+        self._deferred: Dict[str, List[Dict[str, Any]]] = {}
+        self._char_mapping: Dict[str, str] = {}
+        self._outline_mapping: Dict[str, str] = {}
+        self._org_mapping: Dict[str, str] = {}
+        self._chapter_outlines: Dict[str, List[int]] = {}
+        self._org_parents: List[Tuple[str, str]] = []
+        self._style_names: Set[str] = set()
+
+    # ==================== 校验 ====================
+
+    @staticmethod
+    async def validate(reader: JSONStreamReader) -> ImportValidationResult:
+        """
+        流式校验导入文件
+
+        Args:
+            reader: 导入文件的增量读取器
+
+        Returns:
+            ImportValidationResult: 校验结果
+        """
+        errors: List[str] = []
+        warnings: List[str] = []
+        statistics = {section: 0 for section in SECTION_SCHEMAS}
+        version = ""
+        project_name = "未知项目"
+        has_project = False
+        invalid_items = 0
+
+        try:
+            async for kind, key, value in reader.events():
+                if kind == "value" and key == "version":
+                    version = value if isinstance(value, str) else str(value)
+                elif kind == "value" and key == "project":
+                    has_project = True
+                    if not isinstance(value, dict) or not value.get("title"):
+                        errors.append("项目标题不能为空")
+                    else:
+                        project_name = value["title"]
+                elif kind == "item" and key in SECTION_SCHEMAS:
+                    statistics[key] += 1
+                    try:
+                        _parse_item(key, value)
+                    except ValidationError as e:
+                        invalid_items += 1
+                        if invalid_items <= _MAX_LISTED_ERRORS:
+                            first = e.errors()[0]
+                            field = ".".join(str(p) for p in first["loc"])
+                            errors.append(f"{key} 第{statistics[key]}项无效: {field} {first['msg']}")
+        except ValueError as e:
+            errors.append(str(e))
+
+        if invalid_items > _MAX_LISTED_ERRORS:
+            errors.append(f"另有 {invalid_items - _MAX_LISTED_ERRORS} 项数据无效")
+        if not version:
+            errors.append("缺少版本信息")
+        elif version != ImportExportService.SUPPORTED_VERSION:
+            warnings.append(f"版本不匹配: 导入文件版本为 {version}, 当前支持版本为 {ImportExportService.SUPPORTED_VERSION}")
+        if not has_project:
+            errors.append("缺少项目信息")
+
+        if statistics["chapters"] == 0:
+            warnings.append("项目没有章节数据")
+        if statistics["characters"] == 0:
+            warnings.append("项目没有角色数据")
+
+        return ImportValidationResult(
+            valid=len(errors) == 0,
+            version=version,
+            project_name=project_name,
+            statistics=statistics,
+            errors=errors,
+            warnings=warnings
+        )
+
+    # ==================== 导入 ====================
+
+    @staticmethod
+    async def import_file(
+        path: str,
+        user_id: str,
+        resume_project_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        校验并导入本地文件（两次流式读取）
+
+        Args:
+            path: 导入文件路径
+            user_id: 目标用户ID（导入后的项目归属）
+            resume_project_id: 续传的项目ID
+
+        Yields:
+            进度事件 {"message", "progress"}；最后一个事件为 {"result": ImportResult}
+        """
+        yield {"message": "正在校验导入文件...", "progress": 0}
+        with open(path, "rb") as f:
+            validation = await ProjectImportService.validate(JSONStreamReader(file_reader(f)))
+            total_bytes = f.tell()
+        if not validation.valid:
+            yield {"result": ImportResult(
+                success=False,
+                message=f"数据验证失败: {', '.join(validation.errors)}",
+                statistics={},
+                warnings=validation.warnings
+            )}
+            return
+
+        logger.info(f"开始导入项目: {validation.project_name} ({total_bytes} 字节)")
+        importer = ProjectImportService(user_id)
+        importer.warnings.extend(validation.warnings)
+        with open(path, "rb") as f:
+            async for event in importer.run(JSONStreamReader(file_reader(f)), total_bytes, resume_project_id):
+                yield event
+
+    async def run(
+        self,
+        reader: JSONStreamReader,
+        total_bytes: int = 0,
+        resume_project_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式导入（调用前应已通过 validate 校验）
+
+        Args:
+            reader: 导入文件的增量读取器
+            total_bytes: 文件大小（用于计算进度）
+            resume_project_id: 续传的项目ID（该项目须处于导入中状态）
+
+        Yields:
+            进度事件 {"message", "progress"}；最后一个事件为 {"result": ImportResult}
+        """
+        from app.database import session_scope
+
+        try:
+            async with session_scope(self.user_id, name="project_import") as db:
+                async for kind, key, value in reader.events():
+                    if kind == "value" and key == "project":
+                        await self._start_project(db, value, resume_project_id)
+                        yield {"message": "项目已创建，开始导入数据" if not resume_project_id else "继续导入数据", "progress": 1}
+                    elif kind == "item" and key in SECTION_MODELS:
+                        if self.project_id is None:
+                            raise ValueError("项目信息必须位于数据之前")
+                        dependency = SECTION_DEPENDENCIES.get(key)
+                        if dependency and dependency not in self._done:
+                            self._deferred.setdefault(key, []).append(value)
+                            continue
+                        if await self._add(db, key, value):
+                            yield self._progress(key, reader.bytes_read, total_bytes)
+                    elif kind == "end" and key in SECTION_MODELS and key not in self._deferred:
+                        await self._finish_section(db, key)
+                        yield self._progress(key, reader.bytes_read, total_bytes)
+                        for section in await self._drain_deferred(db):
+                            yield self._progress(section, reader.bytes_read, total_bytes)
+
+                if self.project_id is None:
+                    raise ValueError("缺少项目信息")
+
+                # 依赖始终未出现的分段按空映射处理（无法关联的数据会被跳过）
+                for section in list(self._deferred):
+                    self._done.add(SECTION_DEPENDENCIES[section])
+                for section in await self._drain_deferred(db):
+                    yield self._progress(section, reader.bytes_read, total_bytes)
+
+                await self._link_references(db)
+                await db.execute(
+                    update(Project)
+                    .where(Project.id == self.project_id)
+                    .values(wizard_status="completed")
+                )
+                await db.commit()
+
+            logger.info(f"✅ 项目导入完成: {self.project_id} {self.statistics}")
+            yield {"result": ImportResult(
+                success=True,
+                project_id=self.project_id,
+                message="项目导入成功",
+                statistics=self.statistics,
+                warnings=self.warnings
+            )}
+
+        except Exception as e:
+            logger.error(f"❌ 导入项目失败: {str(e)}", exc_info=True)
+            message = f"导入失败: {str(e)}"
+            if self.project_id:
+                message += "（已导入的数据已保存，可使用同一文件并传入项目ID继续导入）"
+            yield {"result": ImportResult(
+                success=False,
+                project_id=self.project_id,
+                message=message,
+                statistics=self.statistics,
+                warnings=self.warnings
+            )}
+
+    def _progress(self, section: str, bytes_read: int, total_bytes: int) -> Dict[str, Any]:
+        progress = min(99, 1 + int(bytes_read * 98 / total_bytes)) if total_bytes else 50
+        return {
+            "message": f"正在导入 {section}（已导入{self.statistics.get(section, 0)}条）",
+            "progress": progress
+        }
+
+    async def _start_project(self, db: AsyncSession, project_data: Dict[str, Any], resume_project_id: Optional[str]):
+        """创建项目，或加载续传项目并重建已导入的状态"""
+        if resume_project_id:
+            project = (await db.execute(
+                select(Project).where(Project.id == resume_project_id, Project.user_id == self.user_id)
+            )).scalar_one_or_none()
+            if not project:
+                raise ValueError("续传的项目不存在")
+            if project.wizard_status != IMPORTING_STATUS:
+                raise ValueError("该项目不处于导入中状态，无法续传")
+            self.project_id = project.id
+            await self._load_existing(db)
+            logger.info(f"🔁 续传导入项目: {self.project_id}，跳过已导入 {self._skip}")
+        else:
+            project = Project(
+                user_id=self.user_id,  # 设置为当前用户ID
+                title=project_data.get("title"),
+                description=project_data.get("description"),
+                theme=project_data.get("theme"),
+                genre=project_data.get("genre"),
+                target_words=project_data.get("target_words"),
+                status=project_data.get("status", "planning"),
+                world_time_period=project_data.get("world_time_period"),
+                world_location=project_data.get("world_location"),
+                world_atmosphere=project_data.get("world_atmosphere"),
+                world_rules=project_data.get("world_rules"),
+                chapter_count=project_data.get("chapter_count"),
+                narrative_perspective=project_data.get("narrative_perspective"),
+                character_count=project_data.get("character_count"),
+                outline_mode=project_data.get("outline_mode", "one-to-many"),  # ✅ 导入大纲模式，默认为一对多
+                current_words=project_data.get("current_words", 0),  # 保留原项目的字数
+                wizard_step=4,  # 导入的项目设置为向导完成状态
+                wizard_status=IMPORTING_STATUS  # 全部数据写入后标记为 completed
+            )
+            db.add(project)
+            await db.flush()
+            self.project_id = project.id
+            logger.info(f"📥 创建导入项目: {self.project_id} ({project.title})")
+
+        result = await db.execute(select(WritingStyle.name).where(WritingStyle.user_id == self.user_id))
+        self._style_names = {name for name, in result}
+        await db.commit()
+
+    async def _load_existing(self, db: AsyncSession):
+        """续传：从数据库重建名称映射和各分段已写入的行数"""
+        project_id = self.project_id
+
+        result = await db.execute(select(Character.id, Character.name).where(Character.project_id == project_id))
+        rows = result.all()
+        self._char_mapping = {name: char_id for char_id, name in rows}
+        self._skip["characters"] = len(rows)
+
+        result = await db.execute(select(Outline.id, Outline.title).where(Outline.project_id == project_id))
+        rows = result.all()
+        self._outline_mapping = {title: outline_id for outline_id, title in rows}
+        self._skip["outlines"] = len(rows)
+
+        result = await db.execute(
+            select(Organization.id, Character.name)
+            .join(Character, Organization.character_id == Character.id)
+            .where(Organization.project_id == project_id)
+        )
+        rows = result.all()
+        self._org_mapping = {name: org_id for org_id, name in rows}
+        self._skip["organizations"] = len(rows)
+
+        self._skip["chapters"] = (await db.execute(
+            select(func.count(Chapter.id)).where(Chapter.project_id == project_id)
+        )).scalar() or 0
+        self._skip["relationships"] = (await db.execute(
+            select(func.count(CharacterRelationship.id)).where(CharacterRelationship.project_id == project_id)
+        )).scalar() or 0
+        self._skip["organization_members"] = (await db.execute(
+            select(func.count(OrganizationMember.id))
+            .join(Organization, OrganizationMember.organization_id == Organization.id)
+            .where(Organization.project_id == project_id)
+        )).scalar() or 0
+
+        for section, count in self._skip.items():
+            self.statistics[section] = count
+
+    async def _add(self, db: AsyncSession, section: str, item: Dict[str, Any]) -> bool:
+        """
+        加入一项数据，批次满时写入
+
+        Returns:
+            是否写入了一个批次
+        """
+        data = _parse_item(section, item)
+        row = self._build_row(section, data)
+        if row is None:
+            return False
+
+        if self._skip.get(section):
+            # 续传：该项已在上次导入中写入
+            self._skip[section] -= 1
+            if section == "organizations" and data.parent_org_name:
+                org_id = self._org_mapping.get(data.character_name)
+                if org_id:
+                    self._org_parents.append((org_id, data.parent_org_name))
+            return False
+
+        if section == "characters":
+            self._char_mapping[data.name] = row["id"]
+        elif section == "outlines":
+            self._outline_mapping[data.title] = row["id"]
+        elif section == "organizations":
+            self._org_mapping[data.character_name] = row["id"]
+            if data.parent_org_name:
+                self._org_parents.append((row["id"], data.parent_org_name))
+        elif section == "writing_styles":
+            self._style_names.add(data.name)
+
+        batch = self._batches[section]
+        batch.append(row)
+        if len(batch) >= self.batch_size:
+            await self._flush(db, section)
+            return True
+        return False
+
+    async def _flush(self, db: AsyncSession, section: str):
+        """写入并提交一个批次"""
+        batch = self._batches[section]
+        if not batch:
+            return
+        await db.execute(insert(SECTION_MODELS[section]), batch)
+        await db.commit()
+        self.statistics[section] += len(batch)
+        self._batches[section] = []
+
+    async def _finish_section(self, db: AsyncSession, section: str):
+        await self._flush(db, section)
+        self._done.add(section)
+        logger.info(f"📥 导入{section}: {self.statistics[section]}")
+
+    async def _drain_deferred(self, db: AsyncSession) -> List[str]:
+        """处理依赖已完成的暂存分段，返回处理过的分段"""
+        drained = []
+        progressed = True
+        while progressed:
+            progressed = False
+            for section in list(self._deferred):
+                if SECTION_DEPENDENCIES[section] not in self._done:
+                    continue
+                for item in self._deferred.pop(section):
+                    await self._add(db, section, item)
+                await self._finish_section(db, section)
+                drained.append(section)
+                progressed = True
+        return drained
+
+    def _build_row(self, section: str, data: BaseModel) -> Optional[Dict[str, Any]]:
+        """把一项导出数据转换为插入行（无法关联的数据返回None）"""
+        project_id = self.project_id
+
+        if section == "chapters":
+            # 大纲关联在全部数据写入后按章节号统一更新
+            if data.outline_title:
+                self._chapter_outlines.setdefault(data.outline_title, []).append(data.chapter_number)
+            expansion_plan = data.expansion_plan
+            if expansion_plan and isinstance(expansion_plan, dict):
+                expansion_plan = json.dumps(expansion_plan, ensure_ascii=False)
+            return {
+                "id": str(uuid.uuid4()),
+                "project_id": project_id,
+                "title": data.title,
+                "content": data.content,
+                "summary": data.summary,
+                "chapter_number": data.chapter_number,
+                "word_count": data.word_count,
+                "status": data.status,
+                "outline_id": None,
+                "sub_index": data.sub_index,
+                "expansion_plan": expansion_plan,
+            }
+
+        if section == "characters":
+            traits = data.traits
+            if isinstance(traits, list):
+                traits = json.dumps(traits, ensure_ascii=False)
+            return {
+                "id": str(uuid.uuid4()),
+                "project_id": project_id,
+                "name": data.name,
+                "age": data.age,
+                "gender": data.gender,
+                "is_organization": data.is_organization,
+                "role_type": data.role_type,
+                "personality": data.personality,
+                "background": data.background,
+                "appearance": data.appearance,
+                "traits": traits,
+                "organization_type": data.organization_type,
+                "organization_purpose": data.organization_purpose,
+            }
+
+        if section == "outlines":
+            return {
+                "id": str(uuid.uuid4()),
+                "project_id": project_id,
+                "title": data.title,
+                "content": data.content,
+                "structure": data.structure,
+                "order_index": data.order_index,
+            }
+
+        if section == "relationships":
+            source_id = self._char_mapping.get(data.source_name)
+            target_id = self._char_mapping.get(data.target_name)
+            if not (source_id and target_id):
+                return None
+            return {
+                "id": str(uuid.uuid4()),
+                "project_id": project_id,
+                "character_from_id": source_id,
+                "character_to_id": target_id,
+                "relationship_name": data.relationship_name,
+                "intimacy_level": data.intimacy_level,
+                "status": data.status,
+                "description": data.description,
+                "started_at": data.started_at,
+            }
+
+        if section == "organizations":
+            char_id = self._char_mapping.get(data.character_name)
+            if not char_id:
+                return None
+            return {
+                "id": str(uuid.uuid4()),
+                "project_id": project_id,
+                "character_id": char_id,
+                "power_level": data.power_level,
+                "member_count": data.member_count,
+                "location": data.location,
+                "motto": data.motto,
+                "color": data.color,
+            }
+
+        if section == "organization_members":
+            org_id = self._org_mapping.get(data.organization_name)
+            char_id = self._char_mapping.get(data.character_name)
+            if not (org_id and char_id):
+                return None
+            return {
+                "id": str(uuid.uuid4()),
+                "organization_id": org_id,
+                "character_id": char_id,
+                "position": data.position,
+                "rank": data.rank,
+                "status": data.status,
+                "joined_at": data.joined_at,
+                "loyalty": data.loyalty,
+                "contribution": data.contribution,
+                "notes": data.notes,
+            }
+
+        if section == "writing_styles":
+            # 用户级数据，已存在同名风格时跳过（续传时同样适用）
+            if data.name in self._style_names:
+                logger.debug(f"风格 {data.name} 已存在，跳过导入")
+                return None
+            return {
+                "user_id": self.user_id,
+                "name": data.name,
+                "style_type": data.style_type,
+                "preset_id": data.preset_id,
+                "description": data.description,
+                "prompt_content": data.prompt_content,
+                "order_index": data.order_index,
+            }
+
+        return None
+
+    async def _link_references(self, db: AsyncSession):
+        """写入剩余批次，并更新章节的大纲关联和组织的父组织"""
+        for section in SECTION_MODELS:
+            await self._flush(db, section)
+
+        for outline_title, chapter_numbers in self._chapter_outlines.items():
+            outline_id = self._outline_mapping.get(outline_title)
+            if not outline_id:
+                continue
+            for start in range(0, len(chapter_numbers), self.batch_size):
+                await db.execute(
+                    update(Chapter)
+                    .where(
+                        Chapter.project_id == self.project_id,
+                        Chapter.chapter_number.in_(chapter_numbers[start:start + self.batch_size])
+                    )
+                    .values(outline_id=outline_id)
+                )
+
+        for org_id, parent_name in self._org_parents:
+            parent_id = self._org_mapping.get(parent_name)
+            if parent_id:
+                await db.execute(
+                    update(Organization).where(Organization.id == org_id).values(parent_org_id=parent_id)
+                )
@@ -0,0 +1,183 @@
+"""提示词模板注册表 - 用户自定义模板的进程内缓存与预编译
+
+每次分析、去味、重写、大纲展开都会调用 PromptService.get_template，即使用户没有任何自定义模板也要查询一次数据库，
+format_prompt 再用 str.format 重新解析整段模板（数KB的中文文本）。注册表：
+- 首次使用时一次读取用户全部启用的自定义模板，按用户缓存在进程内
+- 以用户的模板版本号为键：prompt_templates API 提交修改后版本号+1，缓存随之失效
+- 多进程部署时其他进程的修改无法感知，按 prompt_template_cache_ttl_seconds 兜底过期
+- 模板按内容预解析为文本片段和参数名，渲染时只做拼接
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+_formatter = Formatter()
+_CONVERTERS: Dict[Optional[str], Optional[Callable[[Any], str]]] = {None: None, "s": str, "r": repr, "a": ascii}
+
+
+class CompiledTemplate:
+    """预解析的提示词模板（渲染结果与 str.format 一致）"""
+
+    __slots__ = ("source", "fields", "_parts")
+
+    def __init__(self, source: str):
+        self.source = source
+        self._parts: Optional[Tuple[Tuple[str, Optional[str], str, Optional[Callable[[Any], str]]], ...]] = None
+        try:
+            parsed = list(_formatter.parse(source))
+        except ValueError:
+            # 模板格式错误：渲染时由 str.format 抛出相同的错误
+            parsed = []
+        self.fields: FrozenSet[str] = frozenset(name for _, name, _, _ in parsed if name)
+
+        # 位置参数、属性/下标访问、嵌套格式说明等少见写法仍交给 str.format
+        if parsed and all(
+            name is None or (name.isidentifier() and conversion in _CONVERTERS and "{" not in spec)
+            for _, name, spec, conversion in parsed
+        ):
+            self._parts = tuple(
+                (literal, name, spec or "", _CONVERTERS.get(conversion))
+                for literal, name, spec, conversion in parsed
+            )
+
+    def render(self, **kwargs) -> str:
+        """
+        渲染模板
+
+        Raises:
+            KeyError: 缺少模板参数
+        """
+        if self._parts is None:
+            return self.source.format(**kwargs)
+        out = []
+        for literal, name, spec, convert in self._parts:
+            if literal:
+                out.append(literal)
+            if name is not None:
+                value = kwargs[name]
+                if convert is not None:
+                    value = convert(value)
+                out.append(value if not spec and type(value) is str else format(value, spec))
+        return "".join(out)
+
+
+@lru_cache(maxsize=512)
+def compile_template(source: str) -> CompiledTemplate:
+    """按模板内容获取预编译模板（系统模板与缓存的自定义模板是同一字符串对象，哈希只计算一次）"""
+    return CompiledTemplate(source)
+
+
+@dataclass(frozen=True)
+class TemplateOverride:
+    """用户自定义模板"""
+    name: str
+    content: str
+
+
+class PromptTemplateRegistry:
+    """按用户模板版本号缓存自定义模板"""
+
+    def __init__(self):
+        # 全局代数：使全部用户失效时递增
+        self._generation = 0
+        self._versions: Dict[str, int] = {}
+        # user_id -> (过期时间, 版本号, 模板键 -> 自定义模板)
+        self._overrides: Dict[str, Tuple[float, Tuple[int, int], Dict[str, TemplateOverride]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def version(self, user_id: str) -> Tuple[int, int]:
+        """用户当前的模板版本号"""
+        return self._generation, self._versions.get(user_id, 0)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """
+        使用户的自定义模板缓存失效（模板修改提交后调用）
+
+        Args:
+            user_id: 用户ID，为None时使全部用户失效
+        """
+        if user_id is None:
+            self._generation += 1
+            self._overrides.clear()
+        else:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._overrides.pop(user_id, None)
+        self._stats["invalidations"] += 1
+
+    async def get_overrides(self, db: AsyncSession, user_id: str) -> Dict[str, TemplateOverride]:
+        """
+        获取用户全部启用的自定义模板（版本号未变且未过期时直接返回缓存）
+
+        Args:
+            db: 数据库会话（仅在需要重新读取时使用）
+            user_id: 用户ID
+        """
+        overrides = self._cached(user_id)
+        if overrides is not None:
+            self._stats["hits"] += 1
+            return overrides
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            # 等待锁期间其他协程可能已经读取完成
+            overrides = self._cached(user_id)
+            if overrides is not None:
+                self._stats["hits"] += 1
+                return overrides
+
+            # prompt_service 在模块加载时导入本模块，模型延迟导入以免与 app.database 循环导入
+            from app.models.prompt_template import PromptTemplate
+
+            self._stats["misses"] += 1
+            # 先记录版本号再读取：读取期间发生的修改会使该缓存立即过期
+            version = self.version(user_id)
+            rows = (await db.execute(
+                select(PromptTemplate.template_key, PromptTemplate.template_name, PromptTemplate.template_content)
+                .where(PromptTemplate.user_id == user_id, PromptTemplate.is_active == True)
+            )).all()
+            overrides = {row.template_key: TemplateOverride(row.template_name, row.template_content) for row in rows}
+            logger.info(f"📚 加载用户提示词模板: user_id={user_id}, 自定义{len(overrides)}个")
+
+            now = time.monotonic()
+            if len(self._overrides) >= settings.prompt_template_cache_max_users:
+                # 先清理过期条目，仍然超限则整体清空
+                self._overrides = {k: v for k, v in self._overrides.items() if v[0] > now}
+                if len(self._overrides) >= settings.prompt_template_cache_max_users:
+                    self._overrides.clear()
+                    self._locks = {user_id: lock}
+            self._overrides[user_id] = (now + settings.prompt_template_cache_ttl_seconds, version, overrides)
+        return overrides
+
+    async def get_override(self, db: AsyncSession, user_id: str, template_key: str) -> Optional[TemplateOverride]:
+        """获取用户对某个模板的自定义版本，没有时返回None"""
+        return (await self.get_overrides(db, user_id)).get(template_key)
+
+    def _cached(self, user_id: str) -> Optional[Dict[str, TemplateOverride]]:
+        entry = self._overrides.get(user_id)
+        if entry and entry[0] > time.monotonic() and entry[1] == self.version(user_id):
+            return entry[2]
+        return None
+
+    def get_stats(self) -> dict:
+        """缓存统计"""
+        return {
+            **self._stats,
+            "users": len(self._overrides),
+            "compiled_templates": compile_template.cache_info().currsize
+        }
+
+
+# 全局注册表
+prompt_template_registry = PromptTemplateRegistry()
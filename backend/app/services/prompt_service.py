@@ -2,6 +2,8 @@
 from typing import Dict, Any, Optional
 import json
 
+from app.services.prompt_registry import compile_template, prompt_template_registry
+
 
 class WritingStyleManager:
     """写作风格管理器"""
@@ -1910,7 +1912,7 @@ class PromptService:
             格式化后的提示词
         """
         try:
-            return template.format(**kwargs)
+            return compile_template(template).render(**kwargs)
         except KeyError as e:
             raise ValueError(f"缺少必需的参数: {e}")
     
@@ -2119,28 +2121,19 @@ class PromptService:
         Returns:
             提示词模板内容
         """
-        from sqlalchemy import select
-        from app.models.prompt_template import PromptTemplate
         from app.logger import get_logger
         
         logger = get_logger(__name__)
         
-        # 1. 尝试从数据库获取用户自定义模板
-        result = await db.execute(
-            select(PromptTemplate).where(
-                PromptTemplate.user_id == user_id,
-                PromptTemplate.template_key == template_key,
-                PromptTemplate.is_active == True
-            )
-        )
-        custom_template = result.scalar_one_or_none()
-        
-        if custom_template:
-            logger.info(f"✅ 使用用户自定义提示词: user_id={user_id}, template_key={template_key}, template_name={custom_template.template_name}")
-            return custom_template.template_content
+        # 1. 用户自定义模板（注册表按用户缓存，模板修改后失效）
+        if user_id:
+            custom_template = await prompt_template_registry.get_override(db, user_id, template_key)
+            if custom_template:
+                logger.debug(f"✅ 使用用户自定义提示词: user_id={user_id}, template_key={template_key}, template_name={custom_template.name}")
+                return custom_template.content
         
         # 2. 降级到系统默认模板
-        logger.info(f"⚪ 使用系统默认提示词: user_id={user_id}, template_key={template_key} (未找到自定义模板)")
+        logger.debug(f"⚪ 使用系统默认提示词: user_id={user_id}, template_key={template_key} (未找到自定义模板)")
         
         # 直接从类属性获取系统默认模板
         template_content = getattr(cls, template_key, None)
@@ -148,7 +148,8 @@ class QualityScorer:
             result = await self.ai_service.generate_text(
                 prompt=prompt,
                 max_tokens=8000,
-                temperature=0.3
+                temperature=0.3,
+                use_cache=True
             )
             
             content_str = result.get("content", "") or result.get("reasoning_content", "")
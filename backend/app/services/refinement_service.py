@@ -14,6 +14,8 @@ from app.models.character import Character
 from app.models.outline import Outline
 from app.config import RefinementConfig
 from app.logger import get_logger
+from app.services.duplicate_detector import refresh_duplicate_index
+from app.utils.text_split import find_best_split_point
 
 logger = get_logger(__name__)
 
@@ -256,8 +258,8 @@ def split_chapter_for_refinement(content: str) -> List[Dict]:
     target_seg1_end = int(total_length * 0.4)
     target_seg2_end = int(total_length * 0.8)
     
-    seg1_end = _find_best_split_point(content, target_seg1_end)
-    seg2_end = _find_best_split_point(content, target_seg2_end)
+    seg1_end = find_best_split_point(content, target_seg1_end)
+    seg2_end = find_best_split_point(content, target_seg2_end)
     
     return [
         {
@@ -281,31 +283,6 @@ def split_chapter_for_refinement(content: str) -> List[Dict]:
     ]
 
 
-def _find_best_split_point(content: str, target: int, search_range: int = 500) -> int:
-    """在目标位置附近找最佳切分点"""
-    start = max(0, target - search_range)
-    end = min(len(content), target + search_range)
-    search_area = content[start:end]
-    
-    # 优先找双换行
-    pos = search_area.rfind('\n\n')
-    if pos != -1:
-        return start + pos + 2
-    
-    # 其次找单换行
-    pos = search_area.rfind('\n')
-    if pos != -1:
-        return start + pos + 1
-    
-    # 最后找句号
-    for punct in ['。', '！', '？', '.', '!', '?']:
-        pos = search_area.rfind(punct)
-        if pos != -1:
-            return start + pos + 1
-    
-    return target
-
-
 def generate_segment_summary(content: str, max_chars: int = 200) -> str:
     """生成段落摘要"""
     if not content:
@@ -776,9 +753,12 @@ class ChapterRefinementService:
                 is_refined=True,
                 refined_at=datetime.now(),
                 refinement_id=refinement_id,
-                refinement_model=model
+                refinement_model=model,
+                version=Chapter.version + 1
             )
         )
+        await self.db.refresh(chapter)
+        await refresh_duplicate_index(chapter, self.db)
         await self.db.commit()
     
     async def _mark_failed(self, refinement_id: str, error: str):
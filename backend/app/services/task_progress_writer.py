@@ -0,0 +1,144 @@
+"""任务进度合并写入器 - 替代按用户的进程内写锁
+
+批量生成、章节分析等后台任务会频繁写入 progress / current_chapter_id 等进度字段。
+原先每次写入都要获取用户级 asyncio.Lock 并单独提交，同一用户的并发任务在进度更新上串行，
+且多 worker 部署时锁并不生效。
+
+该写入器按 (模型, 行ID) 合并待写字段，每 flush_interval_ms 毫秒用一次事务批量 UPDATE：
+- update(): 记录进度字段，立即返回，同一字段的多次更新只写最后一次
+- write_now(): 与未写入的进度合并后立即落库（用于 completed/failed 等终态，保证顺序）
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple, Type
+
+from sqlalchemy import update
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+_PendingKey = Tuple[Type, str]
+
+
+class TaskProgressWriter:
+    """任务进度合并写入器（进程级单例）"""
+
+    def __init__(self, flush_interval_ms: int):
+        """
+        初始化写入器
+
+        Args:
+            flush_interval_ms: 合并窗口（毫秒）
+        """
+        self.flush_interval = max(flush_interval_ms, 1) / 1000
+        self._pending: Dict[_PendingKey, Dict[str, Any]] = {}
+        self._owners: Dict[_PendingKey, str] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stats = {"updates": 0, "coalesced": 0, "flushes": 0, "rows_written": 0, "errors": 0, "flush_ms_max": 0.0}
+
+    def update(self, model: Type, row_id: str, user_id: str, **values: Any):
+        """
+        记录待写入的字段（合并后由后台定期写入）
+
+        Args:
+            model: ORM模型类（需有 id 主键列）
+            row_id: 行ID
+            user_id: 用户ID（用于获取数据库会话）
+            values: 待写入的列值
+        """
+        key = (model, row_id)
+        pending = self._pending.setdefault(key, {})
+        self._stats["updates"] += 1
+        self._stats["coalesced"] += sum(1 for name in values if name in pending)
+        pending.update(values)
+        self._owners[key] = user_id
+        self._ensure_flusher()
+
+    async def write_now(self, model: Type, row_id: str, user_id: str, **values: Any):
+        """
+        与未写入的进度合并后立即写入（失败时抛出异常）
+
+        Args:
+            model: ORM模型类
+            row_id: 行ID
+            user_id: 用户ID
+            values: 待写入的列值
+        """
+        self.update(model, row_id, user_id, **values)
+        await self.flush([(model, row_id)], raise_errors=True)
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self, keys: Optional[list] = None, raise_errors: bool = False):
+        """
+        写入待更新的字段
+
+        Args:
+            keys: 只写入指定的 (模型, 行ID)，None表示全部
+            raise_errors: 写入失败时是否抛出异常（否则放回队列下次重试）
+        """
+        from app.database import session_scope
+
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            targets = list(self._pending) if keys is None else [k for k in keys if k in self._pending]
+            if not targets:
+                return
+            batch = {key: self._pending.pop(key) for key in targets}
+            owners = {key: self._owners.pop(key, None) for key in targets}
+
+            by_user: Dict[str, list] = {}
+            for key in targets:
+                by_user.setdefault(owners[key] or "_task_progress_", []).append(key)
+
+            start = time.monotonic()
+            for user_id, user_keys in by_user.items():
+                try:
+                    async with session_scope(user_id, name="task_progress") as session:
+                        for model, row_id in user_keys:
+                            await session.execute(
+                                update(model).where(model.id == row_id).values(**batch[(model, row_id)])
+                            )
+                    self._stats["rows_written"] += len(user_keys)
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    # 放回队列，较新的值优先
+                    for key in user_keys:
+                        merged = {**batch[key], **self._pending.get(key, {})}
+                        self._pending[key] = merged
+                        self._owners.setdefault(key, user_id)
+                    if raise_errors:
+                        raise
+                    logger.warning(f"⚠️ 任务进度写入失败，稍后重试: {str(e)}")
+            self._stats["flushes"] += 1
+            self._stats["flush_ms_max"] = max(self._stats["flush_ms_max"], (time.monotonic() - start) * 1000)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取写入统计
+
+        Returns:
+            合并次数、写入行数、待写入数量等指标
+        """
+        return {
+            **self._stats,
+            "flush_ms_max": round(self._stats["flush_ms_max"], 2),
+            "pending_rows": len(self._pending),
+            "flush_interval_ms": int(self.flush_interval * 1000),
+        }
+
+
+# 全局实例
+progress_writer = TaskProgressWriter(settings.task_progress_flush_ms)
@@ -0,0 +1,437 @@
+"""项目世界状态快照 - 角色、职业、角色职业关联、大纲的进程内缓存
+
+每次章节生成、大纲续写、大纲展开都会重新查询整个项目的角色、职业和大纲，并重复拼接相同的提示词片段。
+批量生成100章时，这些数据在整个过程中几乎不变。快照把它们读取一次后缓存在进程内：
+- 以项目的"世界版本号"为键：角色、职业、角色职业关联、关系、组织、大纲在本进程提交写入后版本号+1，快照随之失效
+- 版本号在事务提交时才递增，避免其他请求在提交前读到旧数据却缓存到新版本下
+- 批量语句从参数或 WHERE 等值条件（project_id / character_id）中定位项目，无法确定时使全部快照失效
+- 多进程部署时其他进程的写入无法感知，按 world_snapshot_ttl_seconds 兜底过期
+- 只缓存从主库读取的快照：只读副本可能落后于主库，从副本读到的快照只供本次使用
+- 快照只保存普通数据（不持有ORM对象），格式化后的提示词片段在快照上按参数记忆
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.logger import get_logger
+from app.models.career import Career, CharacterCareer
+from app.models.character import Character
+from app.models.outline import Outline
+from app.models.relationship import CharacterRelationship, Organization, OrganizationMember
+
+logger = get_logger(__name__)
+
+# 写入后需要使快照失效的模型
+_WORLD_MODELS = (Character, Career, CharacterCareer, CharacterRelationship, Organization, OrganizationMember, Outline)
+
+# session.info 中记录待提交的失效项目；_ALL 表示全部项目
+_PENDING_KEY = "world_snapshot_pending"
+_ALL = "*"
+
+
+@dataclass(frozen=True)
+class CharacterEntry:
+    """角色/组织"""
+    id: str
+    name: str
+    is_organization: bool
+    role_type: Optional[str]
+    personality: Optional[str]
+
+
+@dataclass(frozen=True)
+class CareerEntry:
+    """职业"""
+    id: str
+    name: str
+    type: str
+    description: Optional[str]
+    max_stage: int
+
+
+@dataclass(frozen=True)
+class OutlineEntry:
+    """大纲"""
+    id: str
+    order_index: Optional[int]
+    title: str
+    content: Optional[str]
+    structure: Optional[str]
+
+
+@dataclass
+class WorldSnapshot:
+    """
+    项目世界状态快照（只读）
+
+    快照构建后不再修改，格式化结果通过 memo 按参数缓存在快照上，快照失效时一并丢弃。
+    """
+    project_id: str
+    version: Tuple[int, int]
+    characters: Tuple[CharacterEntry, ...]
+    careers: Tuple[CareerEntry, ...]
+    # 角色ID -> {'main': 职业信息, 'sub': [职业信息, ...]}
+    character_careers: Dict[str, Dict[str, Any]]
+    outlines: Tuple[OutlineEntry, ...]
+    _renderings: Dict[Hashable, Any] = field(default_factory=dict, repr=False)
+
+    def memo(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        """按键缓存格式化结果"""
+        if key not in self._renderings:
+            self._renderings[key] = build()
+        return self._renderings[key]
+
+    def filter_characters(self, names: Optional[Sequence[str]]) -> List[CharacterEntry]:
+        """按名称筛选角色（保持原有顺序）"""
+        if not names:
+            return list(self.characters)
+        return [c for c in self.characters if c.name in names]
+
+    def characters_with_careers(self, characters: Sequence[CharacterEntry]) -> str:
+        """角色信息（含主/副职业与阶段），用于章节生成"""
+        def build() -> str:
+            parts = []
+            for c in characters:
+                entity_type = '组织' if c.is_organization else '角色'
+                line = f"- {c.name}({entity_type}, {c.role_type})"
+
+                career_data = self.character_careers.get(c.id)
+                if career_data:
+                    main = career_data['main']
+                    if main:
+                        line += f" | 主职业: {main['name']}({main['stage']}/{main['max_stage']}阶)"
+                    if career_data['sub']:
+                        sub_list = [f"{sub['name']}({sub['stage']}/{sub['max_stage']}阶)" for sub in career_data['sub']]
+                        line += f" | 副职业: {', '.join(sub_list)}"
+
+                if c.personality:
+                    line += f": {c.personality[:100]}"
+                parts.append(line)
+            return "\n".join(parts)
+
+        return self.memo(("characters_with_careers", tuple(c.id for c in characters)), build)
+
+    def characters_brief(self) -> str:
+        """全部角色的简要信息（名称、类型、性格前100字），用于大纲生成与展开"""
+        return self.memo("characters_brief", lambda: "\n".join(
+            f"- {c.name} ({'组织' if c.is_organization else '角色'}, {c.role_type}): "
+            f"{c.personality[:100] if c.personality else '暂无描述'}"
+            for c in self.characters
+        ))
+
+    def outline_neighbors(self, order_index: Optional[int]) -> Tuple[Optional[OutlineEntry], Optional[OutlineEntry]]:
+        """返回指定序号的前一个和后一个大纲"""
+        prev_outline = next_outline = None
+        if order_index is None:
+            return prev_outline, next_outline
+        for outline in self.outlines:
+            if outline.order_index is None:
+                continue
+            if outline.order_index < order_index:
+                prev_outline = outline
+            elif outline.order_index > order_index:
+                next_outline = outline
+                break
+        return prev_outline, next_outline
+
+
+class WorldSnapshotCache:
+    """按项目世界版本号缓存快照"""
+
+    def __init__(self):
+        # 全局代数：无法确定项目的写入时递增，使全部快照失效
+        self._generation = 0
+        self._versions: Dict[str, int] = {}
+        # project_id -> (过期时间, 快照)
+        self._snapshots: Dict[str, Tuple[float, WorldSnapshot]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # 角色ID -> 项目ID（CharacterCareer/OrganizationMember 只有角色ID，用于定位项目）
+        self._character_projects: Dict[str, str] = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "replica_loads": 0}
+
+    def version(self, project_id: str) -> Tuple[int, int]:
+        """项目当前的世界版本号"""
+        return self._generation, self._versions.get(project_id, 0)
+
+    def bump(self, project_id: Optional[str] = None):
+        """
+        递增世界版本号
+
+        Args:
+            project_id: 项目ID，为None时使全部项目失效
+        """
+        if project_id is None:
+            self._generation += 1
+            self._snapshots.clear()
+        else:
+            self._versions[project_id] = self._versions.get(project_id, 0) + 1
+            self._snapshots.pop(project_id, None)
+        self._stats["invalidations"] += 1
+
+    async def get(self, db: AsyncSession, project_id: str) -> WorldSnapshot:
+        """
+        获取项目快照（版本号未变且未过期时直接返回缓存）
+
+        Args:
+            db: 数据库会话（仅在需要重新构建时使用）
+            project_id: 项目ID
+        """
+        if self._has_pending_writes(db, project_id):
+            # 当前事务中有未提交的世界状态写入：读取包含这些写入的数据，只供本次使用不缓存
+            self._stats["misses"] += 1
+            return await self._load(db, project_id, self.version(project_id))
+
+        snapshot = self._cached(project_id)
+        if snapshot:
+            self._stats["hits"] += 1
+            return snapshot
+
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            # 等待锁期间其他协程可能已经构建完成
+            snapshot = self._cached(project_id)
+            if snapshot:
+                self._stats["hits"] += 1
+                return snapshot
+
+            self._stats["misses"] += 1
+            # 先记录版本号再读取：读取期间发生的提交会使该快照立即过期
+            version = self.version(project_id)
+            snapshot = await self._load(db, project_id, version)
+
+            # 读取触发了自动flush：快照包含未提交数据，不缓存
+            if self._has_pending_writes(db, project_id):
+                return snapshot
+            # 从只读副本读取：副本可能尚未同步最新提交，缓存后会在新版本号下长期返回旧数据
+            if getattr(db.sync_session, "reads_from_replica", False):
+                self._stats["replica_loads"] += 1
+                return snapshot
+
+            now = time.monotonic()
+            if len(self._snapshots) >= settings.world_snapshot_max_projects:
+                self._snapshots = {k: v for k, v in self._snapshots.items() if v[0] > now}
+                if len(self._snapshots) >= settings.world_snapshot_max_projects:
+                    self._snapshots.clear()
+                    self._character_projects.clear()
+                    self._locks = {project_id: lock}
+            self._snapshots[project_id] = (now + settings.world_snapshot_ttl_seconds, snapshot)
+            for character in snapshot.characters:
+                self._character_projects[character.id] = project_id
+        return snapshot
+
+    def _has_pending_writes(self, db: AsyncSession, project_id: str) -> bool:
+        """当前会话是否有影响该项目的未提交写入（已flush或尚未flush）"""
+        session = db.sync_session
+        pending = set(session.info.get(_PENDING_KEY) or ())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(obj, _WORLD_MODELS):
+                pending.add(self.project_of(obj))
+        return project_id in pending or _ALL in pending
+
+    def _cached(self, project_id: str) -> Optional[WorldSnapshot]:
+        entry = self._snapshots.get(project_id)
+        if entry and entry[0] > time.monotonic() and entry[1].version == self.version(project_id):
+            return entry[1]
+        return None
+
+    @staticmethod
+    async def _load(db: AsyncSession, project_id: str, version: Tuple[int, int]) -> WorldSnapshot:
+        """从数据库读取项目世界状态（只读取需要的列）"""
+        character_rows = (await db.execute(
+            select(
+                Character.id, Character.name, Character.is_organization,
+                Character.role_type, Character.personality
+            ).where(Character.project_id == project_id)
+        )).all()
+        characters = tuple(
+            CharacterEntry(row.id, row.name, bool(row.is_organization), row.role_type, row.personality)
+            for row in character_rows
+        )
+
+        career_rows = (await db.execute(
+            select(Career.id, Career.name, Career.type, Career.description, Career.max_stage)
+            .where(Career.project_id == project_id)
+            .order_by(Career.type, Career.id)
+        )).all()
+        careers = tuple(CareerEntry(row.id, row.name, row.type, row.description, row.max_stage) for row in career_rows)
+        careers_map = {c.id: c for c in careers}
+
+        link_rows = (await db.execute(
+            select(
+                CharacterCareer.character_id, CharacterCareer.career_id, CharacterCareer.career_type,
+                CharacterCareer.current_stage, CharacterCareer.stage_progress
+            )
+            .join(Character, Character.id == CharacterCareer.character_id)
+            .where(Character.project_id == project_id)
+        )).all()
+        character_careers: Dict[str, Dict[str, Any]] = {}
+        for row in link_rows:
+            career_data = character_careers.setdefault(row.character_id, {'main': None, 'sub': []})
+            career = careers_map.get(row.career_id)
+            if not career:
+                continue
+            career_info = {
+                'name': career.name,
+                'stage': row.current_stage,
+                'max_stage': career.max_stage,
+                'stage_progress': row.stage_progress
+            }
+            if row.career_type == 'main':
+                career_data['main'] = career_info
+            else:
+                career_data['sub'].append(career_info)
+
+        outline_rows = (await db.execute(
+            select(Outline.id, Outline.order_index, Outline.title, Outline.content, Outline.structure)
+            .where(Outline.project_id == project_id)
+            .order_by(Outline.order_index)
+        )).all()
+        outlines = tuple(
+            OutlineEntry(row.id, row.order_index, row.title, row.content, row.structure) for row in outline_rows
+        )
+
+        logger.debug(
+            f"🌍 构建世界状态快照: 项目{project_id[:8]} "
+            f"（{len(characters)}个角色，{len(careers)}个职业，{len(outlines)}个大纲）"
+        )
+        return WorldSnapshot(
+            project_id=project_id,
+            version=version,
+            characters=characters,
+            careers=careers,
+            character_careers=character_careers,
+            outlines=outlines,
+        )
+
+    def project_of(self, obj: Any) -> Optional[str]:
+        """
+        定位被写入对象所属的项目
+
+        Returns:
+            项目ID；返回 _ALL 表示无法确定（需要使全部快照失效）；返回None表示没有受影响的缓存
+        """
+        # 只读取已加载的属性，避免在flush期间触发懒加载
+        return self.project_of_values(inspect(obj).dict)
+
+    def project_of_values(self, values: Dict[str, Any]) -> Optional[str]:
+        """按列值（project_id / character_id）定位项目，返回值含义同 project_of"""
+        project_id = values.get("project_id")
+        if project_id:
+            return project_id
+        character_id = values.get("character_id")
+        if character_id:
+            # 角色不在任何快照中时，其所属快照要么未缓存，要么已被新增角色本身失效
+            return self._character_projects.get(character_id)
+        return _ALL
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        return {**self._stats, "entries": len(self._snapshots)}
+
+
+# 全局实例
+world_snapshot_cache = WorldSnapshotCache()
+
+
+def _pending(session: Session) -> Set[str]:
+    return session.info.setdefault(_PENDING_KEY, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_world_writes(session: Session, flush_context):
+    """记录本次flush中写入的世界状态对象所属项目"""
+    pending = None
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, _WORLD_MODELS):
+            continue
+        project_id = world_snapshot_cache.project_of(obj)
+        if project_id:
+            if pending is None:
+                pending = _pending(session)
+            pending.add(project_id)
+
+
+def _criteria_values(whereclause) -> List[Dict[str, Any]]:
+    """
+    从 WHERE 条件中提取 project_id / character_id 的取值
+
+    只识别顶层（AND 连接）的等值或 IN 条件，例如 where(Character.project_id == pid)；
+    返回每个取值对应的列值字典，无法识别时返回空列表
+    """
+    if whereclause is None:
+        return []
+    if isinstance(whereclause, BooleanClauseList) and whereclause.operator is operators.and_:
+        clauses = whereclause.clauses
+    else:
+        clauses = [whereclause]
+
+    for column_name in ("project_id", "character_id"):
+        for clause in clauses:
+            if not isinstance(clause, BinaryExpression) or not isinstance(clause.right, BindParameter):
+                continue
+            if getattr(clause.left, "key", None) != column_name:
+                continue
+            value = clause.right.effective_value
+            if clause.operator is operators.eq and value is not None:
+                return [{column_name: value}]
+            if clause.operator is operators.in_op and value:
+                return [{column_name: v} for v in value]
+    return []
+
+
+def _statement_projects(orm_execute_state) -> Set[str]:
+    """批量语句影响的项目（无法确定时返回 {_ALL}）"""
+    rows: List[Dict[str, Any]] = []
+    if not orm_execute_state.is_insert:
+        rows = _criteria_values(orm_execute_state.statement.whereclause)
+    if not rows:
+        params = orm_execute_state.parameters
+        rows = list(params) if isinstance(params, (list, tuple)) else [params] if params else []
+    if not rows:
+        return {_ALL}
+
+    projects = set()
+    for row in rows:
+        project_id = world_snapshot_cache.project_of_values(row)
+        if project_id == _ALL:
+            return {_ALL}
+        if project_id:
+            projects.add(project_id)
+    return projects
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_world_writes(orm_execute_state):
+    """记录批量 insert/update/delete 语句影响的项目，无法确定项目时提交后使全部快照失效"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, _WORLD_MODELS):
+        _pending(orm_execute_state.session).update(_statement_projects(orm_execute_state))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_world_writes(session: Session):
+    """事务提交后递增版本号"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _ALL in pending:
+        world_snapshot_cache.bump()
+    else:
+        for project_id in pending:
+            world_snapshot_cache.bump(project_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_world_writes(session: Session):
+    """事务回滚时丢弃待递增的项目"""
+    session.info.pop(_PENDING_KEY, None)
@@ -2,8 +2,9 @@
 用户管理模块 - 使用数据库存储
 """
 import asyncio
+import time
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from pydantic import BaseModel
@@ -28,22 +29,60 @@ class UserManager:
     
     def __init__(self):
         """初始化用户管理器"""
-        pass
+        self._session_factory: Optional[async_sessionmaker] = None
+        # 认证中间件使用的用户缓存: user_id -> (过期时间, 用户或None)
+        self._user_cache: Dict[str, Tuple[float, Optional[User]]] = {}
+        self._cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
     
     async def _get_session(self) -> AsyncSession:
-        """获取数据库会话 - 使用共享的PostgreSQL引擎"""
-        from app.database import get_engine
+        """获取数据库会话 - 使用共享的PostgreSQL引擎和会话工厂"""
+        if self._session_factory is None:
+            from app.database import get_session_factory
+            
+            # 使用共享的PostgreSQL引擎（user_id使用特殊标识）
+            self._session_factory = await get_session_factory("_global_users_")
+        
+        return self._session_factory()
+    
+    async def get_user_cached(self, user_id: str) -> Optional[User]:
+        """
+        获取用户（带短TTL缓存，供认证中间件在每个请求上调用）
+        
+        用户状态变更（禁用、重置密码、删除等）会显式失效缓存，TTL只是兜底。
+        """
+        now = time.monotonic()
+        entry = self._user_cache.get(user_id)
+        if entry and entry[0] > now:
+            self._cache_stats["hits"] += 1
+            return entry[1]
         
-        # 使用共享的PostgreSQL引擎（user_id使用特殊标识）
-        engine = await get_engine("_global_users_")
+        self._cache_stats["misses"] += 1
+        user = await self.get_user(user_id)
         
-        session_maker = async_sessionmaker(
-            engine,
-            class_=AsyncSession,
-            expire_on_commit=False
-        )
+        if len(self._user_cache) >= settings.auth_user_cache_max_entries:
+            # 先清理过期条目，仍然超限则整体清空
+            self._user_cache = {k: v for k, v in self._user_cache.items() if v[0] > now}
+            if len(self._user_cache) >= settings.auth_user_cache_max_entries:
+                self._user_cache.clear()
+        self._user_cache[user_id] = (now + settings.auth_user_cache_ttl_seconds, user)
+        return user
+    
+    def invalidate_user(self, user_id: Optional[str] = None):
+        """
+        使用户缓存失效
         
-        return session_maker()
+        Args:
+            user_id: 用户ID，为None时清空全部缓存
+        """
+        if user_id is None:
+            self._user_cache.clear()
+        else:
+            self._user_cache.pop(user_id, None)
+        self._cache_stats["invalidations"] += 1
+    
+    def get_cache_stats(self) -> dict:
+        """获取用户缓存统计"""
+        return {**self._cache_stats, "entries": len(self._user_cache)}
     
     async def create_or_update_from_linuxdo(
         self,
@@ -116,6 +155,7 @@ class UserManager:
             await session.commit()
             await session.refresh(user)
             
+            self.invalidate_user(user_id)
             return User(**user.to_dict())
     
     async def get_user(self, user_id: str) -> Optional[User]:
@@ -177,6 +217,7 @@ class UserManager:
             user.is_admin = is_admin
             await session.commit()
             
+            self.invalidate_user(user_id)
             return True
     
     async def delete_user(self, user_id: str) -> bool:
@@ -207,6 +248,7 @@ class UserManager:
             await session.delete(user)
             await session.commit()
             
+            self.invalidate_user(user_id)
             return True
     
     async def is_admin(self, user_id: str) -> bool:
@@ -15,22 +15,17 @@ class UserPasswordManager:
     
     def __init__(self):
         """初始化密码管理器"""
-        pass
+        self._session_factory: Optional[async_sessionmaker] = None
     
     async def _get_session(self) -> AsyncSession:
-        """获取数据库会话 - 使用共享的PostgreSQL引擎"""
-        from app.database import get_engine
-        
-        # 使用共享的PostgreSQL引擎（user_id使用特殊标识）
-        engine = await get_engine("_global_users_")
-        
-        session_maker = async_sessionmaker(
-            engine,
-            class_=AsyncSession,
-            expire_on_commit=False
-        )
+        """获取数据库会话 - 使用共享的PostgreSQL引擎和会话工厂"""
+        if self._session_factory is None:
+            from app.database import get_session_factory
+            
+            # 使用共享的PostgreSQL引擎（user_id使用特殊标识）
+            self._session_factory = await get_session_factory("_global_users_")
         
-        return session_maker()
+        return self._session_factory()
     
     def _hash_password(self, password: str) -> str:
         """密码哈希"""
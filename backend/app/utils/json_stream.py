@@ -0,0 +1,142 @@
+"""增量JSON读取 - 逐项解析顶层对象中的数组，无需一次性载入整个文件
+
+导入备份文件原先对整个上传内容 json.loads，几百章的备份会在内存中同时存在原始字节、解码后的字符串和完整对象树。
+该读取器只面向导出文件的结构（顶层为对象，大字段为数组），按需读取数据块：
+- 顶层非数组字段整体解析，产出 ("value", 键, 值)
+- 顶层数组逐个元素解析，产出 ("item", 键, 元素)，结束时产出 ("end", 键, 元素数)
+单个元素仍整体解析，内存占用取决于最大的单个元素而不是文件大小。
+"""
+import asyncio
+import codecs
+import json
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Tuple
+
+# 每次读取的字节数
+_READ_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+# 合法JSON中值之后可能出现的字符
+_VALUE_END = _WHITESPACE + ",]}:"
+
+
+class JSONStreamReader:
+    """顶层对象的增量读取器"""
+
+    def __init__(self, read: Callable[[int], Awaitable[bytes]], read_size: int = _READ_SIZE):
+        """
+        Args:
+            read: 异步读取函数（如 UploadFile.read），返回空字节表示结束
+            read_size: 每次读取的字节数
+        """
+        self._read = read
+        self._read_size = read_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+
+    async def _fill(self) -> bool:
+        """读取下一个数据块，返回是否读到了新数据"""
+        if self._eof:
+            return False
+        data = await self._read(self._read_size)
+        self.bytes_read += len(data)
+        if not data:
+            self._eof = True
+            text = self._decoder.decode(b"", final=True)
+        else:
+            text = self._decoder.decode(data)
+        # 丢弃已解析的部分
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        if text:
+            if not self._buffer and text.startswith("\ufeff"):
+                text = text[1:]
+            self._buffer += text
+        return bool(data) or bool(text)
+
+    async def _peek(self) -> str:
+        """跳过空白并返回下一个字符（结束时返回空字符串）"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not await self._fill():
+                return ""
+
+    async def _expect(self, char: str):
+        found = await self._peek()
+        if found != char:
+            raise ValueError(f"无效的JSON格式: 位置 {self.bytes_read} 附近应为 '{char}'，实际为 '{found or '文件结束'}'")
+        self._pos += 1
+
+    async def _value(self) -> Any:
+        """解析一个完整的JSON值（数据不足时继续读取）"""
+        await self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if await self._fill():
+                    continue
+                raise ValueError(f"无效的JSON格式: {e.msg}") from e
+            # 数字可能在数据块边界被截断（如 "0." 会被解析为 0），其后必须是分隔符才算完整
+            if not self._eof and (end == len(self._buffer) or self._buffer[end] not in _VALUE_END):
+                await self._fill()
+                continue
+            self._pos = end
+            return value
+
+    async def events(self) -> AsyncIterator[Tuple[str, str, Any]]:
+        """
+        逐项产出顶层字段
+
+        Yields:
+            ("value", 键, 值) / ("item", 键, 数组元素) / ("end", 键, 数组元素数)
+        """
+        await self._expect("{")
+        if await self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = await self._value()
+            if not isinstance(key, str):
+                raise ValueError("无效的JSON格式: 字段名必须是字符串")
+            await self._expect(":")
+            if await self._peek() == "[":
+                self._pos += 1
+                count = 0
+                if await self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield "item", key, await self._value()
+                        count += 1
+                        if await self._peek() == ",":
+                            self._pos += 1
+                            continue
+                        await self._expect("]")
+                        break
+                yield "end", key, count
+            else:
+                yield "value", key, await self._value()
+
+            if await self._peek() == ",":
+                self._pos += 1
+                continue
+            await self._expect("}")
+            break
+
+        if await self._peek():
+            raise ValueError("无效的JSON格式: 顶层对象之后存在多余内容")
+
+
+def file_reader(file: BinaryIO) -> Callable[[int], Awaitable[bytes]]:
+    """把本地文件包装为异步读取函数（在线程中读取，不阻塞事件循环）"""
+    async def read(size: int) -> bytes:
+        return await asyncio.to_thread(file.read, size)
+    return read
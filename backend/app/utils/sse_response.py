@@ -1,12 +1,58 @@
-"""Server-Sent Events (SSE) 响应工具类"""
+"""Server-Sent Events (SSE) 响应工具类
+
+生成端仍以 `yield await SSEResponse.send_xxx(...)` 产出消息，create_sse_response 在其外层加一层传输：
+- 内容块（send_chunk）在时间/字数窗口内（默认 50ms 或 256 字符）合并为一帧，合并后才序列化
+- 窗口内连续的进度消息只发送最新一条，与内容块一起写出
+- 心跳只在连接空闲时发送，生成端自行发出的心跳被丢弃
+- 生成端与客户端之间为有界队列：客户端读取慢时生成端等待（背压），等待超时视为慢客户端并终止流
+- 每个流统计帧数/写入次数/字节数，进程级累计见 get_sse_stats()
+"""
 import json
 import asyncio
-from typing import AsyncGenerator, Dict, Any, Optional
+import time
+from json.encoder import encode_basestring
+from typing import AsyncGenerator, Dict, Any, List, Optional, Union
 from fastapi.responses import StreamingResponse
+from app.config import settings
 from app.logger import get_logger
+from app.utils.stream_buffer import StreamTextBuffer
 
 logger = get_logger(__name__)
 
+# 复用编码器实例（json.dumps 传入非默认参数时每次都会新建编码器）
+_json_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _format_chunk(chunk_type: str, content: str) -> str:
+    """内容块快速序列化：只转义字符串本身"""
+    return f'data: {{"type":{encode_basestring(chunk_type)},"content":{encode_basestring(content)}}}\n\n'
+
+
+class SSEChunk:
+    """待发送的内容块（由传输层合并后再序列化）"""
+    
+    __slots__ = ("content", "chunk_type")
+    
+    def __init__(self, content: str, chunk_type: str = "chunk"):
+        self.content = content
+        self.chunk_type = chunk_type
+    
+    def __str__(self) -> str:
+        return _format_chunk(self.chunk_type, self.content)
+
+
+class _ProgressFrame(str):
+    """进度消息（合并窗口内只保留最新一条）"""
+
+
+class _HeartbeatFrame(str):
+    """心跳（传输层按空闲时间统一发送）"""
+
+
+_HEARTBEAT = _HeartbeatFrame(": heartbeat\n\n")
+_END = object()
+_IDLE = object()
+
 
 class SSEResponse:
     """SSE响应构建器"""
@@ -27,7 +73,7 @@ class SSEResponse:
             message = ""
             if event:
                 message += f"event: {event}\n"
-            message += f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+            message += f"data: {_json_encode(data)}\n\n"
             return message
         except Exception as e:
             logger.error(f"❌ SSE格式化失败: {type(e).__name__}: {e}")
@@ -44,7 +90,8 @@ class SSEResponse:
     async def send_progress(
         message: str,
         progress: int,
-        status: str = "processing"
+        status: str = "processing",
+        word_count: Optional[int] = None
     ) -> str:
         """
         发送进度消息
@@ -53,26 +100,28 @@ class SSEResponse:
             message: 进度消息
             progress: 进度百分比(0-100)
             status: 状态(processing/success/error)
+            word_count: 已生成字数(可选)
         """
-        return SSEResponse.format_sse({
+        data = {
             "type": "progress",
             "message": message,
             "progress": progress,
             "status": status
-        })
+        }
+        if word_count is not None:
+            data["word_count"] = word_count
+        return _ProgressFrame(SSEResponse.format_sse(data))
     
     @staticmethod
-    async def send_chunk(content: str) -> str:
+    async def send_chunk(content: str, chunk_type: str = "chunk") -> SSEChunk:
         """
-        发送内容块(用于流式输出AI生成内容)
+        发送内容块(用于流式输出AI生成内容，由传输层合并后序列化)
         
         Args:
             content: 内容块
+            chunk_type: 消息类型(前端按 chunk 或 content 读取)
         """
-        return SSEResponse.format_sse({
-            "type": "chunk",
-            "content": content
-        })
+        return SSEChunk(content, chunk_type)
     
     @staticmethod
     async def send_result(data: Dict[str, Any]) -> str:
@@ -122,14 +171,14 @@ class SSEResponse:
     
     @staticmethod
     async def send_heartbeat() -> str:
-        """发送心跳消息(保持连接活跃)"""
-        return ": heartbeat\n\n"
+        """发送心跳消息(保持连接活跃；经 create_sse_response 发送时改为空闲时统一发送)"""
+        return _HEARTBEAT
 
 
 async def create_sse_generator(
     async_gen: AsyncGenerator[str, None],
     show_progress: bool = True
-) -> AsyncGenerator[str, None]:
+) -> AsyncGenerator[Union[str, SSEChunk], None]:
     """
     创建SSE生成器包装器
     
@@ -145,19 +194,13 @@ async def create_sse_generator(
             yield await SSEResponse.send_progress("开始生成...", 0)
         
         # 累积内容用于进度计算
-        accumulated_content = ""
-        chunk_count = 0
+        content_buffer = StreamTextBuffer()
         
         async for chunk in async_gen:
-            chunk_count += 1
-            accumulated_content += chunk
+            content_buffer.append(chunk)
             
-            # 发送内容块
+            # 发送内容块（心跳由传输层在空闲时发送）
             yield await SSEResponse.send_chunk(chunk)
-            
-            # 每10个块发送一次心跳
-            if chunk_count % 10 == 0:
-                yield await SSEResponse.send_heartbeat()
         
         if show_progress:
             yield await SSEResponse.send_progress("生成完成", 100, "success")
@@ -170,9 +213,240 @@ async def create_sse_generator(
         yield await SSEResponse.send_error(str(e))
 
 
-def create_sse_response(generator: AsyncGenerator[str, None]) -> StreamingResponse:
+# 进程级累计统计
+_sse_totals: Dict[str, Any] = {
+    "streams": 0,
+    "active": 0,
+    "chunks": 0,
+    "frames": 0,
+    "writes": 0,
+    "bytes": 0,
+    "heartbeats": 0,
+    "progress_dropped": 0,
+    "slow_clients": 0,
+    "producer_blocked_ms": 0.0,
+}
+
+
+class SSETransport:
+    """SSE 传输层：生成端与客户端之间的有界队列 + 内容块合并"""
+    
+    def __init__(
+        self,
+        source: AsyncGenerator[Union[str, SSEChunk], None],
+        flush_interval_ms: Optional[int] = None,
+        max_chunk_chars: Optional[int] = None,
+        heartbeat_seconds: Optional[float] = None,
+        queue_size: Optional[int] = None,
+        slow_client_timeout: Optional[float] = None
+    ):
+        """
+        初始化传输层
+        
+        Args:
+            source: 生成端（产出格式化好的消息或 SSEChunk）
+            flush_interval_ms: 内容块合并窗口（毫秒）
+            max_chunk_chars: 合并内容达到该字符数时立即发送
+            heartbeat_seconds: 空闲多久发送一次心跳
+            queue_size: 待发送队列上限
+            slow_client_timeout: 生成端最长等待时间（秒），超时终止流
+        """
+        self.source = source
+        self.flush_interval = (flush_interval_ms if flush_interval_ms is not None else settings.sse_flush_interval_ms) / 1000
+        self.max_chunk_chars = max_chunk_chars or settings.sse_flush_max_chars
+        self.heartbeat_seconds = heartbeat_seconds or settings.sse_heartbeat_seconds
+        self.queue_size = max(1, queue_size or settings.sse_queue_size)
+        self.slow_client_timeout = slow_client_timeout or settings.sse_slow_client_timeout_seconds
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._space = asyncio.Event()
+        self._pump_task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "chunks": 0,
+            "frames": 0,
+            "writes": 0,
+            "bytes": 0,
+            "heartbeats": 0,
+            "progress_dropped": 0,
+            "max_queue_depth": 0,
+            "producer_blocked_ms": 0.0,
+            "slow_client": False,
+        }
+    
+    async def _put(self, item) -> bool:
+        """放入队列，队列已满时等待客户端读取；超时返回False"""
+        if self._queue.qsize() >= self.queue_size:
+            start = time.monotonic()
+            deadline = start + self.slow_client_timeout
+            try:
+                while self._queue.qsize() >= self.queue_size:
+                    self._space.clear()
+                    await asyncio.wait_for(self._space.wait(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self.stats["slow_client"] = True
+                _sse_totals["slow_clients"] += 1
+                logger.warning(f"⚠️ SSE客户端读取过慢（{self.slow_client_timeout}秒内未消费，积压{self._queue.qsize()}条），终止生成")
+                return False
+            finally:
+                self.stats["producer_blocked_ms"] += (time.monotonic() - start) * 1000
+        self._queue.put_nowait(item)
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self._queue.qsize())
+        return True
+    
+    async def _pump(self):
+        """读取生成端写入队列；结束、慢客户端或被取消时关闭生成端"""
+        try:
+            async for item in self.source:
+                if not await self._put(item):
+                    break
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ SSE生成端异常: {type(e).__name__}: {e}")
+            self._queue.put_nowait(await SSEResponse.send_error(str(e)))
+        finally:
+            # 生成端停在 yield 处时抛入 GeneratorExit，触发其回滚逻辑
+            try:
+                await self.source.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ 关闭SSE生成端失败: {e}")
+            self._queue.put_nowait(_END)
+    
+    async def _next(self, timeout: float):
+        if self._queue.empty():
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return _IDLE
+        else:
+            item = self._queue.get_nowait()
+        self._space.set()
+        return item
+    
+    def _write(self, frames: List[str]) -> str:
+        data = "".join(frames)
+        size = len(data.encode("utf-8"))
+        self.stats["frames"] += len(frames)
+        self.stats["writes"] += 1
+        self.stats["bytes"] += size
+        _sse_totals["frames"] += len(frames)
+        _sse_totals["writes"] += 1
+        _sse_totals["bytes"] += size
+        return data
+    
+    async def frames(self) -> AsyncGenerator[str, None]:
+        """
+        输出合并后的SSE数据
+        
+        Yields:
+            一次写入的内容（可能包含多帧）
+        """
+        _sse_totals["streams"] += 1
+        _sse_totals["active"] += 1
+        self._pump_task = asyncio.create_task(self._pump())
+        
+        pending: List[str] = []
+        pending_type = None
+        pending_chars = 0
+        pending_progress: Optional[str] = None
+        progress_first = False
+        deadline = 0.0
+        
+        def take_pending() -> List[str]:
+            nonlocal pending, pending_chars, pending_progress
+            out = []
+            if pending:
+                out.append(_format_chunk(pending_type, "".join(pending)))
+                pending = []
+                pending_chars = 0
+            if pending_progress is not None:
+                # 按到达顺序：进度先于本窗口的内容块到达时放在前面
+                out.insert(0 if progress_first else len(out), pending_progress)
+                pending_progress = None
+            return out
+        
+        try:
+            while True:
+                waiting = bool(pending) or pending_progress is not None
+                timeout = max(0.0, deadline - time.monotonic()) if waiting else self.heartbeat_seconds
+                item = await self._next(timeout)
+                
+                if item is _IDLE:
+                    if waiting:
+                        yield self._write(take_pending())
+                    else:
+                        self.stats["heartbeats"] += 1
+                        _sse_totals["heartbeats"] += 1
+                        yield self._write([_HEARTBEAT])
+                    continue
+                
+                if item is _END:
+                    if waiting:
+                        yield self._write(take_pending())
+                    break
+                
+                if isinstance(item, SSEChunk):
+                    self.stats["chunks"] += 1
+                    _sse_totals["chunks"] += 1
+                    if not item.content:
+                        continue
+                    if pending and item.chunk_type != pending_type:
+                        yield self._write(take_pending())
+                        waiting = pending_progress is not None
+                    if not waiting:
+                        deadline = time.monotonic() + self.flush_interval
+                    pending.append(item.content)
+                    pending_type = item.chunk_type
+                    pending_chars += len(item.content)
+                    if pending_chars >= self.max_chunk_chars:
+                        yield self._write(take_pending())
+                    continue
+                
+                if isinstance(item, _HeartbeatFrame):
+                    continue
+                
+                if isinstance(item, _ProgressFrame):
+                    if pending_progress is not None:
+                        self.stats["progress_dropped"] += 1
+                        _sse_totals["progress_dropped"] += 1
+                    elif not waiting:
+                        deadline = time.monotonic() + self.flush_interval
+                    pending_progress = item
+                    progress_first = not pending
+                    continue
+                
+                # 其他消息（结果、错误、完成等）保持顺序立即发送
+                yield self._write(take_pending() + [str(item)])
+        finally:
+            _sse_totals["active"] -= 1
+            _sse_totals["producer_blocked_ms"] += self.stats["producer_blocked_ms"]
+            if not self._pump_task.done():
+                # 客户端断开：停止生成端（此处可能处于取消状态，不能等待）
+                self._pump_task.cancel()
+            logger.debug(
+                f"SSE流结束: {self.stats['chunks']}块 -> {self.stats['frames']}帧/{self.stats['writes']}次写入, "
+                f"{self.stats['bytes']}字节, 心跳{self.stats['heartbeats']}次"
+            )
+
+
+def get_sse_stats() -> Dict[str, Any]:
+    """
+    获取SSE传输统计
+    
+    Returns:
+        流数量、合并前后的块/帧数、写入字节数、慢客户端次数等
+    """
+    return {
+        **_sse_totals,
+        "producer_blocked_ms": round(_sse_totals["producer_blocked_ms"], 2),
+        "flush_interval_ms": settings.sse_flush_interval_ms,
+        "flush_max_chars": settings.sse_flush_max_chars,
+        "heartbeat_seconds": settings.sse_heartbeat_seconds,
+    }
+
+
+def create_sse_response(generator: AsyncGenerator[Union[str, SSEChunk], None]) -> StreamingResponse:
     """
-    创建SSE StreamingResponse
+    创建SSE StreamingResponse（经 SSETransport 合并内容块并施加背压）
     
     Args:
         generator: SSE消息生成器
@@ -183,7 +457,7 @@ def create_sse_response(generator: AsyncGenerator[str, None]) -> StreamingRespon
     async def wrapper():
         """包装生成器以捕获StreamingResponse初始化时的GeneratorExit"""
         try:
-            async for chunk in generator:
+            async for chunk in SSETransport(generator).frames():
                 yield chunk
         except GeneratorExit:
             # StreamingResponse在初始化时会进行类型检查，导致GeneratorExit
@@ -0,0 +1,85 @@
+"""流式文本缓冲区 - 替代逐 token 的字符串拼接
+
+流式生成时原先以 `text += chunk` 累积全文，长章节（8k~15k 字）在 token 粒度下会反复复制整段字符串，
+并在每次发送进度时重新计算长度。该缓冲区：
+- append(): 只追加到分片列表，O(1) 均摊，同时增量维护字数和分片数
+- getvalue(): 按需拼接，并把分片合并为一段，后续再次读取不重复拼接
+- checkpoint(): 取当前全文快照并记录位置，since_checkpoint() 返回此后新增的内容
+- tail(): 只拼接末尾所需的分片
+"""
+from typing import List
+
+
+class StreamTextBuffer:
+    """流式文本缓冲区"""
+
+    __slots__ = ("_parts", "_length", "_chunk_count", "_checkpoint")
+
+    def __init__(self, initial: str = ""):
+        self._parts: List[str] = [initial] if initial else []
+        self._length = len(initial)
+        self._chunk_count = 0
+        self._checkpoint = 0
+
+    def append(self, chunk: str) -> int:
+        """
+        追加内容块
+
+        Args:
+            chunk: 内容块（空块只计数不存储）
+
+        Returns:
+            追加后的总字数
+        """
+        self._chunk_count += 1
+        if chunk:
+            self._parts.append(chunk)
+            self._length += len(chunk)
+        return self._length
+
+    def getvalue(self) -> str:
+        """返回当前全文"""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def tail(self, size: int) -> str:
+        """返回末尾 size 个字符（只拼接需要的分片）"""
+        if size <= 0:
+            return ""
+        collected: List[str] = []
+        remaining = size
+        for part in reversed(self._parts):
+            collected.append(part)
+            remaining -= len(part)
+            if remaining <= 0:
+                break
+        return "".join(reversed(collected))[-size:]
+
+    def checkpoint(self) -> str:
+        """记录检查点并返回当前全文快照"""
+        self._checkpoint = self._length
+        return self.getvalue()
+
+    def since_checkpoint(self) -> str:
+        """返回上一个检查点之后新增的内容"""
+        return self.tail(self._length - self._checkpoint)
+
+    @property
+    def word_count(self) -> int:
+        """字数（与 Chapter.word_count 口径一致，即字符数）"""
+        return self._length
+
+    @property
+    def chunk_count(self) -> int:
+        """已追加的内容块数量"""
+        return self._chunk_count
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __str__(self) -> str:
+        return self.getvalue()
@@ -0,0 +1,38 @@
+"""文本切分辅助函数"""
+
+
+def find_best_split_point(content: str, target: int, search_range: int = 500) -> int:
+    """
+    在目标位置附近找最佳切分点
+
+    依次优先段落（双换行）、单换行、句末标点，均未找到时返回目标位置
+
+    Args:
+        content: 文本
+        target: 目标切分位置
+        search_range: 向前后搜索的字符数
+
+    Returns:
+        切分位置（切分点之前的内容以段落/句子结尾）
+    """
+    start = max(0, target - search_range)
+    end = min(len(content), target + search_range)
+    search_area = content[start:end]
+    
+    # 优先找双换行
+    pos = search_area.rfind('\n\n')
+    if pos != -1:
+        return start + pos + 2
+    
+    # 其次找单换行
+    pos = search_area.rfind('\n')
+    if pos != -1:
+        return start + pos + 1
+    
+    # 最后找句号
+    for punct in ['。', '！', '？', '.', '!', '?']:
+        pos = search_area.rfind(punct)
+        if pos != -1:
+            return start + pos + 1
+    
+    return target
@@ -0,0 +1,155 @@
+"""任务队列 worker 入口
+
+用法（在 backend 目录下）：
+    python -m app.worker
+
+可启动多个实例水平扩展；各实例通过任务表租约（FOR UPDATE SKIP LOCKED + 条件 UPDATE）领取任务，互不重复。
+API 进程默认也内嵌一个 worker（JOB_WORKER_EMBEDDED=true），独立部署 worker 时可关闭。
+
+部署要求：
+- 多实例只支持 PostgreSQL；SQLite 下只运行一个 worker（内嵌或独立二选一）
+- 任务会写入长期记忆：worker 与 API 进程必须使用同一 CHROMA_PERSIST_DIR 和 EMBEDDING_CACHE_DIR
+  （同一主机，或挂载同一共享卷）。ChromaDB 以本地文件持久化，不同主机各自的目录互不可见
+"""
+import asyncio
+import signal
+from typing import Any, Dict
+
+from app.config import settings as config_settings
+from app.database import close_db
+from app.logger import setup_logging, get_logger
+from app.services.job_queue import JobWorker, job_queue
+
+logger = get_logger(__name__)
+
+
+async def run_batch_generation_job(job: Dict[str, Any]):
+    """执行批量生成任务（从已完成章节之后继续）"""
+    from app.api.chapters import execute_batch_generation_in_order
+    from app.api.settings import load_user_ai_service
+    from app.database import session_scope
+    from app.services.ai_clients.llm_scheduler import set_llm_user
+
+    user_id = job["user_id"]
+    set_llm_user(user_id)
+    async with session_scope(user_id, name="job_ai_settings") as db:
+        ai_service = await load_user_ai_service(user_id, db)
+    await execute_batch_generation_in_order(
+        batch_id=job["id"],
+        user_id=user_id,
+        ai_service=ai_service,
+        custom_model=job.get("model")
+    )
+
+
+async def run_analysis_job(job: Dict[str, Any]):
+    """执行章节分析任务"""
+    from app.api.chapters import analyze_chapter_background
+    from app.api.settings import load_user_ai_service
+    from app.database import session_scope
+    from app.services.ai_clients.llm_scheduler import set_llm_user
+
+    user_id = job["user_id"]
+    set_llm_user(user_id)
+    async with session_scope(user_id, name="job_ai_settings") as db:
+        ai_service = await load_user_ai_service(user_id, db)
+    await analyze_chapter_background(
+        chapter_id=job["chapter_id"],
+        user_id=user_id,
+        project_id=job["project_id"],
+        task_id=job["id"],
+        ai_service=ai_service
+    )
+
+
+async def run_memory_reindex_job(job: Dict[str, Any]):
+    """执行记忆重建索引任务（从游标继续）"""
+    from app.services.memory_reindex_service import MemoryReindexService
+
+    await MemoryReindexService.run(
+        task_id=job["id"],
+        user_id=job["user_id"],
+        project_id=job["project_id"]
+    )
+
+
+def register_default_jobs():
+    """注册批量生成、章节分析和记忆重建索引任务"""
+    from app.models.analysis_task import AnalysisTask
+    from app.models.batch_generation_task import BatchGenerationTask
+    from app.models.memory_reindex_task import MemoryReindexTask
+
+    if "batch_generation" not in job_queue.kinds:
+        job_queue.register("batch_generation", BatchGenerationTask, run_batch_generation_job)
+    if "chapter_analysis" not in job_queue.kinds:
+        job_queue.register("chapter_analysis", AnalysisTask, run_analysis_job)
+    if "memory_reindex" not in job_queue.kinds:
+        job_queue.register("memory_reindex", MemoryReindexTask, run_memory_reindex_job)
+
+
+def create_worker() -> JobWorker:
+    """创建已注册默认任务类型的 worker"""
+    register_default_jobs()
+    return JobWorker(job_queue)
+
+
+def _check_deployment():
+    """检查独立 worker 的部署条件"""
+    from pathlib import Path
+
+    if config_settings.database_url.startswith("sqlite"):
+        if config_settings.job_worker_embedded:
+            raise SystemExit("SQLite 下只能运行一个 worker：请设置 JOB_WORKER_EMBEDDED=false 后再启动独立 worker，或改用 PostgreSQL")
+        logger.warning("⚠️ SQLite 不支持多 worker 并发写入，请勿启动多个 worker 实例")
+
+    shared_dirs = [("CHROMA_PERSIST_DIR", config_settings.chroma_persist_dir)]
+    if config_settings.embedding_cache_enabled:
+        shared_dirs.append(("EMBEDDING_CACHE_DIR", config_settings.embedding_cache_dir))
+    for name, path in shared_dirs:
+        resolved = Path(path).resolve()
+        if not resolved.is_dir():
+            raise SystemExit(f"{name} 不存在: {resolved}（worker 必须与 API 进程共享该目录）")
+        logger.info(f"📂 {name}: {resolved}（须与 API 进程相同）")
+
+
+async def _main():
+    worker = create_worker()
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    run_task = asyncio.create_task(worker.run())
+    await stop_event.wait()
+    logger.info("收到停止信号，正在交还执行中的任务...")
+    await worker.stop()
+    run_task.cancel()
+    await asyncio.gather(run_task, return_exceptions=True)
+
+    from app.services.embedding_cache import flush_embedding_caches
+    from app.services.task_progress_writer import progress_writer
+    try:
+        await progress_writer.flush()
+    except Exception as e:
+        logger.warning(f"写入任务进度失败: {e}")
+    flush_embedding_caches()
+    await close_db()
+
+
+def main():
+    setup_logging(
+        level=config_settings.log_level,
+        log_to_file=config_settings.log_to_file,
+        log_file_path=config_settings.log_file_path,
+        max_bytes=config_settings.log_max_bytes,
+        backup_count=config_settings.log_backup_count
+    )
+    _check_deployment()
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
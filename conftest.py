@@ -0,0 +1,64 @@
+"""pytest 配置：后端单元测试使用临时 SQLite 数据库
+
+test_all_apis.py / test_stream_apis.py 是针对运行中服务的脚本（python test_all_apis.py），不由 pytest 收集。
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+collect_ignore = ["test_all_apis.py", "test_stream_apis.py"]
+
+_TMP_DIR = tempfile.mkdtemp(prefix="mumu_tests_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_TMP_DIR, 'test.db')}")
+os.environ.setdefault("LOG_TO_FILE", "false")
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+# app.database 需先于模型与服务模块导入（模型包与数据库模块相互引用）
+from app.database import close_db  # noqa: E402
+
+
+def run_async(coro):
+    """在新事件循环中执行协程，结束后释放数据库引擎（引擎绑定在创建它的事件循环上）"""
+    async def _run():
+        try:
+            return await coro
+        finally:
+            await close_db()
+
+    return asyncio.run(_run())
+
+
+@pytest.fixture
+def create_tables():
+    """创建指定的表（完整 create_all 在 SQLite 上不可用），测试结束后删除"""
+    from app.database import Base, get_session_factory
+    created = []
+
+    def _create(*models):
+        tables = [model.__table__ for model in models]
+
+        async def _do():
+            factory = await get_session_factory("_tests_")
+            async with factory() as session:
+                conn = await session.connection()
+                await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=tables))
+                await session.commit()
+
+        run_async(_do())
+        created.extend(tables)
+
+    yield _create
+
+    async def _drop():
+        factory = await get_session_factory("_tests_")
+        async with factory() as session:
+            conn = await session.connection()
+            await conn.run_sync(lambda sync_conn: Base.metadata.drop_all(sync_conn, tables=created))
+            await session.commit()
+
+    if created:
+        run_async(_drop())
@@ -724,10 +724,10 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
             return [TextContent(type="text", text=f"❌ 提交失败: {result}")]
         
         elif name == "novel_check_progress":
-            chapters = await client.request("get", f"/api/chapters/project/{arguments['project_id']}?limit=200")
+            chapters = await client.request("get", f"/api/chapters/project/{arguments['project_id']}?fields=content_length")
             items = chapters.get("items", [])
             total = chapters.get("total", 0)
-            generated = len([c for c in items if c.get("content") and len(c["content"]) > 100])
+            generated = len([c for c in items if c.get("content_length", 0) > 100])
             
             active = await client.request("get", f"/api/chapters/project/{arguments['project_id']}/batch-generate/active")
             status = "🟢 生成中" if active.get("has_active_task") else "⏸️ 空闲"
@@ -739,12 +739,12 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
             resumed = 0
             for proj in projects.get("items", []):
                 pid = proj["id"]
-                chapters = await client.request("get", f"/api/chapters/project/{pid}?limit=200")
+                chapters = await client.request("get", f"/api/chapters/project/{pid}?fields=content_length")
                 items = chapters.get("items", [])
                 total = chapters.get("total", 0)
                 if total == 0:
                     continue
-                generated = len([c for c in items if c.get("content") and len(c["content"]) > 100])
+                generated = len([c for c in items if c.get("content_length", 0) > 100])
                 if generated >= total:
                     continue
                 
@@ -753,7 +753,7 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
                     continue
                 
                 # 需要恢复
-                last = max([c["chapter_number"] for c in items if c.get("content") and len(c["content"]) > 100], default=0)
+                last = max([c["chapter_number"] for c in items if c.get("content_length", 0) > 100], default=0)
                 result = await client.request("post", f"/api/chapters/project/{pid}/batch-generate",
                     json={"start_chapter_number": last + 1, "count": total - last, "target_word_count": 10000})
                 if "batch_id" in result:
@@ -793,9 +793,9 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
             return [TextContent(type="text", text=f"✅ 大纲删除成功")]
         
         elif name == "novel_list_chapters":
-            result = await client.request("get", f"/api/chapters/project/{arguments['project_id']}?limit=200")
+            result = await client.request("get", f"/api/chapters/project/{arguments['project_id']}?fields=content_length")
             items = result.get("items", [])
-            generated = len([c for c in items if c.get("content") and len(c["content"]) > 100])
+            generated = len([c for c in items if c.get("content_length", 0) > 100])
             return [TextContent(type="text", text=f"共 {result.get('total', 0)} 章，已生成 {generated} 章")]
         
         elif name == "novel_update_chapter":
@@ -0,0 +1,132 @@
+"""章节序号重排测试：窗口函数重排（UPDATE ... FROM 与关联子查询两种写法）、序号平移"""
+import pytest
+
+from conftest import run_async
+
+
+@pytest.fixture(params=["update_from", "correlated"])
+def numbering(request, create_tables, monkeypatch):
+    from app.models.chapter import Chapter
+    from app.models.outline import Outline
+    from app.models.project import Project
+    from app.services import chapter_numbering
+
+    create_tables(Project, Outline, Chapter)
+    if request.param == "correlated":
+        monkeypatch.setattr(chapter_numbering, "_supports_update_from", lambda db: False)
+    return chapter_numbering
+
+
+async def _seed():
+    """两个大纲（序号2的大纲先创建），章节序号被打乱，另有一章未关联大纲"""
+    from app.database import session_scope
+    from app.models.chapter import Chapter
+    from app.models.outline import Outline
+    from app.models.project import Project
+
+    async with session_scope("_tests_") as db:
+        db.add(Project(id="p1", title="测试", user_id="u1"))
+        db.add(Outline(id="o2", project_id="p1", title="第二卷", order_index=2))
+        db.add(Outline(id="o1", project_id="p1", title="第一卷", order_index=1))
+        chapters = [
+            ("c1", "o1", 1, 5), ("c2", "o1", 2, 1), ("c3", "o2", 1, 3),
+            ("c4", "o2", 2, 2), ("c5", "o2", 3, 9), ("loose", None, 1, 100),
+        ]
+        for chapter_id, outline_id, sub_index, number in chapters:
+            db.add(Chapter(
+                id=chapter_id, project_id="p1", outline_id=outline_id,
+                sub_index=sub_index, chapter_number=number, title=chapter_id
+            ))
+
+
+async def _numbers():
+    from sqlalchemy import select
+
+    from app.database import session_scope
+    from app.models.chapter import Chapter
+
+    async with session_scope("_tests_", read_only=True) as db:
+        rows = (await db.execute(select(Chapter.id, Chapter.chapter_number, Chapter.version))).all()
+    return {row.id: (row.chapter_number, row.version) for row in rows}
+
+
+def test_renumber_all(numbering):
+    async def scenario():
+        from app.database import session_scope
+
+        await _seed()
+        async with session_scope("_tests_") as db:
+            assert await numbering.renumber_outline_chapters(db, "p1") == 4
+        return await _numbers()
+
+    numbers = run_async(scenario())
+    assert {k: v[0] for k, v in numbers.items()} == {"c1": 1, "c2": 2, "c3": 3, "c4": 4, "c5": 5, "loose": 100}
+    # 只有序号变化的章节递增版本号
+    assert {k: v[1] for k, v in numbers.items()} == {"c1": 2, "c2": 2, "c3": 1, "c4": 2, "c5": 2, "loose": 1}
+
+
+def test_renumber_from_order_index(numbering):
+    async def scenario():
+        from app.database import session_scope
+
+        await _seed()
+        async with session_scope("_tests_") as db:
+            assert await numbering.renumber_outline_chapters(db, "p1", from_order_index=2) == 2
+        return await _numbers()
+
+    numbers = run_async(scenario())
+    assert {k: v[0] for k, v in numbers.items()} == {"c1": 5, "c2": 1, "c3": 3, "c4": 4, "c5": 5, "loose": 100}
+
+
+def test_renumber_is_idempotent(numbering):
+    async def scenario():
+        from app.database import session_scope
+
+        await _seed()
+        async with session_scope("_tests_") as db:
+            await numbering.renumber_outline_chapters(db, "p1")
+        async with session_scope("_tests_") as db:
+            return await numbering.renumber_outline_chapters(db, "p1")
+
+    assert run_async(scenario()) == 0
+
+
+def test_renumber_syncs_loaded_chapters(numbering):
+    async def scenario():
+        from app.database import session_scope
+        from app.models.chapter import Chapter
+
+        await _seed()
+        async with session_scope("_tests_") as db:
+            chapter = await db.get(Chapter, "c1")
+            await numbering.renumber_outline_chapters(db, "p1")
+            assert chapter.chapter_number == 1
+            assert chapter.version == 2
+            # 版本号已同步，后续通过ORM修改不会触发乐观锁冲突
+            chapter.title = "改名"
+        return await _numbers()
+
+    assert run_async(scenario())["c1"] == (1, 3)
+
+
+def test_shift_chapter_numbers_and_outline_order(numbering):
+    async def scenario():
+        from sqlalchemy import select
+
+        from app.database import session_scope
+        from app.models.outline import Outline
+
+        await _seed()
+        async with session_scope("_tests_") as db:
+            assert await numbering.shift_chapter_numbers(db, "p1", after_number=3, delta=-1) == 3
+            outline = await db.get(Outline, "o2")
+            assert await numbering.shift_outline_order(db, "p1", after_index=1, delta=1) == 1
+            assert outline.order_index == 3
+        async with session_scope("_tests_", read_only=True) as db:
+            orders = dict((await db.execute(select(Outline.id, Outline.order_index))).all())
+        return await _numbers(), orders
+
+    numbers, orders = run_async(scenario())
+    assert {k: v[0] for k, v in numbers.items()} == {"c1": 4, "c2": 1, "c3": 3, "c4": 2, "c5": 8, "loose": 99}
+    assert numbers["c1"][1] == 2 and numbers["c2"][1] == 1
+    assert orders == {"o1": 1, "o2": 3}
@@ -0,0 +1,110 @@
+"""Embedding持久化缓存测试：LRU淘汰、重新打开、跨实例（模拟多进程）槽位校验"""
+import pytest
+
+
+def _vec(x):
+    return [float(x), float(x) + 0.5, float(x) + 1.0]
+
+
+@pytest.fixture
+def open_cache(tmp_path):
+    from app.services.embedding_cache import EmbeddingCache
+
+    def _open(capacity=3, dim=3, model_name="test/model"):
+        return EmbeddingCache(str(tmp_path), model_name=model_name, dim=dim, capacity=capacity)
+
+    return _open
+
+
+def test_put_get_roundtrip(open_cache):
+    cache = open_cache()
+    cache.put_many(["甲", "乙"], [_vec(1), _vec(2)])
+
+    assert cache.get_many(["乙", "丙", "甲"]) == [_vec(2), None, _vec(1)]
+    stats = cache.get_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["writes"] == 2
+    assert stats["entries"] == 2
+
+
+def test_wrong_dimension_is_ignored(open_cache):
+    cache = open_cache()
+    cache.put_many(["甲"], [[1.0, 2.0]])
+
+    assert cache.get_many(["甲"]) == [None]
+    assert cache.get_stats()["writes"] == 0
+
+
+def test_evicts_least_recently_used(open_cache):
+    cache = open_cache(capacity=2)
+    cache.put_many(["a", "b"], [_vec(1), _vec(2)])
+    cache.get_many(["a"])
+    cache.put_many(["c"], [_vec(3)])
+
+    assert cache.get_many(["a", "b", "c"]) == [_vec(1), None, _vec(3)]
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["entries"] == 2
+
+
+def test_reopen_restores_entries_and_lru_order(open_cache):
+    cache = open_cache(capacity=2)
+    cache.put_many(["a", "b"], [_vec(1), _vec(2)])
+    cache.get_many(["a"])
+    cache.flush()
+
+    reopened = open_cache(capacity=2)
+    assert reopened.get_stats()["entries"] == 2
+    # 重启前 b 最久未访问，应先被淘汰
+    reopened.put_many(["c"], [_vec(3)])
+    assert reopened.get_many(["a", "b", "c"]) == [_vec(1), None, _vec(3)]
+
+
+def test_lru_order_is_shared_across_instances(open_cache):
+    first = open_cache(capacity=2)
+    second = open_cache(capacity=2)
+    first.put_many(["a"], [_vec(1)])
+    for _ in range(5):
+        first.get_many(["a"])
+    # 另一实例较晚访问的 b 即使访问次数少也应排在 a 之后
+    second.put_many(["b"], [_vec(2)])
+    first.flush()
+    second.flush()
+
+    reopened = open_cache(capacity=2)
+    reopened.put_many(["c"], [_vec(3)])
+    assert reopened.get_many(["a", "b", "c"]) == [None, _vec(2), _vec(3)]
+
+
+def test_reopen_with_different_layout_rebuilds(open_cache):
+    cache = open_cache(dim=3)
+    cache.put_many(["a"], [_vec(1)])
+    cache.flush()
+
+    rebuilt = open_cache(dim=2)
+    assert rebuilt.get_stats()["entries"] == 0
+    assert rebuilt.get_many(["a"]) == [None]
+
+
+def test_slot_reused_by_another_instance_is_a_miss(open_cache):
+    first = open_cache(capacity=1)
+    second = open_cache(capacity=1)
+
+    first.put_many(["a"], [_vec(1)])
+    # 另一个"进程"发现槽位已被占用，并入索引后淘汰 a 并写入 b
+    second.put_many(["b"], [_vec(2)])
+
+    assert first.get_many(["a"]) == [None]
+    assert first.get_stats()["stale"] == 1
+    # 槽位中的实际键重新登记到本实例的索引
+    assert first.get_many(["b"]) == [_vec(2)]
+
+
+def test_flush_embedding_caches(open_cache):
+    from app.services.embedding_cache import flush_embedding_caches
+
+    cache = open_cache()
+    cache.put_many(["a"], [_vec(1)])
+    flush_embedding_caches()
+
+    assert open_cache().get_many(["a"]) == [_vec(1)]
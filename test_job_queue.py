@@ -0,0 +1,179 @@
+"""任务队列租约测试：领取、心跳、失败重新排队、超过领取次数"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import run_async
+
+
+@pytest.fixture
+def queue(create_tables, monkeypatch):
+    from app.config import settings
+    from app.models.analysis_task import AnalysisTask
+    from app.services.job_queue import JobQueue
+
+    create_tables(AnalysisTask)
+    monkeypatch.setattr(settings, "job_max_attempts", 2)
+    monkeypatch.setattr(settings, "job_lease_seconds", 60)
+    job_queue = JobQueue()
+    job_queue.register("chapter_analysis", AnalysisTask, handler=None)
+    return job_queue
+
+
+def _kind(queue):
+    return queue.kinds["chapter_analysis"]
+
+
+async def _add_task(**values):
+    from app.database import session_scope
+    from app.models.analysis_task import AnalysisTask
+
+    async with session_scope("_tests_") as db:
+        task = AnalysisTask(chapter_id="c1", user_id="u1", project_id="p1", **values)
+        db.add(task)
+    return task.id
+
+
+async def _get_task(task_id):
+    from app.database import session_scope
+    from app.models.analysis_task import AnalysisTask
+
+    async with session_scope("_tests_", read_only=True) as db:
+        return await db.get(AnalysisTask, task_id)
+
+
+def test_claim_sets_lease_and_is_exclusive(queue):
+    async def scenario():
+        task_id = await _add_task(status="pending")
+        claims = await asyncio.gather(*(queue.claim(_kind(queue), f"w{i}") for i in range(4)))
+        claimed = [c for c in claims if c is not None]
+        assert len(claimed) == 1
+        assert claimed[0]["id"] == task_id
+        assert claimed[0]["status"] == "running"
+        assert claimed[0]["attempts"] == 1
+
+        task = await _get_task(task_id)
+        assert task.lease_owner == claimed[0]["lease_owner"]
+        assert task.lease_expires_at > datetime.now()
+        assert await queue.claim(_kind(queue), "w9") is None
+
+    run_async(scenario())
+
+
+def test_heartbeat_only_for_lease_owner(queue):
+    async def scenario():
+        await _add_task(status="pending")
+        job = await queue.claim(_kind(queue), "w1")
+        assert await queue.heartbeat(_kind(queue), job["id"], "w1")
+        assert not await queue.heartbeat(_kind(queue), job["id"], "w2")
+
+    run_async(scenario())
+
+
+def test_expired_lease_is_taken_over(queue):
+    async def scenario():
+        task_id = await _add_task(
+            status="running", lease_owner="dead", attempts=1,
+            lease_expires_at=datetime.now() - timedelta(seconds=1)
+        )
+        job = await queue.claim(_kind(queue), "w1")
+        assert job["id"] == task_id
+        assert job["attempts"] == 2
+        assert not await queue.heartbeat(_kind(queue), task_id, "dead")
+
+    run_async(scenario())
+
+
+def test_failed_handler_requeues_then_fails_after_max_attempts(queue):
+    async def scenario():
+        task_id = await _add_task(status="pending")
+        for attempt in (1, 2):
+            job = await queue.claim(_kind(queue), "w1")
+            assert job is not None and job["attempts"] == attempt
+            await queue.release(_kind(queue), task_id, "w1", error=f"boom {attempt}")
+            task = await _get_task(task_id)
+            assert task.status == "running"
+            assert task.error_message == f"boom {attempt}"
+            await asyncio.sleep(0.01)
+
+        # 超过 job_max_attempts：不再领取，标记为失败并保留最后的错误
+        assert await queue.claim(_kind(queue), "w1") is None
+        task = await _get_task(task_id)
+        assert task.status == "failed"
+        assert "boom 2" in task.error_message
+        assert task.lease_owner is None
+
+    run_async(scenario())
+
+
+def test_release_after_handler_marked_failed_only_clears_lease(queue):
+    async def scenario():
+        from app.database import session_scope
+        from app.models.analysis_task import AnalysisTask
+
+        task_id = await _add_task(status="pending")
+        await queue.claim(_kind(queue), "w1")
+        async with session_scope("_tests_") as db:
+            task = await db.get(AnalysisTask, task_id)
+            task.status = "failed"
+            task.error_message = "分析失败"
+        await queue.release(_kind(queue), task_id, "w1", error="boom")
+
+        task = await _get_task(task_id)
+        assert task.status == "failed"
+        assert task.error_message == "分析失败"
+        assert task.lease_owner is None and task.lease_expires_at is None
+
+    run_async(scenario())
+
+
+def test_stop_requeue_does_not_count_attempt(queue):
+    async def scenario():
+        task_id = await _add_task(status="pending")
+        await queue.claim(_kind(queue), "w1")
+        await queue.release(_kind(queue), task_id, "w1", requeue=True)
+        await asyncio.sleep(0.01)
+        job = await queue.claim(_kind(queue), "w2")
+        assert job["id"] == task_id
+        assert job["attempts"] == 1
+
+    run_async(scenario())
+
+
+def test_inline_task_lease_is_cleared_on_success(queue):
+    async def scenario():
+        task_id = await _add_task(**queue.inline_lease())
+        assert await queue.claim(_kind(queue), "w1") is None
+
+        async def work():
+            return "ok"
+
+        from app.models.analysis_task import AnalysisTask
+        assert await queue.run_inline(AnalysisTask, task_id, work()) == "ok"
+        task = await _get_task(task_id)
+        assert task.lease_owner is None and task.lease_expires_at is None
+
+    run_async(scenario())
+
+
+def test_interrupted_inline_task_is_claimable(queue):
+    async def scenario():
+        from app.models.analysis_task import AnalysisTask
+
+        task_id = await _add_task(**queue.inline_lease())
+
+        async def work():
+            await asyncio.sleep(10)
+
+        runner = asyncio.create_task(queue.run_inline(AnalysisTask, task_id, work()))
+        await asyncio.sleep(0.01)
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+        job = await queue.claim(_kind(queue), "w1")
+        assert job["id"] == task_id
+        assert job["attempts"] == 2
+
+    run_async(scenario())
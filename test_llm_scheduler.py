@@ -0,0 +1,73 @@
+"""LLM调度器测试：流式与非流式名额分别计数，批量请求不能占用为交互式请求预留的名额"""
+import asyncio
+
+from app.services.ai_clients.llm_scheduler import LLMPriority, LLMScheduler, with_llm_priority
+from app.services.ai_config import RateLimitConfig
+
+
+def _config(**overrides):
+    values = dict(
+        max_concurrent_requests=2, max_concurrent_streams=2, interactive_reserved_slots=1,
+        requests_per_second=1000.0, request_burst=1000,
+    )
+    values.update(overrides)
+    return RateLimitConfig(**values)
+
+
+async def _hold(scheduler, config, started, release, stream):
+    async with scheduler.slot("p", 0, config, stream=stream):
+        started.append(asyncio.current_task().get_name())
+        await release.wait()
+
+
+def test_batch_streams_leave_reserved_slot_for_interactive():
+    async def scenario():
+        scheduler = LLMScheduler()
+        config = _config()
+        release = asyncio.Event()
+        started = []
+
+        @with_llm_priority(LLMPriority.BATCH)
+        async def batch_stream():
+            await _hold(scheduler, config, started, release, stream=True)
+
+        tasks = [asyncio.create_task(batch_stream(), name=f"batch{i}") for i in range(3)]
+        await asyncio.sleep(0.01)
+        # 流式上限2、预留1：批量流只能准入1个
+        assert started == ["batch0"]
+
+        tasks.append(asyncio.create_task(_hold(scheduler, config, started, release, True), name="interactive"))
+        await asyncio.sleep(0.01)
+        assert started == ["batch0", "interactive"]
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert sorted(started) == ["batch0", "batch1", "batch2", "interactive"]
+        stats = scheduler.get_stats()["p"]
+        assert stats["streams_in_flight"] == 0 and stats["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_streams_do_not_block_requests():
+    async def scenario():
+        scheduler = LLMScheduler()
+        config = _config(interactive_reserved_slots=0)
+        release = asyncio.Event()
+        started = []
+
+        tasks = [
+            asyncio.create_task(_hold(scheduler, config, started, release, True), name=f"stream{i}")
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(_hold(scheduler, config, started, release, False), name="request"))
+        await asyncio.sleep(0.01)
+        # 流式名额已满（第三个流排队），非流式请求不受影响
+        assert started == ["stream0", "stream1", "request"]
+        assert scheduler.get_stats()["p"]["queued"]["interactive"] == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
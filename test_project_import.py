@@ -0,0 +1,261 @@
+"""流式导入测试：增量JSON读取、流式校验、分批导入、依赖分段乱序与续传"""
+import asyncio
+import io
+import json
+
+import pytest
+
+from conftest import run_async
+
+
+def _reader(data: bytes, read_size: int = 7, fail_after: int = None):
+    """内存数据的增量读取器（fail_after 字节后读取失败，模拟上传中断）"""
+    from app.utils.json_stream import JSONStreamReader
+
+    buffer = io.BytesIO(data)
+
+    async def read(size: int) -> bytes:
+        if fail_after is not None and buffer.tell() >= fail_after:
+            raise IOError("连接中断")
+        return buffer.read(size)
+
+    return JSONStreamReader(read, read_size)
+
+
+async def _collect(reader):
+    out = {}
+    async for kind, key, value in reader.events():
+        if kind == "value":
+            out[key] = value
+        elif kind == "item":
+            out.setdefault(key, []).append(value)
+        else:
+            out.setdefault(key, [])
+            assert value == len(out[key])
+    return out
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 64, 1 << 16])
+def test_reader_matches_json_loads(read_size):
+    document = {
+        "version": "1.0.0",
+        "project": {"title": "书名", "target_words": 100000, "ratio": 0.25, "flag": True, "none": None},
+        "chapters": [{"title": f"第{i}章", "content": "正文“引号”\"转义\\\n" * i} for i in range(5)],
+        "empty": [],
+        "numbers": [1, -2.5e3, 12345678901234567890],
+    }
+    data = ("﻿" + json.dumps(document, ensure_ascii=False, indent=1)).encode("utf-8")
+
+    assert asyncio.run(_collect(_reader(data, read_size))) == document
+
+
+@pytest.mark.parametrize("data", [
+    b'{"a": 1} {"b": 2}',
+    b'{"a": [1, 2}',
+    b'{"a": }',
+    b'[1, 2]',
+    b'{"a": 1',
+])
+def test_reader_rejects_invalid_json(data):
+    with pytest.raises(ValueError, match="无效的JSON格式"):
+        asyncio.run(_collect(_reader(data)))
+
+
+def _document(**overrides):
+    """导出格式的项目数据：依赖分段（关系、组织、成员）位于角色之前"""
+    document = {
+        "version": "1.0.0",
+        "project": {"title": "导入测试", "outline_mode": "one-to-many"},
+        "relationships": [
+            {"source_name": f"人{i}", "target_name": f"人{i + 1}", "relationship_name": "朋友"} for i in range(4)
+        ] + [{"source_name": "人0", "target_name": "不存在", "relationship_name": "无法关联"}],
+        "organization_members": [
+            {"organization_name": "门派", "character_name": f"人{i}", "position": "弟子"} for i in range(3)
+        ],
+        "organizations": [
+            {"character_name": "门派", "power_level": 80},
+            {"character_name": "分舵", "parent_org_name": "门派"},
+        ],
+        "characters": [{"name": f"人{i}", "role_type": "supporting"} for i in range(5)] + [
+            {"name": "门派", "is_organization": True},
+            {"name": "分舵", "is_organization": True},
+        ],
+        "outlines": [{"title": f"卷{i}", "order_index": i + 1} for i in range(3)],
+        "chapters": [
+            {"title": f"第{i}章", "chapter_number": i, "content": "正文" * i, "outline_title": f"卷{i % 3}"}
+            for i in range(1, 8)
+        ],
+    }
+    document.update(overrides)
+    return json.dumps(document, ensure_ascii=False).encode("utf-8")
+
+
+EXPECTED_COUNTS = {
+    "chapters": 7, "characters": 7, "outlines": 3, "relationships": 4,
+    "organizations": 2, "organization_members": 3, "linked_chapters": 7, "org_parents": 1,
+}
+
+
+@pytest.fixture
+def import_tables(create_tables):
+    from app.models.chapter import Chapter
+    from app.models.character import Character
+    from app.models.outline import Outline
+    from app.models.project import Project
+    from app.models.relationship import CharacterRelationship, Organization, OrganizationMember
+    from app.models.writing_style import WritingStyle
+
+    create_tables(Project, Outline, Chapter, Character, CharacterRelationship, Organization, OrganizationMember, WritingStyle)
+
+
+async def _counts(project_id):
+    from sqlalchemy import func, select
+
+    from app.database import session_scope
+    from app.models.chapter import Chapter
+    from app.models.character import Character
+    from app.models.outline import Outline
+    from app.models.relationship import CharacterRelationship, Organization, OrganizationMember
+
+    async def count(query):
+        return (await db.execute(query)).scalar()
+
+    async with session_scope("_tests_", read_only=True) as db:
+        return {
+            "chapters": await count(select(func.count(Chapter.id)).where(Chapter.project_id == project_id)),
+            "characters": await count(select(func.count(Character.id)).where(Character.project_id == project_id)),
+            "outlines": await count(select(func.count(Outline.id)).where(Outline.project_id == project_id)),
+            "relationships": await count(
+                select(func.count(CharacterRelationship.id)).where(CharacterRelationship.project_id == project_id)
+            ),
+            "organizations": await count(select(func.count(Organization.id)).where(Organization.project_id == project_id)),
+            "organization_members": await count(
+                select(func.count(OrganizationMember.id))
+                .join(Organization, OrganizationMember.organization_id == Organization.id)
+                .where(Organization.project_id == project_id)
+            ),
+            "linked_chapters": await count(
+                select(func.count(Chapter.id)).where(Chapter.project_id == project_id, Chapter.outline_id.isnot(None))
+            ),
+            "org_parents": await count(
+                select(func.count(Organization.id))
+                .where(Organization.project_id == project_id, Organization.parent_org_id.isnot(None))
+            ),
+        }
+
+
+async def _wizard_status(project_id):
+    from app.database import session_scope
+    from app.models.project import Project
+
+    async with session_scope("_tests_", read_only=True) as db:
+        return (await db.get(Project, project_id)).wizard_status
+
+
+async def _run_import(data, resume_project_id=None, fail_after=None):
+    from app.services.project_import_service import ProjectImportService
+
+    importer = ProjectImportService("_tests_", batch_size=2)
+    events = [
+        event async for event in importer.run(_reader(data, 64, fail_after), len(data), resume_project_id)
+    ]
+    return events[-1]["result"], events[:-1]
+
+
+def test_validate_reports_invalid_items():
+    from app.services.project_import_service import ProjectImportService
+
+    data = _document(chapters=[{"title": "缺少章节号"}, {"title": "第1章", "chapter_number": 1}], version="0.9")
+    result = asyncio.run(ProjectImportService.validate(_reader(data)))
+
+    assert not result.valid
+    assert result.project_name == "导入测试"
+    assert result.statistics["chapters"] == 2
+    assert any("chapters 第1项无效" in error for error in result.errors)
+    assert any("版本不匹配" in warning for warning in result.warnings)
+
+
+def test_validate_requires_project_and_version():
+    from app.services.project_import_service import ProjectImportService
+
+    result = asyncio.run(ProjectImportService.validate(_reader(b'{"chapters": []}')))
+    assert not result.valid
+    assert "缺少版本信息" in result.errors
+    assert "缺少项目信息" in result.errors
+
+
+def test_import_in_batches_with_out_of_order_sections(import_tables):
+    async def scenario():
+        result, progress = await _run_import(_document())
+        assert result.success, result.message
+        assert all(0 <= event["progress"] <= 99 for event in progress)
+        return result, await _counts(result.project_id), await _wizard_status(result.project_id)
+
+    result, counts, status = run_async(scenario())
+    assert counts == EXPECTED_COUNTS
+    assert status == "completed"
+    assert result.statistics["relationships"] == 4
+
+
+def test_import_baseline_export_with_missing_and_null_fields(import_tables):
+    """旧版 export_project 的导出：缺少后来新增的可选字段与分段，手工编辑后部分字段为 null"""
+    data = json.dumps({
+        "version": "1.0.0",
+        "export_time": "2024-01-01T00:00:00",
+        "project": {"title": "旧版导出", "description": None},
+        "chapters": [
+            {"title": "第1章", "chapter_number": 1, "content": "正文", "word_count": None, "status": None},
+            {"title": "第2章", "chapter_number": 2},
+        ],
+        "characters": [{"name": "甲", "age": None, "traits": None}, {"name": "乙"}],
+        "relationships": [{"source_name": "甲", "target_name": "乙", "intimacy_level": None}],
+        "writing_styles": [],
+        "generation_history": [{"chapter_title": "第1章", "prompt": None}],
+    }, ensure_ascii=False).encode("utf-8")
+
+    async def scenario():
+        from app.services.project_import_service import ProjectImportService
+
+        validation = await ProjectImportService.validate(_reader(data))
+        assert validation.valid, validation.errors
+        result, _ = await _run_import(data)
+        assert result.success, result.message
+        return await _counts(result.project_id)
+
+    counts = run_async(scenario())
+    assert counts["chapters"] == 2
+    assert counts["characters"] == 2
+    assert counts["relationships"] == 1
+    assert counts["outlines"] == 0
+
+
+def test_resume_after_interrupted_import(import_tables):
+    data = _document()
+
+    async def scenario():
+        failed, _ = await _run_import(data, fail_after=len(data) // 2)
+        assert not failed.success
+        assert failed.project_id
+        assert await _wizard_status(failed.project_id) == "importing"
+        partial = await _counts(failed.project_id)
+
+        resumed, _ = await _run_import(data, resume_project_id=failed.project_id)
+        assert resumed.success, resumed.message
+        assert resumed.project_id == failed.project_id
+        return partial, await _counts(failed.project_id), await _wizard_status(failed.project_id)
+
+    partial, counts, status = run_async(scenario())
+    assert sum(partial.values()) < sum(EXPECTED_COUNTS.values())
+    assert counts == EXPECTED_COUNTS
+    assert status == "completed"
+
+
+def test_resume_requires_importing_project(import_tables):
+    async def scenario():
+        done, _ = await _run_import(_document())
+        again, _ = await _run_import(_document(), resume_project_id=done.project_id)
+        return again
+
+    result = run_async(scenario())
+    assert not result.success
+    assert "不处于导入中状态" in result.message
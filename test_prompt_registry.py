@@ -0,0 +1,181 @@
+"""提示词模板注册表测试：预编译模板与 str.format 结果一致、自定义模板缓存与失效"""
+import pytest
+
+from conftest import run_async
+
+FORMAT_CASES = [
+    ("纯文本，没有参数", {}),
+    ("", {}),
+    ("你好，{name}！", {"name": "世界"}),
+    ("{a}{b}{a}", {"a": "甲", "b": "乙"}),
+    ("转义 {{不是参数}} 与 {name}", {"name": "值"}),
+    ("{{{name}}}", {"name": "值"}),
+    ("{value!r:>8}|", {"value": "x"}),
+    ("{value:.2f} / {count:04d}", {"value": 3.14159, "count": 7}),
+    ("{value!s} {value!a}", {"value": "中文"}),
+    ("{value:{width}}", {"value": "x", "width": 5}),
+    ("{item.real}", {"item": 3}),
+    ("{items[0]}", {"items": ["首项"]}),
+    ("{number}", {"number": 42}),
+]
+
+ERROR_CASES = [
+    ("{missing}", {}),
+    ("{0}", {}),
+    ("未闭合 {name", {"name": "x"}),
+    ("单独的 } 括号", {}),
+    ("{value!z}", {"value": "x"}),
+]
+
+
+@pytest.mark.parametrize("template,params", FORMAT_CASES)
+def test_compiled_template_matches_str_format(template, params):
+    from app.services.prompt_registry import CompiledTemplate
+
+    assert CompiledTemplate(template).render(**params) == template.format(**params)
+
+
+@pytest.mark.parametrize("template,params", ERROR_CASES)
+def test_compiled_template_raises_like_str_format(template, params):
+    from app.services.prompt_registry import CompiledTemplate
+
+    with pytest.raises(Exception) as expected:
+        template.format(**params)
+    with pytest.raises(type(expected.value)):
+        CompiledTemplate(template).render(**params)
+
+
+def test_compiled_template_fields():
+    from app.services.prompt_registry import CompiledTemplate, compile_template
+
+    assert CompiledTemplate("{a} {{b}} {c:>3}").fields == frozenset({"a", "c"})
+    assert compile_template("{a}") is compile_template("{a}")
+
+
+def test_format_prompt_reports_missing_parameter():
+    from app.services.prompt_service import PromptService
+
+    with pytest.raises(ValueError, match="缺少必需的参数"):
+        PromptService.format_prompt("{name}")
+
+
+@pytest.fixture
+def registry(create_tables, monkeypatch):
+    from app.config import settings
+    from app.models.prompt_template import PromptTemplate
+    from app.services.prompt_registry import PromptTemplateRegistry
+
+    create_tables(PromptTemplate)
+    monkeypatch.setattr(settings, "prompt_template_cache_ttl_seconds", 300)
+    return PromptTemplateRegistry()
+
+
+async def _set_template(user_id, template_key, content, is_active=True):
+    from sqlalchemy import select
+
+    from app.database import session_scope
+    from app.models.prompt_template import PromptTemplate
+
+    async with session_scope("_tests_") as db:
+        row = (await db.execute(
+            select(PromptTemplate).where(PromptTemplate.user_id == user_id, PromptTemplate.template_key == template_key)
+        )).scalar_one_or_none()
+        if row is None:
+            db.add(PromptTemplate(
+                user_id=user_id, template_key=template_key, template_name=template_key,
+                template_content=content, is_active=is_active
+            ))
+        else:
+            row.template_content = content
+            row.is_active = is_active
+
+
+async def _overrides(registry, user_id):
+    from app.database import session_scope
+
+    async with session_scope("_tests_", read_only=True) as db:
+        return await registry.get_overrides(db, user_id)
+
+
+def test_registry_caches_until_invalidated(registry):
+    async def scenario():
+        await _set_template("u1", "K", "旧模板")
+        first = await _overrides(registry, "u1")
+        assert first["K"].content == "旧模板"
+
+        await _set_template("u1", "K", "新模板")
+        assert (await _overrides(registry, "u1"))["K"].content == "旧模板"
+        assert registry.get_stats()["hits"] == 1
+
+        registry.invalidate("u1")
+        assert (await _overrides(registry, "u1"))["K"].content == "新模板"
+
+    run_async(scenario())
+
+
+def test_registry_invalidation_is_per_user(registry):
+    async def scenario():
+        await _set_template("u1", "K", "用户1")
+        await _set_template("u2", "K", "用户2")
+        await _overrides(registry, "u1")
+        await _overrides(registry, "u2")
+
+        registry.invalidate("u1")
+        assert registry.get_stats()["misses"] == 2
+        await _overrides(registry, "u2")
+        assert registry.get_stats()["misses"] == 2
+        await _overrides(registry, "u1")
+        assert registry.get_stats()["misses"] == 3
+
+        registry.invalidate()
+        await _overrides(registry, "u2")
+        assert registry.get_stats()["misses"] == 4
+
+    run_async(scenario())
+
+
+def test_registry_expires_after_ttl(registry, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "prompt_template_cache_ttl_seconds", 0)
+
+    async def scenario():
+        await _set_template("u1", "K", "旧模板")
+        await _overrides(registry, "u1")
+        await _set_template("u1", "K", "其他进程修改")
+        assert (await _overrides(registry, "u1"))["K"].content == "其他进程修改"
+
+    run_async(scenario())
+
+
+def test_registry_skips_inactive_templates(registry):
+    async def scenario():
+        await _set_template("u1", "K", "停用", is_active=False)
+        assert await _overrides(registry, "u1") == {}
+
+    run_async(scenario())
+
+
+def test_get_template_prefers_user_override(create_tables):
+    from app.models.prompt_template import PromptTemplate
+    from app.services.prompt_registry import prompt_template_registry
+    from app.services.prompt_service import PromptService
+
+    create_tables(PromptTemplate)
+    template_key = PromptService.get_all_system_templates()[0]["template_key"]
+
+    async def scenario():
+        from app.database import session_scope
+
+        prompt_template_registry.invalidate("u-override")
+        async with session_scope("_tests_", read_only=True) as db:
+            system = await PromptService.get_template(template_key, "u-override", db)
+        await _set_template("u-override", template_key, "自定义{name}")
+        prompt_template_registry.invalidate("u-override")
+        async with session_scope("_tests_", read_only=True) as db:
+            custom = await PromptService.get_template(template_key, "u-override", db)
+        return system, custom
+
+    system, custom = run_async(scenario())
+    assert system == getattr(PromptService, template_key)
+    assert custom == "自定义{name}"